@@ -0,0 +1,134 @@
+"""move large clip bodies to compressed content-addressed storage
+
+Revision ID: add_clip_bodies
+Revises: add_clip_minhash
+Create Date: 2026-10-19
+
+"""
+import hashlib
+import zlib
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard is optional
+    zstandard = None
+
+# revision identifiers, used by Alembic.
+revision = 'add_clip_bodies'
+down_revision = 'add_clip_minhash'
+branch_labels = None
+depends_on = None
+
+BACKFILL_CHUNK_SIZE = 500
+# Fixed here rather than read from app.services.clip_body_service, so the
+# migration does the same thing whatever the environment or later edits
+CLIP_BODY_THRESHOLD = 8192
+CLIP_PREVIEW_CHARS = 1000
+ZLIB_LEVEL = 6
+
+def body_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+def compress(data):
+    # Always zlib, which needs nothing installed; the app reads either codec
+    return 'zlib', zlib.compress(data, ZLIB_LEVEL)
+
+def decompress(codec, data):
+    if codec == 'zlib':
+        return zlib.decompress(data)
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError('Clip body is zstd-compressed but the zstandard package is not installed')
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f'Unknown clip body codec: {codec}')
+
+clips = sa.table('clips', sa.column('id', sa.String), sa.column('value', sa.Text),
+                 sa.column('body_hash', sa.String), sa.column('body_size', sa.Integer))
+bodies = sa.table('clip_bodies', sa.column('hash', sa.String), sa.column('codec', sa.String),
+                  sa.column('size', sa.Integer), sa.column('data', sa.LargeBinary),
+                  sa.column('last_used_at', sa.DateTime))
+
+def upgrade():
+    op.create_table(
+        'clip_bodies',
+        sa.Column('hash', sa.String(64), primary_key=True),
+        sa.Column('codec', sa.String(8), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.Column('last_used_at', sa.DateTime(), nullable=False),
+    )
+    op.add_column('clips', sa.Column('body_hash', sa.String(64), nullable=True))
+    op.add_column('clips', sa.Column('body_size', sa.Integer(), nullable=True))
+    op.create_index('ix_clips_body_hash', 'clips', ['body_hash'])
+
+    # Keyset-paged move of existing large bodies. A UTF-8 character is at most
+    # 4 bytes, so the length() filter is a safe (portable) pre-check; the
+    # exact byte size is checked per row.
+    conn = op.get_bind()
+    now = datetime.utcnow()
+    last_id = ''
+    while True:
+        rows = conn.execute(
+            sa.select(clips.c.id, clips.c.value)
+            .where(clips.c.id > last_id, sa.func.length(clips.c.value) > CLIP_BODY_THRESHOLD // 4)
+            .order_by(clips.c.id)
+            .limit(BACKFILL_CHUNK_SIZE)
+        ).all()
+        if not rows:
+            break
+        moved, new_bodies = [], {}
+        for row in rows:
+            data = row.value.encode('utf-8')
+            if len(data) <= CLIP_BODY_THRESHOLD:
+                continue
+            digest = body_hash(data)
+            new_bodies.setdefault(digest, data)
+            moved.append({"b_id": row.id, "b_value": row.value[:CLIP_PREVIEW_CHARS],
+                          "b_hash": digest, "b_size": len(data)})
+        if moved:
+            known = set(conn.execute(
+                sa.select(bodies.c.hash).where(bodies.c.hash.in_(list(new_bodies)))
+            ).scalars())
+            inserts = []
+            for digest, data in new_bodies.items():
+                if digest not in known:
+                    codec, compressed = compress(data)
+                    inserts.append({"hash": digest, "codec": codec, "size": len(data),
+                                    "data": compressed, "last_used_at": now})
+            if inserts:
+                conn.execute(bodies.insert(), inserts)
+            conn.execute(
+                clips.update()
+                .where(clips.c.id == sa.bindparam('b_id'))
+                .values(value=sa.bindparam('b_value'), body_hash=sa.bindparam('b_hash'),
+                        body_size=sa.bindparam('b_size')),
+                moved
+            )
+        last_id = rows[-1].id
+
+def downgrade():
+    # Put full bodies back in row before dropping the store
+    conn = op.get_bind()
+    last_id = ''
+    while True:
+        rows = conn.execute(
+            sa.select(clips.c.id, bodies.c.codec, bodies.c.data)
+            .join(bodies, bodies.c.hash == clips.c.body_hash)
+            .where(clips.c.id > last_id)
+            .order_by(clips.c.id)
+            .limit(BACKFILL_CHUNK_SIZE)
+        ).all()
+        if not rows:
+            break
+        conn.execute(
+            clips.update().where(clips.c.id == sa.bindparam('b_id')).values(value=sa.bindparam('b_value')),
+            [{"b_id": row.id, "b_value": decompress(row.codec, row.data).decode('utf-8')} for row in rows]
+        )
+        last_id = rows[-1].id
+    op.drop_index('ix_clips_body_hash', table_name='clips')
+    op.drop_column('clips', 'body_size')
+    op.drop_column('clips', 'body_hash')
+    op.drop_table('clip_bodies')
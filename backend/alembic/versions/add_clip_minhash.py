@@ -0,0 +1,70 @@
+"""add minhash signatures and lsh buckets for clips
+
+Revision ID: add_clip_minhash
+Revises: add_clip_url_hash
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import numpy as np
+import sqlalchemy as sa
+from app.utils import minhash
+from app.utils.minhash import DEDUPE_TYPES
+
+# revision identifiers, used by Alembic.
+revision = 'add_clip_minhash'
+down_revision = 'add_clip_url_hash'
+branch_labels = None
+depends_on = None
+
+BACKFILL_CHUNK_SIZE = 2000
+
+def upgrade():
+    op.add_column('clips', sa.Column('minhash', sa.LargeBinary(), nullable=True))
+    op.create_table(
+        'clip_lsh_buckets',
+        sa.Column('clip_id', sa.String(), sa.ForeignKey('clips.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('band', sa.SmallInteger(), primary_key=True),
+        sa.Column('idea_id', sa.String(), nullable=False),
+        sa.Column('bucket', sa.BigInteger(), nullable=False),
+    )
+    op.create_index('ix_clip_lsh_buckets_idea_id_bucket', 'clip_lsh_buckets', ['idea_id', 'bucket'])
+
+    # Backfill in keyset-paged chunks; signatures are computed per chunk in one batch
+    conn = op.get_bind()
+    clips = sa.table('clips', sa.column('id', sa.String), sa.column('type', sa.String),
+                     sa.column('value', sa.Text), sa.column('idea_id', sa.String),
+                     sa.column('minhash', sa.LargeBinary))
+    buckets = sa.table('clip_lsh_buckets', sa.column('clip_id', sa.String), sa.column('band', sa.SmallInteger),
+                       sa.column('idea_id', sa.String), sa.column('bucket', sa.BigInteger))
+    last_id = ''
+    while True:
+        rows = conn.execute(
+            sa.select(clips.c.id, clips.c.type, clips.c.value, clips.c.idea_id)
+            .where(clips.c.type.in_(DEDUPE_TYPES), clips.c.id > last_id)
+            .order_by(clips.c.id)
+            .limit(BACKFILL_CHUNK_SIZE)
+        ).all()
+        if not rows:
+            break
+        sigs = minhash.signatures([(row.type, row.value) for row in rows])
+        signed = [(row, sig) for row, sig in zip(rows, sigs) if sig is not None]
+        if signed:
+            conn.execute(
+                clips.update()
+                .where(clips.c.id == sa.bindparam('b_id'))
+                .values(minhash=sa.bindparam('b_minhash')),
+                [{"b_id": row.id, "b_minhash": minhash.to_bytes(sig)} for row, sig in signed]
+            )
+            keys = minhash.band_keys(np.stack([sig for _, sig in signed]))
+            conn.execute(buckets.insert(), [
+                {"clip_id": row.id, "band": band, "idea_id": row.idea_id, "bucket": int(key)}
+                for (row, _), band_row in zip(signed, keys.tolist())
+                for band, key in enumerate(band_row)
+            ])
+        last_id = rows[-1].id
+
+def downgrade():
+    op.drop_index('ix_clip_lsh_buckets_idea_id_bucket', table_name='clip_lsh_buckets')
+    op.drop_table('clip_lsh_buckets')
+    op.drop_column('clips', 'minhash')
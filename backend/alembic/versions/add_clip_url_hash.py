@@ -0,0 +1,54 @@
+"""add canonical url hash to clips
+
+Revision ID: add_clip_url_hash
+Revises: add_link_metadata
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from app.utils.urls import clip_url_hash, URL_CLIP_TYPES
+
+# revision identifiers, used by Alembic.
+revision = 'add_clip_url_hash'
+down_revision = 'add_link_metadata'
+branch_labels = None
+depends_on = None
+
+BACKFILL_CHUNK_SIZE = 2000
+
+def upgrade():
+    op.add_column('clips', sa.Column('url_hash', sa.String(length=32), nullable=True))
+    op.create_index('ix_clips_url_hash', 'clips', ['url_hash'])
+
+    # Backfill in keyset-paged chunks so large tables never load at once
+    conn = op.get_bind()
+    clips = sa.table('clips', sa.column('id', sa.String), sa.column('type', sa.String),
+                     sa.column('value', sa.Text), sa.column('url_hash', sa.String))
+    last_id = ''
+    while True:
+        rows = conn.execute(
+            sa.select(clips.c.id, clips.c.type, clips.c.value)
+            .where(clips.c.type.in_(URL_CLIP_TYPES), clips.c.id > last_id)
+            .order_by(clips.c.id)
+            .limit(BACKFILL_CHUNK_SIZE)
+        ).all()
+        if not rows:
+            break
+        updates = [
+            {"b_id": row.id, "b_hash": clip_url_hash(row.type, row.value)}
+            for row in rows
+        ]
+        updates = [u for u in updates if u["b_hash"]]
+        if updates:
+            conn.execute(
+                clips.update()
+                .where(clips.c.id == sa.bindparam('b_id'))
+                .values(url_hash=sa.bindparam('b_hash')),
+                updates
+            )
+        last_id = rows[-1].id
+
+def downgrade():
+    op.drop_index('ix_clips_url_hash', table_name='clips')
+    op.drop_column('clips', 'url_hash')
@@ -0,0 +1,24 @@
+"""add content hashes to ideas and clips
+
+Revision ID: add_content_hashes
+Revises: add_sync_columns
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_content_hashes'
+down_revision = 'add_sync_columns'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Left NULL: existing rows are rewritten once on their next sync, then hashed
+    op.add_column('ideas', sa.Column('content_hash', sa.String(length=32), nullable=True))
+    op.add_column('clips', sa.Column('content_hash', sa.String(length=32), nullable=True))
+
+def downgrade():
+    op.drop_column('clips', 'content_hash')
+    op.drop_column('ideas', 'content_hash')
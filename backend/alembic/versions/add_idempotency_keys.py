@@ -0,0 +1,32 @@
+"""add idempotency_keys for retried POST /clips and /collect
+
+Revision ID: add_idempotency_keys
+Revises: add_query_plan_indexes
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_idempotency_keys'
+down_revision = 'add_query_plan_indexes'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'idempotency_keys',
+        sa.Column('user_id', sa.String(), sa.ForeignKey('users.id'), primary_key=True),
+        sa.Column('key', sa.String(255), primary_key=True),
+        sa.Column('request_hash', sa.String(64), nullable=False),
+        sa.Column('response_status', sa.Integer(), nullable=True),
+        sa.Column('response_body', sa.LargeBinary(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+    )
+    op.create_index('ix_idempotency_keys_expires_at', 'idempotency_keys', ['expires_at'])
+
+def downgrade():
+    op.drop_index('ix_idempotency_keys_expires_at', table_name='idempotency_keys')
+    op.drop_table('idempotency_keys')
@@ -0,0 +1,36 @@
+"""add link metadata cache
+
+Revision ID: add_link_metadata
+Revises: add_summary_indexes
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_link_metadata'
+down_revision = 'add_summary_indexes'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('link_metadata',
+    sa.Column('url_hash', sa.String(length=64), nullable=False),
+    sa.Column('url', sa.Text(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('title', sa.Text(), nullable=True),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('canonical_url', sa.Text(), nullable=True),
+    sa.Column('image_url', sa.Text(), nullable=True),
+    sa.Column('site_name', sa.String(), nullable=True),
+    sa.Column('video_id', sa.String(), nullable=True),
+    sa.Column('fetched_at', sa.DateTime(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('url_hash')
+    )
+    op.create_index('ix_link_metadata_expires_at', 'link_metadata', ['expires_at'])
+
+def downgrade():
+    op.drop_index('ix_link_metadata_expires_at', table_name='link_metadata')
+    op.drop_table('link_metadata')
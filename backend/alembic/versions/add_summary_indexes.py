@@ -0,0 +1,23 @@
+"""add indexes for idea summaries
+
+Revision ID: add_summary_indexes
+Revises: add_content_hashes
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_summary_indexes'
+down_revision = 'add_content_hashes'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_index('ix_clips_idea_id_type_created_at', 'clips', ['idea_id', 'type', 'created_at'])
+    op.create_index('ix_clip_tags_tag_id', 'clip_tags', ['tag_id'])
+
+def downgrade():
+    op.drop_index('ix_clip_tags_tag_id', table_name='clip_tags')
+    op.drop_index('ix_clips_idea_id_type_created_at', table_name='clips')
@@ -0,0 +1,50 @@
+"""add updated_at/version columns and tombstones for delta sync
+
+Revision ID: add_sync_columns
+Revises: add_user_data_version
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_sync_columns'
+down_revision = 'add_user_data_version'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('ideas', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.add_column('ideas', sa.Column('version', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('clips', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.add_column('clips', sa.Column('version', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('tags', sa.Column('updated_at', sa.DateTime(), nullable=True))
+    # Existing rows have never been modified since creation
+    op.execute("UPDATE clips SET updated_at = created_at")
+
+    op.create_index('ix_ideas_user_id_version', 'ideas', ['user_id', 'version'])
+    op.create_index('ix_clips_idea_id_version', 'clips', ['idea_id', 'version'])
+
+    op.create_table('tombstones',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('user_id', sa.String(), nullable=False),
+    sa.Column('entity', sa.String(), nullable=False),
+    sa.Column('entity_id', sa.String(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_tombstones_user_id_version', 'tombstones', ['user_id', 'version'])
+
+def downgrade():
+    op.drop_index('ix_tombstones_user_id_version', table_name='tombstones')
+    op.drop_table('tombstones')
+    op.drop_index('ix_clips_idea_id_version', table_name='clips')
+    op.drop_index('ix_ideas_user_id_version', table_name='ideas')
+    op.drop_column('tags', 'updated_at')
+    op.drop_column('clips', 'version')
+    op.drop_column('clips', 'updated_at')
+    op.drop_column('ideas', 'version')
+    op.drop_column('ideas', 'updated_at')
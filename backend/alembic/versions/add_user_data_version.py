@@ -0,0 +1,21 @@
+"""add user data version
+
+Revision ID: add_user_data_version
+Revises: add_user_password_field
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_user_data_version'
+down_revision = 'add_user_password_field'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('users', sa.Column('data_version', sa.Integer(), nullable=False, server_default='0'))
+
+def downgrade():
+    op.drop_column('users', 'data_version')
@@ -0,0 +1,227 @@
+"""store idea and clip ids in compact binary form
+
+Revision ID: compact_ids
+Revises: add_clip_bodies
+Create Date: 2026-10-19
+
+Ids keep their string values; only their storage changes (see
+app.utils.ids). On Postgres this runs online:
+
+  1. add a bytea shadow column per id column, kept current by triggers
+  2. backfill the shadow columns in committed batches
+  3. build the new unique and secondary indexes CONCURRENTLY and prove
+     the shadow columns NOT NULL with validated CHECK constraints
+  4. swap the columns under a short lock (no table scans or index builds)
+  5. validate the foreign keys without blocking writes
+
+Other databases (SQLite in development) are converted in place, in batches.
+"""
+import re
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'compact_ids'
+down_revision = 'add_clip_bodies'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 5000
+
+# table -> id columns converted
+ID_COLUMNS = {
+    'ideas': ['id'],
+    'clips': ['id', 'idea_id'],
+    'clip_tags': ['clip_id'],
+    'clip_lsh_buckets': ['clip_id', 'idea_id'],
+}
+PRIMARY_KEYS = {
+    'ideas': ['id'],
+    'clips': ['id'],
+    'clip_tags': ['clip_id', 'tag_id'],
+    'clip_lsh_buckets': ['clip_id', 'band'],
+}
+INDEXES = {
+    'ix_clips_idea_id_version': ('clips', ['idea_id', 'version']),
+    'ix_clips_idea_id_type_created_at': ('clips', ['idea_id', 'type', 'created_at']),
+    'ix_clip_lsh_buckets_idea_id_bucket': ('clip_lsh_buckets', ['idea_id', 'bucket']),
+}
+# (table, column, referenced table, on delete)
+FOREIGN_KEYS = [
+    ('clips', 'idea_id', 'ideas', None),
+    ('clip_tags', 'clip_id', 'clips', None),
+    ('clip_lsh_buckets', 'clip_id', 'clips', 'CASCADE'),
+]
+
+# The encoding of app.utils.ids, copied so later edits there cannot change
+# what this migration writes
+UUID_RE = re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}')
+TEXT_MARK = b'\xff'
+
+def id_to_bytes(value):
+    if len(value) == 36 and UUID_RE.fullmatch(value):
+        return bytes.fromhex(value.replace('-', ''))
+    data = TEXT_MARK + value.encode('utf-8')
+    return data + TEXT_MARK if len(data) == 16 else data
+
+def id_from_bytes(data):
+    if len(data) == 16:
+        h = data.hex()
+        return f'{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}'
+    return data[1:].rstrip(TEXT_MARK).decode('utf-8')
+
+# Same encoding as id_to_bytes, for triggers and backfill
+COMPACT_ID_FUNCTION = r"""
+CREATE OR REPLACE FUNCTION compact_id(value text) RETURNS bytea
+LANGUAGE sql IMMUTABLE STRICT AS $$
+  SELECT CASE
+    WHEN value ~ '^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$'
+      THEN decode(replace(value, '-', ''), 'hex')
+    WHEN octet_length(value) = 15
+      THEN '\xff'::bytea || convert_to(value, 'UTF8') || '\xff'::bytea
+    ELSE '\xff'::bytea || convert_to(value, 'UTF8')
+  END
+$$
+"""
+
+# Inverse, for downgrade
+EXPAND_ID_FUNCTION = r"""
+CREATE OR REPLACE FUNCTION expand_id(value bytea) RETURNS text
+LANGUAGE sql IMMUTABLE STRICT AS $$
+  SELECT CASE
+    WHEN octet_length(value) = 16
+      THEN regexp_replace(encode(value, 'hex'), '^(.{8})(.{4})(.{4})(.{4})(.{12})$', '\1-\2-\3-\4-\5')
+    WHEN octet_length(value) = 17 AND get_byte(value, 16) = 255
+      THEN convert_from(substring(value FROM 2 FOR 15), 'UTF8')
+    ELSE convert_from(substring(value FROM 2), 'UTF8')
+  END
+$$
+"""
+
+def _shadow(column):
+    return f'{column}_bin'
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        _convert_in_place(id_to_bytes)
+        return
+
+    op.execute(COMPACT_ID_FUNCTION)
+    for table, columns in ID_COLUMNS.items():
+        for column in columns:
+            op.add_column(table, sa.Column(_shadow(column), sa.LargeBinary(), nullable=True))
+        assignments = ' '.join(f'NEW.{_shadow(c)} := compact_id(NEW.{c});' for c in columns)
+        op.execute(f"""
+            CREATE FUNCTION {table}_compact_ids() RETURNS trigger LANGUAGE plpgsql AS $$
+            BEGIN {assignments} RETURN NEW; END $$
+        """)
+        op.execute(f"""
+            CREATE TRIGGER {table}_compact_ids BEFORE INSERT OR UPDATE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION {table}_compact_ids()
+        """)
+
+    with op.get_context().autocommit_block():
+        # New writes are covered by the triggers; fill in existing rows
+        for table, columns in ID_COLUMNS.items():
+            pending = ' OR '.join(f'({_shadow(c)} IS NULL AND {c} IS NOT NULL)' for c in columns)
+            assignments = ', '.join(f'{_shadow(c)} = compact_id({c})' for c in columns)
+            while True:
+                result = op.get_bind().execute(sa.text(f"""
+                    UPDATE {table} SET {assignments}
+                    WHERE ctid IN (SELECT ctid FROM {table} WHERE {pending} LIMIT {BATCH_SIZE})
+                """))
+                if result.rowcount == 0:
+                    break
+
+        for table, key in PRIMARY_KEYS.items():
+            key_columns = ', '.join(_shadow(c) if c in ID_COLUMNS[table] else c for c in key)
+            op.execute(f'CREATE UNIQUE INDEX CONCURRENTLY {table}_pkey_bin ON {table} ({key_columns})')
+        for name, (table, columns) in INDEXES.items():
+            index_columns = ', '.join(_shadow(c) if c in ID_COLUMNS[table] else c for c in columns)
+            op.execute(f'CREATE INDEX CONCURRENTLY {name}_bin ON {table} ({index_columns})')
+        for table, columns in ID_COLUMNS.items():
+            for column in columns:
+                op.execute(f'ALTER TABLE {table} ADD CONSTRAINT {table}_{column}_bin_not_null '
+                           f'CHECK ({_shadow(column)} IS NOT NULL) NOT VALID')
+                op.execute(f'ALTER TABLE {table} VALIDATE CONSTRAINT {table}_{column}_bin_not_null')
+
+    # The swap: every step below is a catalog change, so the lock is brief
+    op.execute('LOCK TABLE ideas, clips, clip_tags, clip_lsh_buckets IN ACCESS EXCLUSIVE MODE')
+    for table, columns in ID_COLUMNS.items():
+        op.execute(f'DROP TRIGGER {table}_compact_ids ON {table}')
+        op.execute(f'DROP FUNCTION {table}_compact_ids()')
+    for table, columns in ID_COLUMNS.items():
+        for column in columns:
+            # Takes the old key, foreign keys and indexes with it
+            op.execute(f'ALTER TABLE {table} DROP COLUMN {column} CASCADE')
+            op.execute(f'ALTER TABLE {table} RENAME COLUMN {_shadow(column)} TO {column}')
+            # Proven by the validated CHECK, so this does not scan
+            op.execute(f'ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL')
+            op.execute(f'ALTER TABLE {table} DROP CONSTRAINT {table}_{column}_bin_not_null')
+    for table in PRIMARY_KEYS:
+        op.execute(f'ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY USING INDEX {table}_pkey_bin')
+    for name in INDEXES:
+        op.execute(f'ALTER INDEX {name}_bin RENAME TO {name}')
+    for table, column, referenced, on_delete in FOREIGN_KEYS:
+        cascade = f' ON DELETE {on_delete}' if on_delete else ''
+        op.execute(f'ALTER TABLE {table} ADD CONSTRAINT {table}_{column}_fkey FOREIGN KEY ({column}) '
+                   f'REFERENCES {referenced} (id){cascade} NOT VALID')
+    op.execute('DROP FUNCTION compact_id(text)')
+
+    with op.get_context().autocommit_block():
+        for table, column, _, _ in FOREIGN_KEYS:
+            op.execute(f'ALTER TABLE {table} VALIDATE CONSTRAINT {table}_{column}_fkey')
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        _convert_in_place(id_from_bytes)
+        return
+
+    # Offline: a single transaction that rewrites the tables
+    op.execute(EXPAND_ID_FUNCTION)
+    for table, column, _, _ in FOREIGN_KEYS:
+        op.execute(f'ALTER TABLE {table} DROP CONSTRAINT {table}_{column}_fkey')
+    for table, columns in ID_COLUMNS.items():
+        for column in columns:
+            op.execute(f'ALTER TABLE {table} ALTER COLUMN {column} TYPE varchar USING expand_id({column})')
+    for table, column, referenced, on_delete in FOREIGN_KEYS:
+        cascade = f' ON DELETE {on_delete}' if on_delete else ''
+        op.execute(f'ALTER TABLE {table} ADD CONSTRAINT {table}_{column}_fkey FOREIGN KEY ({column}) '
+                   f'REFERENCES {referenced} (id){cascade}')
+    op.execute('DROP FUNCTION expand_id(bytea)')
+
+def _convert_in_place(convert):
+    """
+    Rewrite id values in keyset-paged batches. SQLite does not enforce
+    column types or (by default) foreign keys, so values can change
+    representation without rebuilding tables.
+    """
+    conn = op.get_bind()
+    for table, columns in ID_COLUMNS.items():
+        t = sa.table(table, sa.column('rowid', sa.Integer), *(sa.column(c) for c in columns))
+        last = 0
+        while True:
+            rows = conn.execute(
+                sa.select(t.c.rowid, *(t.c[c] for c in columns))
+                .where(t.c.rowid > last)
+                .order_by(t.c.rowid)
+                .limit(BATCH_SIZE)
+            ).all()
+            if not rows:
+                break
+            conn.execute(
+                t.update().where(t.c.rowid == sa.bindparam('b_rowid'))
+                .values({c: sa.bindparam(f'b_{c}') for c in columns}),
+                [
+                    {'b_rowid': row[0], **{f'b_{c}': _convert(convert, value) for c, value in zip(columns, row[1:])}}
+                    for row in rows
+                ]
+            )
+            last = rows[-1][0]
+
+def _convert(convert, value):
+    if value is None:
+        return None
+    if convert is id_to_bytes:
+        return value if isinstance(value, bytes) else id_to_bytes(value)
+    return value if isinstance(value, str) else id_from_bytes(bytes(value))
@@ -8,6 +8,7 @@ from sqlalchemy.orm import Session
 from app.models.db_models import User
 from app.models.schemas import TokenData
 from app.db.session import SessionLocal
+from app.db.repository import Repository, get_repository
 
 # Configuration
 SECRET_KEY = "your-secret-key-keep-it-secret"  # Change this in production!
@@ -66,7 +67,7 @@ def create_refresh_token(data: dict) -> str:
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+async def get_current_user(token: str = Depends(oauth2_scheme), repo: Repository = Depends(get_repository)) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -119,7 +120,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         print(f"JWT Error: {str(e)}")
         raise credentials_exception
 
-    user = db.query(User).filter(User.email == token_data.email).first()
+    user = repo.user_by_email(token_data.email)
     if user is None:
         print(f"No user found with email: {token_data.email}")
         raise credentials_exception
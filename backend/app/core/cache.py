@@ -0,0 +1,476 @@
+"""
+Cache for values that are expensive to load.
+
+get_cache(namespace) gives a Cache whose get_or_set() returns the cached
+value for a key, or runs the loader and stores what it returns. Values are
+pickled, so anything picklable can be cached; keep them plain (dicts,
+bytes, dataclasses), never ORM instances.
+
+Backends (CACHE_BACKEND):
+  local  in-process LRU, evicting least recently used entries once they
+         take more than CACHE_MAX_BYTES
+  resp   a Redis-protocol server at CACHE_URL, shared by every worker
+         (redis://[:password@]host:port/db); evicts by its own maxmemory
+         policy. benchmarks.resp_stub is a stand-in for local runs.
+
+Tags group entries for invalidation. Each tag has a generation counter;
+an entry remembers the generations of its tags as they were before its
+value was loaded, and stops matching once any of them moves on. A write
+that lands while a value is being loaded therefore leaves the stored
+value already stale, instead of cached until its TTL.
+
+Every user's entries carry user_tag(user_id). Invalidation events from
+app.core.invalidation move that tag on, so writes on any worker evict the
+user's entries. With the shared backend only the writing worker needs to,
+so events from other workers are ignored. The local backend with the
+in-process transport hears no other worker's writes, so it is refused
+when WEB_CONCURRENCY (the worker count uvicorn and gunicorn read) is
+above 1: a worker would go on serving its cached user, and the ETags
+built from that user's data version would answer 304 for changed data.
+
+Stampedes are held off in two ways. A hit close to expiry is refreshed
+early by a caller chosen at random, weighted by how long the value took
+to load, while everyone else is still served the cached value. A miss
+takes a short lock so one caller loads while the others wait for its
+result, up to CACHE_LOCK_WAIT seconds before loading themselves.
+
+Hits, misses, early refreshes and lock waits are counted per namespace;
+cache_stats.report() gives them with hit rates.
+"""
+import math
+import os
+import pickle
+import random
+import socket
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from queue import Empty, LifoQueue
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from app.core.invalidation import ALL, InProcessTransport, Invalidation, get_invalidation_bus
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "local")
+CACHE_URL = os.getenv("CACHE_URL", "redis://127.0.0.1:6379/0")
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_TTL = float(os.getenv("CACHE_TTL", "300"))
+CACHE_LOCK_WAIT = float(os.getenv("CACHE_LOCK_WAIT", "2"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+# How long a loader may hold the lock before others give up on it
+LOCK_TTL = 10.0
+LOCK_POLL = 0.01
+# Higher refreshes earlier; 1 is the usual choice for probabilistic early expiry
+EARLY_REFRESH_BETA = 1.0
+RESP_POOL_SIZE = 8
+RESP_TIMEOUT = 1.0
+
+MISSING = object()
+
+def user_tag(user_id: str) -> str:
+    return f"user:{user_id}"
+
+class CacheBackend(ABC):
+    """Byte values under string keys; shared is True when all workers see the same data"""
+    shared = False
+
+    @abstractmethod
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        ...
+
+    @abstractmethod
+    def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        """Set only if the key is absent; False when it was there"""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def incr(self, key: str) -> int:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+class LocalBackend(CacheBackend):
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES, clock: Callable[[], float] = time.monotonic):
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.size = 0
+        self.evictions = 0
+        # key -> (value, expires_at or None), least recently used first
+        self._entries: "OrderedDict[str, Tuple[bytes, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _live(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= self.clock():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def _remove(self, key: str) -> None:
+        value, _ = self._entries.pop(key)
+        self.size -= len(key) + len(value)
+
+    def _store(self, key: str, value: bytes, ttl: Optional[float]) -> None:
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (value, self.clock() + ttl if ttl else None)
+        self.size += len(key) + len(value)
+        # Tag generations are read alongside every entry carrying them, so
+        # they stay more recently used than those entries and outlive them
+        while self.size > self.max_bytes and len(self._entries) > 1:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def get_many(self, keys):
+        with self._lock:
+            return [self._live(key) for key in keys]
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def add(self, key, value, ttl=None):
+        with self._lock:
+            if self._live(key) is not None:
+                return False
+            self._store(key, value, ttl)
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def incr(self, key):
+        with self._lock:
+            value = int(self._live(key) or 0) + 1
+            self._store(key, str(value).encode(), None)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+class RespError(Exception):
+    """An error reply from the server"""
+
+class RespBackend(CacheBackend):
+    """
+    Speaks the Redis protocol (RESP2) over a small pool of sockets, so any
+    Redis-compatible server works and no client library is needed.
+    """
+    shared = True
+
+    def __init__(self, url: str = CACHE_URL, pool_size: int = RESP_POOL_SIZE, timeout: float = RESP_TIMEOUT):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._pool: "LifoQueue" = LifoQueue(maxsize=pool_size)
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        conn = (sock, sock.makefile("rb"))
+        if self.password:
+            self._call(conn, "AUTH", self.password)
+        if self.db:
+            self._call(conn, "SELECT", self.db)
+        return conn
+
+    @staticmethod
+    def _encode(args: Iterable[Any]) -> bytes:
+        parts = []
+        args = [arg if isinstance(arg, bytes) else str(arg).encode() for arg in args]
+        parts.append(b"*%d\r\n" % len(args))
+        for arg in args:
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(parts)
+
+    def _read(self, reader):
+        line = reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Connection closed by the cache server")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise RespError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(rest)
+            return None if length < 0 else [self._read(reader) for _ in range(length)]
+        raise ConnectionError(f"Unexpected reply from the cache server: {line[:50]!r}")
+
+    def _call(self, conn, *args):
+        sock, reader = conn
+        sock.sendall(self._encode(args))
+        return self._read(reader)
+
+    def command(self, *args):
+        try:
+            conn = self._pool.get_nowait()
+        except Empty:
+            conn = self._connect()
+        try:
+            reply = self._call(conn, *args)
+        except RespError:
+            self._release(conn)
+            raise
+        except Exception:
+            # The connection may be mid-reply; never reuse it
+            conn[0].close()
+            raise
+        self._release(conn)
+        return reply
+
+    def _release(self, conn) -> None:
+        try:
+            self._pool.put_nowait(conn)
+        except Exception:
+            conn[0].close()
+
+    @staticmethod
+    def _px(ttl: Optional[float]) -> List[Any]:
+        return ["PX", max(1, int(ttl * 1000))] if ttl else []
+
+    def get_many(self, keys):
+        return self.command("MGET", *keys)
+
+    def set(self, key, value, ttl=None):
+        self.command("SET", key, value, *self._px(ttl))
+
+    def add(self, key, value, ttl=None):
+        return self.command("SET", key, value, "NX", *self._px(ttl)) is not None
+
+    def delete(self, key):
+        self.command("DEL", key)
+
+    def incr(self, key):
+        return self.command("INCR", key)
+
+    def clear(self):
+        self.command("FLUSHDB")
+
+BACKENDS: Dict[str, Callable[[], CacheBackend]] = {
+    "local": LocalBackend,
+    "resp": RespBackend,
+}
+
+class CacheStats:
+    COUNTERS = ("hits", "misses", "early_refreshes", "lock_waits", "errors")
+
+    def __init__(self):
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def count(self, namespace: str, counter: str) -> None:
+        with self._lock:
+            counts = self._counts.setdefault(namespace, dict.fromkeys(self.COUNTERS, 0))
+            counts[counter] += 1
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            report = {namespace: dict(counts) for namespace, counts in self._counts.items()}
+        for counts in report.values():
+            lookups = counts["hits"] + counts["misses"]
+            counts["hit_rate"] = round(counts["hits"] / lookups, 4) if lookups else None
+        return report
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts.clear()
+
+class Cache:
+    def __init__(self, namespace: str, backend: CacheBackend, stats: CacheStats,
+                 lock_wait: float = CACHE_LOCK_WAIT, clock: Callable[[], float] = time.time):
+        self.namespace = namespace
+        self.backend = backend
+        self.stats = stats
+        self.lock_wait = lock_wait
+        # Wall clock: expiry times are shared with workers on other hosts
+        self.clock = clock
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def _lookup(self, key: str, tags: Tuple[str, ...]):
+        """(value or MISSING, tag generations, whether to refresh early)"""
+        raw, *generations = self.backend.get_many([self._key(key)] + [f"tag:{tag}" for tag in tags])
+        generations = tuple(int(g or 0) for g in generations)
+        if raw is None:
+            return MISSING, generations, False
+        value, stored, expires_at, load_time = pickle.loads(raw)
+        if stored != generations:
+            return MISSING, generations, False
+        # Probabilistic early expiry: the closer to expiry and the slower the
+        # load, the likelier this caller refreshes ahead of everyone else
+        early = self.clock() - load_time * EARLY_REFRESH_BETA * math.log(1.0 - random.random()) >= expires_at
+        return value, generations, early
+
+    def get(self, key: str, tags: Iterable[str] = ()) -> Any:
+        """The cached value, or MISSING"""
+        try:
+            value, _, _ = self._lookup(key, tuple(tags))
+        except Exception as e:
+            self._error(e)
+            return MISSING
+        self.stats.count(self.namespace, "hits" if value is not MISSING else "misses")
+        return value
+
+    def set(self, key: str, value: Any, ttl: float = CACHE_TTL, tags: Iterable[str] = ()) -> None:
+        tags = tuple(tags)
+        try:
+            generations = ()
+            if tags:
+                generations = tuple(int(g or 0) for g in self.backend.get_many([f"tag:{tag}" for tag in tags]))
+            self._store(key, value, ttl, generations, 0.0)
+        except Exception as e:
+            self._error(e)
+
+    def delete(self, key: str) -> None:
+        try:
+            self.backend.delete(self._key(key))
+        except Exception as e:
+            self._error(e)
+
+    def _store(self, key: str, value: Any, ttl: float, generations: Tuple[int, ...], load_time: float) -> None:
+        entry = (value, generations, self.clock() + ttl, load_time)
+        self.backend.set(self._key(key), pickle.dumps(entry, pickle.HIGHEST_PROTOCOL), ttl)
+
+    def _load(self, key, loader, ttl, generations) -> Any:
+        started = self.clock()
+        value = loader()
+        try:
+            self._store(key, value, ttl, generations, self.clock() - started)
+        except Exception as e:
+            self._error(e)
+        return value
+
+    def get_or_set(self, key: str, loader: Callable[[], Any], ttl: float = CACHE_TTL,
+                   tags: Iterable[str] = (), lock: bool = True) -> Any:
+        """
+        The cached value for key, or loader()'s result, stored for ttl
+        seconds. lock=False skips the miss lock, for loaders cheap enough
+        that waiting on another caller costs more than loading.
+        """
+        tags = tuple(tags)
+        try:
+            value, generations, early = self._lookup(key, tags)
+        except Exception as e:
+            # A cache that is down must not take the app with it
+            self._error(e)
+            return loader()
+        if value is not MISSING and not early:
+            self.stats.count(self.namespace, "hits")
+            return value
+        if value is not MISSING:
+            self.stats.count(self.namespace, "early_refreshes")
+        if not lock:
+            self.stats.count(self.namespace, "misses")
+            return self._load(key, loader, ttl, generations)
+
+        lock_key = self._key(f"lock:{key}")
+        try:
+            locked = self.backend.add(lock_key, b"1", LOCK_TTL)
+        except Exception as e:
+            self._error(e)
+            locked = True
+        if locked:
+            self.stats.count(self.namespace, "misses")
+            try:
+                return self._load(key, loader, ttl, generations)
+            finally:
+                self.delete(f"lock:{key}")
+        if value is not MISSING:
+            # Someone else is already refreshing it
+            self.stats.count(self.namespace, "hits")
+            return value
+
+        self.stats.count(self.namespace, "lock_waits")
+        deadline = time.monotonic() + self.lock_wait
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL)
+            try:
+                value, generations, _ = self._lookup(key, tags)
+            except Exception as e:
+                self._error(e)
+                break
+            if value is not MISSING:
+                self.stats.count(self.namespace, "hits")
+                return value
+        self.stats.count(self.namespace, "misses")
+        return self._load(key, loader, ttl, generations)
+
+    def invalidate_tag(self, tag: str) -> None:
+        """Make every entry carrying the tag, in any namespace, stale"""
+        try:
+            self.backend.incr(f"tag:{tag}")
+        except Exception as e:
+            self._error(e)
+
+    def _error(self, e: Exception) -> None:
+        self.stats.count(self.namespace, "errors")
+        print(f"Cache error in {self.namespace}: {str(e)}")
+
+def evict(backend: CacheBackend, invalidation: Invalidation) -> None:
+    """Invalidation bus handler: make the user's entries stale"""
+    if backend.shared and not invalidation.local:
+        # The writing worker has already done it for everyone
+        return
+    try:
+        if invalidation.user_id == ALL:
+            backend.clear()
+        else:
+            backend.incr(f"tag:{user_tag(invalidation.user_id)}")
+    except Exception as e:
+        print(f"Error evicting cache entries: {str(e)}")
+
+def check_workers(backend: CacheBackend, workers: int = WEB_CONCURRENCY) -> None:
+    """Refuse a per-worker backend that other workers' invalidations never reach"""
+    if workers > 1 and not backend.shared and isinstance(get_invalidation_bus().transport, InProcessTransport):
+        raise RuntimeError(
+            f"CACHE_BACKEND={CACHE_BACKEND} with in-process invalidation is only safe with one worker, "
+            f"but WEB_CONCURRENCY={workers}; set CACHE_BACKEND=resp or INVALIDATION_TRANSPORT=postgres"
+        )
+
+# Create singleton instances
+cache_backend = None
+cache_stats = CacheStats()
+
+def get_cache_backend():
+    """Get or create the cache backend CACHE_BACKEND names, evicting on invalidation events"""
+    global cache_backend
+    if cache_backend is None:
+        backend = BACKENDS[CACHE_BACKEND]()
+        check_workers(backend)
+        get_invalidation_bus().subscribe(lambda invalidation: evict(backend, invalidation))
+        cache_backend = backend
+    return cache_backend
+
+def get_cache(namespace: str) -> Cache:
+    """A Cache over the shared backend, counting into cache_stats under namespace"""
+    return Cache(namespace, get_cache_backend(), cache_stats)
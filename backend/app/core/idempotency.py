@@ -0,0 +1,175 @@
+"""
+Idempotency-Key support for POST routes the extension retries.
+
+The first request with a key claims it by inserting an idempotency_keys
+row, committed before any work starts, then stores its response there.
+A retry with the same key and payload gets that response back, with an
+Idempotent-Replayed header, without touching the data tables. A duplicate
+that arrives while the first request is still running gets a 409 at once,
+with Retry-After: IDEMPOTENCY_RETRY_AFTER seconds. Waiting for the first
+request instead would hold a threadpool thread per duplicate, so clients
+retrying a slow /collect could starve the server.
+
+- A key reused with a different payload gets a 422.
+- A request that fails gives its key up, so the retry runs in full.
+- A claim whose request died without finishing is taken over after
+  IDEMPOTENCY_STALE seconds.
+- Keys expire after IDEMPOTENCY_TTL_HOURS. Expired rows are swept at
+  most every SWEEP_INTERVAL seconds by whichever request notices.
+"""
+import hashlib
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Optional
+
+from fastapi import HTTPException, Response
+from pydantic import BaseModel
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.responses import FastJSONResponse, dumps
+from app.models.db_models import IdempotencyKey
+
+IDEMPOTENCY_TTL_HOURS = float(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+IDEMPOTENCY_RETRY_AFTER = int(os.getenv("IDEMPOTENCY_RETRY_AFTER", "2"))
+IDEMPOTENCY_STALE = float(os.getenv("IDEMPOTENCY_STALE", "300"))
+MAX_KEY_LENGTH = 255
+SWEEP_INTERVAL = 600
+REPLAY_HEADER = "Idempotent-Replayed"
+
+def request_hash(route: str, payload: BaseModel) -> str:
+    """Fingerprint of a request, to tell a retry from a different request reusing its key"""
+    return hashlib.sha256(f"{route}\n{payload.model_dump_json()}".encode("utf-8")).hexdigest()
+
+class IdempotencyStore:
+    def __init__(
+        self,
+        ttl: timedelta = timedelta(hours=IDEMPOTENCY_TTL_HOURS),
+        retry_after: int = IDEMPOTENCY_RETRY_AFTER,
+        stale_after: timedelta = timedelta(seconds=IDEMPOTENCY_STALE)
+    ):
+        self.ttl = ttl
+        self.retry_after = retry_after
+        self.stale_after = stale_after
+        self._last_sweep = 0.0
+
+    def claim(self, db: Session, user_id: str, key: str, fingerprint: str) -> Optional[Response]:
+        """
+        None once this request holds the key and should do the work;
+        otherwise the stored response to send instead.
+        """
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters")
+        if time.monotonic() - self._last_sweep > SWEEP_INTERVAL:
+            self.collect_garbage(db)
+        while True:
+            now = datetime.utcnow()
+            try:
+                db.execute(insert(IdempotencyKey).values(
+                    user_id=user_id, key=key, request_hash=fingerprint,
+                    created_at=now, expires_at=now + self.ttl
+                ))
+                # Committed before the work starts, so duplicates see the claim
+                db.commit()
+                return None
+            except IntegrityError:
+                db.rollback()
+
+            row = db.execute(
+                select(IdempotencyKey.request_hash, IdempotencyKey.response_status,
+                       IdempotencyKey.response_body, IdempotencyKey.created_at, IdempotencyKey.expires_at)
+                .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+            ).first()
+            db.rollback()
+            if row is None:
+                # The first request failed and gave the key up
+                continue
+            abandoned = row.response_status is None and row.created_at < now - self.stale_after
+            if row.expires_at <= now or abandoned:
+                db.execute(delete(IdempotencyKey).where(
+                    IdempotencyKey.user_id == user_id, IdempotencyKey.key == key,
+                    IdempotencyKey.created_at == row.created_at
+                ))
+                db.commit()
+                continue
+            if row.request_hash != fingerprint:
+                raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+            if row.response_status is not None:
+                return Response(content=row.response_body, status_code=row.response_status,
+                                media_type="application/json", headers={REPLAY_HEADER: "true"})
+            raise HTTPException(
+                status_code=409, detail="A request with this Idempotency-Key is still in progress",
+                headers={"Retry-After": str(self.retry_after)}
+            )
+
+    def complete(self, db: Session, user_id: str, key: str, status_code: int, body: bytes) -> None:
+        db.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+            .values(response_status=status_code, response_body=body)
+        )
+        db.commit()
+
+    def release(self, db: Session, user_id: str, key: str) -> None:
+        """Give up a claimed key after the request failed, so a retry can run"""
+        db.rollback()
+        db.execute(delete(IdempotencyKey).where(
+            IdempotencyKey.user_id == user_id, IdempotencyKey.key == key,
+            IdempotencyKey.response_status.is_(None)
+        ))
+        db.commit()
+
+    def run(
+        self,
+        db: Session,
+        user_id: str,
+        key: Optional[str],
+        fingerprint: str,
+        handler: Callable[[], Any],
+        status_code: int = 200
+    ) -> Any:
+        """
+        Handle a request at most once per key: run handler() and store its
+        result, or replay the stored result. Without a key, just run it.
+        """
+        if key is None:
+            return handler()
+        replay = self.claim(db, user_id, key, fingerprint)
+        if replay is not None:
+            return replay
+        try:
+            result = handler()
+        except BaseException:
+            try:
+                self.release(db, user_id, key)
+            except Exception as e:
+                # The claim goes stale and is taken over later
+                print(f"Error releasing Idempotency-Key: {str(e)}")
+            raise
+        body = dumps(result.model_dump(mode="json") if isinstance(result, BaseModel) else result)
+        # If this fails the work is done but unrecorded; the claim stays until
+        # it goes stale rather than letting a retry repeat the work at once
+        self.complete(db, user_id, key, status_code, body)
+        # The first response is byte for byte what retries will get
+        return FastJSONResponse(body, status_code=status_code)
+
+    def collect_garbage(self, db: Session) -> int:
+        """Delete expired keys"""
+        self._last_sweep = time.monotonic()
+        deleted = db.execute(
+            delete(IdempotencyKey).where(IdempotencyKey.expires_at <= datetime.utcnow())
+        ).rowcount
+        db.commit()
+        return deleted
+
+# Create singleton instance
+idempotency_store = None
+
+def get_idempotency_store():
+    """Get or create the idempotency store instance"""
+    global idempotency_store
+    if idempotency_store is None:
+        idempotency_store = IdempotencyStore()
+    return idempotency_store
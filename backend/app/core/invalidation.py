@@ -0,0 +1,237 @@
+"""
+Cache invalidation across worker processes.
+
+Write paths queue an Invalidation (user id, entity, data version) on their
+session with invalidate_after_commit(), which bump_data_version() does for
+them; once the transaction commits it is published on the bus. Subscribers in this process get it straight away,
+and the transport carries it to every other worker, whose subscribers
+evict what the event names.
+
+Transports (INVALIDATION_TRANSPORT):
+  local     in-process only, the default; enough for a single worker and
+            for tests, where several buses can share one transport
+  postgres  NOTIFY on INVALIDATION_CHANNEL, with a LISTEN thread per worker
+
+Others register in TRANSPORTS. A transport that may have missed events,
+like a LISTEN connection that dropped, asks the bus to resync: every
+subscriber then gets the wildcard event and drops everything it holds.
+"""
+import os
+import select
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+try:
+    import psycopg2
+    import psycopg2.extensions
+except ImportError:  # pragma: no cover - psycopg2 is optional
+    psycopg2 = None
+
+INVALIDATION_TRANSPORT = os.getenv("INVALIDATION_TRANSPORT", "local")
+INVALIDATION_CHANNEL = os.getenv("INVALIDATION_CHANNEL", "clipkit_invalidation")
+RECONNECT_DELAY = 1.0
+# Entities; ALL stands for any entity, or with user_id ALL, for everything
+ENTITIES = ("user", "idea", "clip", "tag")
+ALL = "*"
+
+@dataclass(frozen=True)
+class Invalidation:
+    user_id: str
+    entity: str
+    version: int = 0
+    # False for events that came from another worker
+    local: bool = True
+
+    def encode(self, origin: str) -> str:
+        # The user id goes last, so it may contain the separator
+        return f"{origin}:{self.entity}:{self.version}:{self.user_id}"
+
+    @classmethod
+    def decode(cls, payload: str):
+        """(origin, event) from an encoded payload"""
+        origin, entity, version, user_id = payload.split(":", 3)
+        return origin, cls(user_id=user_id, entity=entity, version=int(version), local=False)
+
+RESYNC = Invalidation(user_id=ALL, entity=ALL, local=False)
+
+class Transport(ABC):
+    """Carries encoded events between the buses of different workers"""
+
+    @abstractmethod
+    def start(self, deliver: Callable[[str], None], resync: Callable[[], None]) -> None:
+        """Begin handing received payloads to deliver"""
+
+    @abstractmethod
+    def send(self, payload: str) -> None:
+        ...
+
+    def close(self) -> None:
+        pass
+
+class InProcessTransport(Transport):
+    """Delivers to every bus started on this transport, synchronously"""
+
+    def __init__(self):
+        self._receivers: List[Callable[[str], None]] = []
+
+    def start(self, deliver, resync):
+        self._receivers.append(deliver)
+
+    def send(self, payload):
+        for deliver in list(self._receivers):
+            deliver(payload)
+
+    def close(self):
+        self._receivers.clear()
+
+class PostgresTransport(Transport):
+    """
+    NOTIFY to send, and a daemon thread holding a LISTEN connection to
+    receive. Notifications go out on their own autocommit connection after
+    the write has committed, so a worker evicting on receipt never reloads
+    the old data.
+    """
+
+    def __init__(self, url: str, channel: str = INVALIDATION_CHANNEL, reconnect_delay: float = RECONNECT_DELAY):
+        if psycopg2 is None:
+            raise RuntimeError("The postgres invalidation transport needs psycopg2")
+        self.url = make_url(url)
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self.engine = create_engine(url, pool_size=2, max_overflow=2)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def send(self, payload):
+        with self.engine.connect() as conn:
+            conn.execute(text("SELECT pg_notify(:channel, :payload)"),
+                         {"channel": self.channel, "payload": payload})
+            conn.commit()
+
+    def start(self, deliver, resync):
+        self._thread = threading.Thread(
+            target=self._listen, args=(deliver, resync), name="invalidation-listener", daemon=True
+        )
+        self._thread.start()
+
+    def _connect(self):
+        dsn = self.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        conn = psycopg2.connect(dsn)
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with conn.cursor() as cursor:
+            cursor.execute(f'LISTEN "{self.channel}"')
+        return conn
+
+    def _listen(self, deliver, resync):
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = self._connect()
+                # Whatever was sent while we weren't listening is lost
+                resync()
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], 1.0)[0]:
+                        conn.poll()
+                        while conn.notifies:
+                            deliver(conn.notifies.pop(0).payload)
+            except Exception as e:
+                print(f"Invalidation listener error, reconnecting: {str(e)}")
+                time.sleep(self.reconnect_delay)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    def close(self):
+        self._stop.set()
+        self.engine.dispose()
+
+TRANSPORTS: Dict[str, Callable[[], Transport]] = {
+    "local": InProcessTransport,
+    "postgres": lambda: PostgresTransport(os.getenv("DATABASE_URL")),
+}
+
+class InvalidationBus:
+    def __init__(self, transport: Transport):
+        self.transport = transport
+        # Tells this worker's own events apart when the transport echoes them
+        self.origin = uuid.uuid4().hex[:12]
+        self._subscribers: List[Callable[[Invalidation], None]] = []
+        self._lock = threading.Lock()
+        transport.start(self._receive, self.resync)
+
+    def subscribe(self, handler: Callable[[Invalidation], None]) -> Callable[[], None]:
+        """Call handler for every event; returns a function that unsubscribes"""
+        with self._lock:
+            self._subscribers.append(handler)
+        def unsubscribe():
+            with self._lock:
+                if handler in self._subscribers:
+                    self._subscribers.remove(handler)
+        return unsubscribe
+
+    def publish(self, user_id: str, entity: str, version: int = 0) -> None:
+        invalidation = Invalidation(user_id=user_id, entity=entity, version=version)
+        self._dispatch(invalidation)
+        try:
+            self.transport.send(invalidation.encode(self.origin))
+        except Exception as e:
+            # Other workers' caches catch up when their entries expire
+            print(f"Error publishing invalidation: {str(e)}")
+
+    def resync(self) -> None:
+        self._dispatch(RESYNC)
+
+    def _receive(self, payload: str) -> None:
+        try:
+            origin, invalidation = Invalidation.decode(payload)
+        except ValueError:
+            print(f"Ignoring malformed invalidation: {payload[:100]}")
+            return
+        if origin != self.origin:
+            self._dispatch(invalidation)
+
+    def _dispatch(self, invalidation: Invalidation) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for handler in subscribers:
+            try:
+                handler(invalidation)
+            except Exception as e:
+                print(f"Error in invalidation handler: {str(e)}")
+
+    def close(self) -> None:
+        self.transport.close()
+
+def invalidate_after_commit(db: Session, user_id: str, entity: str, version: int = 0) -> None:
+    """Publish an invalidation once the session's transaction commits"""
+    db.info.setdefault("invalidations", []).append((user_id, entity, version))
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending(session):
+    pending = session.info.pop("invalidations", None)
+    if pending:
+        bus = get_invalidation_bus()
+        for user_id, entity, version in dict.fromkeys(pending):
+            bus.publish(user_id, entity, version)
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending(session):
+    session.info.pop("invalidations", None)
+
+# Create singleton instance
+invalidation_bus = None
+
+def get_invalidation_bus():
+    """Get or create the invalidation bus, on the transport INVALIDATION_TRANSPORT names"""
+    global invalidation_bus
+    if invalidation_bus is None:
+        invalidation_bus = InvalidationBus(TRANSPORTS[INVALIDATION_TRANSPORT]())
+    return invalidation_bus
@@ -0,0 +1,45 @@
+import json
+from datetime import date, datetime
+from typing import Any, Optional
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+def _default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(content: Any) -> bytes:
+    """Serialize plain dicts/lists/datetimes, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, default=_default, separators=(",", ":")).encode("utf-8")
+
+class FastJSONResponse(Response):
+    """
+    JSON response for content that is already plain Python data.
+
+    Skips jsonable_encoder entirely, so list endpoints should hand it dicts
+    built from SQL rows rather than ORM instances.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        # Bodies serialized earlier (e.g. kept in app.core.cache) go out as they are
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
+
+def fast_json(content: Any, response: Optional[Response] = None) -> FastJSONResponse:
+    """
+    Wrap content in a FastJSONResponse, keeping headers (e.g. the ETag) that
+    the route already set on its injected `response`.
+    """
+    headers = None
+    if response is not None:
+        headers = {k: v for k, v in response.headers.items() if k.lower() != "content-length"}
+    return FastJSONResponse(content, headers=headers)
@@ -0,0 +1,65 @@
+from typing import Optional
+from fastapi import Request, Response
+from sqlalchemy import update, select
+from sqlalchemy.orm import Session
+from app.models.db_models import User, Tombstone
+from app.core.invalidation import invalidate_after_commit, ALL
+
+def bump_data_version(db: Session, user_id: str, entity: str = ALL) -> int:
+    """
+    Increment the user's data version inside the current transaction.
+
+    Every write path calls this before committing so cached list responses
+    (and their ETags) are invalidated. The UPDATE takes the row lock on the
+    user, so concurrent writers for the same user get consecutive versions.
+    It also queues the invalidation of the changed entity, published on
+    commit, so the cached user (and the version it carries) is dropped on
+    every worker without the caller having to remember.
+    """
+    db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(data_version=User.data_version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    version = db.execute(select(User.data_version).where(User.id == user_id)).scalar_one()
+    invalidate_after_commit(db, user_id, entity, version)
+    return version
+
+def record_deletion(db: Session, user_id: str, entity: str, entity_id: str, version: int) -> None:
+    """Leave a tombstone so delta syncs see the deletion"""
+    db.add(Tombstone(user_id=user_id, entity=entity, entity_id=entity_id, version=version))
+
+def data_etag(user: User) -> str:
+    """Weak ETag for everything readable by this user at their current version"""
+    return f'W/"{user.id}-{user.data_version or 0}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: ignore the W/ prefix on either side
+    wanted = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == wanted:
+            return True
+    return False
+
+def not_modified(request: Request, response: Response, user: User) -> Optional[Response]:
+    """
+    Set the ETag on the outgoing response, and return a 304 response if the
+    client already holds the current version.
+
+    The version comes from the user row that get_current_user has already
+    loaded, so a matching request never touches the list queries.
+    """
+    etag = data_etag(user)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
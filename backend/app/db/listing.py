@@ -0,0 +1,95 @@
+"""
+Column-level queries for the list endpoints.
+
+These select plain rows instead of ORM instances and return dicts in the
+shape of the response schemas (ClipOut, IdeaOut, TagOut), ready for
+FastJSONResponse. Keeping identity-map and attribute-instrumentation
+overhead out of the loop is what makes large listings cheap.
+"""
+from typing import Any, Dict, Iterable, List, Tuple
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.models.db_models import Clip, Idea, Tag, clip_tags
+from app.services.unfurl_service import get_unfurl_service, UNFURL_TYPES
+
+CLIP_COLUMNS = (
+    Clip.id, Clip.type, Clip.value, Clip.status,
+    Clip.created_at, Clip.updated_at, Clip.idea_id, Clip.body_size.label("size"),
+)
+IDEA_COLUMNS = (Idea.id, Idea.name, Idea.category, Idea.user_id, Idea.updated_at)
+
+def user_clip_ids(user_id: str, *criteria):
+    """Subquery of the ids of a user's clips matching extra criteria"""
+    return (
+        select(Clip.id)
+        .join(Idea, Idea.id == Clip.idea_id)
+        .where(Idea.user_id == user_id, *criteria)
+    )
+
+def clip_rows(db: Session, user_id: str, *criteria) -> List[Dict[str, Any]]:
+    """The user's clips, each with its tags, in two queries"""
+    clips = {}
+    result = db.execute(
+        select(*CLIP_COLUMNS)
+        .join(Idea, Idea.id == Clip.idea_id)
+        .where(Idea.user_id == user_id, *criteria)
+    )
+    for row in result:
+        clip = row._asdict()
+        # Large bodies are listed by their stored preview
+        clip["truncated"] = clip["size"] is not None
+        clip["tags"] = []
+        clip["preview"] = None
+        clips[clip["id"]] = clip
+
+    if clips:
+        # Same filter as a subquery rather than a huge IN list of ids
+        tag_result = db.execute(
+            select(clip_tags.c.clip_id, Tag.id, Tag.name)
+            .join(Tag, Tag.id == clip_tags.c.tag_id)
+            .where(clip_tags.c.clip_id.in_(user_clip_ids(user_id, *criteria)))
+        )
+        for clip_id, tag_id, tag_name in tag_result:
+            clip = clips.get(clip_id)
+            if clip is not None:
+                clip["tags"].append({"id": tag_id, "name": tag_name})
+        attach_previews(db, clips.values())
+    return list(clips.values())
+
+def scored_clips(db: Session, user_id: str, matches: List[Tuple[str, float]], *criteria) -> List[Dict[str, Any]]:
+    """
+    Clip rows for (clip id, score) search matches, best first. Matches that
+    are no longer the user's clips (or fail the criteria) are dropped.
+    """
+    if not matches:
+        return []
+    scores = dict(matches)
+    clips = clip_rows(db, user_id, Clip.id.in_(list(scores)), *criteria)
+    for clip in clips:
+        clip["score"] = round(scores[clip["id"]], 4)
+    clips.sort(key=lambda clip: -clip["score"])
+    return clips
+
+def attach_previews(db: Session, clips: Iterable[Dict[str, Any]]) -> None:
+    """Fill in cached link previews for link/video clips (never fetches)"""
+    linked = [clip for clip in clips if clip["type"] in UNFURL_TYPES]
+    if not linked:
+        return
+    previews = get_unfurl_service().previews(db, [clip["value"] for clip in linked])
+    for clip in linked:
+        clip["preview"] = previews.get(clip["value"])
+
+def idea_rows(db: Session, user_id: str) -> List[Dict[str, Any]]:
+    result = db.execute(select(*IDEA_COLUMNS).where(Idea.user_id == user_id))
+    return [row._asdict() for row in result]
+
+def tag_rows(db: Session, user_id: str) -> List[Dict[str, Any]]:
+    """Distinct tags used on any of the user's clips"""
+    result = db.execute(
+        select(Tag.id, Tag.name)
+        .where(Tag.id.in_(
+            select(clip_tags.c.tag_id)
+            .where(clip_tags.c.clip_id.in_(user_clip_ids(user_id)))
+        ))
+    )
+    return [row._asdict() for row in result]
@@ -1,7 +1,18 @@
-# In-memory storage for the app
-DB = {
-    "users": {},
-    "ideas": {},
-    "clips": {},
-    "tags": {},
-}
+# In-memory storage for the app, read and written by
+# app.db.repository.MemoryRepository
+def new_store():
+    return {
+        "users": {},
+        "ideas": {},
+        "clips": {},
+        "tags": {},
+        # Secondary indexes, kept in step with the tables by the repository.
+        # Values are dicts used as insertion-ordered sets of ids.
+        "users_by_email": {},
+        "tags_by_name": {},
+        "ideas_by_user": {},
+        "clips_by_idea": {},
+        "clips_by_tag": {},
+    }
+
+DB = new_store()
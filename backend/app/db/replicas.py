@@ -0,0 +1,158 @@
+"""
+Read replicas for GET traffic.
+
+DATABASE_REPLICA_URLS lists replica databases, comma separated. Sessions
+marked read-only (GET and HEAD requests through app.db.repository) send
+their queries to a replica once they know the user, chosen round robin or
+by fewest sessions in use (REPLICA_BALANCE). They read from the primary
+instead when:
+
+- no replica passed its last health check with at most REPLICA_MAX_LAG
+  seconds of replication lag, or
+- none has replayed the user's data version already loaded from the
+  primary, so a replica might not show their latest write.
+
+The version check is made against the replica itself, so read-your-writes
+holds across server processes and hosts, and a response is never built
+from data older than the version its ETag and cache key name.
+
+Health and lag are re-checked every REPLICA_CHECK_INTERVAL seconds by
+whichever request notices the check is due.
+"""
+import os
+import time
+from dataclasses import dataclass
+from threading import Lock
+from typing import Callable, List, Optional
+
+from sqlalchemy import column, create_engine, select, table, text
+from sqlalchemy.engine import Connection, Engine
+
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_BALANCE = os.getenv("REPLICA_BALANCE", "round_robin")
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", "5"))
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "5"))
+
+# Just the columns the freshness check reads, without importing the models
+users = table("users", column("id"), column("data_version"))
+
+def replication_lag(conn: Connection) -> float:
+    """Seconds the replica is behind its primary; 0 when it has replayed everything"""
+    if conn.dialect.name == "postgresql":
+        # An idle primary sends nothing to replay, so a replica that has
+        # replayed all it received is current however old its last replay is
+        lag = conn.execute(text(
+            "SELECT CASE WHEN NOT pg_is_in_recovery() "
+            "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+            "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+        )).scalar()
+        return float(lag or 0)
+    conn.execute(text("SELECT 1"))
+    return 0.0
+
+@dataclass
+class Replica:
+    engine: Engine
+    healthy: bool = True
+    lag: float = 0.0
+    # Sessions currently reading from it, for least-connections balancing
+    in_use: int = 0
+
+class ReplicaPool:
+    def __init__(
+        self,
+        engines: List[Engine],
+        balance: str = REPLICA_BALANCE,
+        max_lag: float = REPLICA_MAX_LAG,
+        check_interval: float = REPLICA_CHECK_INTERVAL,
+        lag_probe: Callable[[Connection], float] = replication_lag,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        if balance not in ("round_robin", "least_connections"):
+            raise ValueError(f"Unknown replica balancing: {balance}")
+        self.replicas = [Replica(engine) for engine in engines]
+        self.balance = balance
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.lag_probe = lag_probe
+        self.clock = clock
+        self._lock = Lock()
+        self._next = 0
+        self._checked_at: Optional[float] = None
+        self._checking = False
+
+    def check(self) -> None:
+        """Probe every replica for health and lag"""
+        for replica in self.replicas:
+            try:
+                with replica.engine.connect() as conn:
+                    lag = self.lag_probe(conn)
+            except Exception as e:
+                print(f"Replica {replica.engine.url!r} failed its health check: {str(e)}")
+                replica.healthy = False
+                continue
+            replica.healthy, replica.lag = True, lag
+        self._checked_at = self.clock()
+
+    def _check_if_due(self) -> None:
+        with self._lock:
+            due = self._checked_at is None or self.clock() - self._checked_at >= self.check_interval
+            if not due or self._checking:
+                return
+            self._checking = True
+        try:
+            self.check()
+        finally:
+            self._checking = False
+
+    def acquire(self, user_id: str, data_version: int) -> Optional[Replica]:
+        """
+        A replica to read the user's data from, or None for the primary.
+        data_version is the user's version as loaded from the primary; a
+        replica that has not replayed it yet is passed over.
+        """
+        if not self.replicas:
+            return None
+        self._check_if_due()
+        with self._lock:
+            usable = [r for r in self.replicas if r.healthy and r.lag <= self.max_lag]
+            if not usable:
+                return None
+            if self.balance == "least_connections":
+                usable.sort(key=lambda r: r.in_use)
+            else:
+                start = self._next % len(usable)
+                usable = usable[start:] + usable[:start]
+                self._next += 1
+        for replica in usable:
+            if self._has_version(replica, user_id, data_version):
+                with self._lock:
+                    replica.in_use += 1
+                return replica
+        return None
+
+    def _has_version(self, replica: Replica, user_id: str, data_version: int) -> bool:
+        try:
+            with replica.engine.connect() as conn:
+                replayed = conn.execute(
+                    select(users.c.data_version).where(users.c.id == user_id)
+                ).scalar()
+        except Exception as e:
+            print(f"Replica {replica.engine.url!r} failed its version check: {str(e)}")
+            return False
+        # A missing row is a user created since the replica last caught up
+        return replayed is not None and replayed >= data_version
+
+    def release(self, replica: Replica) -> None:
+        with self._lock:
+            replica.in_use -= 1
+
+# Create singleton instance
+replica_pool = None
+
+def get_replica_pool():
+    """Get or create the replica pool, empty when no replicas are configured"""
+    global replica_pool
+    if replica_pool is None:
+        replica_pool = ReplicaPool([create_engine(url) for url in DATABASE_REPLICA_URLS])
+    return replica_pool
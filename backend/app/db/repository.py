@@ -0,0 +1,381 @@
+"""
+Storage behind the idea, clip and tag routes.
+
+Routes take a Repository from the get_repository dependency and get back
+plain dicts in the shape of the response schemas (IdeaOut, ClipOut, TagOut).
+SqlRepository runs the column-level queries in app.db.listing on a
+SQLAlchemy session. MemoryRepository keeps the same data in the dicts of
+app.db.memory, with secondary indexes from users to ideas, ideas to clips
+and tags to clips, so routing and serialization can be tested and
+benchmarked without a database. Tests and benchmarks select it by
+overriding the get_repository dependency; it is not an app setting, since
+registration, clip writes, /collect and sync always write to SQL.
+
+GET and HEAD requests get a read-only session, which app.db.session
+routes to a read replica after the user lookup (see app.db.replicas).
+
+Clip writes, and reads that go through the dedupe, clip body, embedding,
+unfurl and sync services, still use a session directly: those services
+keep their state in SQL tables.
+"""
+import os
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from fastapi import Request
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.db.listing import IDEA_COLUMNS, clip_rows, idea_rows, tag_rows
+from app.db.memory import new_store
+from app.db.session import SessionLocal
+from app.core.versioning import bump_data_version, record_deletion
+from app.core.cache import MISSING, get_cache, user_tag
+from app.core.invalidation import ALL
+from app.models.db_models import Clip, Idea, Tag, User, clip_tags
+from app.services.clip_body_service import get_clip_body_service
+from app.services.dedupe_service import get_dedupe_service
+from app.services.embedding_service import get_embedding_service
+from app.services.tag_suggestion_service import get_tag_suggestion_service
+from app.utils.ids import new_id
+
+READ_METHODS = {"GET", "HEAD"}
+# Upper bound on how stale a user lookup gets if an invalidation is lost
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+
+class Repository(ABC):
+    """Users, ideas, clips and tags as the routes read and write them"""
+
+    @abstractmethod
+    def user_by_email(self, email: str) -> Optional[Any]:
+        """The user with this email, with id, name, email and data_version"""
+
+    @abstractmethod
+    def list_ideas(self, user_id: str) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def get_idea(self, user_id: str, idea_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def create_idea(self, user_id: str, name: str, category: Optional[str] = None) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    def update_idea(self, user_id: str, idea_id: str, name: Optional[str] = None,
+                    category: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Change the given fields; None when the idea is not the user's"""
+
+    @abstractmethod
+    def delete_idea(self, user_id: str, idea_id: str) -> bool:
+        """Delete the idea; False when it is not the user's"""
+
+    @abstractmethod
+    def list_clips(self, user_id: str, idea_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """The user's clips with their tags, optionally those of one idea"""
+
+    @abstractmethod
+    def clips_by_tag(self, user_id: str, tag: str) -> List[Dict[str, Any]]:
+        """The user's clips carrying a tag, given by id or by name"""
+
+    @abstractmethod
+    def list_tags(self, user_id: str) -> List[Dict[str, Any]]:
+        """Distinct tags used on any of the user's clips"""
+
+class SqlRepository(Repository):
+    def __init__(self, db: Session):
+        self.db = db
+
+    def user_by_email(self, email: str) -> Optional["CachedUser"]:
+        """
+        The user, from the cache when possible. Entries are keyed by id and
+        dropped on every write to the user's data, so the data version (and
+        the ETags built from it) stays current. Loads go to the primary.
+        """
+        users = get_cache("users")
+        user_id = users.get(f"email:{email}")
+        if user_id is MISSING:
+            user_id = self.db.execute(select(User.id).where(User.email == email)).scalar()
+            if user_id is None:
+                return None
+            users.set(f"email:{email}", user_id, ttl=USER_CACHE_TTL)
+        user = users.get_or_set(
+            f"id:{user_id}", lambda: self._load_user(user_id),
+            ttl=USER_CACHE_TTL, tags=(user_tag(user_id),), lock=False
+        )
+        if user is None or user.email != email:
+            # The account is gone or its email has changed since
+            users.delete(f"email:{email}")
+            return None
+        # Lets a read-only session pick a replica for what follows, one that
+        # has replayed this version
+        self.db.info["user_id"] = user.id
+        self.db.info["data_version"] = user.data_version
+        return user
+
+    def _load_user(self, user_id: str) -> Optional["CachedUser"]:
+        row = self.db.execute(
+            select(User.id, User.name, User.email, User.data_version).where(User.id == user_id)
+        ).first()
+        return CachedUser(row.id, row.name, row.email, row.data_version or 0) if row else None
+
+    def list_ideas(self, user_id: str) -> List[Dict[str, Any]]:
+        return idea_rows(self.db, user_id)
+
+    def get_idea(self, user_id: str, idea_id: str) -> Optional[Dict[str, Any]]:
+        row = self.db.execute(
+            select(*IDEA_COLUMNS).where(Idea.id == idea_id, Idea.user_id == user_id)
+        ).first()
+        return row._asdict() if row else None
+
+    def _idea_dict(self, idea: Idea) -> Dict[str, Any]:
+        return {column.key: getattr(idea, column.key) for column in IDEA_COLUMNS}
+
+    def create_idea(self, user_id: str, name: str, category: Optional[str] = None) -> Dict[str, Any]:
+        idea = Idea(id=new_id(), name=name, category=category, user_id=user_id)
+        idea.version = bump_data_version(self.db, user_id, "idea")
+        self.db.add(idea)
+        self.db.commit()
+        self.db.refresh(idea)
+        return self._idea_dict(idea)
+
+    def update_idea(self, user_id: str, idea_id: str, name: Optional[str] = None,
+                    category: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        idea = self.db.query(Idea).filter_by(id=idea_id, user_id=user_id).first()
+        if not idea:
+            return None
+        if name is not None:
+            idea.name = name
+        if category is not None:
+            idea.category = category
+        # Edited outside the collector, so the next sync must not be skipped
+        idea.content_hash = None
+        idea.version = bump_data_version(self.db, user_id, "idea")
+        self.db.commit()
+        self.db.refresh(idea)
+        return self._idea_dict(idea)
+
+    def delete_idea(self, user_id: str, idea_id: str) -> bool:
+        idea = self.db.query(Idea).filter_by(id=idea_id, user_id=user_id).first()
+        if not idea:
+            return False
+        # Clips cannot outlive their idea; they go in the same transaction
+        clips = self.db.query(Clip).filter(Clip.idea_id == idea_id).all()
+        clip_ids = [clip.id for clip in clips]
+        version = bump_data_version(self.db, user_id, ALL if clips else "idea")
+        if clip_ids:
+            self.db.execute(clip_tags.delete().where(clip_tags.c.clip_id.in_(clip_ids)))
+            get_dedupe_service().remove(self.db, clip_ids)
+        for clip in clips:
+            self.db.delete(clip)
+            record_deletion(self.db, user_id, "clip", clip.id, version)
+        self.db.flush()
+        get_clip_body_service().release(self.db, [clip.body_hash for clip in clips])
+        self.db.delete(idea)
+        record_deletion(self.db, user_id, "idea", idea_id, version)
+        self.db.commit()
+        if clip_ids:
+            get_embedding_service().remove(user_id, clip_ids)
+            get_tag_suggestion_service().invalidate(user_id)
+        return True
+
+    def list_clips(self, user_id: str, idea_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        criteria = [Idea.id == idea_id] if idea_id else []
+        return clip_rows(self.db, user_id, *criteria)
+
+    def clips_by_tag(self, user_id: str, tag: str) -> List[Dict[str, Any]]:
+        tagged = select(clip_tags.c.clip_id).join(Tag, Tag.id == clip_tags.c.tag_id).where(
+            (Tag.id == tag) | (Tag.name == tag)
+        )
+        return clip_rows(self.db, user_id, Clip.id.in_(tagged))
+
+    def list_tags(self, user_id: str) -> List[Dict[str, Any]]:
+        return tag_rows(self.db, user_id)
+
+@dataclass
+class CachedUser:
+    """The user columns routes read from current_user, safe to keep between requests"""
+    id: str
+    name: str
+    email: str
+    data_version: int = 0
+
+@dataclass
+class MemoryUser:
+    id: str
+    name: str
+    email: str
+    hashed_password: str = "x"
+    data_version: int = 0
+
+class MemoryRepository(Repository):
+    """
+    The repository over app.db.memory's dicts.
+
+    Every lookup goes through an index, so costs match the SQL backend's
+    indexed plans: a user's ideas, an idea's clips or a tag's clips are
+    found without scanning the tables. One lock guards reads and writes,
+    since sync routes run on a thread pool.
+    """
+
+    def __init__(self, store: Optional[Dict[str, Dict]] = None):
+        self.store = store if store is not None else new_store()
+        self._lock = threading.RLock()
+
+    # Loading, for tests and benchmarks; the routes never create users or clips here
+
+    def add_user(self, name: str, email: str, user_id: Optional[str] = None) -> MemoryUser:
+        with self._lock:
+            user = MemoryUser(id=user_id or new_id(), name=name, email=email)
+            self.store["users"][user.id] = user
+            self.store["users_by_email"][email] = user.id
+            self.store["ideas_by_user"][user.id] = {}
+            return user
+
+    def add_clip(self, user_id: str, idea_id: str, type: str, value: str,
+                 tags: Iterable[str] = (), status: str = "active",
+                 clip_id: Optional[str] = None) -> Dict[str, Any]:
+        """Add a clip to one of the user's ideas, creating tags by name as needed"""
+        with self._lock:
+            if idea_id not in self.store["ideas_by_user"].get(user_id, {}):
+                raise KeyError(idea_id)
+            now = datetime.utcnow()
+            clip = {
+                "id": clip_id or new_id(), "type": type, "value": value, "status": status,
+                "created_at": now, "updated_at": now, "idea_id": idea_id, "size": None,
+                "version": self._bump(user_id), "tag_ids": [],
+            }
+            for name in dict.fromkeys(tags):
+                tag_id = self.store["tags_by_name"].get(name)
+                if tag_id is None:
+                    tag_id = new_id()
+                    self.store["tags"][tag_id] = {"id": tag_id, "name": name}
+                    self.store["tags_by_name"][name] = tag_id
+                    self.store["clips_by_tag"][tag_id] = {}
+                clip["tag_ids"].append(tag_id)
+                self.store["clips_by_tag"][tag_id][clip["id"]] = None
+            self.store["clips"][clip["id"]] = clip
+            self.store["clips_by_idea"][idea_id][clip["id"]] = None
+            return self._clip_row(clip)
+
+    def _bump(self, user_id: str) -> int:
+        user = self.store["users"][user_id]
+        user.data_version += 1
+        return user.data_version
+
+    def _idea_row(self, idea: Dict[str, Any]) -> Dict[str, Any]:
+        return {column.key: idea[column.key] for column in IDEA_COLUMNS}
+
+    def _clip_row(self, clip: Dict[str, Any]) -> Dict[str, Any]:
+        tags = self.store["tags"]
+        row = {key: clip[key] for key in
+               ("id", "type", "value", "status", "created_at", "updated_at", "idea_id", "size")}
+        row["truncated"] = False
+        row["tags"] = [dict(tags[tag_id]) for tag_id in clip["tag_ids"]]
+        # Link previews live in the SQL unfurl cache
+        row["preview"] = None
+        return row
+
+    def _owns(self, user_id: str, idea_id: str) -> bool:
+        return idea_id in self.store["ideas_by_user"].get(user_id, {})
+
+    def user_by_email(self, email: str) -> Optional[MemoryUser]:
+        with self._lock:
+            user_id = self.store["users_by_email"].get(email)
+            return self.store["users"][user_id] if user_id else None
+
+    def list_ideas(self, user_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            ideas = self.store["ideas"]
+            return [self._idea_row(ideas[idea_id])
+                    for idea_id in self.store["ideas_by_user"].get(user_id, {})]
+
+    def get_idea(self, user_id: str, idea_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if not self._owns(user_id, idea_id):
+                return None
+            return self._idea_row(self.store["ideas"][idea_id])
+
+    def create_idea(self, user_id: str, name: str, category: Optional[str] = None) -> Dict[str, Any]:
+        with self._lock:
+            idea = {"id": new_id(), "name": name, "category": category, "user_id": user_id,
+                    "updated_at": datetime.utcnow(), "version": self._bump(user_id)}
+            self.store["ideas"][idea["id"]] = idea
+            self.store["ideas_by_user"].setdefault(user_id, {})[idea["id"]] = None
+            self.store["clips_by_idea"][idea["id"]] = {}
+            return self._idea_row(idea)
+
+    def update_idea(self, user_id: str, idea_id: str, name: Optional[str] = None,
+                    category: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if not self._owns(user_id, idea_id):
+                return None
+            idea = self.store["ideas"][idea_id]
+            if name is not None:
+                idea["name"] = name
+            if category is not None:
+                idea["category"] = category
+            idea["updated_at"] = datetime.utcnow()
+            idea["version"] = self._bump(user_id)
+            return self._idea_row(idea)
+
+    def delete_idea(self, user_id: str, idea_id: str) -> bool:
+        with self._lock:
+            if not self._owns(user_id, idea_id):
+                return False
+            for clip_id in self.store["clips_by_idea"].pop(idea_id):
+                clip = self.store["clips"].pop(clip_id)
+                for tag_id in clip["tag_ids"]:
+                    self.store["clips_by_tag"][tag_id].pop(clip_id, None)
+            del self.store["ideas"][idea_id]
+            del self.store["ideas_by_user"][user_id][idea_id]
+            self._bump(user_id)
+            return True
+
+    def list_clips(self, user_id: str, idea_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            if idea_id:
+                idea_ids = [idea_id] if self._owns(user_id, idea_id) else []
+            else:
+                idea_ids = self.store["ideas_by_user"].get(user_id, {})
+            clips, by_idea = self.store["clips"], self.store["clips_by_idea"]
+            return [self._clip_row(clips[clip_id]) for idea in idea_ids for clip_id in by_idea[idea]]
+
+    def clips_by_tag(self, user_id: str, tag: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            tag_ids = {tag_id for tag_id in (tag, self.store["tags_by_name"].get(tag))
+                       if tag_id in self.store["tags"]}
+            clip_ids = dict.fromkeys(
+                clip_id for tag_id in tag_ids for clip_id in self.store["clips_by_tag"][tag_id]
+            )
+            clips = self.store["clips"]
+            return [self._clip_row(clips[clip_id]) for clip_id in clip_ids
+                    if self._owns(user_id, clips[clip_id]["idea_id"])]
+
+    def list_tags(self, user_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            clips, by_idea = self.store["clips"], self.store["clips_by_idea"]
+            tag_ids = dict.fromkeys(
+                tag_id
+                for idea_id in self.store["ideas_by_user"].get(user_id, {})
+                for clip_id in by_idea[idea_id]
+                for tag_id in clips[clip_id]["tag_ids"]
+            )
+            return [dict(self.store["tags"][tag_id]) for tag_id in tag_ids]
+
+def get_repository(request: Request):
+    """
+    Dependency giving the request its repository. FastAPI reuses it within a
+    request, so get_current_user and the route share one session.
+    """
+    db = SessionLocal()
+    # Handlers for these methods only read, so a replica may serve them
+    db.info["read_only"] = request.method in READ_METHODS
+    try:
+        yield SqlRepository(db)
+    finally:
+        db.close()
@@ -1,11 +1,44 @@
 import os
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from dotenv import load_dotenv
+from app.db.replicas import get_replica_pool
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
 engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+class RoutingSession(Session):
+    """
+    Session that reads from a replica once it is marked read-only and knows
+    its user: info["read_only"], info["user_id"] and info["data_version"],
+    set by the repository. Until then, and for every other session, queries
+    go to the primary. The replica is picked once, only among those that
+    have the user's data version, and kept until the session closes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        replica = self._read_replica()
+        if replica is not None:
+            return replica.engine
+        return super().get_bind(mapper, clause=clause, **kw)
+
+    def _read_replica(self):
+        if not self.info.get("read_only") or self._flushing:
+            return None
+        if "replica" not in self.info:
+            user_id = self.info.get("user_id")
+            if user_id is None:
+                return None
+            self.info["replica"] = get_replica_pool().acquire(user_id, self.info["data_version"])
+        return self.info["replica"]
+
+    def close(self):
+        replica = self.info.pop("replica", None)
+        if replica is not None:
+            get_replica_pool().release(replica)
+        super().close()
+
+SessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, bind=engine)
@@ -0,0 +1,21 @@
+from sqlalchemy.types import LargeBinary, TypeDecorator
+from app.utils.ids import id_from_bytes, id_to_bytes
+
+class CompactId(TypeDecorator):
+    """
+    String id stored in binary: 16 bytes for UUIDs instead of 36 characters
+    (bytea on Postgres, BLOB on SQLite). Python code still sees strings.
+
+    Byte order matches creation order for UUIDv7 ids, so ORDER BY and
+    keyset comparisons on the column stay consistent with each other.
+    Postgres' native uuid type is not used because collector clients may
+    send ids that are not UUIDs.
+    """
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else id_to_bytes(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else id_from_bytes(bytes(value))
@@ -0,0 +1,456 @@
+"""
+Per-user approximate nearest-neighbour index over clip embeddings.
+
+Vectors live in a float16 memory-mapped matrix that grows in place, so
+opening an index does not read it and adding rows does not copy it.
+Once an index holds IVF_MIN_ROWS vectors, a spherical k-means coarse
+quantizer (IVF) is trained and searches only scan the rows in the lists
+closest to the query, reading each list as one slice of the rows sorted
+by list. New rows are assigned to their nearest list and
+deleted rows are freed for reuse, so neither needs a rebuild; the lists
+are retrained only after the index has grown RETRAIN_FACTOR times.
+
+Several worker processes may open the same user's index. Changes are
+made under an exclusive file lock, after catching up with what other
+processes wrote, so two workers never hand out the same free row. Row
+assignments are appended to a journal rather than rewriting the row
+table, so an add costs the rows it writes, not the size of the index.
+"""
+
+import json
+import os
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - no file locks on Windows
+    fcntl = None
+
+IVF_MIN_ROWS = 2048
+RETRAIN_FACTOR = 4
+INITIAL_CAPACITY = 1024
+# Rows scored per matrix product when assigning lists
+ASSIGN_CHUNK = 65536
+# k-means trains on at most this many rows per list
+TRAIN_ROWS_PER_LIST = 256
+# Above this many (row, cluster) pairs, seed k-means with random rows instead of k-means++
+KMEANS_PP_MAX_WORK = 4_000_000
+# The journal is rewritten as a snapshot once it holds this many times more
+# entries than the index has rows
+COMPACT_FACTOR = 4
+COMPACT_MIN_ENTRIES = 4096
+# The rows sorted by list are re-sorted once more than 1/LIST_RESORT_FACTOR
+# of the index has been added, freed or moved since the last sort
+LIST_RESORT_FACTOR = 8
+
+def kmeans(x: np.ndarray, k: int, iterations: int = 10, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Spherical k-means on unit vectors. Returns (centroids, labels).
+    Empty clusters keep their previous centroid.
+    """
+    rng = np.random.default_rng(seed)
+    k = min(k, len(x))
+    if len(x) * k <= KMEANS_PP_MAX_WORK:
+        centroids = _kmeans_pp(x, k, rng)
+    else:
+        centroids = x[rng.choice(len(x), k, replace=False)].astype(np.float32)
+    labels = np.zeros(len(x), dtype=np.int32)
+    for _ in range(iterations):
+        labels = assign(x, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, x)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        filled = norms[:, 0] > 0
+        centroids[filled] = sums[filled] / norms[filled]
+    return centroids, labels
+
+def _kmeans_pp(x: np.ndarray, k: int, rng) -> np.ndarray:
+    """k-means++ seeding: each new centroid is drawn far from the existing ones"""
+    chosen = [int(rng.integers(len(x)))]
+    closest = x @ x[chosen[0]]
+    for _ in range(1, k):
+        weights = np.clip(1 - closest, 0, None) ** 2
+        total = weights.sum()
+        if total <= 0:
+            break
+        chosen.append(int(rng.choice(len(x), p=weights / total)))
+        closest = np.maximum(closest, x @ x[chosen[-1]])
+    centroids = x[chosen].astype(np.float32)
+    if len(centroids) < k:
+        # Fewer distinct points than clusters; pad with repeats
+        centroids = centroids[np.arange(k) % len(centroids)]
+    return centroids
+
+def assign(x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the most similar centroid for each row, in bounded chunks"""
+    labels = np.empty(len(x), dtype=np.int32)
+    for start in range(0, len(x), ASSIGN_CHUNK):
+        chunk = np.asarray(x[start:start + ASSIGN_CHUNK], dtype=np.float32)
+        labels[start:start + ASSIGN_CHUNK] = np.argmax(chunk @ centroids.T, axis=1)
+    return labels
+
+class VectorIndex:
+    """
+    Files under `path`:
+        meta.json    dimension
+        ids.log      journal of row assignments: "row<TAB>clip id" lines,
+                     with an empty clip id for a freed row
+        vectors.f16  capacity x dim float16 rows
+        lists.i32    IVF list per row, -1 for none
+        df.f32       feature document counts
+        ivf.npz      list centroids and training size, rewritten on training
+        lock         flock()ed around every read and write
+
+    Document counts per dimension are kept so the hashed TF-IDF embedder
+    can weight terms by how rare they are in this user's clips.
+    """
+
+    def __init__(self, path: str, dim: int, nprobe: int = 8):
+        self.path = path
+        self.dim = dim
+        self.nprobe = nprobe
+        os.makedirs(path, exist_ok=True)
+        self._meta_path = os.path.join(path, "meta.json")
+        self._journal_path = os.path.join(path, "ids.log")
+        self._vectors_path = os.path.join(path, "vectors.f16")
+        self._lists_path = os.path.join(path, "lists.i32")
+        self._df_path = os.path.join(path, "df.f32")
+        self._ivf_path = os.path.join(path, "ivf.npz")
+        self._lock_file = open(os.path.join(path, "lock"), "a+")
+
+        self.ids: List[Optional[str]] = []
+        self.rows: Dict[str, int] = {}
+        self.free: Set[int] = set()
+        self.trained_rows = 0
+        self.centroids: Optional[np.ndarray] = None
+        self.vectors: Optional[np.memmap] = None
+        self.lists: Optional[np.memmap] = None
+        self.df: Optional[np.memmap] = None
+        # How far into which journal this process has read
+        self._journal_token: Optional[bytes] = None
+        self._journal_offset = 0
+        self._journal_entries = 0
+        self._ivf_stamp = None
+        # Live rows sorted by list, list i being _list_rows[_list_offsets[i]:_list_offsets[i + 1]];
+        # None until sorted. Rows assigned or freed since the sort are kept in _list_moved
+        self._list_rows: Optional[np.ndarray] = None
+        self._list_offsets: Optional[np.ndarray] = None
+        self._list_moved: Set[int] = set()
+        with self._locked(exclusive=True):
+            self._create()
+            self._sync()
+
+    # -- persistence ----------------------------------------------------
+
+    @contextmanager
+    def _locked(self, exclusive: bool = False):
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _create(self):
+        """Set up a new index, or upgrade one written as a single meta.json"""
+        meta = {}
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path) as f:
+                meta = json.load(f)
+            if meta.get("dim") != self.dim:
+                raise ValueError(f"Index at {self.path} has dim {meta.get('dim')}, expected {self.dim}")
+            if "ids" not in meta:
+                return
+        ids = meta.get("ids", [])
+        lists, df, centroids = np.full(len(ids), -1, np.int32), np.zeros(self.dim, np.float32), None
+        if ids and os.path.exists(self._ivf_path):
+            with np.load(self._ivf_path) as ivf:
+                stored = ivf["lists"][:len(ids)]
+                lists[:len(stored)] = stored
+                df = ivf["df"]
+                centroids = ivf["centroids"] if len(ivf["centroids"]) else None
+        np.asarray(df, dtype=np.float32).tofile(self._df_path)
+        capacity = INITIAL_CAPACITY
+        if os.path.exists(self._vectors_path):
+            capacity = max(capacity, os.path.getsize(self._vectors_path) // (2 * self.dim))
+        self._grow(max(capacity, len(ids)))
+        self.lists[:len(ids)] = lists
+        self.lists.flush()
+        self._write_ivf(centroids, meta.get("trained_rows", 0))
+        self._write_journal([(row, clip_id) for row, clip_id in enumerate(ids) if clip_id is not None])
+        tmp = f"{self._meta_path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"dim": self.dim}, f)
+        os.replace(tmp, self._meta_path)
+
+    def _sync(self):
+        """Catch up with changes other processes made; call with the lock held"""
+        self._sync_journal()
+        stat = os.stat(self._ivf_path)
+        if (stat.st_ino, stat.st_mtime_ns) != self._ivf_stamp:
+            with np.load(self._ivf_path) as ivf:
+                self.centroids = ivf["centroids"] if len(ivf["centroids"]) else None
+                self.trained_rows = int(ivf["trained_rows"])
+            self._ivf_stamp = (stat.st_ino, stat.st_mtime_ns)
+            self._list_rows = None
+        capacity = os.path.getsize(self._vectors_path) // (2 * self.dim)
+        if self.vectors is None or capacity != len(self.vectors):
+            self._open(capacity)
+
+    def _sync_journal(self):
+        with open(self._journal_path, "rb") as f:
+            token = f.readline()
+            if token != self._journal_token:
+                # First read, or compacted since: replay from the start
+                self.ids, self.rows, self.free = [], {}, set()
+                self._journal_token, self._journal_offset, self._journal_entries = token, len(token), 0
+                self._list_rows = None
+            f.seek(self._journal_offset)
+            data = f.read()
+        if not data:
+            return
+        end = data.rfind(b"\n") + 1
+        entries = []
+        for line in data[:end].decode("utf-8").splitlines():
+            row, clip_id = line.split("\t", 1)
+            entries.append((int(row), clip_id or None))
+        self._apply(entries)
+        self._journal_offset += end
+
+    def _apply(self, entries: List[Tuple[int, Optional[str]]]):
+        if self._list_rows is not None:
+            self._list_moved.update(row for row, _ in entries)
+        for row, clip_id in entries:
+            while len(self.ids) <= row:
+                self.free.add(len(self.ids))
+                self.ids.append(None)
+            previous = self.ids[row]
+            if previous is not None and self.rows.get(previous) == row:
+                del self.rows[previous]
+            self.ids[row] = clip_id
+            if clip_id is None:
+                self.free.add(row)
+            else:
+                self.rows[clip_id] = row
+                self.free.discard(row)
+        self._journal_entries += len(entries)
+
+    def _commit(self, entries: List[Tuple[int, Optional[str]]]):
+        """Record row changes already applied in this process"""
+        if not entries:
+            return
+        self.vectors.flush()
+        self.lists.flush()
+        self.df.flush()
+        if self._journal_entries > max(COMPACT_MIN_ENTRIES, COMPACT_FACTOR * len(self.rows)):
+            live = sorted((row, clip_id) for clip_id, row in self.rows.items())
+            self._journal_token, self._journal_offset = self._write_journal(live)
+            self._journal_entries = len(live)
+            return
+        with open(self._journal_path, "ab") as f:
+            f.write("".join(f"{row}\t{clip_id or ''}\n" for row, clip_id in entries).encode("utf-8"))
+            self._journal_offset = f.tell()
+
+    def _write_journal(self, entries: List[Tuple[int, str]]) -> Tuple[bytes, int]:
+        """Replace the journal with a snapshot of the live rows; returns its token and length"""
+        token = f"#{uuid.uuid4().hex}\n".encode()
+        data = token + "".join(f"{row}\t{clip_id}\n" for row, clip_id in entries).encode("utf-8")
+        tmp = f"{self._journal_path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self._journal_path)
+        return token, len(data)
+
+    def _write_ivf(self, centroids: Optional[np.ndarray], trained_rows: int):
+        tmp = f"{self._ivf_path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                centroids=centroids if centroids is not None else np.zeros((0, self.dim), np.float32),
+                trained_rows=trained_rows,
+            )
+        os.replace(tmp, self._ivf_path)
+
+    def _open(self, capacity: int):
+        for matrix in (self.vectors, self.lists, self.df):
+            if matrix is not None:
+                matrix.flush()
+        self.vectors = np.memmap(self._vectors_path, dtype=np.float16, mode="r+", shape=(capacity, self.dim))
+        self.lists = np.memmap(self._lists_path, dtype=np.int32, mode="r+", shape=(capacity,))
+        self.df = np.memmap(self._df_path, dtype=np.float32, mode="r+", shape=(self.dim,))
+
+    def _grow(self, capacity: int):
+        """Extend the row files to at least capacity rows; call with the exclusive lock held"""
+        with open(self._vectors_path, "ab") as f:
+            if f.tell() < capacity * self.dim * 2:
+                f.truncate(capacity * self.dim * 2)
+        with open(self._lists_path, "ab") as f:
+            rows = f.tell() // 4
+            if rows < capacity:
+                # New rows belong to no list
+                f.write(np.full(capacity - rows, -1, np.int32).tobytes())
+        self._open(capacity)
+
+    # -- updates --------------------------------------------------------
+
+    def __len__(self):
+        with self._locked():
+            self._sync()
+            return len(self.rows)
+
+    def __contains__(self, clip_id):
+        with self._locked():
+            self._sync()
+            return clip_id in self.rows
+
+    def idf(self) -> np.ndarray:
+        with self._locked():
+            self._sync()
+            return np.log((1 + len(self.rows)) / (1 + np.asarray(self.df))) + 1
+
+    def add(self, ids: List[str], vectors: np.ndarray) -> None:
+        """Insert or replace vectors (unit length, float32) by clip id"""
+        if not ids:
+            return
+        with self._locked(exclusive=True):
+            self._sync()
+            entries = self._release([clip_id for clip_id in ids if clip_id in self.rows])
+            rows = []
+            for clip_id in ids:
+                row = self.free.pop() if self.free else len(self.ids)
+                self._apply([(row, clip_id)])
+                entries.append((row, clip_id))
+                rows.append(row)
+            if len(self.ids) > len(self.vectors):
+                self._grow(max(len(self.ids), 2 * len(self.vectors)))
+
+            rows = np.array(rows)
+            self.vectors[rows] = vectors.astype(np.float16)
+            self.df += (vectors != 0).sum(axis=0)
+            if self.centroids is not None:
+                self.lists[rows] = assign(vectors, self.centroids)
+
+            if len(self.rows) >= max(IVF_MIN_ROWS, RETRAIN_FACTOR * self.trained_rows):
+                self.train()
+            self._commit(entries)
+
+    def remove(self, ids: Iterable[str]) -> None:
+        with self._locked(exclusive=True):
+            self._sync()
+            self._commit(self._release(ids))
+
+    def _release(self, ids: Iterable[str]) -> List[Tuple[int, Optional[str]]]:
+        """Free the rows of the given clips; returns the journal entries"""
+        rows = [self.rows[clip_id] for clip_id in ids if clip_id in self.rows]
+        if not rows:
+            return []
+        self.df -= (self.vectors[np.array(rows)] != 0).sum(axis=0)
+        self.lists[np.array(rows)] = -1
+        entries = [(row, None) for row in rows]
+        self._apply(entries)
+        return entries
+
+    def train(self) -> None:
+        """Retrain the IVF lists; call with the exclusive lock held"""
+        live = np.array(sorted(self.rows.values()))
+        nlist = int(np.clip(np.sqrt(len(live)), 8, 1024))
+        sample = live
+        if len(live) > nlist * TRAIN_ROWS_PER_LIST:
+            sample = np.sort(np.random.default_rng(0).choice(live, nlist * TRAIN_ROWS_PER_LIST, replace=False))
+        self.centroids, _ = kmeans(np.asarray(self.vectors[sample], dtype=np.float32), nlist)
+        self.lists[live] = assign(self.vectors[live], self.centroids)
+        self.trained_rows = len(live)
+        self._list_rows = None
+        self._write_ivf(self.centroids, self.trained_rows)
+        stat = os.stat(self._ivf_path)
+        self._ivf_stamp = (stat.st_ino, stat.st_mtime_ns)
+
+    def close(self) -> None:
+        """Flush and drop the memory maps and release the lock file"""
+        for matrix in (self.vectors, self.lists, self.df):
+            if matrix is not None:
+                matrix.flush()
+        self.vectors = self.lists = self.df = None
+        self._lock_file.close()
+
+    # -- queries --------------------------------------------------------
+
+    def get(self, clip_id: str) -> Optional[np.ndarray]:
+        with self._locked():
+            self._sync()
+            row = self.rows.get(clip_id)
+            if row is None:
+                return None
+            return np.asarray(self.vectors[row], dtype=np.float32)
+
+    def _sort_lists(self):
+        """Sort the live rows by list and record where each list starts"""
+        lists = np.asarray(self.lists[:len(self.ids)])
+        counts = np.bincount(lists[lists >= 0], minlength=len(self.centroids))
+        order = np.argsort(lists, kind="stable")
+        # Rows in no list (-1) sort first
+        self._list_rows = order[len(order) - int(counts.sum()):]
+        self._list_offsets = np.concatenate(([0], np.cumsum(counts)))
+        self._list_moved = set()
+
+    def _probe(self, probes: np.ndarray) -> np.ndarray:
+        """Live rows in the given lists, reading only those lists"""
+        if self._list_rows is None or len(self._list_moved) * LIST_RESORT_FACTOR > len(self.rows):
+            self._sort_lists()
+        offsets = self._list_offsets
+        parts = [self._list_rows[offsets[p]:offsets[p + 1]] for p in probes.tolist()]
+        if self._list_moved:
+            parts.append(np.fromiter(self._list_moved, dtype=np.intp, count=len(self._list_moved)))
+        candidates = np.unique(np.concatenate(parts))
+        # Rows freed or reassigned since the sort drop out here
+        return candidates[np.isin(self.lists[candidates], probes)]
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int = 10,
+        exclude: Iterable[str] = (),
+        within: Optional[Iterable[str]] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Up to k (clip id, cosine similarity) pairs, most similar first.
+        With `within`, only those clips are ranked, by exact scan.
+        """
+        with self._locked():
+            self._sync()
+            if not self.rows or k <= 0:
+                return []
+            exclude = set(exclude)
+            candidates = None
+            if within is not None:
+                rows = [self.rows[clip_id] for clip_id in set(within) if clip_id in self.rows]
+                if not rows:
+                    return []
+                candidates = np.array(rows, dtype=np.intp)
+            elif self.centroids is not None:
+                probes = np.argsort(-(self.centroids @ query))[:self.nprobe]
+                candidates = self._probe(probes)
+                if len(candidates) < k + len(exclude):
+                    candidates = None
+            if candidates is None:
+                # Small index, or too few rows near the query: scan every live row
+                candidates = np.fromiter(self.rows.values(), dtype=np.intp, count=len(self.rows))
+
+            scores = np.asarray(self.vectors[candidates], dtype=np.float32) @ query
+            top = min(k + len(exclude), len(scores))
+            best = np.argpartition(-scores, top - 1)[:top]
+            best = best[np.argsort(-scores[best])]
+            results = []
+            for i in best.tolist():
+                clip_id = self.ids[candidates[i]]
+                if clip_id in exclude:
+                    continue
+                results.append((clip_id, float(scores[i])))
+                if len(results) == k:
+                    break
+            return results
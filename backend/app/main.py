@@ -10,12 +10,25 @@ from app.routes.content import router as content_router
 from app.routes.debug import router as debug_router
 from app.routes.test_user import router as test_user_router
 from app.routes.auth_debug import router as auth_debug_router
+from app.routes.sync import router as sync_router
+from app.routes.media import router as media_router
+from app.routes.search import router as search_router
+from app.routes.export import router as export_router
+from app.core.cache import get_cache_backend
+from contextlib import asynccontextmanager
 import os
 
 # Check if we're in development mode
 DEBUG = os.environ.get("DEBUG", "false").lower() == "true"
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Fails the worker at startup, not on its first request, when the
+    # cache cannot be kept consistent across workers
+    get_cache_backend()
+    yield
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -30,6 +43,10 @@ app.include_router(collect_router)
 app.include_router(ideas_router)
 app.include_router(clips_router)
 app.include_router(tags_router)
+app.include_router(sync_router)
+app.include_router(media_router)
+app.include_router(search_router)
+app.include_router(export_router)
 app.include_router(db_router)
 app.include_router(content_router, prefix="/content", tags=["content"])
 
@@ -1,49 +1,148 @@
-from sqlalchemy import Column, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Integer, BigInteger, SmallInteger, LargeBinary, Index
 from sqlalchemy.orm import relationship, declarative_base
 from sqlalchemy.dialects.postgresql import UUID
-import uuid
 from datetime import datetime
+from app.db.types import CompactId
+from app.utils.ids import new_id
 
 Base = declarative_base()
 
 class User(Base):
     __tablename__ = "users"
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(String, primary_key=True, default=new_id)
     name = Column(String, nullable=False)
     email = Column(String, nullable=False, unique=True)
     hashed_password = Column(String, nullable=False)
+    # Bumped on every write to the user's ideas/clips; used for ETags
+    data_version = Column(Integer, nullable=False, default=0, server_default="0")
     ideas = relationship("Idea", back_populates="user")
 
 class Idea(Base):
     __tablename__ = "ideas"
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(CompactId, primary_key=True, default=new_id)
     name = Column(String, nullable=False)
     category = Column(String, nullable=True)
     user_id = Column(String, ForeignKey("users.id"), nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # User data_version at the last write, used as the sync cursor
+    version = Column(Integer, nullable=False, default=0, server_default="0")
+    # Hash of the collected fields, so unchanged rows are skipped on re-sync
+    content_hash = Column(String(32), nullable=True)
     user = relationship("User", back_populates="ideas")
     clips = relationship("Clip", back_populates="idea")
 
+    __table_args__ = (
+        Index("ix_ideas_user_id_version", "user_id", "version"),
+        # Unique so the planner knows (user_id, id) groups need no further sort
+        Index("ix_ideas_user_id_id", "user_id", "id", unique=True),
+    )
+
 class Clip(Base):
     __tablename__ = "clips"
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(CompactId, primary_key=True, default=new_id)
     type = Column(String, nullable=False)
     value = Column(Text, nullable=False)
     status = Column(String, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
-    idea_id = Column(String, ForeignKey("ideas.id"), nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = Column(Integer, nullable=False, default=0, server_default="0")
+    content_hash = Column(String(32), nullable=True)
+    # Hash of the canonical URL for link/image/video clips (app.utils.urls)
+    url_hash = Column(String(32), nullable=True, index=True)
+    # MinHash signature of text/code clips (app.utils.minhash)
+    minhash = Column(LargeBinary, nullable=True)
+    # Bodies over CLIP_BODY_THRESHOLD live in clip_bodies; `value` then holds
+    # a preview and these point at the full text (app.services.clip_body_service)
+    body_hash = Column(String(64), nullable=True, index=True)
+    body_size = Column(Integer, nullable=True)
+    idea_id = Column(CompactId, ForeignKey("ideas.id"), nullable=False)
     idea = relationship("Idea", back_populates="clips")
     tags = relationship("Tag", secondary="clip_tags", back_populates="clips")
 
+    __table_args__ = (
+        Index("ix_clips_idea_id_version", "idea_id", "version"),
+        # Covers the per-idea type counts and last activity in /ideas/summary
+        Index("ix_clips_idea_id_type_created_at", "idea_id", "type", "created_at"),
+        # An idea's clips oldest first (export, clustering) without a sort
+        Index("ix_clips_idea_id_created_at", "idea_id", "created_at", "id"),
+    )
+
 class Tag(Base):
     __tablename__ = "tags"
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(String, primary_key=True, default=new_id)
     name = Column(String, nullable=False, unique=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     clips = relationship("Clip", secondary="clip_tags", back_populates="tags")
 
+class Tombstone(Base):
+    """Record of a deleted idea or clip, so delta syncs can propagate deletions"""
+    __tablename__ = "tombstones"
+    id = Column(String, primary_key=True, default=new_id)
+    user_id = Column(String, ForeignKey("users.id"), nullable=False)
+    entity = Column(String, nullable=False)  # "idea" or "clip"
+    entity_id = Column(String, nullable=False)
+    version = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_tombstones_user_id_version", "user_id", "version"),
+    )
+
+class IdempotencyKey(Base):
+    """An Idempotency-Key sent with a POST, and the response to replay when it is retried"""
+    __tablename__ = "idempotency_keys"
+    user_id = Column(String, ForeignKey("users.id"), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    request_hash = Column(String(64), nullable=False)  # sha256 of the route and payload
+    # Both NULL while the first request is still being handled
+    response_status = Column(Integer, nullable=True)
+    response_body = Column(LargeBinary, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+class ClipLshBucket(Base):
+    """One LSH band key per row for a clip's MinHash signature"""
+    __tablename__ = "clip_lsh_buckets"
+    clip_id = Column(CompactId, ForeignKey("clips.id", ondelete="CASCADE"), primary_key=True)
+    band = Column(SmallInteger, primary_key=True)
+    idea_id = Column(CompactId, nullable=False)
+    bucket = Column(BigInteger, nullable=False)
+
+    __table_args__ = (
+        Index("ix_clip_lsh_buckets_idea_id_bucket", "idea_id", "bucket"),
+    )
+
+class ClipBody(Base):
+    """Compressed full text of a large clip, stored once per distinct body"""
+    __tablename__ = "clip_bodies"
+    hash = Column(String(64), primary_key=True)  # sha256 of the UTF-8 text
+    codec = Column(String(8), nullable=False)  # "zstd" or "zlib"
+    size = Column(Integer, nullable=False)  # Uncompressed bytes
+    data = Column(LargeBinary, nullable=False)
+    # Touched whenever a write references the body, so cleanup never races it
+    last_used_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+class LinkMetadata(Base):
+    """Unfurled page metadata for link and video clip URLs, shared across users"""
+    __tablename__ = "link_metadata"
+    url_hash = Column(String(64), primary_key=True)
+    url = Column(Text, nullable=False)
+    status = Column(String, nullable=False)  # "ok" or "error"
+    title = Column(Text, nullable=True)
+    description = Column(Text, nullable=True)
+    canonical_url = Column(Text, nullable=True)
+    image_url = Column(Text, nullable=True)
+    site_name = Column(String, nullable=True)
+    video_id = Column(String, nullable=True)
+    fetched_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
 from sqlalchemy import Table
 clip_tags = Table(
     "clip_tags",
     Base.metadata,
-    Column("clip_id", String, ForeignKey("clips.id"), primary_key=True),
+    Column("clip_id", CompactId, ForeignKey("clips.id"), primary_key=True),
     Column("tag_id", String, ForeignKey("tags.id"), primary_key=True),
+    # Covering, so tag -> clip lookups never touch the table
+    Index("ix_clip_tags_tag_id_clip_id", "tag_id", "clip_id"),
 )
@@ -1,5 +1,6 @@
-from pydantic import BaseModel, EmailStr
-from typing import List, Optional
+from pydantic import BaseModel, ConfigDict, EmailStr, Field
+from typing import Dict, List, Optional
+from datetime import datetime
 
 # Auth schemas
 class UserCreate(BaseModel):
@@ -54,12 +55,110 @@ class IdeaUpdate(BaseModel):
 class TagCreate(BaseModel):
     name: str
 
+# Response schemas. List endpoints build these shapes straight from SQL rows;
+# from_attributes lets single-object endpoints return ORM instances.
+class TagOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    name: str
+
+class LinkPreview(BaseModel):
+    title: Optional[str] = None
+    description: Optional[str] = None
+    canonical_url: Optional[str] = None
+    image_url: Optional[str] = None
+    site_name: Optional[str] = None
+    video_id: Optional[str] = None
+
+class ClipOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    type: str
+    value: str
+    status: str
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    idea_id: str
+    tags: List[TagOut] = []
+    # Unfurled metadata for link and video clips, once available
+    preview: Optional[LinkPreview] = None
+    # List endpoints send a preview of large bodies; GET /clips/{id} has the full text
+    truncated: bool = False
+    size: Optional[int] = None  # Full body size in bytes, when truncated
+
+class ScoredClip(ClipOut):
+    score: float
+
+class TagSuggestRequest(BaseModel):
+    content: str
+    tags: List[str] = []  # Tags already chosen for the clip
+    limit: int = Field(5, ge=1, le=50)
+
+class TagSuggestion(BaseModel):
+    name: str
+    score: float
+
+class TagCount(BaseModel):
+    name: str
+    count: int
+
+class IdeaSummary(BaseModel):
+    idea_id: str
+    name: str
+    category: Optional[str] = None
+    clip_count: int
+    clips_by_type: Dict[str, int]
+    last_clip_at: Optional[datetime] = None
+    top_tags: List[TagCount]
+
+class ClipCluster(BaseModel):
+    id: int
+    label: str
+    terms: List[str]
+    size: int
+    clip_ids: List[str]
+
+class DuplicateGroup(BaseModel):
+    keep: str
+    duplicates: List[str]
+    similarity: float
+
+class ThumbnailSignRequest(BaseModel):
+    urls: List[str]
+    size: str = "md"
+    format: str = "webp"
+
+class UrlLookupRequest(BaseModel):
+    urls: List[str]
+
+class UrlMatch(BaseModel):
+    id: str
+    idea_id: str
+    type: str
+    created_at: Optional[datetime] = None
+
+class UrlLookupResult(BaseModel):
+    url: str
+    canonical_url: Optional[str] = None
+    clips: List[UrlMatch]
+
+class IdeaOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: str
+    name: str
+    category: Optional[str] = None
+    user_id: Optional[str] = None
+    updated_at: Optional[datetime] = None
+
 class Idea(BaseModel):
     id: str
     name: str
     category: Optional[str] = None
     user_id: Optional[str] = None
-    clips: List[Clip]
+    clips: List[Clip] = []
 
 class User(BaseModel):
     id: str
@@ -68,4 +167,7 @@ class User(BaseModel):
 
 class ClipkitPayload(BaseModel):
     user: User
-    ideas: List[Idea]
+    # Either the full tree or only the ideas/clips changed since the last sync
+    ideas: List[Idea] = []
+    deleted_ideas: List[str] = []
+    deleted_clips: List[str] = []
@@ -13,8 +13,10 @@ from app.core.auth import (
     SECRET_KEY,
     ALGORITHM
 )
+from app.core.invalidation import invalidate_after_commit
 from app.models.db_models import User
 from app.models.schemas import UserCreate, Token, RefreshRequest
+from app.utils.ids import new_id
 
 router = APIRouter()
 
@@ -30,12 +32,14 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     # Create new user
     hashed_password = get_password_hash(user_data.password)
     db_user = User(
+        id=new_id(),
         email=user_data.email,
         name=user_data.name,
         hashed_password=hashed_password
     )
     
     db.add(db_user)
+    invalidate_after_commit(db, db_user.id, "user")
     db.commit()
     db.refresh(db_user)
     
@@ -1,14 +1,28 @@
-from fastapi import APIRouter, HTTPException, Path, Query, Depends
+from fastapi import APIRouter, BackgroundTasks, Header, HTTPException, Path, Query, Depends, Request, Response
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from typing import Optional, List
 from app.models.db_models import Clip, Idea, Tag, User, clip_tags
 from app.db.session import SessionLocal
 from app.core.auth import get_current_user
-from app.models.schemas import ClipCreate, TagCreate
-import uuid
+from app.core.versioning import bump_data_version, record_deletion, not_modified
+from app.core.idempotency import get_idempotency_store, request_hash
+from app.core.responses import FastJSONResponse, fast_json
+from app.db.listing import scored_clips
+from app.db.repository import Repository, get_repository
+from app.services.unfurl_service import get_unfurl_service, unfurl_clips, UNFURL_TYPES
+from app.services.dedupe_service import get_dedupe_service, DEDUPE_TYPES
+from app.services.embedding_service import get_embedding_service, embed_clips
+from app.services.tag_suggestion_service import get_tag_suggestion_service
+from app.services.clip_body_service import get_clip_body_service
+from app.models.schemas import ClipCreate, TagCreate, ClipOut, ScoredClip, UrlLookupRequest, UrlLookupResult
+from app.utils.urls import canonicalize_url, canonical_url_hash, clip_url_hash
+from app.utils.ids import new_id
 
 router = APIRouter()
 
+MAX_LOOKUP_URLS = 1000
+
 def get_db():
     db = SessionLocal()
     try:
@@ -16,51 +30,138 @@ def get_db():
     finally:
         db.close()
 
-@router.get("/clips")
+def _with_body(clip: Clip, value: str) -> ClipOut:
+    """Single-clip response carrying the full text rather than the stored preview"""
+    out = ClipOut.model_validate(clip)
+    out.value = value
+    return out
+
+def _tag_names(db: Session, clip_id: str) -> List[str]:
+    return list(db.execute(
+        select(Tag.name).join(clip_tags, clip_tags.c.tag_id == Tag.id).where(clip_tags.c.clip_id == clip_id)
+    ).scalars())
+
+@router.get("/clips", response_model=List[ClipOut], response_class=FastJSONResponse)
 def list_clips(
+    request: Request,
+    response: Response,
     idea: Optional[str] = None,
+    repo: Repository = Depends(get_repository),
+    current_user: User = Depends(get_current_user)
+):
+    cached = not_modified(request, response, current_user)
+    if cached:
+        return cached
+    clips = repo.list_clips(current_user.id, idea)
+    return fast_json(clips, response)
+
+def _lookup_urls(db: Session, user_id: str, urls: List[str]) -> List[dict]:
+    """Match URLs against the user's clips by canonical URL hash, in one query"""
+    hashes = {url: canonical_url_hash(url) for url in urls}
+    matches = {}
+    wanted = {h for h in hashes.values() if h}
+    if wanted:
+        rows = db.execute(
+            select(Clip.url_hash, Clip.id, Clip.idea_id, Clip.type, Clip.created_at)
+            .join(Idea, Idea.id == Clip.idea_id)
+            .where(Clip.url_hash.in_(wanted), Idea.user_id == user_id)
+        )
+        for row in rows:
+            match = row._asdict()
+            matches.setdefault(match.pop("url_hash"), []).append(match)
+    return [
+        {
+            "url": url,
+            "canonical_url": canonicalize_url(url),
+            "clips": matches.get(url_hash, []) if url_hash else [],
+        }
+        for url, url_hash in hashes.items()
+    ]
+
+@router.get("/clips/lookup", response_model=UrlLookupResult, response_class=FastJSONResponse)
+def lookup_clip_url(
+    url: str = Query(..., description="Link, image or video URL to check"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    query = db.query(Clip).join(Idea).filter(Idea.user_id == current_user.id)
-    if idea:
-        query = query.filter(Idea.id == idea)
-    
-    clips = query.all()
-    print(f"Returning {len(clips)} clips for user {current_user.email}, idea filter: {idea}")
-    for i, clip in enumerate(clips):
-        print(f"  Clip {i+1}: id={clip.id}, type={clip.type}")
-    
-    return clips
+    """Which of the user's clips already point at this URL, after canonicalization"""
+    return fast_json(_lookup_urls(db, current_user.id, [url])[0])
+
+@router.post("/clips/lookup", response_model=List[UrlLookupResult], response_class=FastJSONResponse)
+def lookup_clip_urls(
+    lookup: UrlLookupRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Batch form of GET /clips/lookup, answered with a single indexed query"""
+    if len(lookup.urls) > MAX_LOOKUP_URLS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_LOOKUP_URLS} URLs per lookup")
+    return fast_json(_lookup_urls(db, current_user.id, list(dict.fromkeys(lookup.urls))))
 
-@router.get("/clips/{clip_id}")
+@router.get("/clips/{clip_id}", response_model=ClipOut)
 def get_clip(
+    request: Request,
+    response: Response,
     clip_id: str = Path(...),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
+    # Looked up first: the ETag covers all the user's data, so it would
+    # otherwise answer 304 for clips that are missing or someone else's
     clip = db.query(Clip).join(Idea).filter(
         Clip.id == clip_id,
         Idea.user_id == current_user.id
     ).first()
     if not clip:
         raise HTTPException(status_code=404, detail="Clip not found")
-    return clip
+    cached = not_modified(request, response, current_user)
+    if cached:
+        return cached
+    if clip.type in UNFURL_TYPES:
+        clip.preview = get_unfurl_service().previews(db, [clip.value]).get(clip.value)
+    return _with_body(clip, get_clip_body_service().full_value(db, clip))
 
-@router.get("/clips-by-tag")
+@router.get("/clips/{clip_id}/related", response_model=List[ScoredClip], response_class=FastJSONResponse)
+def list_related_clips(
+    clip_id: str,
+    limit: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """The user's clips most similar to this one, across all ideas"""
+    clip = db.query(Clip.type, Clip.value).join(Idea).filter(
+        Clip.id == clip_id,
+        Idea.user_id == current_user.id
+    ).first()
+    if not clip:
+        raise HTTPException(status_code=404, detail="Clip not found")
+    service = get_embedding_service()
+    matches = service.related(current_user.id, clip_id, service.clip_text(clip.type, clip.value), limit)
+    return fast_json(scored_clips(db, current_user.id, matches))
+
+@router.get("/clips-by-tag", response_model=List[ClipOut], response_class=FastJSONResponse)
 def list_clips_by_tag(
     tag: str = Query(...),
-    db: Session = Depends(get_db),
+    repo: Repository = Depends(get_repository),
     current_user: User = Depends(get_current_user)
 ):
-    return db.query(Clip).join(Clip.tags).filter((Tag.id == tag) | (Tag.name == tag)).all()
+    return fast_json(repo.clips_by_tag(current_user.id, tag))
 
-@router.post("/clips", status_code=201)
+@router.post("/clips", status_code=201, response_model=ClipOut)
 def create_clip(
     clip_data: ClipCreate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None)
 ):
+    """A retry sending the same Idempotency-Key gets the first response back, not a second clip"""
+    return get_idempotency_store().run(
+        db, current_user.id, idempotency_key, request_hash("POST /clips", clip_data),
+        lambda: _create_clip(clip_data, background_tasks, db, current_user), status_code=201
+    )
+
+def _create_clip(clip_data: ClipCreate, background_tasks: BackgroundTasks, db: Session, current_user: User) -> ClipOut:
     # Check if the idea exists and belongs to the current user
     idea = db.query(Idea).filter(
         Idea.id == clip_data.idea_id,
@@ -72,11 +173,12 @@ def create_clip(
     
     # Create the clip
     new_clip = Clip(
-        id=str(uuid.uuid4()),
+        id=new_id(),
         type=clip_data.type,
         value=clip_data.content,  # Map content to value
         status="active",
         idea_id=clip_data.idea_id,
+        url_hash=clip_url_hash(clip_data.type, clip_data.content),
         # Tags will be added below
     )
     
@@ -89,7 +191,7 @@ def create_clip(
             # Check if tag exists, create if not
             tag = db.query(Tag).filter(Tag.name == tag_name).first()
             if not tag:
-                tag = Tag(id=str(uuid.uuid4()), name=tag_name)
+                tag = Tag(id=new_id(), name=tag_name)
                 db.add(tag)
                 db.flush()
             
@@ -101,16 +203,29 @@ def create_clip(
                 )
             )
     
+    if new_clip.type in DEDUPE_TYPES:
+        get_dedupe_service().index_clip(db, new_clip)
+    # Large bodies move out of row only after they have been signed
+    get_clip_body_service().store_clip(db, new_clip, clip_data.content)
+    
+    new_clip.version = bump_data_version(db, current_user.id, "clip")
     db.commit()
     
     # Refresh to get all relationships loaded
     db.refresh(new_clip)
-    return new_clip
+    get_tag_suggestion_service().clip_changed(
+        current_user.id, None, (new_clip.value, clip_data.tags or [])
+    )
+    if new_clip.type in UNFURL_TYPES:
+        background_tasks.add_task(unfurl_clips, [new_clip.id])
+    background_tasks.add_task(embed_clips, [new_clip.id])
+    return _with_body(new_clip, clip_data.content)
 
-@router.put("/clips/{clip_id}")
+@router.put("/clips/{clip_id}", response_model=ClipOut)
 def update_clip(
     clip_id: str,
     clip_data: dict,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -124,8 +239,13 @@ def update_clip(
         raise HTTPException(status_code=404, detail="Clip not found or does not belong to current user")
     
     # Update clip fields
+    bodies = get_clip_body_service()
+    stored_before = (clip.type, clip.value, clip.body_hash)
+    tagged_before = (clip.value, _tag_names(db, clip_id))
     if "value" in clip_data or "content" in clip_data:
-        clip.value = clip_data.get("content", clip_data.get("value", clip.value))
+        value = clip_data.get("content", clip_data.get("value", clip.value))
+    else:
+        value = bodies.full_value(db, clip)
         
     if "type" in clip_data:
         clip.type = clip_data["type"]
@@ -133,6 +253,11 @@ def update_clip(
     if "status" in clip_data:
         clip.status = clip_data["status"]
     
+    bodies.store_clip(db, clip, value)
+    clip.url_hash = clip_url_hash(clip.type, value)
+    if (clip.type, clip.value, clip.body_hash) != stored_before:
+        get_dedupe_service().index_clip(db, clip, value)
+    
     # Handle tags if provided
     if "tags" in clip_data and clip_data["tags"] is not None:
         # Remove existing tags
@@ -147,7 +272,7 @@ def update_clip(
             # Check if tag exists, create if not
             tag = db.query(Tag).filter(Tag.name == tag_name).first()
             if not tag:
-                tag = Tag(id=str(uuid.uuid4()), name=tag_name)
+                tag = Tag(id=new_id(), name=tag_name)
                 db.add(tag)
                 db.flush()
             
@@ -159,9 +284,22 @@ def update_clip(
                 )
             )
     
+    # Edited outside the collector, so the next sync must not be skipped
+    clip.content_hash = None
+    clip.version = bump_data_version(db, current_user.id, "clip")
+    if stored_before[2] and stored_before[2] != clip.body_hash:
+        db.flush()
+        bodies.release(db, [stored_before[2]])
     db.commit()
     db.refresh(clip)
-    return clip
+    get_tag_suggestion_service().clip_changed(
+        current_user.id, tagged_before, (clip.value, _tag_names(db, clip_id))
+    )
+    if clip.type in UNFURL_TYPES:
+        # No-op when the URL's metadata is already cached
+        background_tasks.add_task(unfurl_clips, [clip.id])
+    background_tasks.add_task(embed_clips, [clip.id])
+    return _with_body(clip, value)
 
 @router.delete("/clips/{clip_id}", status_code=204)
 def delete_clip(
@@ -177,6 +315,7 @@ def delete_clip(
     
     if not clip:
         raise HTTPException(status_code=404, detail="Clip not found or does not belong to current user")
+    tagged_before = (clip.value, _tag_names(db, clip_id))
     
     # Delete associated tags
     db.execute(
@@ -185,7 +324,16 @@ def delete_clip(
         )
     )
     
+    get_dedupe_service().remove(db, [clip_id])
+    
     # Delete the clip
     db.delete(clip)
+    if clip.body_hash:
+        db.flush()
+        get_clip_body_service().release(db, [clip.body_hash])
+    version = bump_data_version(db, current_user.id, "clip")
+    record_deletion(db, current_user.id, "clip", clip_id, version)
     db.commit()
+    get_embedding_service().remove(current_user.id, [clip_id])
+    get_tag_suggestion_service().clip_changed(current_user.id, tagged_before, None)
     return {"message": "Clip deleted successfully"}
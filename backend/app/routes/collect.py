@@ -1,9 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException
+from sqlalchemy import select, insert, update
 from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import Optional
 from app.models.schemas import ClipkitPayload
-from app.models.db_models import User, Idea, Clip, Tag
+from app.models.db_models import User, Idea, Clip, Tag, clip_tags
 from app.db.session import SessionLocal
 from app.core.auth import get_current_user
+from app.core.versioning import bump_data_version, record_deletion
+from app.core.invalidation import ALL
+from app.core.idempotency import get_idempotency_store, request_hash
+from app.utils.content_hash import idea_hash, clip_hash
+from app.utils.urls import clip_url_hash
+from app.services.unfurl_service import unfurl_clips, UNFURL_TYPES
+from app.services.dedupe_service import get_dedupe_service
+from app.services.embedding_service import get_embedding_service, embed_clips
+from app.services.tag_suggestion_service import get_tag_suggestion_service
+from app.services.clip_body_service import get_clip_body_service
 
 router = APIRouter()
 
@@ -14,59 +27,252 @@ def get_db():
     finally:
         db.close()
 
+def _parse_datetime(value):
+    """Clip timestamps arrive as ISO strings from the extension"""
+    if not value or isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+# Keep IN (...) lists well under SQLite's bound-parameter limit
+LOOKUP_CHUNK_SIZE = 500
+
+def _chunks(items, size=LOOKUP_CHUNK_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def _existing(db: Session, query, id_column, ids):
+    """Fetch (id, ...) rows for the given ids in a few chunked queries"""
+    rows = {}
+    for chunk in _chunks(list(ids)):
+        for row in db.execute(query.where(id_column.in_(chunk))):
+            rows[row[0]] = row
+    return rows
+
+def _check_owner(rows, user_id: str, kind: str) -> None:
+    """
+    Refuse ids the collector sent that already belong to another user,
+    rather than overwriting (or moving) their rows
+    """
+    if any(row.user_id != user_id for row in rows.values()):
+        raise HTTPException(status_code=403, detail=f"Cannot collect {kind} belonging to another user")
+
 @router.post("/collect")
 def collect(
     payload: ClipkitPayload,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None)
 ):
+    """
+    Upsert ideas and clips from the collector.
+
+    The payload may be the full tree or only what changed since the last
+    sync: ideas and clips not mentioned are left untouched, and removals are
+    sent explicitly in `deleted_ideas` / `deleted_clips`.
+
+    Rows whose content hash matches the stored one are skipped entirely, so
+    re-sending unchanged data does not rewrite rows or their clip_tags.
+
+    A retry sending the same Idempotency-Key gets the first response back
+    without reading the payload against the tables again.
+    """
+    return get_idempotency_store().run(
+        db, current_user.id, idempotency_key, request_hash("POST /collect", payload),
+        lambda: _collect(payload, background_tasks, db, current_user)
+    )
+
+def _collect(payload: ClipkitPayload, background_tasks: BackgroundTasks, db: Session, current_user: User):
     # Verify the user in payload matches the authenticated user
     if payload.user.id != current_user.id:
         raise HTTPException(status_code=403, detail="Cannot collect data for another user")
-    # Upsert user
-    user_obj = db.query(User).filter_by(id=payload.user.id).first()
-    if not user_obj:
-        user_obj = User(id=payload.user.id, name=payload.user.name, email=payload.user.email)
-        db.add(user_obj)
-    else:
-        user_obj.name = payload.user.name
-        user_obj.email = payload.user.email
-    db.flush()
-    for idea in payload.ideas:
-        idea_obj = db.query(Idea).filter_by(id=idea.id).first()
-        if not idea_obj:
-            idea_obj = Idea(id=idea.id, name=idea.name, category=idea.category, user_id=user_obj.id)
-            db.add(idea_obj)
-        else:
-            idea_obj.name = idea.name
-            idea_obj.category = idea.category
-        db.flush()
-        for clip in idea.clips:
-            clip_obj = db.query(Clip).filter_by(id=clip.id).first()
-            if not clip_obj:
-                clip_obj = Clip(
-                    id=clip.id,
-                    type=clip.type,
-                    value=clip.value,
-                    status=clip.status,
-                    created_at=clip.created_at,
-                    idea_id=idea_obj.id
-                )
-                db.add(clip_obj)
-            else:
-                clip_obj.type = clip.type
-                clip_obj.value = clip.value
-                clip_obj.status = clip.status
-                clip_obj.created_at = clip.created_at
-            db.flush()
-            # Tags (many-to-many)
-            tag_objs = []
-            for tag in clip.tags:
-                tag_obj = db.query(Tag).filter_by(id=tag.id).first()
-                if not tag_obj:
-                    tag_obj = Tag(id=tag.id, name=tag.name)
-                    db.add(tag_obj)
-                tag_objs.append(tag_obj)
-            clip_obj.tags = tag_objs
+    user_changed = current_user.name != payload.user.name or current_user.email != payload.user.email
+    if user_changed:
+        db.execute(
+            update(User)
+            .where(User.id == current_user.id)
+            .values(name=payload.user.name, email=payload.user.email)
+        )
+
+    # Last occurrence wins if the collector sends the same id twice
+    ideas_payload = list({idea.id: idea for idea in payload.ideas}.values())
+    clips_payload = list({
+        clip.id: (idea.id, clip) for idea in ideas_payload for clip in idea.clips
+    }.values())
+    stored_ideas = _existing(
+        db, select(Idea.id, Idea.content_hash, Idea.user_id), Idea.id, {i.id for i in ideas_payload}
+    )
+    stored_clips = _existing(
+        db,
+        select(Clip.id, Clip.content_hash, Clip.body_hash, Idea.user_id).outerjoin(Idea, Idea.id == Clip.idea_id),
+        Clip.id,
+        {c.id for _, c in clips_payload}
+    )
+    # Checked before anything is written, so the bulk updates below (which
+    # match on id alone) only ever touch the user's own rows
+    _check_owner(stored_ideas, current_user.id, "ideas")
+    _check_owner(stored_clips, current_user.id, "clips")
+
+    # Work out what actually changed before touching anything
+    idea_rows, new_idea_ids = [], set()
+    for idea in ideas_payload:
+        digest = idea_hash(idea.name, idea.category)
+        stored = stored_ideas.get(idea.id)
+        if stored is not None and stored.content_hash == digest:
+            continue
+        if stored is None:
+            new_idea_ids.add(idea.id)
+        idea_rows.append({
+            "id": idea.id,
+            "name": idea.name,
+            "category": idea.category,
+            "content_hash": digest,
+        })
+
+    clip_rows, new_clip_ids, clip_tag_rows, tags_seen = [], set(), [], {}
+    for idea_id, clip in clips_payload:
+        created_at = _parse_datetime(clip.created_at)
+        tag_ids = list(dict.fromkeys(tag.id for tag in clip.tags))
+        digest = clip_hash(clip.type, clip.value, clip.status, created_at, idea_id, tag_ids)
+        stored = stored_clips.get(clip.id)
+        if stored is not None and stored.content_hash == digest:
+            continue
+        if stored is None:
+            new_clip_ids.add(clip.id)
+        clip_rows.append({
+            "id": clip.id,
+            "type": clip.type,
+            "value": clip.value,
+            "status": clip.status,
+            "created_at": created_at,
+            "idea_id": idea_id,
+            "content_hash": digest,
+            "url_hash": clip_url_hash(clip.type, clip.value),
+        })
+        for tag in clip.tags:
+            tags_seen.setdefault(tag.id, tag.name)
+        clip_tag_rows.extend({"clip_id": clip.id, "tag_id": tag_id} for tag_id in tag_ids)
+
+    # MinHash signatures for changed text/code clips, computed as one batch
+    dedupe = get_dedupe_service()
+    for row, signature in zip(clip_rows, dedupe.signatures(clip_rows)):
+        row["minhash"] = signature
+
+    skipped = len(ideas_payload) + len(clips_payload) - len(idea_rows) - len(clip_rows)
+    if not (user_changed or idea_rows or clip_rows or payload.deleted_ideas or payload.deleted_clips):
+        return {
+            "message": "Nothing to save",
+            "version": current_user.data_version,
+            "written": 0,
+            "skipped": skipped,
+            "deleted": 0,
+        }
+
+    # Profile, ideas, clips and tags may all have changed
+    version = bump_data_version(db, current_user.id, ALL)
+    now = datetime.utcnow()
+
+    inserts = [dict(row, user_id=current_user.id, version=version, updated_at=now)
+               for row in idea_rows if row["id"] in new_idea_ids]
+    updates = [dict(row, version=version, updated_at=now)
+               for row in idea_rows if row["id"] not in new_idea_ids]
+    if inserts:
+        db.execute(insert(Idea), inserts)
+    if updates:
+        db.execute(update(Idea), updates)
+
+    if tags_seen:
+        known_tags = _existing(db, select(Tag.id), Tag.id, tags_seen.keys())
+        new_tags = [{"id": tag_id, "name": name, "updated_at": now}
+                    for tag_id, name in tags_seen.items() if tag_id not in known_tags]
+        if new_tags:
+            db.execute(insert(Tag), new_tags)
+
+    # Large bodies move out of row once hashes and signatures are computed
+    bodies = get_clip_body_service()
+    bodies.store(db, clip_rows)
+    inserts = [dict(row, version=version, updated_at=now)
+               for row in clip_rows if row["id"] in new_clip_ids]
+    updates = [dict(row, version=version, updated_at=now)
+               for row in clip_rows if row["id"] not in new_clip_ids]
+    if inserts:
+        db.execute(insert(Clip), inserts)
+    if updates:
+        db.execute(update(Clip), updates)
+        # Only changed clips get their tag links rewritten
+        for chunk in _chunks([row["id"] for row in updates]):
+            db.execute(clip_tags.delete().where(clip_tags.c.clip_id.in_(chunk)))
+    if clip_tag_rows:
+        db.execute(clip_tags.insert(), clip_tag_rows)
+    if clip_rows:
+        dedupe.index(db, clip_rows)
+
+    deleted, deleted_clip_ids, released = _apply_deletions(db, current_user.id, payload, version)
+    released += [
+        stored_clips[row["id"]].body_hash for row in updates
+        if stored_clips[row["id"]].body_hash != row["body_hash"]
+    ]
+    bodies.release(db, released)
     db.commit()
-    return {"message": "Saved to database!"}
+
+    linked = [row["id"] for row in clip_rows if row["type"] in UNFURL_TYPES]
+    if linked:
+        background_tasks.add_task(unfurl_clips, linked)
+    if clip_rows:
+        background_tasks.add_task(embed_clips, [row["id"] for row in clip_rows])
+    if deleted_clip_ids:
+        get_embedding_service().remove(current_user.id, deleted_clip_ids)
+    if clip_rows or deleted_clip_ids:
+        # Bulk change: rebuild tag suggestions on next use rather than diffing
+        get_tag_suggestion_service().invalidate(current_user.id)
+    return {
+        "message": "Saved to database!",
+        "version": version,
+        "written": len(idea_rows) + len(clip_rows),
+        "skipped": skipped,
+        "deleted": deleted,
+    }
+
+def _apply_deletions(db: Session, user_id: str, payload: ClipkitPayload, version: int):
+    """
+    Delete the user's ideas/clips named in the payload, leaving tombstones.
+    Returns the number of deleted rows, the ids of the deleted clips and
+    the body hashes they referenced.
+    """
+    if not payload.deleted_ideas and not payload.deleted_clips:
+        return 0, [], []
+    deleted = 0
+    clips = []
+    if payload.deleted_clips:
+        clips += db.query(Clip).join(Idea).filter(
+            Clip.id.in_(payload.deleted_clips),
+            Idea.user_id == user_id
+        ).all()
+    ideas = []
+    if payload.deleted_ideas:
+        ideas = db.query(Idea).filter(
+            Idea.id.in_(payload.deleted_ideas),
+            Idea.user_id == user_id
+        ).all()
+        # Clips cannot outlive their idea
+        clips += db.query(Clip).filter(Clip.idea_id.in_([idea.id for idea in ideas])).all()
+
+    seen = set()
+    for clip in clips:
+        if clip.id in seen:
+            continue
+        seen.add(clip.id)
+        db.execute(clip_tags.delete().where(clip_tags.c.clip_id == clip.id))
+        get_dedupe_service().remove(db, [clip.id])
+        db.delete(clip)
+        record_deletion(db, user_id, "clip", clip.id, version)
+        deleted += 1
+    db.flush()
+    for idea in ideas:
+        db.delete(idea)
+        record_deletion(db, user_id, "idea", idea.id, version)
+        deleted += 1
+    return deleted, list(seen), [clip.body_hash for clip in clips if clip.body_hash]
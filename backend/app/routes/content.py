@@ -1,10 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException
+from collections import Counter
 from typing import List, Optional, Union
 from pydantic import BaseModel
 from app.models.db_models import Clip, Idea, User
 from app.db.session import SessionLocal
 from sqlalchemy.orm import Session
 from app.services.ai_service import get_ai_service
+from app.services.unfurl_service import get_unfurl_service, UNFURL_TYPES
+from app.services.dedupe_service import get_dedupe_service
+from app.services.cluster_service import get_cluster_service
+from app.services.clip_body_service import get_clip_body_service
 from app.core.auth import get_current_user
 
 router = APIRouter()
@@ -22,10 +27,24 @@ class ContentGenerationRequest(BaseModel):
     content_type: str
     tone: str
     length: str
+    drop_duplicates: bool = False  # Leave near-duplicate clips out of the prompt
+    group_by_theme: bool = False  # Order clips by theme cluster and name the themes
 
 class GeneratedContent(BaseModel):
     content: str
     
+def _group_by_theme(db: Session, user_id: str, idea_id: str, clips: List[Clip]):
+    """Selected clips ordered theme by theme, plus the labels of the themes they cover"""
+    clusters = get_cluster_service().clusters(db, user_id, idea_id)
+    rank = {
+        clip_id: (cluster["id"], n)
+        for cluster in clusters for n, clip_id in enumerate(cluster["clip_ids"])
+    }
+    ordered = sorted(clips, key=lambda clip: rank.get(clip.id, (len(clusters), 0)))
+    counts = Counter(rank[clip.id][0] for clip in clips if clip.id in rank)
+    themes = [f"{c['label']} ({counts[c['id']]} clips)" for c in clusters if counts[c["id"]]]
+    return ordered, themes
+
 @router.post("/generate", response_model=GeneratedContent)
 async def generate_content(
     request: ContentGenerationRequest,
@@ -49,6 +68,7 @@ async def generate_content(
     
     # Variable to hold our clips
     clips = []
+    themes = None
     using_mock_data = False
     
     if not idea:
@@ -134,6 +154,25 @@ async def generate_content(
             for clip in selected_clips:
                 print(f"  - ID: {clip.id}, Type: {clip.type}")
                 
+            if request.drop_duplicates:
+                kept = get_dedupe_service().drop_duplicates(db, request.idea_id, selected_clips)
+                print(f"Dropped {len(selected_clips) - len(kept)} near-duplicate clips")
+                selected_clips = kept
+                
+            if request.group_by_theme:
+                selected_clips, themes = _group_by_theme(db, current_user.id, request.idea_id, selected_clips)
+                print(f"Grouped clips into {len(themes)} themes")
+            
+            # The prompt gets the full text of large clips. They are detached
+            # first so the swapped-in body can never be flushed over the preview.
+            bodies = get_clip_body_service().load(
+                db, [clip.body_hash for clip in selected_clips if clip.body_hash]
+            )
+            for clip in selected_clips:
+                if clip.body_hash in bodies:
+                    db.expunge(clip)
+                    clip.value = bodies[clip.body_hash]
+                
             clips = selected_clips
         except Exception as e:
             print(f"Error fetching clips: {str(e)}")
@@ -172,13 +211,22 @@ async def generate_content(
             content_preview = clip_content[:30] if clip_content else "N/A"
             print(f"  Clip {idx+1}: ID={clip_id}, Type={clip_type}, Content={content_preview}...")
         
+        # Cached link/video previews; generation never waits on unfurling
+        link_metadata = {}
+        if not using_mock_data:
+            link_metadata = get_unfurl_service().previews(
+                db, [clip.value for clip in clips if clip.type in UNFURL_TYPES]
+            )
+        
         # Generate content using AI service
         content = await ai_service.generate_content(
             idea=idea,
             clips=clips,
             content_type=request.content_type,
             tone=request.tone,
-            length=request.length
+            length=request.length,
+            link_metadata=link_metadata,
+            themes=themes
         )
         
         print(f"Content generation successful, returning {len(content)} characters")
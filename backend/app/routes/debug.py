@@ -3,6 +3,7 @@ from fastapi.responses import JSONResponse
 from app.core.auth import create_access_token
 from datetime import timedelta
 from app.core.auth import ACCESS_TOKEN_EXPIRE_MINUTES
+from app.core.cache import cache_stats
 
 router = APIRouter()
 
@@ -26,3 +27,8 @@ async def debug_token():
         },
         status_code=200
     )
+
+@router.get("/debug/cache-stats")
+async def cache_stats_report():
+    """Hits, misses and hit rate per cache namespace since the worker started"""
+    return JSONResponse(content=cache_stats.report(), status_code=200)
@@ -0,0 +1,28 @@
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from app.models.db_models import User
+from app.core.auth import get_current_user
+from app.services.export_service import get_export_service, EXPORT_FORMATS
+
+router = APIRouter(tags=["export"])
+
+@router.get("/export")
+def export_data(
+    format: str = Query("jsonl", description="jsonl, markdown or zip (one Markdown file per idea)"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Download all of the user's ideas, clips and tags. The body is streamed
+    as it is read from the database, so large exports start immediately.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    media_type, extension = EXPORT_FORMATS[format]
+    body = getattr(get_export_service(), format)(current_user.id)
+    filename = f"clipkit-export-{datetime.utcnow():%Y%m%d}.{extension}"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "Cache-Control": "no-store"}
+    )
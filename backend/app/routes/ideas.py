@@ -1,11 +1,17 @@
-from fastapi import APIRouter, HTTPException, Path, Query, Depends
+from fastapi import APIRouter, HTTPException, Path, Query, Depends, Request, Response
 from sqlalchemy.orm import Session
-from typing import Optional
+from typing import Optional, List
 from app.models.db_models import Idea, User
 from app.db.session import SessionLocal
 from app.core.auth import get_current_user
-from app.models.schemas import IdeaCreate, IdeaUpdate
-import uuid
+from app.core.versioning import not_modified
+from app.core.cache import get_cache, user_tag
+from app.core.responses import FastJSONResponse, dumps, fast_json
+from app.db.repository import Repository, get_repository
+from app.models.schemas import IdeaCreate, IdeaUpdate, IdeaOut, IdeaSummary, DuplicateGroup, ClipCluster
+from app.services.summary_service import get_summary_service
+from app.services.dedupe_service import get_dedupe_service
+from app.services.cluster_service import get_cluster_service
 
 router = APIRouter()
 
@@ -16,82 +22,137 @@ def get_db():
     finally:
         db.close()
 
-@router.get("/ideas")
+@router.get("/ideas", response_model=List[IdeaOut], response_class=FastJSONResponse)
 def list_ideas(
+    request: Request,
+    response: Response,
+    repo: Repository = Depends(get_repository),
+    current_user: User = Depends(get_current_user)
+):
+    cached = not_modified(request, response, current_user)
+    if cached:
+        return cached
+    # Keyed by data version, so a write moves on to a new entry
+    body = get_cache("ideas").get_or_set(
+        f"{current_user.id}:{current_user.data_version or 0}",
+        lambda: dumps(repo.list_ideas(current_user.id)),
+        tags=(user_tag(current_user.id),)
+    )
+    return fast_json(body, response)
+
+@router.get("/ideas/summary", response_model=List[IdeaSummary], response_class=FastJSONResponse)
+def list_idea_summaries(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    return db.query(Idea).filter_by(user_id=current_user.id).all()
+    """
+    Clip counts per type, last clip time and top tags for every idea, so the
+    dashboard can render without fetching all clips.
+    """
+    cached = not_modified(request, response, current_user)
+    if cached:
+        return cached
+    return fast_json(get_summary_service().get_summaries(db, current_user), response)
 
-@router.get("/ideas/{idea_id}")
+@router.get("/ideas/{idea_id}", response_model=IdeaOut)
 def get_idea(
+    request: Request,
+    response: Response,
     idea_id: str = Path(...),
-    db: Session = Depends(get_db),
+    repo: Repository = Depends(get_repository),
     current_user: User = Depends(get_current_user)
 ):
-    idea = db.query(Idea).filter_by(id=idea_id, user_id=current_user.id).first()
+    # Looked up first: the ETag covers all the user's data, so it would
+    # otherwise answer 304 for ideas that are missing or someone else's
+    idea = repo.get_idea(current_user.id, idea_id)
     if not idea:
         raise HTTPException(status_code=404, detail="Idea not found")
+    cached = not_modified(request, response, current_user)
+    if cached:
+        return cached
     return idea
 
-@router.post("/ideas", status_code=201)
+@router.get("/ideas/{idea_id}/duplicates", response_model=List[DuplicateGroup], response_class=FastJSONResponse)
+def list_idea_duplicates(
+    request: Request,
+    response: Response,
+    idea_id: str = Path(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Groups of near-duplicate text/code clips in an idea, oldest clip kept"""
+    idea = db.query(Idea.id).filter_by(id=idea_id, user_id=current_user.id).first()
+    if not idea:
+        raise HTTPException(status_code=404, detail="Idea not found")
+    cached = not_modified(request, response, current_user)
+    if cached:
+        return cached
+    return fast_json(get_dedupe_service().duplicate_groups(db, idea_id), response)
+
+@router.get("/ideas/{idea_id}/clusters", response_model=List[ClipCluster], response_class=FastJSONResponse)
+def list_idea_clusters(
+    request: Request,
+    response: Response,
+    idea_id: str = Path(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """The idea's clips grouped into themes, largest first, so they can be selected by theme"""
+    idea = db.query(Idea.id).filter_by(id=idea_id, user_id=current_user.id).first()
+    if not idea:
+        raise HTTPException(status_code=404, detail="Idea not found")
+    cached = not_modified(request, response, current_user)
+    if cached:
+        return cached
+    return fast_json(get_cluster_service().clusters(db, current_user.id, idea_id), response)
+
+@router.post("/ideas", status_code=201, response_model=IdeaOut)
 def create_idea(
     idea_data: IdeaCreate,
-    db: Session = Depends(get_db),
+    repo: Repository = Depends(get_repository),
     current_user: User = Depends(get_current_user)
 ):
-    new_idea = Idea(
-        id=str(uuid.uuid4()),
-        name=idea_data.name,
-        category=idea_data.category,
-        user_id=current_user.id
-    )
-    
-    db.add(new_idea)
-    db.commit()
-    db.refresh(new_idea)
-    return new_idea
+    return repo.create_idea(current_user.id, idea_data.name, idea_data.category)
 
-@router.put("/ideas/{idea_id}")
+@router.put("/ideas/{idea_id}", response_model=IdeaOut)
 def update_idea(
     idea_id: str,
     idea_data: IdeaUpdate,
-    db: Session = Depends(get_db),
+    repo: Repository = Depends(get_repository),
     current_user: User = Depends(get_current_user)
 ):
-    idea = db.query(Idea).filter_by(id=idea_id, user_id=current_user.id).first()
+    idea = repo.update_idea(current_user.id, idea_id, idea_data.name, idea_data.category)
     if not idea:
         raise HTTPException(status_code=404, detail="Idea not found")
-    
-    # Update fields if provided
-    if idea_data.name is not None:
-        idea.name = idea_data.name
-        
-    if idea_data.category is not None:
-        idea.category = idea_data.category
-    
-    db.commit()
-    db.refresh(idea)
     return idea
 
 @router.delete("/ideas/{idea_id}", status_code=204)
 def delete_idea(
     idea_id: str,
-    db: Session = Depends(get_db),
+    repo: Repository = Depends(get_repository),
     current_user: User = Depends(get_current_user)
 ):
-    idea = db.query(Idea).filter_by(id=idea_id, user_id=current_user.id).first()
-    if not idea:
+    # The idea's clips are deleted with it
+    if not repo.delete_idea(current_user.id, idea_id):
         raise HTTPException(status_code=404, detail="Idea not found")
-    
-    # Note: This will cascade delete all associated clips if foreign key constraints are set up
-    db.delete(idea)
-    db.commit()
     return {"message": "Idea deleted successfully"}
 
-@router.get("/my-ideas")
+@router.get("/my-ideas", response_model=List[IdeaOut], response_class=FastJSONResponse)
 def list_my_ideas(
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    repo: Repository = Depends(get_repository),
     current_user: User = Depends(get_current_user)
 ):
-    return db.query(Idea).filter_by(user_id=current_user.id).all()
+    cached = not_modified(request, response, current_user)
+    if cached:
+        return cached
+    # Keyed by data version, so a write moves on to a new entry
+    body = get_cache("ideas").get_or_set(
+        f"{current_user.id}:{current_user.data_version or 0}",
+        lambda: dumps(repo.list_ideas(current_user.id)),
+        tags=(user_tag(current_user.id),)
+    )
+    return fast_json(body, response)
@@ -0,0 +1,111 @@
+import hashlib
+import hmac
+import os
+import time
+from typing import Dict, Optional
+from urllib.parse import urlencode
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import FileResponse, Response
+from fastapi.security import OAuth2PasswordBearer
+from app.core.auth import SECRET_KEY, get_current_user
+from app.db.repository import Repository, get_repository
+from app.models.db_models import User
+from app.models.schemas import ThumbnailSignRequest
+from app.core.versioning import etag_matches
+from app.services.thumbnail_service import get_thumbnail_service, ThumbnailError
+
+# Environment variables
+THUMBNAIL_URL_TTL = int(os.getenv("THUMBNAIL_URL_TTL", str(24 * 3600)))
+
+router = APIRouter(tags=["media"])
+
+# Thumbnails for a URL never change once generated; private since the
+# route needs a signed-in user or a URL signed for one
+CACHE_CONTROL = "private, max-age=604800, immutable"
+MAX_SIGN_URLS = 500
+
+# Like oauth2_scheme, but leaves the 401 to get_current_user so a signed
+# URL can stand in for the header
+optional_token = OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False)
+
+def _signature(url: str, size: str, format: str, expires: int) -> str:
+    message = f"thumb\n{url}\n{size}\n{format}\n{expires}".encode("utf-8")
+    return hmac.new(SECRET_KEY.encode("utf-8"), message, hashlib.sha256).hexdigest()
+
+def signed_thumbnail_path(url: str, size: str = "md", format: str = "webp", now: Optional[float] = None) -> str:
+    """
+    /media/thumb path that works without an Authorization header, as an
+    <img src> needs, until it expires in between one and two TTLs. Expiry
+    is rounded so a URL stays the same for a whole TTL and browsers keep
+    reusing their cached copy.
+    """
+    now = time.time() if now is None else now
+    expires = (int(now) // THUMBNAIL_URL_TTL + 2) * THUMBNAIL_URL_TTL
+    query = {"url": url, "size": size, "format": format,
+             "expires": expires, "sig": _signature(url, size, format, expires)}
+    return f"/media/thumb?{urlencode(query)}"
+
+async def _authorize(
+    url: str, size: str, format: str, expires: Optional[int], sig: Optional[str],
+    token: Optional[str], repo: Repository
+) -> None:
+    """Accept a valid signed URL, otherwise require a signed-in user"""
+    if sig is None:
+        await get_current_user(token, repo)
+        return
+    if expires is None or expires < time.time():
+        raise HTTPException(status_code=403, detail="Thumbnail URL has expired")
+    if not hmac.compare_digest(sig, _signature(url, size, format, expires)):
+        raise HTTPException(status_code=403, detail="Invalid thumbnail URL signature")
+
+@router.post("/media/thumb/sign")
+def sign_thumbnails(
+    request: ThumbnailSignRequest,
+    current_user: User = Depends(get_current_user)
+) -> Dict[str, str]:
+    """
+    Signed, expiring GET /media/thumb paths for the given image URLs, so
+    a page can show them with plain <img> tags
+    """
+    if len(request.urls) > MAX_SIGN_URLS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_SIGN_URLS} URLs per request")
+    now = time.time()
+    return {url: signed_thumbnail_path(url, request.size, request.format, now) for url in request.urls}
+
+@router.get("/media/thumb")
+async def get_thumbnail(
+    request: Request,
+    url: str = Query(..., description="Remote image URL, e.g. an image clip's value"),
+    size: str = Query("md", description="sm, md or lg"),
+    format: str = Query("webp", description="webp or jpeg"),
+    expires: Optional[int] = Query(None, description="Expiry of a signed URL, from POST /media/thumb/sign"),
+    sig: Optional[str] = Query(None, description="Signature of a signed URL"),
+    token: Optional[str] = Depends(optional_token),
+    repo: Repository = Depends(get_repository)
+):
+    """
+    Serve a resized copy of a remote image. The original is downloaded once
+    per URL; every size and format is generated from it and kept in a
+    size-bounded disk cache. Only for signed-in users, or through a URL
+    signed for one by POST /media/thumb/sign, so the server cannot be used
+    as an open image proxy.
+    """
+    await _authorize(url, size, format, expires, sig, token, repo)
+    for _ in range(2):
+        try:
+            thumb = await get_thumbnail_service().get_thumbnail(url, size, format)
+        except ThumbnailError as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
+        try:
+            stat_result = os.stat(thumb.path)
+            break
+        except FileNotFoundError:
+            # Another worker evicted it after the lookup; asking again renders it anew
+            continue
+    else:
+        raise HTTPException(status_code=503, detail="Thumbnail was evicted before it could be served")
+
+    headers = {"ETag": thumb.etag, "Cache-Control": CACHE_CONTROL}
+    if etag_matches(request.headers.get("if-none-match"), thumb.etag):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(thumb.path, media_type=thumb.content_type, headers=headers, stat_result=stat_result)
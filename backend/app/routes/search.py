@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from app.models.db_models import Clip, Idea, User
+from app.models.schemas import ScoredClip
+from app.db.session import SessionLocal
+from app.db.listing import scored_clips
+from app.core.auth import get_current_user
+from app.core.responses import FastJSONResponse, fast_json
+from app.services.embedding_service import get_embedding_service
+
+router = APIRouter()
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+@router.get("/search/semantic", response_model=List[ScoredClip], response_class=FastJSONResponse)
+def semantic_search(
+    q: str = Query(..., min_length=1, description="Free-text query"),
+    limit: int = Query(20, ge=1, le=100),
+    idea: Optional[str] = Query(None, description="Only return clips from this idea"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Clips ranked by similarity to the query, without needing shared keywords or tags"""
+    within, criteria = None, []
+    if idea:
+        # Rank only the idea's clips, so the filter never eats into the limit
+        within = db.scalars(
+            select(Clip.id).join(Idea, Idea.id == Clip.idea_id)
+            .where(Idea.id == idea, Idea.user_id == current_user.id)
+        ).all()
+        if not within:
+            return fast_json([])
+        criteria = [Idea.id == idea]
+    matches = get_embedding_service().search(current_user.id, q, limit, within=within)
+    return fast_json(scored_clips(db, current_user.id, matches, *criteria)[:limit])
@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+from app.models.db_models import User
+from app.db.session import SessionLocal
+from app.core.auth import get_current_user
+from app.services.sync_service import get_sync_service, decode_cursor, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+router = APIRouter()
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+@router.get("/sync")
+def sync(
+    since: Optional[str] = Query(None, description="Cursor from a previous sync; omit for a full sync"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Return ideas, clips and tags created or updated, plus ideas and clips
+    deleted, since the cursor. Keep calling with the returned cursor while
+    `has_more` is true.
+    """
+    try:
+        cursor = decode_cursor(since)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return get_sync_service().changes_since(db, current_user.id, cursor, limit)
@@ -1,8 +1,15 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
 from sqlalchemy.orm import Session
+from typing import List
 from app.models.db_models import Tag, User, Clip, Idea
 from app.db.session import SessionLocal
 from app.core.auth import get_current_user
+from app.core.versioning import not_modified
+from app.core.cache import get_cache, user_tag
+from app.core.responses import FastJSONResponse, dumps, fast_json
+from app.db.repository import Repository, get_repository
+from app.models.schemas import TagOut, TagSuggestRequest, TagSuggestion
+from app.services.tag_suggestion_service import get_tag_suggestion_service
 
 router = APIRouter()
 
@@ -13,12 +20,36 @@ def get_db():
     finally:
         db.close()
 
-@router.get("/tags")
+@router.get("/tags", response_model=List[TagOut], response_class=FastJSONResponse)
 def list_tags(
+    request: Request,
+    response: Response,
+    repo: Repository = Depends(get_repository),
+    current_user: User = Depends(get_current_user)
+):
+    cached = not_modified(request, response, current_user)
+    if cached:
+        return cached
+    # Get tags only from clips that belong to the user's ideas; keyed by
+    # data version, so a write moves on to a new entry
+    body = get_cache("tags").get_or_set(
+        f"{current_user.id}:{current_user.data_version or 0}",
+        lambda: dumps(repo.list_tags(current_user.id)),
+        tags=(user_tag(current_user.id),)
+    )
+    return fast_json(body, response)
+
+@router.post("/tags/suggest", response_model=List[TagSuggestion], response_class=FastJSONResponse)
+def suggest_tags(
+    suggest: TagSuggestRequest,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    # Get tags only from clips that belong to the user's ideas
-    return db.query(Tag).join(Tag.clips).join(Clip.idea).filter(
-        Idea.user_id == current_user.id
-    ).distinct().all()
+    """
+    Rank the user's existing tags for new clip content, by the words it
+    shares with clips carrying each tag and by co-occurrence with the tags
+    already chosen.
+    """
+    return fast_json(get_tag_suggestion_service().suggest(
+        db, current_user.id, suggest.content, suggest.tags, suggest.limit
+    ))
@@ -1,20 +1,41 @@
+import asyncio
 import os
 import httpx
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from pydantic import BaseModel
 from app.models.db_models import Clip, Idea
 
 # Environment variables
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
+# Any OpenAI-compatible API, e.g. benchmarks/llm_stub.py for offline load tests
+GROQ_API_BASE = os.getenv("GROQ_API_BASE", "https://api.groq.com/openai/v1")
+GROQ_API_URL = f"{GROQ_API_BASE.rstrip('/')}/chat/completions"
+GROQ_TIMEOUT = float(os.getenv("GROQ_TIMEOUT", "60"))
+# Retries for 429s and 5xx responses, after Retry-After or exponential backoff
+GROQ_MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", "2"))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 10.0
 MODEL = "llama3-70b-8192" # or another model available in GROQ
 
 class AIService:
     """Service for AI-related operations"""
     
-    def __init__(self, api_key: str = None, model: str = MODEL):
+    def __init__(
+        self,
+        api_key: str = None,
+        model: str = MODEL,
+        base_url: str = None,
+        timeout: float = GROQ_TIMEOUT,
+        max_retries: int = GROQ_MAX_RETRIES,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
         self.api_key = api_key or GROQ_API_KEY
         self.model = model
+        self.api_url = f"{base_url.rstrip('/')}/chat/completions" if base_url else GROQ_API_URL
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.transport = transport
         # Don't raise an error, just log a warning if API key is missing
         if not self.api_key:
             print("WARNING: GROQ API key is not set. Using mock responses for content generation.")
@@ -28,9 +49,17 @@ class AIService:
         clips: List[Clip],
         content_type: str,
         tone: str,
-        length: str
+        length: str,
+        link_metadata: Optional[Dict[str, Dict[str, Any]]] = None,
+        themes: Optional[List[str]] = None
     ) -> str:
-        """Generate content based on clips and parameters"""
+        """Generate content based on clips and parameters
+
+        link_metadata maps link/video URLs to their cached unfurl results,
+        which are added to the prompt next to the bare URL. themes names
+        the clip clusters the clips were ordered by, if any.
+        """
+        link_metadata = link_metadata or {}
         
         try:
             # Process clips based on type
@@ -52,9 +81,9 @@ class AIService:
                     elif clip.type == "image":
                         image_clips.append(f"Image URL: {clip_content}")
                     elif clip.type == "link":
-                        link_clips.append(f"Link: {clip_content}")
+                        link_clips.append(f"Link: {clip_content}{self._describe_link(link_metadata.get(clip_content))}")
                     elif clip.type == "video":
-                        video_clips.append(f"Video URL: {clip_content}")
+                        video_clips.append(f"Video URL: {clip_content}{self._describe_link(link_metadata.get(clip_content))}")
                     elif clip.type == "code":
                         # Fallback if lang is not available
                         code_clips.append(f"Code snippet:\n```\n{clip_content}\n```")
@@ -72,7 +101,8 @@ class AIService:
                 code_clips=code_clips,
                 content_type=content_type,
                 tone=tone,
-                length=length
+                length=length,
+                themes=themes
             )
             
             # Make API request to GROQ
@@ -92,24 +122,16 @@ class AIService:
                         length=length
                     )
                     
-                async with httpx.AsyncClient() as client:
-                    response = await client.post(
-                        GROQ_API_URL,
-                        headers={
-                            "Authorization": f"Bearer {self.api_key}",
-                            "Content-Type": "application/json"
-                        },
-                        json={
-                            "model": self.model,
-                            "messages": [
-                                {"role": "system", "content": "You are a professional content creator that specializes in creating high-quality content based on collected research and notes."},
-                                {"role": "user", "content": prompt}
-                            ],
-                            "temperature": 0.7,
-                            "max_tokens": self._get_max_tokens(length)
-                        },
-                        timeout=60.0  # Increased timeout for longer generations
-                    )
+                async with httpx.AsyncClient(transport=self.transport) as client:
+                    response = await self._post_completion(client, {
+                        "model": self.model,
+                        "messages": [
+                            {"role": "system", "content": "You are a professional content creator that specializes in creating high-quality content based on collected research and notes."},
+                            {"role": "user", "content": prompt}
+                        ],
+                        "temperature": 0.7,
+                        "max_tokens": self._get_max_tokens(length)
+                    })
                     
                     if response.status_code != 200:
                         print(f"Error from GROQ API: {response.text}")
@@ -126,6 +148,58 @@ class AIService:
             print(f"Unexpected error in generate_content: {str(e)}")
             return f"Error in content generation: {str(e)}"
     
+    async def _post_completion(self, client: httpx.AsyncClient, payload: Dict[str, Any]) -> httpx.Response:
+        """POST a chat completion, retrying rate limits, server errors,
+        timeouts and dropped connections
+
+        Returns the last response, successful or not; raises the last
+        transport error if no attempt got a response.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await client.post(
+                    self.api_url,
+                    headers={
+                        "Authorization": f"Bearer {self.api_key}",
+                        "Content-Type": "application/json"
+                    },
+                    json=payload,
+                    timeout=self.timeout
+                )
+            except httpx.TransportError as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self._retry_delay(None, attempt)
+                print(f"GROQ API request failed ({type(e).__name__}: {str(e)}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+            if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                return response
+            delay = self._retry_delay(response, attempt)
+            print(f"GROQ API returned {response.status_code}, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    def _retry_delay(self, response: Optional[httpx.Response], attempt: int) -> float:
+        """Seconds to wait before retrying, honouring Retry-After in seconds"""
+        try:
+            delay = float(response.headers.get("Retry-After", "") if response is not None else "")
+        except ValueError:
+            delay = RETRY_BASE_DELAY * 2 ** attempt
+        return min(max(delay, 0.0), RETRY_MAX_DELAY)
+
+    def _describe_link(self, metadata: Optional[Dict[str, Any]]) -> str:
+        """Title and description of an unfurled link, for the prompt"""
+        if not metadata:
+            return ""
+        parts = []
+        if metadata.get("title"):
+            parts.append(f"Title: {metadata['title']}")
+        if metadata.get("description"):
+            parts.append(f"Description: {metadata['description']}")
+        if metadata.get("site_name"):
+            parts.append(f"Site: {metadata['site_name']}")
+        return f" ({'; '.join(parts)})" if parts else ""
+
     def _build_prompt(
         self,
         idea: Idea,
@@ -136,7 +210,8 @@ class AIService:
         code_clips: List[str],
         content_type: str,
         tone: str,
-        length: str
+        length: str,
+        themes: Optional[List[str]] = None
     ) -> str:
         """Build a detailed prompt for content generation"""
         
@@ -154,90 +229,76 @@ class AIService:
             idea_name = "Mock Idea"
             idea_description = "No description available"
         
-        prompt = f"""
+        parts = [f"""
 Create a {length} {tone} {content_type} based on the following idea and collection of research clips.
 
 IDEA: {idea_name}
 DESCRIPTION: {idea_description}
 
 COLLECTED RESEARCH CLIPS:
-"""
+"""]
         
-        # Add text clips
-        if text_clips:
-            prompt += "\n--- TEXT NOTES ---\n"
-            for i, clip in enumerate(text_clips, 1):
-                prompt += f"{i}. {clip}\n"
-        
-        # Add image descriptions
-        if image_clips:
-            prompt += "\n--- IMAGE REFERENCES ---\n"
-            for i, clip in enumerate(image_clips, 1):
-                prompt += f"{i}. {clip}\n"
-        
-        # Add links
-        if link_clips:
-            prompt += "\n--- LINKS AND RESOURCES ---\n"
-            for i, clip in enumerate(link_clips, 1):
-                prompt += f"{i}. {clip}\n"
-        
-        # Add videos
-        if video_clips:
-            prompt += "\n--- VIDEO REFERENCES ---\n"
-            for i, clip in enumerate(video_clips, 1):
-                prompt += f"{i}. {clip}\n"
-        
-        # Add code snippets
-        if code_clips:
-            prompt += "\n--- CODE SNIPPETS ---\n"
-            for i, clip in enumerate(code_clips, 1):
-                prompt += f"{i}. {clip}\n"
+        # Themes first, in the order the clips follow, then one numbered
+        # section per clip type. Parts are joined once at the end rather
+        # than growing one string, which copied the prompt on every clip.
+        sections = [
+            ("THEMES", themes or []),
+            ("TEXT NOTES", text_clips),
+            ("IMAGE REFERENCES", image_clips),
+            ("LINKS AND RESOURCES", link_clips),
+            ("VIDEO REFERENCES", video_clips),
+            ("CODE SNIPPETS", code_clips),
+        ]
+        for heading, items in sections:
+            if items:
+                parts.append(f"\n--- {heading} ---\n")
+                parts.extend(f"{i}. {item}\n" for i, item in enumerate(items, 1))
         
         # Add specific instructions based on content type
-        prompt += f"""
+        parts.append(f"""
 CONTENT SPECIFICATIONS:
 - Type: {content_type}
 - Tone: {tone}
 - Length: {length}
-"""
+""")
 
         if content_type == "article":
-            prompt += """
+            parts.append("""
 Create a well-structured article with:
 - An engaging headline
 - A compelling introduction
 - Clear section headings
 - A strong conclusion
 - Use markdown formatting for structure
-"""
+""")
         elif content_type == "script":
-            prompt += """
+            parts.append("""
 Create a video script with:
 - A hook to grab attention
 - Clear sections for introduction, main points, and conclusion
 - Visual and audio cues (marked as [VISUAL] or [AUDIO])
 - Conversational tone suitable for speaking
 - Use markdown formatting for structure
-"""
+""")
         elif content_type == "social":
-            prompt += """
+            parts.append("""
 Create a social media post that:
 - Is concise and engaging
 - Includes relevant hashtags
 - Has a clear call-to-action
 - Is optimized for sharing
 - Use markdown formatting if needed
-"""
+""")
         elif content_type == "outline":
-            prompt += """
+            parts.append("""
 Create a detailed content outline with:
 - Main sections and subsections
 - Key points for each section
 - Suggested references or examples
 - Use markdown formatting for hierarchical structure
-"""
+""")
         elif content_type == "email":
-            prompt += """
+            parts.append("""
 Create an email with:
 - A relevant subject line
 - Professional greeting
@@ -245,9 +306,9 @@ Create an email with:
 - Appropriate call-to-action
 - Professional signature
 - Use markdown formatting for structure
-"""
+""")
         elif content_type == "blog":
-            prompt += """
+            parts.append("""
 Create a blog post with:
 - An attention-grabbing title
 - Engaging introduction with a hook
@@ -256,11 +317,11 @@ Create a blog post with:
 - A conclusion with takeaways
 - Call-to-action for readers
 - Use markdown formatting for structure
-"""
+""")
         
-        prompt += "\nThe content should be formatted in Markdown."
+        parts.append("\nThe content should be formatted in Markdown.")
         
-        return prompt
+        return "".join(parts)
     
     def _generate_mock_content(
         self,
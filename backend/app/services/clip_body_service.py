@@ -0,0 +1,182 @@
+import hashlib
+import os
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import delete, exists, insert, select, update
+from sqlalchemy.orm import Session
+from app.models.db_models import Clip, ClipBody
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard is optional
+    zstandard = None
+
+# Environment variables
+CLIP_BODY_THRESHOLD = int(os.getenv("CLIP_BODY_THRESHOLD", "8192"))
+CLIP_PREVIEW_CHARS = int(os.getenv("CLIP_PREVIEW_CHARS", "1000"))
+
+ZSTD_LEVEL = 6
+ZLIB_LEVEL = 6
+# Unreferenced bodies are only deleted once no write has used them for this long
+RELEASE_GRACE = timedelta(minutes=10)
+# Seconds between full sweeps for bodies that were still in their grace period
+SWEEP_INTERVAL = 3600
+# Keep IN (...) lists well under SQLite's bound-parameter limit
+LOOKUP_CHUNK_SIZE = 500
+
+def compress(data: bytes) -> Tuple[str, bytes]:
+    """(codec, compressed bytes), using zstd when it is installed"""
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return "zlib", zlib.compress(data, ZLIB_LEVEL)
+
+def decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zlib":
+        return zlib.decompress(data)
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Clip body is zstd-compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"Unknown clip body codec: {codec}")
+
+def body_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+class ClipBodyService:
+    """
+    Out-of-row storage for large clip bodies.
+
+    A clip whose value is over CLIP_BODY_THRESHOLD bytes keeps only the
+    first CLIP_PREVIEW_CHARS characters in `clips.value`, plus body_hash
+    and body_size. The full text is compressed into clip_bodies, keyed by
+    its hash, so identical bodies are stored once. Listings, search and the
+    text models read the short preview; single-clip reads, sync, export and
+    content generation load the full body.
+
+    Bodies are shared, so deleting a clip only drops its body once nothing
+    references it and no write has reused it within the grace period. Bodies
+    still inside it are picked up by a sweep at most every SWEEP_INTERVAL.
+    """
+
+    def __init__(
+        self,
+        threshold: int = CLIP_BODY_THRESHOLD,
+        preview_chars: int = CLIP_PREVIEW_CHARS,
+        grace: timedelta = RELEASE_GRACE
+    ):
+        self.threshold = threshold
+        self.preview_chars = preview_chars
+        self.grace = grace
+        self._last_sweep = time.monotonic()
+
+    def store(self, db: Session, clips: List[Dict[str, Any]]) -> None:
+        """
+        Move the large values of clip dicts out of row: each dict's value is
+        replaced by its preview and body_hash/body_size are set (to None for
+        values kept inline, so updates clear them).
+        """
+        bodies = {}
+        for clip in clips:
+            data = (clip["value"] or "").encode("utf-8")
+            if len(data) <= self.threshold:
+                clip["body_hash"] = clip["body_size"] = None
+                continue
+            digest = body_hash(data)
+            bodies.setdefault(digest, data)
+            clip["value"] = clip["value"][:self.preview_chars]
+            clip["body_hash"] = digest
+            clip["body_size"] = len(data)
+        if not bodies:
+            return
+
+        now = datetime.utcnow()
+        known = set()
+        for chunk in _chunks(list(bodies)):
+            # Touch reused bodies first: the row locks and fresh last_used_at keep
+            # a concurrent release() from deleting them before this commits
+            db.execute(update(ClipBody).where(ClipBody.hash.in_(chunk)).values(last_used_at=now))
+            known.update(db.execute(select(ClipBody.hash).where(ClipBody.hash.in_(chunk))).scalars())
+        new = []
+        for digest, data in bodies.items():
+            if digest not in known:
+                codec, compressed = compress(data)
+                new.append({"hash": digest, "codec": codec, "size": len(data),
+                            "data": compressed, "last_used_at": now})
+        if new:
+            db.execute(insert(ClipBody), new)
+
+    def store_clip(self, db: Session, clip: Clip, value: str) -> None:
+        """Set a single ORM clip's value from its full text (create/update paths)"""
+        row = {"value": value}
+        self.store(db, [row])
+        clip.value, clip.body_hash, clip.body_size = row["value"], row["body_hash"], row["body_size"]
+
+    def load(self, db: Session, hashes: Iterable[str]) -> Dict[str, str]:
+        """Full text for each body hash that exists"""
+        bodies = {}
+        for chunk in _chunks(list(set(hashes))):
+            rows = db.execute(
+                select(ClipBody.hash, ClipBody.codec, ClipBody.data).where(ClipBody.hash.in_(chunk))
+            )
+            for digest, codec, data in rows:
+                bodies[digest] = decompress(codec, data).decode("utf-8")
+        return bodies
+
+    def full_value(self, db: Session, clip: Any) -> str:
+        """A clip's full text; falls back to the preview if the body is missing"""
+        if not clip.body_hash:
+            return clip.value
+        return self.load(db, [clip.body_hash]).get(clip.body_hash, clip.value)
+
+    def hydrate(self, db: Session, clips: List[Dict[str, Any]]) -> None:
+        """Replace the previews in clip dicts carrying a body_hash with their full text"""
+        bodies = self.load(db, [clip["body_hash"] for clip in clips if clip.get("body_hash")])
+        for clip in clips:
+            if clip.get("body_hash") in bodies:
+                clip["value"] = bodies[clip["body_hash"]]
+
+    def release(self, db: Session, hashes: Iterable[Optional[str]]) -> int:
+        """
+        Delete the given bodies if no clip references them any more. Call
+        after the clip rows are deleted or updated (and flushed).
+        """
+        hashes = [digest for digest in set(hashes) if digest]
+        if time.monotonic() - self._last_sweep > SWEEP_INTERVAL:
+            return self.collect_garbage(db)
+        cutoff = datetime.utcnow() - self.grace
+        deleted = 0
+        for chunk in _chunks(hashes):
+            deleted += db.execute(
+                delete(ClipBody).where(
+                    ClipBody.hash.in_(chunk),
+                    ClipBody.last_used_at < cutoff,
+                    ~exists().where(Clip.body_hash == ClipBody.hash)
+                )
+            ).rowcount
+        return deleted
+
+    def collect_garbage(self, db: Session) -> int:
+        """Delete every unreferenced body, including ones release() had to skip"""
+        self._last_sweep = time.monotonic()
+        return db.execute(
+            delete(ClipBody).where(
+                ClipBody.last_used_at < datetime.utcnow() - self.grace,
+                ~exists().where(Clip.body_hash == ClipBody.hash)
+            )
+        ).rowcount
+
+def _chunks(items: List[str], size: int = LOOKUP_CHUNK_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+# Create singleton instance
+clip_body_service = None
+
+def get_clip_body_service():
+    """Get or create clip body service instance"""
+    global clip_body_service
+    if clip_body_service is None:
+        clip_body_service = ClipBodyService()
+    return clip_body_service
@@ -0,0 +1,117 @@
+import math
+from collections import Counter
+from typing import Any, Dict, List
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from app.core.cache import get_cache, user_tag
+from app.db.vector_index import kmeans
+from app.models.db_models import Clip
+from app.services.embedding_service import get_embedding_service
+from app.services.tag_suggestion_service import terms
+from app.services.unfurl_service import get_unfurl_service, UNFURL_TYPES
+
+MAX_CLUSTERS = 12
+# Ideas smaller than this are returned as a single group
+MIN_CLIPS_TO_CLUSTER = 4
+LABEL_TERMS = 3
+KMEANS_ITERATIONS = 20
+KMEANS_RESTARTS = 8
+
+class ClusterService:
+    """
+    Groups an idea's clips into themes with spherical k-means over their
+    embeddings (see EmbeddingService), labelled by each group's most
+    distinctive terms.
+
+    Results are cached (app.core.cache, shared by the workers) per idea,
+    keyed by the idea's clip count and highest clip version. Every clip
+    write stamps a new version and every delete changes the count, so clip
+    changes miss the cache while other ideas' clusters stay warm.
+    """
+
+    def clusters(self, db: Session, user_id: str, idea_id: str) -> List[Dict[str, Any]]:
+        count, max_version = db.execute(
+            select(func.count(Clip.id), func.max(Clip.version)).where(Clip.idea_id == idea_id)
+        ).one()
+        return get_cache("clusters").get_or_set(
+            f"{idea_id}:{count}:{max_version or 0}",
+            lambda: self._compute(db, user_id, idea_id),
+            tags=(user_tag(user_id),)
+        )
+
+    def _compute(self, db: Session, user_id: str, idea_id: str) -> List[Dict[str, Any]]:
+        rows = db.execute(
+            select(Clip.id, Clip.type, Clip.value)
+            .where(Clip.idea_id == idea_id)
+            .order_by(Clip.created_at, Clip.id)
+        ).all()
+        if not rows:
+            return []
+        embedding = get_embedding_service()
+        previews = get_unfurl_service().previews(db, [row.value for row in rows if row.type in UNFURL_TYPES])
+        texts = [embedding.clip_text(row.type, row.value, previews.get(row.value)) for row in rows]
+        ids = [row.id for row in rows]
+        vectors = embedding.vectors(user_id, ids, texts)
+        return self.group(ids, texts, vectors)
+
+    def group(self, ids: List[str], texts: List[str], vectors: np.ndarray) -> List[Dict[str, Any]]:
+        """Cluster unit vectors; clips without any features form their own group"""
+        has_features = np.flatnonzero(np.abs(vectors).sum(axis=1) > 0)
+        labels = np.full(len(ids), -1, dtype=np.int32)
+        centroids = np.zeros((0, vectors.shape[1]), dtype=np.float32)
+        if len(has_features) >= MIN_CLIPS_TO_CLUSTER:
+            k = int(np.clip(round(math.sqrt(len(has_features) / 2)), 2, MAX_CLUSTERS))
+            points = vectors[has_features]
+            # Best of a few seeded runs, by total similarity to the assigned centroid
+            centroids, found = max(
+                (kmeans(points, k, iterations=KMEANS_ITERATIONS, seed=seed) for seed in range(KMEANS_RESTARTS)),
+                key=lambda run: float((points * run[0][run[1]]).sum())
+            )
+            labels[has_features] = found
+        elif len(has_features):
+            labels[has_features] = 0
+            centroids = vectors[has_features].mean(axis=0, keepdims=True)
+
+        members: Dict[int, List[int]] = {}
+        for i, label in enumerate(labels.tolist()):
+            members.setdefault(label, []).append(i)
+        term_counts = {
+            label: Counter(term for i in group for term in terms(texts[i]))
+            for label, group in members.items()
+        }
+        # A term used by every group describes none of them
+        spread = Counter(term for counts in term_counts.values() for term in counts)
+
+        clusters = []
+        for label, group in members.items():
+            if label >= 0:
+                # Most central clips first
+                group.sort(key=lambda i: -float(vectors[i] @ centroids[label]))
+            distinctive = sorted(
+                term_counts[label].items(),
+                key=lambda item: (-item[1] * math.log(1 + len(members) / spread[item[0]]), item[0])
+            )
+            label_terms = [term for term, _ in distinctive[:LABEL_TERMS]]
+            clusters.append({
+                "label": ", ".join(label_terms) if label >= 0 and label_terms else "Other",
+                "terms": label_terms,
+                "size": len(group),
+                "clip_ids": [ids[i] for i in group],
+                "unsorted": label < 0,
+            })
+        # Largest themes first, featureless clips last
+        clusters.sort(key=lambda c: (c.pop("unsorted"), -c["size"], c["clip_ids"][0]))
+        for n, cluster in enumerate(clusters):
+            cluster["id"] = n
+        return clusters
+
+# Create singleton instance
+cluster_service = None
+
+def get_cluster_service():
+    """Get or create clip cluster service instance"""
+    global cluster_service
+    if cluster_service is None:
+        cluster_service = ClusterService()
+    return cluster_service
@@ -0,0 +1,165 @@
+import os
+from typing import Any, Dict, Iterable, List, Optional
+import numpy as np
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+from app.models.db_models import Clip, ClipLshBucket
+from app.utils import minhash
+from app.utils.minhash import DEDUPE_TYPES
+
+# Environment variables
+DEDUPE_THRESHOLD = float(os.getenv("DEDUPE_THRESHOLD", "0.8"))
+
+# Keep IN (...) lists well under SQLite's bound-parameter limit
+LOOKUP_CHUNK_SIZE = 500
+
+class DedupeService:
+    """
+    Near-duplicate detection for text and code clips.
+
+    Signatures are computed when clips are written and stored on the clip,
+    with one clip_lsh_buckets row per band. Finding duplicates in an idea
+    reads only the buckets shared by two or more clips, then confirms each
+    candidate pair by estimated Jaccard similarity.
+    """
+
+    def __init__(self, threshold: float = DEDUPE_THRESHOLD):
+        self.threshold = threshold
+
+    def signatures(self, clips: List[Dict[str, Any]]) -> List[Optional[bytes]]:
+        """Stored signature for each clip dict (type, value), or None"""
+        sigs = minhash.signatures([(clip["type"], clip["value"]) for clip in clips])
+        return [minhash.to_bytes(sig) if sig is not None else None for sig in sigs]
+
+    def index(self, db: Session, clips: List[Dict[str, Any]]) -> None:
+        """
+        Replace the LSH buckets of the given clips. Each dict needs id,
+        idea_id and minhash (None removes the clip from the index).
+        """
+        for chunk in _chunks([clip["id"] for clip in clips]):
+            db.execute(delete(ClipLshBucket).where(ClipLshBucket.clip_id.in_(chunk)))
+        signed = [clip for clip in clips if clip.get("minhash")]
+        if not signed:
+            return
+        keys = minhash.band_keys(np.stack([minhash.from_bytes(clip["minhash"]) for clip in signed]))
+        db.execute(insert(ClipLshBucket), [
+            {"clip_id": clip["id"], "band": band, "idea_id": clip["idea_id"], "bucket": int(key)}
+            for clip, row in zip(signed, keys.tolist())
+            for band, key in enumerate(row)
+        ])
+
+    def index_clip(self, db: Session, clip: Clip, value: Optional[str] = None) -> None:
+        """
+        Sign and index a single ORM clip (create/update paths). Pass the full
+        text as `value` when clip.value only holds a preview.
+        """
+        value = clip.value if value is None else value
+        row = {"id": clip.id, "idea_id": clip.idea_id, "type": clip.type, "value": value}
+        clip.minhash = row["minhash"] = self.signatures([row])[0]
+        self.index(db, [row])
+
+    def remove(self, db: Session, clip_ids: Iterable[str]) -> None:
+        for chunk in _chunks(list(clip_ids)):
+            db.execute(delete(ClipLshBucket).where(ClipLshBucket.clip_id.in_(chunk)))
+
+    def duplicate_groups(self, db: Session, idea_id: str) -> List[Dict[str, Any]]:
+        """
+        Groups of near-duplicate clips in an idea, oldest clip first. Each
+        group reports the lowest similarity of a member to the kept clip.
+        """
+        shared = (
+            select(ClipLshBucket.bucket)
+            .where(ClipLshBucket.idea_id == idea_id)
+            .group_by(ClipLshBucket.bucket)
+            .having(func.count() > 1)
+        )
+        rows = db.execute(
+            select(ClipLshBucket.clip_id, ClipLshBucket.bucket, Clip.created_at, Clip.minhash)
+            .join(Clip, Clip.id == ClipLshBucket.clip_id)
+            .where(
+                ClipLshBucket.idea_id == idea_id,
+                Clip.idea_id == idea_id,
+                ClipLshBucket.bucket.in_(shared)
+            )
+        ).all()
+        if not rows:
+            return []
+
+        clips = {}
+        for clip_id, _, created_at, signature in rows:
+            clips.setdefault(clip_id, (created_at, signature))
+        # Oldest first, so the clip kept in each group is the original
+        ids = sorted(clips, key=lambda cid: (clips[cid][0] is None, clips[cid][0] or 0, cid))
+        position = {clip_id: i for i, clip_id in enumerate(ids)}
+        sigs = np.stack([minhash.from_bytes(clips[clip_id][1]) for clip_id in ids])
+
+        pairs = minhash.candidate_pairs(
+            np.array([position[row.clip_id] for row in rows]),
+            np.array([row.bucket for row in rows], dtype=np.int64)
+        )
+        scores = minhash.similarity(sigs[pairs[:, 0]], sigs[pairs[:, 1]])
+        keep = scores >= self.threshold
+        return self._groups(ids, pairs[keep], scores[keep], sigs)
+
+    def _groups(self, ids, pairs, scores, sigs) -> List[Dict[str, Any]]:
+        parent = list(range(len(ids)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for a, b in pairs.tolist():
+            ra, rb = find(a), find(b)
+            if ra != rb:
+                # The lower position is older, and becomes the root
+                parent[max(ra, rb)] = min(ra, rb)
+
+        members: Dict[int, List[int]] = {}
+        for i in range(len(ids)):
+            members.setdefault(find(i), []).append(i)
+        groups = []
+        for root, group in sorted(members.items()):
+            if len(group) < 2:
+                continue
+            others = np.array(group[1:])
+            groups.append({
+                "keep": ids[root],
+                "duplicates": [ids[i] for i in group[1:]],
+                "similarity": round(float(minhash.similarity(sigs[others], sigs[root]).min()), 3),
+            })
+        return groups
+
+    def drop_duplicates(self, db: Session, idea_id: str, clips: List[Any]) -> List[Any]:
+        """
+        Keep the first of the given clips from each duplicate group, so a
+        selection that leaves out the original still keeps one copy.
+        """
+        group_of = {}
+        for n, group in enumerate(self.duplicate_groups(db, idea_id)):
+            for clip_id in [group["keep"], *group["duplicates"]]:
+                group_of[clip_id] = n
+        kept, seen = [], set()
+        for clip in clips:
+            group = group_of.get(clip.id)
+            if group is not None:
+                if group in seen:
+                    continue
+                seen.add(group)
+            kept.append(clip)
+        return kept
+
+def _chunks(items, size=LOOKUP_CHUNK_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+# Create singleton instance
+dedupe_service = None
+
+def get_dedupe_service():
+    """Get or create dedupe service instance"""
+    global dedupe_service
+    if dedupe_service is None:
+        dedupe_service = DedupeService()
+    return dedupe_service
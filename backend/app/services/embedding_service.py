@@ -0,0 +1,211 @@
+import asyncio
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import select
+from app.db.session import SessionLocal
+from app.db.vector_index import VectorIndex
+from app.models.db_models import Clip, Idea
+from app.services.unfurl_service import get_unfurl_service, UNFURL_TYPES
+from app.utils.text_embedding import load_embedder
+
+# Environment variables
+EMBEDDING_INDEX_DIR = os.getenv("EMBEDDING_INDEX_DIR", os.path.join(".cache", "embeddings"))
+EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", "2"))
+EMBEDDING_NPROBE = int(os.getenv("EMBEDDING_NPROBE", "8"))
+
+# Indexes kept open at once; least recently used ones are closed
+MAX_OPEN_INDEXES = 64
+EMBED_BATCH_SIZE = 256
+# Keep IN (...) lists well under SQLite's bound-parameter limit
+LOOKUP_CHUNK_SIZE = 500
+
+class EmbeddingService:
+    """
+    Embeds clips after they are written and answers nearest-neighbour
+    queries from a per-user VectorIndex.
+
+    Embedding runs in a small thread pool fed by background tasks, so
+    writes never wait on it. Link and video clips are embedded with their
+    cached page title and description when available.
+    """
+
+    def __init__(
+        self,
+        index_dir: str = EMBEDDING_INDEX_DIR,
+        workers: int = EMBEDDING_WORKERS,
+        nprobe: int = EMBEDDING_NPROBE,
+        embedder=None,
+        session_factory=SessionLocal
+    ):
+        self.index_dir = index_dir
+        self.workers = workers
+        self.nprobe = nprobe
+        self.session_factory = session_factory
+        self._embedder = embedder
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._indexes: "OrderedDict[str, VectorIndex]" = OrderedDict()
+        self._user_locks: Dict[str, Lock] = {}
+        self._lock = Lock()
+
+    @property
+    def embedder(self):
+        with self._lock:
+            if self._embedder is None:
+                self._embedder = load_embedder()
+            return self._embedder
+
+    def _user_lock(self, user_id: str) -> Lock:
+        with self._lock:
+            return self._user_locks.setdefault(user_id, Lock())
+
+    def _index(self, user_id: str) -> VectorIndex:
+        """Open (or create) a user's index; call with the user's lock held"""
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is not None:
+                self._indexes.move_to_end(user_id)
+                return index
+        embedder = self.embedder
+        index = VectorIndex(os.path.join(self.index_dir, embedder.name, user_id), embedder.dim, self.nprobe)
+        with self._lock:
+            self._indexes[user_id] = index
+            self._evict()
+        return index
+
+    def _evict(self) -> None:
+        """Close least recently used indexes beyond MAX_OPEN_INDEXES; call with self._lock held"""
+        for user_id in list(self._indexes):
+            if len(self._indexes) <= MAX_OPEN_INDEXES:
+                return
+            # An index another thread is using stays open until a later eviction
+            lock = self._user_locks.get(user_id)
+            if lock is None or not lock.acquire(blocking=False):
+                continue
+            try:
+                self._indexes.pop(user_id).close()
+            finally:
+                lock.release()
+
+    def clip_text(self, type: str, value: str, preview: Optional[Dict] = None) -> str:
+        if preview and type in UNFURL_TYPES:
+            parts = [preview.get("title"), preview.get("description"), preview.get("site_name"), value]
+            return "\n".join(part for part in parts if part)
+        return value or ""
+
+    def embed(self, user_id: str, texts: List[str]) -> np.ndarray:
+        embedder = self.embedder
+        idf = None
+        if embedder.uses_idf:
+            with self._user_lock(user_id):
+                index = self._index(user_id)
+                if len(index):
+                    idf = index.idf()
+        return embedder.embed(texts, idf=idf)
+
+    def refresh_clips(self, clip_ids: List[str]) -> int:
+        """(Re-)embed the given clips into their owners' indexes"""
+        if not clip_ids:
+            return 0
+        db = self.session_factory()
+        try:
+            rows = []
+            for i in range(0, len(clip_ids), LOOKUP_CHUNK_SIZE):
+                rows += db.execute(
+                    select(Clip.id, Clip.type, Clip.value, Idea.user_id)
+                    .join(Idea, Idea.id == Clip.idea_id)
+                    .where(Clip.id.in_(clip_ids[i:i + LOOKUP_CHUNK_SIZE]))
+                ).all()
+            previews = get_unfurl_service().previews(
+                db, [row.value for row in rows if row.type in UNFURL_TYPES]
+            )
+        except Exception as e:
+            print(f"Error loading clips to embed: {str(e)}")
+            return 0
+        finally:
+            db.close()
+
+        by_user: Dict[str, List] = {}
+        for row in rows:
+            if row.user_id:
+                by_user.setdefault(row.user_id, []).append(row)
+        for user_id, user_rows in by_user.items():
+            for i in range(0, len(user_rows), EMBED_BATCH_SIZE):
+                batch = user_rows[i:i + EMBED_BATCH_SIZE]
+                texts = [self.clip_text(row.type, row.value, previews.get(row.value)) for row in batch]
+                vectors = self.embed(user_id, texts)
+                with self._user_lock(user_id):
+                    self._index(user_id).add([row.id for row in batch], vectors)
+        return len(rows)
+
+    def remove(self, user_id: str, clip_ids: Iterable[str]) -> None:
+        with self._user_lock(user_id):
+            self._index(user_id).remove(list(clip_ids))
+
+    def vectors(self, user_id: str, ids: List[str], texts: List[str]) -> np.ndarray:
+        """Indexed vectors for the given clips, embedding any not indexed yet"""
+        with self._user_lock(user_id):
+            index = self._index(user_id)
+            stored = [index.get(clip_id) for clip_id in ids]
+        missing = [i for i, vector in enumerate(stored) if vector is None]
+        if missing:
+            embedded = self.embed(user_id, [texts[i] for i in missing])
+            for i, vector in zip(missing, embedded):
+                stored[i] = vector
+        if not stored:
+            return np.zeros((0, self.embedder.dim), dtype=np.float32)
+        return np.stack(stored).astype(np.float32)
+
+    def search(
+        self, user_id: str, query: str, k: int = 10, within: Optional[Iterable[str]] = None
+    ) -> List[Tuple[str, float]]:
+        """Nearest clips to a free-text query, among `within` when given"""
+        vector = self.embed(user_id, [query])[0]
+        if not vector.any():
+            return []
+        with self._user_lock(user_id):
+            return self._index(user_id).search(vector, k, within=within)
+
+    def related(self, user_id: str, clip_id: str, fallback_text: str, k: int = 10) -> List[Tuple[str, float]]:
+        """Nearest clips to a clip, embedding it on the fly if it is not indexed yet"""
+        with self._user_lock(user_id):
+            vector = self._index(user_id).get(clip_id)
+        if vector is None:
+            vector = self.embed(user_id, [fallback_text])[0]
+        if not vector.any():
+            return []
+        with self._user_lock(user_id):
+            return self._index(user_id).search(vector, k, exclude=[clip_id])
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="embed")
+            return self._pool
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+# Create singleton instance
+embedding_service = None
+
+def get_embedding_service():
+    """Get or create embedding service instance"""
+    global embedding_service
+    if embedding_service is None:
+        embedding_service = EmbeddingService()
+    return embedding_service
+
+async def embed_clips(clip_ids: List[str]) -> None:
+    """Background task entry point used by the clip write paths"""
+    service = get_embedding_service()
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(service._executor(), service.refresh_clips, clip_ids)
+    except Exception as e:
+        print(f"Error embedding clips: {str(e)}")
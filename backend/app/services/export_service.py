@@ -0,0 +1,289 @@
+import re
+import zipfile
+from datetime import datetime
+from itertools import chain
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.core.responses import dumps
+from app.db.listing import user_clip_ids
+from app.db.session import SessionLocal
+from app.services.clip_body_service import get_clip_body_service
+from app.models.db_models import Clip, Idea, Tag, clip_tags
+
+EXPORT_FORMATS = {
+    "jsonl": ("application/x-ndjson", "jsonl"),
+    "markdown": ("text/markdown; charset=utf-8", "md"),
+    "zip": ("application/zip", "zip"),
+}
+
+# Rows fetched per round trip from the server-side cursor
+BATCH_SIZE = 2000
+# Ideas whose clips are fetched (and sorted) per query
+IDEA_CHUNK_SIZE = 50
+# Clips buffered per lookup of their out-of-row bodies
+BODY_BATCH_SIZE = 200
+# Output is handed to the response in chunks of about this size
+CHUNK_SIZE = 64 * 1024
+
+EXPORT_CLIP_COLUMNS = (
+    Clip.id, Clip.idea_id, Clip.type, Clip.value, Clip.status, Clip.created_at, Clip.updated_at,
+)
+
+def _slug(name: str) -> str:
+    return re.sub(r"[^\w]+", "-", (name or "").lower()).strip("-")[:60] or "idea"
+
+def idea_filename(idea: Dict[str, Any]) -> str:
+    """
+    Stable file name for an idea inside the ZIP export. The whole id is
+    used: UUIDv7 ids made within about a minute share their first eight
+    characters, and collector ids need not differ there at all.
+    """
+    return f"{_slug(idea['name'])}-{re.sub(r'[^0-9A-Za-z_.-]', '_', idea['id'])}.md"
+
+def _unique(name: str, taken: set) -> str:
+    """name, or name with a counter when making ids file-safe made it collide"""
+    candidate, n = name, 1
+    while candidate in taken:
+        n += 1
+        candidate = f"{name[:-3]}-{n}.md"
+    taken.add(candidate)
+    return candidate
+
+def idea_markdown(idea: Dict[str, Any]) -> str:
+    lines = [f"# {idea['name']}", ""]
+    if idea.get("category"):
+        lines += [f"_Category: {idea['category']}_", ""]
+    return "\n".join(lines) + "\n"
+
+def clip_markdown(clip: Dict[str, Any]) -> str:
+    created = clip["created_at"].strftime("%Y-%m-%d %H:%M") if clip["created_at"] else ""
+    heading = f"## {clip['type'].title()}" + (f" · {created}" if created else "")
+    lines = [heading, ""]
+    if clip["tags"]:
+        lines += ["Tags: " + ", ".join(f"`{tag}`" for tag in clip["tags"]), ""]
+
+    value = clip["value"] or ""
+    if clip["type"] == "code":
+        # Fence longer than any run of backticks inside the snippet
+        longest = max((len(run) for run in re.findall(r"`+", value)), default=0)
+        fence = "`" * max(3, longest + 1)
+        lines += [fence, value, fence]
+    elif clip["type"] == "image":
+        lines.append(f"![]({value})")
+    elif clip["type"] in ("link", "video"):
+        lines.append(f"<{value}>")
+    else:
+        lines.append(value)
+    return "\n".join(lines) + "\n\n"
+
+class _ChunkSink:
+    """
+    Write-only file object for ZipFile. It has no tell() or seek(), so
+    ZipFile writes local headers with data descriptors and never goes back,
+    and whatever it has written so far can be drained and sent.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self.size = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        self.size = 0
+        return data
+
+class ExportService:
+    """
+    Streams a user's ideas, clips and tags as JSONL, one Markdown document,
+    or a ZIP with one Markdown file per idea.
+
+    Clips are read through server-side cursors (yield_per), a few ideas at
+    a time, and written out as they arrive, so memory does not grow with
+    the number of clips and the first bytes go out before the last rows
+    are read. Only the user's ideas (names and categories) are held in
+    memory.
+
+    Each export opens its own session, since the response outlives the
+    request's dependencies.
+    """
+
+    def __init__(self, session_factory=SessionLocal, batch_size: int = BATCH_SIZE):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+
+    def _ideas(self, db: Session, user_id: str) -> Dict[str, Dict[str, Any]]:
+        result = db.execute(
+            select(Idea.id, Idea.name, Idea.category, Idea.updated_at)
+            .where(Idea.user_id == user_id)
+            .order_by(Idea.name, Idea.id)
+            .execution_options(yield_per=self.batch_size)
+        )
+        return {row.id: row._asdict() for row in result}
+
+    def _tags(self, db: Session, user_id: str) -> Iterator[Dict[str, Any]]:
+        result = db.execute(
+            select(Tag.id, Tag.name)
+            .where(Tag.id.in_(
+                select(clip_tags.c.tag_id)
+                .where(clip_tags.c.clip_id.in_(user_clip_ids(user_id)))
+            ))
+            .order_by(Tag.name)
+            .execution_options(yield_per=self.batch_size)
+        )
+        for row in result:
+            yield row._asdict()
+
+    def _clips(self, db: Session, idea_ids: List[str]) -> Iterator[Dict[str, Any]]:
+        """Clips of the given ideas with their full text, loading large bodies in batches"""
+        batch = []
+        for clip in self._clip_rows(db, idea_ids):
+            batch.append(clip)
+            if len(batch) == BODY_BATCH_SIZE:
+                yield from self._hydrated(db, batch)
+                batch = []
+        yield from self._hydrated(db, batch)
+
+    def _hydrated(self, db: Session, clips: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        get_clip_body_service().hydrate(db, clips)
+        for clip in clips:
+            del clip["body_hash"]
+            yield clip
+
+    def _clip_rows(self, db: Session, idea_ids: List[str]) -> Iterator[Dict[str, Any]]:
+        """
+        Stored clips of the given ideas, each with its tag names. Ideas are read
+        IDEA_CHUNK_SIZE at a time so the database only ever sorts a few
+        ideas' clips, and the first rows arrive without a full-table sort.
+        """
+        for start in range(0, len(idea_ids), IDEA_CHUNK_SIZE):
+            result = db.execute(
+                select(*EXPORT_CLIP_COLUMNS, Clip.body_hash, Tag.name.label("tag"))
+                .outerjoin(clip_tags, clip_tags.c.clip_id == Clip.id)
+                .outerjoin(Tag, Tag.id == clip_tags.c.tag_id)
+                .where(Clip.idea_id.in_(idea_ids[start:start + IDEA_CHUNK_SIZE]))
+                .order_by(Clip.idea_id, Clip.created_at, Clip.id, Tag.name)
+                .execution_options(yield_per=self.batch_size)
+            )
+            clip: Optional[Dict[str, Any]] = None
+            for row in result:
+                if clip is None or row.id != clip["id"]:
+                    if clip is not None:
+                        yield clip
+                    clip = {column.key: getattr(row, column.key) for column in EXPORT_CLIP_COLUMNS}
+                    clip["body_hash"] = row.body_hash
+                    clip["tags"] = []
+                if row.tag is not None:
+                    clip["tags"].append(row.tag)
+            if clip is not None:
+                yield clip
+
+    def _documents(self, db: Session, user_id: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Yields ("idea", idea) followed by ("clip", clip) for each of its
+        clips, for every idea.
+        """
+        ideas = self._ideas(db, user_id)
+        ids = list(ideas)
+        for start in range(0, len(ids), IDEA_CHUNK_SIZE):
+            chunk = ids[start:start + IDEA_CHUNK_SIZE]
+            current = None
+            for clip in self._clips(db, chunk):
+                if clip["idea_id"] != current:
+                    current = clip["idea_id"]
+                    yield "idea", ideas.pop(current)
+                yield "clip", clip
+            # Ideas without clips
+            for idea_id in chunk:
+                if idea_id in ideas:
+                    yield "idea", ideas.pop(idea_id)
+
+    def jsonl(self, user_id: str) -> Iterator[bytes]:
+        """One JSON object per line, each with a "kind" of idea, tag or clip"""
+        db = self.session_factory()
+        try:
+            ideas = self._ideas(db, user_id)
+            records = chain(
+                (("idea", idea) for idea in ideas.values()),
+                (("tag", tag) for tag in self._tags(db, user_id)),
+                (("clip", clip) for clip in self._clips(db, list(ideas))),
+            )
+            buffer = bytearray()
+            for kind, record in records:
+                buffer += dumps({"kind": kind, **record})
+                buffer += b"\n"
+                if len(buffer) >= CHUNK_SIZE:
+                    yield bytes(buffer)
+                    buffer.clear()
+            if buffer:
+                yield bytes(buffer)
+        finally:
+            db.close()
+
+    def markdown(self, user_id: str) -> Iterator[bytes]:
+        """Every idea and its clips in a single Markdown document"""
+        db = self.session_factory()
+        try:
+            buffer = []
+            size = 0
+            for kind, record in self._documents(db, user_id):
+                text = idea_markdown(record) if kind == "idea" else clip_markdown(record)
+                buffer.append(text)
+                size += len(text)
+                if size >= CHUNK_SIZE:
+                    yield "".join(buffer).encode("utf-8")
+                    buffer, size = [], 0
+            if buffer:
+                yield "".join(buffer).encode("utf-8")
+        finally:
+            db.close()
+
+    def zip(self, user_id: str) -> Iterator[bytes]:
+        """A ZIP archive with one Markdown file per idea, written as it streams"""
+        db = self.session_factory()
+        sink = _ChunkSink()
+        try:
+            with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+                entry, names = None, set()
+                for kind, record in self._documents(db, user_id):
+                    if kind == "idea":
+                        if entry is not None:
+                            entry.close()
+                            # Send each finished file, however small it compressed to
+                            yield sink.drain()
+                        info = zipfile.ZipInfo(_unique(idea_filename(record), names), _zip_time(record["updated_at"]))
+                        info.compress_type = zipfile.ZIP_DEFLATED
+                        entry = archive.open(info, "w", force_zip64=True)
+                        entry.write(idea_markdown(record).encode("utf-8"))
+                    else:
+                        entry.write(clip_markdown(record).encode("utf-8"))
+                    if sink.size >= CHUNK_SIZE:
+                        yield sink.drain()
+                if entry is not None:
+                    entry.close()
+            yield sink.drain()
+        finally:
+            db.close()
+
+def _zip_time(value: Optional[datetime]):
+    value = value if value and value.year >= 1980 else datetime(1980, 1, 1)
+    return value.timetuple()[:6]
+
+# Create singleton instance
+export_service = None
+
+def get_export_service():
+    """Get or create export service instance"""
+    global export_service
+    if export_service is None:
+        export_service = ExportService()
+    return export_service
@@ -0,0 +1,103 @@
+from typing import Any, Dict, List, Tuple
+from sqlalchemy import func, literal, null, select, union_all, String
+from sqlalchemy.orm import Session
+from app.core.cache import get_cache, user_tag
+from app.models.db_models import Clip, Idea, Tag, User, clip_tags
+
+TOP_TAGS = 5
+
+class IdeaSummaryService:
+    """
+    Per-idea clip counts, type breakdowns, last activity and top tags.
+
+    Summaries are cached (app.core.cache, shared by the workers) per user
+    and data_version. Every write bumps the user's version, so a write
+    naturally misses the cache, and the user's invalidation drops the old
+    entries.
+    """
+
+    def get_summaries(self, db: Session, user: User) -> List[Dict[str, Any]]:
+        return get_cache("summaries").get_or_set(
+            f"{user.id}:{user.data_version or 0}",
+            lambda: self._compute(db, user.id),
+            tags=(user_tag(user.id),)
+        )
+
+    def _compute(self, db: Session, user_id: str) -> List[Dict[str, Any]]:
+        # Both groupings go out as one statement: per (idea, type) counts and
+        # last activity, and per (idea, tag) counts.
+        by_type = (
+            select(
+                Idea.id.label("idea_id"),
+                Idea.name.label("name"),
+                Idea.category.label("category"),
+                literal("type").label("kind"),
+                Clip.type.label("key"),
+                func.count(Clip.id).label("n"),
+                func.max(Clip.created_at).label("last_created_at"),
+            )
+            .select_from(Idea)
+            .outerjoin(Clip, Clip.idea_id == Idea.id)
+            .where(Idea.user_id == user_id)
+            .group_by(Idea.id, Idea.name, Idea.category, Clip.type)
+        )
+        by_tag = (
+            select(
+                Clip.idea_id,
+                null().cast(String),
+                null().cast(String),
+                literal("tag"),
+                Tag.name,
+                func.count(),
+                null().cast(Clip.created_at.type),
+            )
+            .select_from(Clip)
+            .join(Idea, Idea.id == Clip.idea_id)
+            .join(clip_tags, clip_tags.c.clip_id == Clip.id)
+            .join(Tag, Tag.id == clip_tags.c.tag_id)
+            .where(Idea.user_id == user_id)
+            .group_by(Clip.idea_id, Tag.name)
+        )
+
+        summaries: Dict[str, Dict[str, Any]] = {}
+        tag_counts: Dict[str, List[Tuple[int, str]]] = {}
+        for row in db.execute(union_all(by_type, by_tag)):
+            if row.kind == "tag":
+                tag_counts.setdefault(row.idea_id, []).append((row.n, row.key))
+                continue
+            summary = summaries.setdefault(row.idea_id, {
+                "idea_id": row.idea_id,
+                "name": row.name,
+                "category": row.category,
+                "clip_count": 0,
+                "clips_by_type": {},
+                "last_clip_at": None,
+                "top_tags": [],
+            })
+            if row.key is None:
+                # Idea without clips (outer join)
+                continue
+            summary["clip_count"] += row.n
+            summary["clips_by_type"][row.key] = row.n
+            if row.last_created_at and (
+                summary["last_clip_at"] is None or row.last_created_at > summary["last_clip_at"]
+            ):
+                summary["last_clip_at"] = row.last_created_at
+
+        for idea_id, counts in tag_counts.items():
+            if idea_id in summaries:
+                counts.sort(key=lambda item: (-item[0], item[1]))
+                summaries[idea_id]["top_tags"] = [
+                    {"name": name, "count": n} for n, name in counts[:TOP_TAGS]
+                ]
+        return list(summaries.values())
+
+# Create singleton instance
+summary_service = None
+
+def get_summary_service():
+    """Get or create idea summary service instance"""
+    global summary_service
+    if summary_service is None:
+        summary_service = IdeaSummaryService()
+    return summary_service
@@ -0,0 +1,159 @@
+import heapq
+from typing import List, Dict, Any, Optional, Tuple
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session
+from app.models.db_models import Idea, Clip, Tag, Tombstone, clip_tags
+from app.services.clip_body_service import get_clip_body_service
+
+# Changes are ordered by (version, kind, id); the rank breaks ties between
+# kinds written in the same version so the cursor is a total order.
+KIND_RANK = {"idea": 0, "clip": 1, "deleted": 2}
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+
+Cursor = Tuple[int, int, str]
+
+# Before any row: versions start at 0 for rows that predate delta sync
+START_CURSOR: Cursor = (-1, 0, "")
+
+def encode_cursor(cursor: Cursor) -> str:
+    version, rank, entity_id = cursor
+    return f"{version}:{rank}:{entity_id}"
+
+def decode_cursor(value: Optional[str]) -> Cursor:
+    """
+    Parse a cursor returned by a previous sync.
+
+    A bare integer (e.g. the `version` returned by POST /collect) means
+    "everything after that version".
+    """
+    if not value:
+        return START_CURSOR
+    parts = value.split(":", 2)
+    try:
+        if len(parts) == 1:
+            return (int(parts[0]), len(KIND_RANK), "")
+        return (int(parts[0]), int(parts[1]), parts[2])
+    except (ValueError, IndexError):
+        raise ValueError(f"Invalid sync cursor: {value}")
+
+def _after(version_col, id_col, rank: int, cursor: Cursor):
+    """Keyset condition selecting rows of one kind that sort after the cursor"""
+    cur_version, cur_rank, cur_id = cursor
+    if rank > cur_rank:
+        return version_col >= cur_version
+    if rank < cur_rank:
+        return version_col > cur_version
+    return or_(
+        version_col > cur_version,
+        and_(version_col == cur_version, id_col > cur_id),
+    )
+
+def _iso(value) -> Optional[str]:
+    return value.isoformat() if value else None
+
+class SyncService:
+    """Builds paged change feeds for a user's ideas, clips and tags"""
+
+    def changes_since(
+        self,
+        db: Session,
+        user_id: str,
+        cursor: Cursor,
+        limit: int = DEFAULT_PAGE_SIZE
+    ) -> Dict[str, Any]:
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+        ideas = db.query(Idea).filter(
+            Idea.user_id == user_id,
+            _after(Idea.version, Idea.id, KIND_RANK["idea"], cursor)
+        ).order_by(Idea.version, Idea.id).limit(limit + 1).all()
+
+        clips = db.query(Clip).join(Idea).filter(
+            Idea.user_id == user_id,
+            _after(Clip.version, Clip.id, KIND_RANK["clip"], cursor)
+        ).order_by(Clip.version, Clip.id).limit(limit + 1).all()
+
+        deletions = db.query(Tombstone).filter(
+            Tombstone.user_id == user_id,
+            _after(Tombstone.version, Tombstone.id, KIND_RANK["deleted"], cursor)
+        ).order_by(Tombstone.version, Tombstone.id).limit(limit + 1).all()
+
+        # Each source is already sorted, so a k-way merge yields the page
+        merged = heapq.merge(
+            (((i.version, KIND_RANK["idea"], i.id), "idea", i) for i in ideas),
+            (((c.version, KIND_RANK["clip"], c.id), "clip", c) for c in clips),
+            (((t.version, KIND_RANK["deleted"], t.id), "deleted", t) for t in deletions),
+            key=lambda item: item[0],
+        )
+        page = []
+        has_more = False
+        for item in merged:
+            if len(page) == limit:
+                has_more = True
+                break
+            page.append(item)
+
+        result = {"ideas": [], "clips": [], "tags": [], "deleted": []}
+        page_clips = [obj for _, kind, obj in page if kind == "clip"]
+        tags_by_clip = self._load_tags(db, [clip.id for clip in page_clips])
+        # Clients keep full copies, so large bodies are sent in full
+        bodies = get_clip_body_service().load(db, [clip.body_hash for clip in page_clips if clip.body_hash])
+        seen_tags = {}
+
+        for _, kind, obj in page:
+            if kind == "idea":
+                result["ideas"].append({
+                    "id": obj.id,
+                    "name": obj.name,
+                    "category": obj.category,
+                    "updated_at": _iso(obj.updated_at),
+                })
+            elif kind == "clip":
+                clip_tag_list = tags_by_clip.get(obj.id, [])
+                for tag in clip_tag_list:
+                    seen_tags.setdefault(tag["id"], tag)
+                result["clips"].append({
+                    "id": obj.id,
+                    "idea_id": obj.idea_id,
+                    "type": obj.type,
+                    "value": bodies.get(obj.body_hash, obj.value),
+                    "status": obj.status,
+                    "created_at": _iso(obj.created_at),
+                    "updated_at": _iso(obj.updated_at),
+                    "tags": [tag["id"] for tag in clip_tag_list],
+                })
+            else:
+                result["deleted"].append({
+                    "entity": obj.entity,
+                    "id": obj.entity_id,
+                    "deleted_at": _iso(obj.deleted_at),
+                })
+
+        result["tags"] = list(seen_tags.values())
+        result["cursor"] = encode_cursor(page[-1][0]) if page else encode_cursor(cursor)
+        result["has_more"] = has_more
+        return result
+
+    def _load_tags(self, db: Session, clip_ids: List[str]) -> Dict[str, List[Dict[str, str]]]:
+        tags_by_clip: Dict[str, List[Dict[str, str]]] = {}
+        if not clip_ids:
+            return tags_by_clip
+        rows = db.execute(
+            select(clip_tags.c.clip_id, Tag.id, Tag.name)
+            .join(Tag, Tag.id == clip_tags.c.tag_id)
+            .where(clip_tags.c.clip_id.in_(clip_ids))
+        )
+        for clip_id, tag_id, tag_name in rows:
+            tags_by_clip.setdefault(clip_id, []).append({"id": tag_id, "name": tag_name})
+        return tags_by_clip
+
+# Create singleton instance
+sync_service = None
+
+def get_sync_service():
+    """Get or create sync service instance"""
+    global sync_service
+    if sync_service is None:
+        sync_service = SyncService()
+    return sync_service
@@ -0,0 +1,292 @@
+import heapq
+import math
+import os
+import re
+import time
+from collections import Counter, OrderedDict
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.core.invalidation import ALL, Invalidation, get_invalidation_bus
+from app.models.db_models import Clip, Idea, Tag, clip_tags
+
+# Environment variables
+TAG_MODEL_MAX_AGE = float(os.getenv("TAG_MODEL_MAX_AGE", "3600"))
+
+# Tags kept per term (and co-occurring tags per tag) for scoring
+TOP_K = 32
+CACHE_SIZE = 256
+CO_OCCURRENCE_WEIGHT = 0.5
+NAME_MATCH_WEIGHT = 1.0
+BUILD_BATCH_SIZE = 5000
+
+WORD_RE = re.compile(r"[^\W\d_][\w-]*")
+STOP_WORDS = frozenset("""
+a about after all also an and any are as at be because been but by can could do does
+for from had has have how however i if in into is it its just like more most my no not
+of on or our out over so some such than that the their them then there these they this
+to too up us very was we were what when which while who why will with would you your
+http https www com
+""".split())
+
+def terms(text: str) -> Set[str]:
+    return {
+        word for word in WORD_RE.findall((text or "").lower())
+        if len(word) > 2 and word not in STOP_WORDS
+    }
+
+class SparseCounts:
+    """
+    Sparse count matrix stored as {row: {column: count}}, with each row's
+    TOP_K largest columns kept up to date so reads never scan a full row.
+
+    Increments keep the top list exact without a rescan; only decrements of
+    a column inside the top list trigger one.
+    """
+
+    def __init__(self, k: int = TOP_K):
+        self.k = k
+        self.rows: Dict[str, Counter] = {}
+        self._top: Dict[str, List[Tuple[str, int]]] = {}
+
+    def add(self, row: str, column: str, delta: int) -> None:
+        counts = self.rows.setdefault(row, Counter())
+        counts[column] += delta
+        count = counts[column]
+        if count <= 0:
+            del counts[column]
+            if not counts:
+                del self.rows[row]
+        top = self._top.get(row, [])
+        position = next((i for i, (c, _) in enumerate(top) if c == column), None)
+        if delta < 0:
+            if position is not None:
+                self._rescan(row)
+            return
+        if position is not None:
+            top[position] = (column, count)
+        elif len(top) < self.k:
+            top.append((column, count))
+        elif count > top[-1][1]:
+            top[-1] = (column, count)
+        else:
+            return
+        top.sort(key=lambda item: -item[1])
+        self._top[row] = top
+
+    def add_untracked(self, row: str, column: str) -> None:
+        """Increment without maintaining the top lists; call rescan_all() after"""
+        self.rows.setdefault(row, Counter())[column] += 1
+
+    def rescan_all(self) -> None:
+        for row in self.rows:
+            self._rescan(row)
+
+    def _rescan(self, row: str) -> None:
+        counts = self.rows.get(row)
+        if not counts:
+            self._top.pop(row, None)
+            return
+        self._top[row] = heapq.nlargest(self.k, counts.items(), key=lambda item: item[1])
+
+    def top(self, row: str) -> List[Tuple[str, int]]:
+        return self._top.get(row, [])
+
+class TagModel:
+    """Term -> tag counts and tag co-occurrence counts over a user's tagged clips"""
+
+    def __init__(self):
+        self.term_tags = SparseCounts()
+        self.tag_tags = SparseCounts()
+        self.term_clips: Counter = Counter()
+        self.tag_clips: Counter = Counter()
+        self.name_terms: Dict[str, Set[str]] = {}
+        self.clips = 0
+        self.built_at = time.monotonic()
+
+    def apply(self, text: str, tags: Iterable[str], sign: int) -> None:
+        """Add (sign=1) or remove (sign=-1) one tagged clip"""
+        tags = set(tags)
+        if not tags:
+            return
+        clip_terms = terms(text)
+        self.clips += sign
+        for term in clip_terms:
+            self.term_clips[term] += sign
+            for tag in tags:
+                self.term_tags.add(term, tag, sign)
+        for tag in tags:
+            self.tag_clips[tag] += sign
+            if self.tag_clips[tag] <= 0:
+                del self.tag_clips[tag]
+                for term in terms(tag):
+                    self.name_terms.get(term, set()).discard(tag)
+            elif sign > 0:
+                for term in terms(tag):
+                    self.name_terms.setdefault(term, set()).add(tag)
+            for other in tags:
+                if other != tag:
+                    self.tag_tags.add(tag, other, sign)
+
+    def load(self, text: str, tags: Iterable[str]) -> None:
+        """Bulk form of apply(..., 1) used while building; call finish() after"""
+        tags = set(tags)
+        if not tags:
+            return
+        clip_terms = terms(text)
+        self.clips += 1
+        for term in clip_terms:
+            self.term_clips[term] += 1
+            for tag in tags:
+                self.term_tags.add_untracked(term, tag)
+        for tag in tags:
+            self.tag_clips[tag] += 1
+            for other in tags:
+                if other != tag:
+                    self.tag_tags.add_untracked(tag, other)
+
+    def finish(self) -> None:
+        self.term_tags.rescan_all()
+        self.tag_tags.rescan_all()
+        for tag in self.tag_clips:
+            for term in terms(tag):
+                self.name_terms.setdefault(term, set()).add(tag)
+
+    def suggest(self, text: str, chosen: Iterable[str], limit: int) -> List[Dict]:
+        chosen = set(chosen)
+        scores: Counter = Counter()
+        clip_terms = terms(text)
+        for term in clip_terms:
+            term_clips = self.term_clips.get(term)
+            if not term_clips:
+                continue
+            # P(tag | term), weighted by how rare the term is
+            idf = math.log(1 + self.clips / term_clips)
+            for tag, count in self.term_tags.top(term):
+                scores[tag] += idf * count / term_clips
+            for tag in self.name_terms.get(term, ()):
+                scores[tag] += NAME_MATCH_WEIGHT
+        for tag in chosen:
+            tag_clips = self.tag_clips.get(tag)
+            if not tag_clips:
+                continue
+            for other, count in self.tag_tags.top(tag):
+                scores[other] += CO_OCCURRENCE_WEIGHT * count / tag_clips
+        for tag in chosen:
+            scores.pop(tag, None)
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], item[0]))
+        return [{"name": tag, "score": round(score, 4)} for tag, score in best if score > 0]
+
+class TagSuggestionService:
+    """
+    Suggests tags for new clip content from a per-user TagModel.
+
+    A model is built from the user's clip_tags on first use. After that,
+    the clip write paths apply each change to it, so a suggestion never
+    scans clips or tags. Writes handled by other worker processes arrive
+    on the invalidation bus and drop the user's model; models older than
+    TAG_MODEL_MAX_AGE are rebuilt in case an event was lost.
+    """
+
+    def __init__(self, cache_size: int = CACHE_SIZE, max_age: float = TAG_MODEL_MAX_AGE):
+        self.cache_size = cache_size
+        self.max_age = max_age
+        self._models: "OrderedDict[str, TagModel]" = OrderedDict()
+        self._lock = Lock()
+
+    def _cached(self, user_id: str) -> Optional[TagModel]:
+        with self._lock:
+            model = self._models.get(user_id)
+            if model is None:
+                return None
+            if time.monotonic() - model.built_at > self.max_age:
+                del self._models[user_id]
+                return None
+            self._models.move_to_end(user_id)
+            return model
+
+    def model(self, db: Session, user_id: str) -> TagModel:
+        model = self._cached(user_id)
+        if model is not None:
+            return model
+        model = self.build(db, user_id)
+        with self._lock:
+            self._models[user_id] = model
+            while len(self._models) > self.cache_size:
+                self._models.popitem(last=False)
+        return model
+
+    def build(self, db: Session, user_id: str) -> TagModel:
+        model = TagModel()
+        result = db.execute(
+            select(Clip.id, Clip.value, Tag.name)
+            .join(clip_tags, clip_tags.c.clip_id == Clip.id)
+            .join(Tag, Tag.id == clip_tags.c.tag_id)
+            .join(Idea, Idea.id == Clip.idea_id)
+            .where(Idea.user_id == user_id)
+            .order_by(Clip.id)
+            .execution_options(yield_per=BUILD_BATCH_SIZE)
+        )
+        current, value, tags = None, None, []
+        for clip_id, clip_value, tag_name in result:
+            if clip_id != current:
+                if current is not None:
+                    model.load(value, tags)
+                current, value, tags = clip_id, clip_value, []
+            tags.append(tag_name)
+        if current is not None:
+            model.load(value, tags)
+        model.finish()
+        return model
+
+    def suggest(self, db: Session, user_id: str, content: str, chosen: List[str], limit: int) -> List[Dict]:
+        model = self.model(db, user_id)
+        with self._lock:
+            return model.suggest(content, chosen, limit)
+
+    def clip_changed(
+        self,
+        user_id: str,
+        before: Optional[Tuple[str, List[str]]],
+        after: Optional[Tuple[str, List[str]]]
+    ) -> None:
+        """
+        Apply one clip write, given (value, tag names) before and after it
+        (None for a created or deleted clip). No-op if no model is loaded.
+        """
+        model = self._cached(user_id)
+        if model is None:
+            return
+        with self._lock:
+            if before is not None:
+                model.apply(before[0], before[1], -1)
+            if after is not None:
+                model.apply(after[0], after[1], 1)
+
+    def invalidate(self, user_id: str) -> None:
+        """Drop a user's model; used after bulk writes such as collector syncs"""
+        with self._lock:
+            self._models.pop(user_id, None)
+
+    def on_invalidation(self, invalidation: Invalidation) -> None:
+        """Drop models another worker's clip writes have made stale"""
+        # This worker's own writes were already applied by clip_changed
+        if invalidation.local or invalidation.entity not in ("clip", "tag", ALL):
+            return
+        if invalidation.user_id == ALL:
+            with self._lock:
+                self._models.clear()
+        else:
+            self.invalidate(invalidation.user_id)
+
+# Create singleton instance
+tag_suggestion_service = None
+
+def get_tag_suggestion_service():
+    """Get or create tag suggestion service instance"""
+    global tag_suggestion_service
+    if tag_suggestion_service is None:
+        tag_suggestion_service = TagSuggestionService()
+        get_invalidation_bus().subscribe(tag_suggestion_service.on_invalidation)
+    return tag_suggestion_service
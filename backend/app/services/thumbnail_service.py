@@ -0,0 +1,312 @@
+import asyncio
+import hashlib
+import io
+import json
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+import httpx
+from app.utils.net import checked_get, UnsafeHostError
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - no file locks on Windows
+    fcntl = None
+
+# Environment variables
+THUMBNAIL_CACHE_DIR = os.getenv("THUMBNAIL_CACHE_DIR", os.path.join(".cache", "thumbnails"))
+THUMBNAIL_CACHE_MAX_BYTES = int(os.getenv("THUMBNAIL_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+THUMBNAIL_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", "2"))
+
+# Longest edge in pixels for each named size
+SIZES = {"sm": 160, "md": 320, "lg": 640}
+FORMATS = {"webp": "image/webp", "jpeg": "image/jpeg"}
+MAX_SOURCE_BYTES = 20 * 1024 * 1024
+FETCH_TIMEOUT = 15.0
+
+class ThumbnailError(Exception):
+    """Raised when a thumbnail cannot be produced; carries an HTTP status"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+@dataclass
+class Thumbnail:
+    path: str
+    etag: str
+    content_type: str
+
+@dataclass
+class _Inflight:
+    """Lock shared by the requests waiting on one URL's fetch"""
+    lock: asyncio.Lock
+    waiters: int = 0
+
+def render_thumbnails(data: bytes) -> Dict[str, bytes]:
+    """
+    Decode an image once and encode every size/format variant.
+
+    Runs in a worker process, so it must stay a module-level function.
+    """
+    from PIL import Image, ImageOps
+
+    variants = {}
+    with Image.open(io.BytesIO(data)) as source:
+        source = ImageOps.exif_transpose(source)
+        if source.mode not in ("RGB", "RGBA"):
+            source = source.convert("RGBA" if "transparency" in source.info else "RGB")
+        for size_name, edge in SIZES.items():
+            image = source.copy()
+            image.thumbnail((edge, edge))
+            for fmt in FORMATS:
+                out = io.BytesIO()
+                if fmt == "jpeg":
+                    image.convert("RGB").save(out, "JPEG", quality=82, optimize=True, progressive=True)
+                else:
+                    image.save(out, "WEBP", quality=80, method=4)
+                variants[f"{size_name}.{fmt}"] = out.getvalue()
+    return variants
+
+class ThumbnailCache:
+    """
+    Content-addressed blob store on disk with size-bounded LRU eviction.
+
+    Blobs are named by the SHA-256 of their bytes, so identical thumbnails
+    of different URLs are stored once. A small JSON index per source URL
+    maps each variant to its blob.
+
+    Every worker process sharing the directory sees one cache: a blob's
+    mtime is its last use, and the total size lives in a ledger file that
+    is only rewritten under an flock()ed lock file.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.blob_dir = os.path.join(root, "blobs")
+        self.index_dir = os.path.join(root, "index")
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.index_dir, exist_ok=True)
+        self._ledger_path = os.path.join(root, "ledger")
+        self._lock_file = open(os.path.join(root, "lock"), "a+")
+        self._lock = Lock()
+        with self._locked():
+            if not os.path.exists(self._ledger_path):
+                self._write_ledger(sum(size for _, _, size in self._blobs()))
+
+    @contextmanager
+    def _locked(self):
+        """Serialise ledger updates across threads and processes"""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _blobs(self) -> List[Tuple[float, str, int]]:
+        """(mtime, path, size) of every blob, least recently used first"""
+        blobs = []
+        for dirpath, _, filenames in os.walk(self.blob_dir):
+            for filename in filenames:
+                if filename.endswith(".tmp"):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                blobs.append((stat.st_mtime, path, stat.st_size))
+        return sorted(blobs)
+
+    @property
+    def total_bytes(self) -> int:
+        try:
+            with open(self._ledger_path) as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return sum(size for _, _, size in self._blobs())
+
+    def _write_ledger(self, total: int) -> None:
+        tmp = f"{self._ledger_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "w") as f:
+            f.write(str(max(total, 0)))
+        os.replace(tmp, self._ledger_path)
+
+    def _blob_path(self, digest: str, fmt: str) -> str:
+        return os.path.join(self.blob_dir, digest[:2], f"{digest}.{fmt}")
+
+    def _index_path(self, url_key: str) -> str:
+        return os.path.join(self.index_dir, f"{url_key}.json")
+
+    def lookup(self, url_key: str, variant: str) -> Optional[Tuple[str, str]]:
+        """Return (blob path, digest) and mark it recently used, or None"""
+        try:
+            with open(self._index_path(url_key)) as f:
+                entry = json.load(f)["variants"][variant]
+        except (OSError, KeyError, ValueError):
+            return None
+        path = self._blob_path(entry["digest"], variant.split(".", 1)[1])
+        try:
+            # Fails if any worker has evicted the blob; mtime is the LRU clock
+            os.utime(path)
+        except OSError:
+            return None
+        return path, entry["digest"]
+
+    def store(self, url_key: str, url: str, variants: Dict[str, bytes]) -> None:
+        index = {"url": url, "variants": {}}
+        for variant, data in variants.items():
+            digest = hashlib.sha256(data).hexdigest()
+            path = self._blob_path(digest, variant.split(".", 1)[1])
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if not os.path.exists(path):
+                tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(data)
+                with self._locked():
+                    # Another worker may have stored the same blob meanwhile
+                    if os.path.exists(path):
+                        os.remove(tmp)
+                    else:
+                        os.replace(tmp, path)
+                        self._write_ledger(self.total_bytes + len(data))
+            index["variants"][variant] = {"digest": digest, "bytes": len(data)}
+
+        tmp = f"{self._index_path(url_key)}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp, self._index_path(url_key))
+        self.evict()
+
+    def evict(self) -> None:
+        """Remove least recently used blobs until the cache fits in max_bytes"""
+        if self.total_bytes <= self.max_bytes:
+            return
+        with self._locked():
+            if self.total_bytes <= self.max_bytes:
+                # Another worker evicted while we waited
+                return
+            # Recounted from the files, which also corrects any drift in the ledger
+            blobs = self._blobs()
+            total = sum(size for _, _, size in blobs)
+            for _, path, size in blobs:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+            self._write_ledger(total)
+
+class ThumbnailService:
+    """Fetches remote images once and serves cached, resized variants"""
+
+    def __init__(
+        self,
+        cache_dir: str = THUMBNAIL_CACHE_DIR,
+        max_bytes: int = THUMBNAIL_CACHE_MAX_BYTES,
+        workers: int = THUMBNAIL_WORKERS,
+        allow_private_hosts: bool = False
+    ):
+        self.cache = ThumbnailCache(cache_dir, max_bytes)
+        self.workers = workers
+        self.allow_private_hosts = allow_private_hosts
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._inflight: Dict[str, _Inflight] = {}
+
+    async def get_thumbnail(self, url: str, size: str = "md", fmt: str = "webp") -> Thumbnail:
+        if size not in SIZES:
+            raise ThumbnailError(400, f"Unknown size '{size}', expected one of {sorted(SIZES)}")
+        if fmt not in FORMATS:
+            raise ThumbnailError(400, f"Unknown format '{fmt}', expected one of {sorted(FORMATS)}")
+        parsed = urlparse(url)
+        if parsed.scheme not in ("http", "https") or not parsed.hostname:
+            raise ThumbnailError(400, "Only absolute http(s) image URLs are supported")
+
+        url_key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        variant = f"{size}.{fmt}"
+        hit = self.cache.lookup(url_key, variant)
+        if hit is None:
+            # One fetch per URL even when a whole grid asks at once
+            inflight = self._inflight.setdefault(url_key, _Inflight(asyncio.Lock()))
+            inflight.waiters += 1
+            try:
+                async with inflight.lock:
+                    hit = self.cache.lookup(url_key, variant)
+                    if hit is None:
+                        data = await self._fetch(url)
+                        variants = await self._render(data)
+                        # File writes and the index dump stay off the event loop
+                        loop = asyncio.get_running_loop()
+                        await loop.run_in_executor(None, self.cache.store, url_key, url, variants)
+                        hit = self.cache.lookup(url_key, variant)
+            finally:
+                # Failed fetches release it too; the last waiter out removes it
+                inflight.waiters -= 1
+                if not inflight.waiters:
+                    del self._inflight[url_key]
+        if hit is None:
+            # Evicted straight away: the cache is smaller than one image set
+            raise ThumbnailError(507, "Thumbnail cache is too small")
+        path, digest = hit
+        return Thumbnail(path=path, etag=f'"{digest}"', content_type=FORMATS[fmt])
+
+    async def _fetch(self, url: str) -> bytes:
+        try:
+            async with httpx.AsyncClient(timeout=FETCH_TIMEOUT) as client:
+                async with checked_get(client, url, self.allow_private_hosts) as response:
+                    if response.status_code != 200:
+                        raise ThumbnailError(502, f"Origin returned {response.status_code}")
+                    chunks, total = [], 0
+                    async for chunk in response.aiter_bytes():
+                        total += len(chunk)
+                        if total > MAX_SOURCE_BYTES:
+                            raise ThumbnailError(413, "Source image is too large")
+                        chunks.append(chunk)
+                    return b"".join(chunks)
+        except UnsafeHostError as e:
+            raise ThumbnailError(400, f"Image host refused: {str(e)}")
+        except httpx.HTTPError as e:
+            raise ThumbnailError(502, f"Could not fetch image: {str(e)}")
+
+    async def _render(self, data: bytes) -> Dict[str, bytes]:
+        try:
+            import PIL  # noqa: F401
+        except ImportError:
+            raise ThumbnailError(503, "Pillow is not installed on this server")
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._pool, render_thumbnails, data)
+        except Exception as e:
+            if type(e).__name__ == "UnidentifiedImageError":
+                raise ThumbnailError(415, "Source is not a supported image")
+            raise
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+# Create singleton instance
+thumbnail_service = None
+
+def get_thumbnail_service():
+    """Get or create thumbnail service instance"""
+    global thumbnail_service
+    if thumbnail_service is None:
+        thumbnail_service = ThumbnailService()
+    return thumbnail_service
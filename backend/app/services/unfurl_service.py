@@ -0,0 +1,299 @@
+import asyncio
+import hashlib
+import os
+import time
+from datetime import datetime, timedelta
+from html.parser import HTMLParser
+from typing import Any, Dict, Iterable, List, Optional, Set
+from urllib.parse import urljoin, urlparse
+import httpx
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.db.session import SessionLocal
+from app.models.db_models import Clip, Idea, LinkMetadata
+from app.core.versioning import bump_data_version
+from app.utils.net import checked_get, UnsafeHostError
+from app.utils.urls import canonical_url_hash, video_id
+
+# Environment variables
+UNFURL_REFETCH_HOURS = float(os.getenv("UNFURL_REFETCH_HOURS", "168"))
+UNFURL_ERROR_REFETCH_MINUTES = float(os.getenv("UNFURL_ERROR_REFETCH_MINUTES", "60"))
+UNFURL_CONCURRENCY = int(os.getenv("UNFURL_CONCURRENCY", "8"))
+UNFURL_PER_HOST = int(os.getenv("UNFURL_PER_HOST", "2"))
+UNFURL_HOST_DELAY = float(os.getenv("UNFURL_HOST_DELAY", "0.5"))
+
+UNFURL_TYPES = ("link", "video")
+MAX_HTML_BYTES = 512 * 1024
+FETCH_TIMEOUT = 10.0
+USER_AGENT = "ClipkitBot/1.0 (+link previews)"
+# Keep IN (...) lists well under SQLite's bound-parameter limit
+LOOKUP_CHUNK_SIZE = 500
+
+PREVIEW_FIELDS = ("title", "description", "canonical_url", "image_url", "site_name", "video_id")
+
+def url_key(url: str) -> str:
+    return hashlib.sha256(url.strip().encode("utf-8")).hexdigest()
+
+class PageMetadataParser(HTMLParser):
+    """Collects <title>, description/OpenGraph meta tags and rel=canonical"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.meta: Dict[str, str] = {}
+        self.canonical: Optional[str] = None
+        self.title_parts: List[str] = []
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = {k.lower(): (v or "") for k, v in attrs}
+        if tag == "meta":
+            key = (attrs.get("property") or attrs.get("name") or "").lower()
+            if key and "content" in attrs:
+                self.meta.setdefault(key, attrs["content"].strip())
+        elif tag == "link" and "canonical" in attrs.get("rel", "").lower().split():
+            self.canonical = self.canonical or attrs.get("href")
+        elif tag == "title":
+            self._in_title = True
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self._in_title = False
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title_parts.append(data)
+
+    @property
+    def title(self) -> Optional[str]:
+        title = "".join(self.title_parts).strip()
+        return title or None
+
+def parse_metadata(html: str, page_url: str) -> Dict[str, Any]:
+    parser = PageMetadataParser()
+    try:
+        parser.feed(html)
+    except Exception as e:
+        print(f"Error parsing HTML from {page_url}: {str(e)}")
+    meta = parser.meta
+
+    def absolute(value):
+        return urljoin(page_url, value) if value else None
+
+    canonical = absolute(meta.get("og:url") or parser.canonical)
+    video_url = meta.get("og:video:url") or meta.get("og:video")
+    return {
+        "title": meta.get("og:title") or meta.get("twitter:title") or parser.title,
+        "description": meta.get("og:description") or meta.get("twitter:description") or meta.get("description"),
+        "canonical_url": canonical,
+        "image_url": absolute(meta.get("og:image") or meta.get("twitter:image")),
+        "site_name": meta.get("og:site_name"),
+        "video_id": video_id(page_url) or (video_id(canonical) if canonical else None)
+                    or (video_id(video_url) if video_url else None),
+    }
+
+class UnfurlService:
+    """
+    Fetches title, description, canonical URL, preview image and video id
+    for link and video clips, and caches them in link_metadata.
+
+    Fetching happens in background tasks after writes, never on the request
+    path. Concurrency is bounded overall and per host, and requests to the
+    same host are spaced by a politeness delay.
+
+    Metadata does not expire on its own: once older than ttl (error_ttl for
+    failed fetches) it is re-fetched the next time a clip with its URL is
+    written, and served as it is until then.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = UNFURL_CONCURRENCY,
+        per_host: int = UNFURL_PER_HOST,
+        host_delay: float = UNFURL_HOST_DELAY,
+        ttl: timedelta = timedelta(hours=UNFURL_REFETCH_HOURS),
+        error_ttl: timedelta = timedelta(minutes=UNFURL_ERROR_REFETCH_MINUTES),
+        allow_private_hosts: bool = False,
+        session_factory=SessionLocal
+    ):
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.host_delay = host_delay
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.allow_private_hosts = allow_private_hosts
+        self.session_factory = session_factory
+        self._loop = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._host_next: Dict[str, float] = {}
+
+    def _limits(self) -> asyncio.Semaphore:
+        # asyncio primitives belong to one event loop; rebuild them if it changes
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._host_semaphores = {}
+        return self._semaphore
+
+    async def _polite(self, host: str) -> None:
+        """Wait until this host may be contacted again"""
+        now = time.monotonic()
+        next_allowed = self._host_next.get(host, now)
+        self._host_next[host] = max(now, next_allowed) + self.host_delay
+        if next_allowed > now:
+            await asyncio.sleep(next_allowed - now)
+
+    async def fetch_metadata(self, client: httpx.AsyncClient, url: str) -> Dict[str, Any]:
+        parsed = urlparse(url)
+        if parsed.scheme not in ("http", "https") or not parsed.hostname:
+            return {"status": "error", "video_id": video_id(url)}
+        host = parsed.hostname.lower()
+
+        semaphore = self._limits()
+        host_semaphore = self._host_semaphores.setdefault(host, asyncio.Semaphore(self.per_host))
+        async with semaphore, host_semaphore:
+            try:
+                await self._polite(host)
+                # Every redirect hop's host is checked, not just the first
+                async with checked_get(client, url, self.allow_private_hosts) as response:
+                    if response.status_code != 200:
+                        return {"status": "error", "video_id": video_id(url)}
+                    content_type = response.headers.get("content-type", "")
+                    if "html" not in content_type:
+                        # Direct file links: nothing to parse, but still a valid result
+                        return {"status": "ok", "video_id": video_id(url)}
+                    body = bytearray()
+                    async for chunk in response.aiter_bytes():
+                        body.extend(chunk)
+                        if len(body) >= MAX_HTML_BYTES:
+                            break
+                    final_url = str(response.url)
+                    html = bytes(body).decode(response.encoding or "utf-8", errors="replace")
+            except (httpx.HTTPError, UnsafeHostError) as e:
+                print(f"Unfurl failed for {url}: {str(e)}")
+                return {"status": "error", "video_id": video_id(url)}
+
+        metadata = parse_metadata(html, final_url)
+        metadata["video_id"] = metadata["video_id"] or video_id(url)
+        metadata["status"] = "ok"
+        return metadata
+
+    async def unfurl(self, urls: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Fetch metadata for many URLs concurrently; no caching"""
+        urls = list(dict.fromkeys(u.strip() for u in urls if u and u.strip()))
+        headers = {"User-Agent": USER_AGENT, "Accept": "text/html,application/xhtml+xml"}
+        async with httpx.AsyncClient(
+            timeout=FETCH_TIMEOUT, headers=headers
+        ) as client:
+            results = await asyncio.gather(*(self.fetch_metadata(client, url) for url in urls))
+        return dict(zip(urls, results))
+
+    def stale_urls(self, db: Session, urls: Iterable[str]) -> List[str]:
+        """URLs with no cached metadata, or whose entry has expired"""
+        keys = {url_key(url): url.strip() for url in urls if url and url.strip()}
+        fresh = set()
+        now = datetime.utcnow()
+        key_list = list(keys)
+        for i in range(0, len(key_list), LOOKUP_CHUNK_SIZE):
+            chunk = key_list[i:i + LOOKUP_CHUNK_SIZE]
+            fresh.update(db.execute(
+                select(LinkMetadata.url_hash).where(
+                    LinkMetadata.url_hash.in_(chunk),
+                    LinkMetadata.expires_at > now
+                )
+            ).scalars())
+        return [url for key, url in keys.items() if key not in fresh]
+
+    def store(self, db: Session, results: Dict[str, Dict[str, Any]]) -> None:
+        now = datetime.utcnow()
+        for url, metadata in results.items():
+            ttl = self.ttl if metadata["status"] == "ok" else self.error_ttl
+            values = {field: metadata.get(field) for field in PREVIEW_FIELDS}
+            values.update(url=url, status=metadata["status"], fetched_at=now, expires_at=now + ttl)
+            row = db.get(LinkMetadata, url_key(url))
+            if row is None:
+                db.add(LinkMetadata(url_hash=url_key(url), **values))
+            else:
+                for field, value in values.items():
+                    setattr(row, field, value)
+
+    async def refresh_clips(self, clip_ids: List[str]) -> int:
+        """
+        Unfurl the link/video clips among clip_ids whose metadata is missing
+        or due for a re-fetch. Metadata is shared by URL, so the data version
+        of every user with a clip on a fetched URL is bumped, and their list
+        ETags pick up the new previews.
+        """
+        if not clip_ids:
+            return 0
+        db = self.session_factory()
+        try:
+            values = []
+            for i in range(0, len(clip_ids), LOOKUP_CHUNK_SIZE):
+                values += db.execute(
+                    select(Clip.value)
+                    .where(Clip.id.in_(clip_ids[i:i + LOOKUP_CHUNK_SIZE]), Clip.type.in_(UNFURL_TYPES))
+                ).scalars().all()
+            stale = self.stale_urls(db, values)
+            if not stale:
+                return 0
+            # Release the connection while waiting on the network
+            db.rollback()
+            results = await self.unfurl(stale)
+            self.store(db, results)
+            for user_id in sorted(self.users_linking(db, results)):
+                bump_data_version(db, user_id, "clip")
+            db.commit()
+            return len(results)
+        except Exception as e:
+            db.rollback()
+            print(f"Error unfurling clips: {str(e)}")
+            return 0
+        finally:
+            db.close()
+
+    def users_linking(self, db: Session, urls: Iterable[str]) -> Set[str]:
+        """Owners of link/video clips on any of urls, found through the clips' url_hash index"""
+        urls = {url.strip() for url in urls}
+        hashes = list({h for h in map(canonical_url_hash, urls) if h})
+        users = set()
+        for i in range(0, len(hashes), LOOKUP_CHUNK_SIZE):
+            rows = db.execute(
+                select(Clip.value, Idea.user_id)
+                .join(Idea, Idea.id == Clip.idea_id)
+                .where(Clip.url_hash.in_(hashes[i:i + LOOKUP_CHUNK_SIZE]), Clip.type.in_(UNFURL_TYPES))
+            )
+            # Clips share a url_hash across tracking parameters; metadata is per exact URL
+            users.update(user_id for value, user_id in rows if user_id and value.strip() in urls)
+        return users
+
+    def previews(self, db: Session, urls: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Cached metadata by URL, however old; never fetches"""
+        keys = {url_key(url): url for url in urls if url and url.strip()}
+        previews = {}
+        key_list = list(keys)
+        for i in range(0, len(key_list), LOOKUP_CHUNK_SIZE):
+            chunk = key_list[i:i + LOOKUP_CHUNK_SIZE]
+            result = db.execute(
+                select(LinkMetadata.url_hash, *(getattr(LinkMetadata, f) for f in PREVIEW_FIELDS))
+                .where(LinkMetadata.url_hash.in_(chunk), LinkMetadata.status == "ok")
+            )
+            for row in result:
+                preview = row._asdict()
+                previews[keys[preview.pop("url_hash")]] = preview
+        return previews
+
+# Create singleton instance
+unfurl_service = None
+
+def get_unfurl_service():
+    """Get or create unfurl service instance"""
+    global unfurl_service
+    if unfurl_service is None:
+        unfurl_service = UnfurlService()
+    return unfurl_service
+
+async def unfurl_clips(clip_ids: List[str]) -> None:
+    """Background task entry point used by the clip write paths"""
+    await get_unfurl_service().refresh_clips(clip_ids)
@@ -0,0 +1,29 @@
+"""
+Content hashes used to detect no-op writes during collector syncs
+"""
+
+import hashlib
+from datetime import datetime
+from typing import Iterable, Optional
+
+def _digest(*fields) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    for field in fields:
+        # Unit separator keeps ("ab", "c") and ("a", "bc") distinct
+        h.update(("" if field is None else str(field)).encode("utf-8"))
+        h.update(b"\x1f")
+    return h.hexdigest()
+
+def idea_hash(name: str, category: Optional[str]) -> str:
+    return _digest("idea", name, category)
+
+def clip_hash(
+    type: str,
+    value: str,
+    status: str,
+    created_at: Optional[datetime],
+    idea_id: str,
+    tag_ids: Iterable[str]
+) -> str:
+    created = created_at.isoformat() if created_at else None
+    return _digest("clip", type, value, status, created, idea_id, ",".join(sorted(tag_ids)))
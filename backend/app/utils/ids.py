@@ -0,0 +1,64 @@
+"""
+Time-ordered ids and their compact binary form.
+
+New rows get UUIDv7 ids: a 48-bit millisecond timestamp followed by a
+counter and random bits, so ids created later sort later and inserts land
+at the right-hand edge of primary key indexes instead of on random pages.
+
+Stored ids (see app.db.types.CompactId) are 16 raw bytes for canonical
+UUID strings. Any other id, such as the ones collector clients choose
+themselves, is stored as 0xFF followed by its UTF-8 bytes. A trailing 0xFF
+is added when that would otherwise be 16 bytes long. 0xFF never occurs in
+UTF-8, so the two forms can never be confused.
+"""
+
+import os
+import re
+import time
+import uuid
+from threading import Lock
+
+UUID_RE = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+TEXT_MARK = b"\xff"
+
+_lock = Lock()
+_last_ms = 0
+_counter = 0
+
+def uuid7() -> uuid.UUID:
+    """
+    UUIDv7 (RFC 9562). The 12-bit rand_a field is a counter seeded randomly
+    each millisecond, so ids from one process are strictly increasing.
+    """
+    global _last_ms, _counter
+    with _lock:
+        ms = time.time_ns() // 1_000_000
+        if ms > _last_ms:
+            _last_ms = ms
+            # Random start in the lower half leaves room to count up
+            _counter = int.from_bytes(os.urandom(2), "big") & 0x7FF
+        else:
+            _counter += 1
+            if _counter > 0xFFF:
+                # More than ~2000 ids in one millisecond: borrow the next one
+                _last_ms += 1
+                _counter = 0
+        ms, counter = _last_ms, _counter
+    rand_b = int.from_bytes(os.urandom(8), "big") & ((1 << 62) - 1)
+    return uuid.UUID(int=(ms << 80) | (0x7 << 76) | (counter << 64) | (0b10 << 62) | rand_b)
+
+def new_id() -> str:
+    """A new time-ordered id in the usual string form"""
+    return str(uuid7())
+
+def id_to_bytes(value: str) -> bytes:
+    if len(value) == 36 and UUID_RE.fullmatch(value):
+        return bytes.fromhex(value.replace("-", ""))
+    data = TEXT_MARK + value.encode("utf-8")
+    return data + TEXT_MARK if len(data) == 16 else data
+
+def id_from_bytes(data: bytes) -> str:
+    if len(data) == 16:
+        h = data.hex()
+        return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+    return data[1:].rstrip(TEXT_MARK).decode("utf-8")
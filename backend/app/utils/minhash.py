@@ -0,0 +1,138 @@
+"""
+MinHash signatures and LSH band keys for near-duplicate text and code clips.
+
+Clips are tokenized (words for text, identifiers and punctuation for code),
+turned into overlapping k-token shingles, and summarised by NUM_PERM minimum
+hash values. Two signatures agree in each position with probability equal to
+the Jaccard similarity of the shingle sets, and splitting a signature into
+BANDS bands of ROWS values gives keys that collide for similar clips, so
+candidates come from bucket lookups instead of pairwise comparison.
+
+Everything past tokenization is vectorized over a batch of clips.
+"""
+
+import re
+import zlib
+from functools import lru_cache
+from itertools import chain
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+
+DEDUPE_TYPES = ("text", "code")
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+# Text is compared on word 3-grams; code tokens are shorter, so use 5-grams
+SHINGLE_SIZE = {"text": 3, "code": 5}
+
+# Shingles are hashed modulo a 31-bit prime so products stay inside uint64
+PRIME = np.uint64((1 << 31) - 1)
+SHINGLE_BASE = np.uint64(1_000_003)
+# Permutations use multiply-shift hashing: (a * x + b) mod 2**64, top 32
+# bits. It needs no division, which dominates the cost of the % form.
+_rng = np.random.default_rng(0x5EED)
+PERM_A = _rng.integers(0, 1 << 63, NUM_PERM, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+PERM_B = _rng.integers(0, 1 << 63, NUM_PERM, dtype=np.uint64)
+SHIFT = np.uint64(32)
+BAND_SEED = np.arange(1, BANDS + 1, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+BAND_MIX = np.uint64(0x100000001B3)
+
+# Upper bound on shingles hashed at once: (shingles x NUM_PERM) uint64 matrix
+MAX_BATCH_SHINGLES = 200_000
+
+WORD_RE = re.compile(r"\w+")
+CODE_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+def tokenize(type: str, value: str) -> List[str]:
+    """Word tokens for text (case-insensitive); code keeps case and punctuation"""
+    if type == "code":
+        return CODE_TOKEN_RE.findall(value or "")
+    return WORD_RE.findall((value or "").lower())
+
+@lru_cache(maxsize=1 << 18)
+def _token_hash(token: str) -> int:
+    return zlib.crc32(token.encode("utf-8")) % int(PRIME)
+
+def _signature_batch(docs: List[List[int]], k: int) -> np.ndarray:
+    lengths = np.array([len(doc) for doc in docs], dtype=np.int64)
+    tokens = np.fromiter(chain.from_iterable(docs), dtype=np.uint64, count=int(lengths.sum()))
+    doc_start = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+
+    # Rolling polynomial hash of every k-token window in the concatenation,
+    # then keep only windows that stay inside one document
+    windows = len(tokens) - k + 1
+    shingles = np.zeros(windows, dtype=np.uint64)
+    for j in range(k):
+        shingles = (shingles * SHINGLE_BASE + tokens[j:j + windows]) % PRIME
+    doc_of = np.repeat(np.arange(len(docs)), lengths)[:windows]
+    offset = np.arange(windows) - doc_start[doc_of]
+    shingles = shingles[offset <= (lengths - k)[doc_of]]
+
+    # One row per permutation, so the per-document minimum runs along
+    # contiguous memory
+    hashed = ((PERM_A[:, None] * shingles + PERM_B[:, None]) >> SHIFT).astype(np.uint32)
+    starts = np.concatenate(([0], np.cumsum(lengths - k + 1)[:-1]))
+    return np.minimum.reduceat(hashed, starts, axis=1).T
+
+def signatures(clips: Sequence[Tuple[str, str]]) -> List[Optional[np.ndarray]]:
+    """
+    MinHash signature (NUM_PERM uint32 values) for each (type, value) pair,
+    or None for clip types that are not deduplicated or have no tokens.
+    """
+    results: List[Optional[np.ndarray]] = [None] * len(clips)
+    for type, k in SHINGLE_SIZE.items():
+        batch, indexes, shingle_count = [], [], 0
+        for i, (clip_type, value) in enumerate(clips):
+            if clip_type != type:
+                continue
+            doc = [_token_hash(token) for token in tokenize(type, value)]
+            if not doc:
+                continue
+            # Short clips become a single padded shingle
+            doc += [0] * (k - len(doc))
+            batch.append(doc)
+            indexes.append(i)
+            shingle_count += len(doc) - k + 1
+            if shingle_count >= MAX_BATCH_SHINGLES:
+                for index, sig in zip(indexes, _signature_batch(batch, k)):
+                    results[index] = sig
+                batch, indexes, shingle_count = [], [], 0
+        if batch:
+            for index, sig in zip(indexes, _signature_batch(batch, k)):
+                results[index] = sig
+    return results
+
+def band_keys(sigs: np.ndarray) -> np.ndarray:
+    """(n, NUM_PERM) signatures -> (n, BANDS) signed 63-bit bucket keys"""
+    bands = sigs.reshape(len(sigs), BANDS, ROWS).astype(np.uint64)
+    keys = np.broadcast_to(BAND_SEED, (len(sigs), BANDS)).copy()
+    for r in range(ROWS):
+        keys = keys * BAND_MIX ^ bands[:, :, r]
+    return (keys >> np.uint64(1)).astype(np.int64)
+
+def candidate_pairs(members: np.ndarray, keys: np.ndarray) -> np.ndarray:
+    """
+    Pairs (i, j) of members sharing a bucket key. Each bucket pairs its
+    members with its first member only, which keeps the output linear in the
+    bucket size; grouping is transitive anyway.
+    """
+    order = np.lexsort((members, keys))
+    members, keys = members[order], keys[order]
+    if len(keys) == 0:
+        return np.empty((0, 2), dtype=members.dtype)
+    head = np.concatenate(([True], keys[1:] != keys[:-1]))
+    head_member = members[np.flatnonzero(head)[np.cumsum(head) - 1]]
+    pairs = np.stack((head_member, members), axis=1)[~head]
+    pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+    return np.unique(pairs, axis=0)
+
+def similarity(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Estimated Jaccard similarity of signature rows a[i] and b[i]"""
+    return (a == b).mean(axis=-1)
+
+def to_bytes(sig: np.ndarray) -> bytes:
+    return sig.astype("<u4").tobytes()
+
+def from_bytes(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype="<u4").astype(np.uint32)
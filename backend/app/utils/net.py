@@ -0,0 +1,80 @@
+"""
+Outbound request guards for services that fetch user-supplied URLs
+"""
+
+import asyncio
+import ipaddress
+import socket
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+from urllib.parse import urljoin, urlparse
+
+import httpx
+
+MAX_REDIRECTS = 5
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+
+class UnsafeHostError(Exception):
+    pass
+
+async def ensure_public_host(hostname: str) -> str:
+    """
+    Refuse hosts that resolve into the server's own network. Returns the
+    checked address, so the caller can connect to it rather than resolve
+    the name again.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        infos = await loop.getaddrinfo(hostname, None, type=socket.SOCK_STREAM)
+    except socket.gaierror:
+        raise UnsafeHostError(f"Could not resolve {hostname}")
+    if not infos:
+        raise UnsafeHostError(f"Could not resolve {hostname}")
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0])
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not address.is_global or address.is_multicast:
+            raise UnsafeHostError(f"{hostname} is not publicly routable")
+    return infos[0][4][0]
+
+@asynccontextmanager
+async def checked_get(
+    client: httpx.AsyncClient,
+    url: str,
+    allow_private_hosts: bool = False,
+    max_redirects: int = MAX_REDIRECTS
+) -> AsyncIterator[httpx.Response]:
+    """
+    Stream a GET of url, following redirects by hand so every hop's host
+    goes through ensure_public_host. Each hop connects to the address that
+    was checked, so a DNS answer that changes after the check (rebinding)
+    is never used. The client must not follow redirects itself.
+
+    Raises UnsafeHostError for a refused hop, and httpx.TooManyRedirects
+    after max_redirects.
+    """
+    for _ in range(max_redirects + 1):
+        parsed = urlparse(url)
+        if parsed.scheme not in ("http", "https") or not parsed.hostname:
+            raise UnsafeHostError(f"Refusing to fetch {url}")
+        request = client.build_request("GET", url)
+        if not allow_private_hosts:
+            address = await ensure_public_host(parsed.hostname)
+            # Host header and TLS name stay those of the URL
+            request.url = request.url.copy_with(host=address)
+            request.extensions["sni_hostname"] = parsed.hostname
+        response = await client.send(request, stream=True, follow_redirects=False)
+        # Report the URL as requested, not the pinned address
+        response.request.url = httpx.URL(url)
+        location = response.headers.get("location")
+        if response.status_code in REDIRECT_STATUSES and location:
+            await response.aclose()
+            url = urljoin(url, location)
+            continue
+        try:
+            yield response
+        finally:
+            await response.aclose()
+        return
+    raise httpx.TooManyRedirects(f"More than {max_redirects} redirects", request=request)
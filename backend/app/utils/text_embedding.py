@@ -0,0 +1,85 @@
+"""
+Text embedders for related-clip lookups and semantic search.
+
+HashingEmbedder is the default: word and bigram counts hashed into a fixed
+number of signed buckets, weighted by IDF when the index supplies document
+frequencies. It needs nothing beyond numpy. Setting EMBEDDING_MODEL to a
+sentence-transformers model name uses that model on the CPU instead, if
+the package is installed.
+"""
+
+import os
+import re
+import zlib
+from functools import lru_cache
+from typing import List, Optional, Sequence
+import numpy as np
+
+# Environment variables
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "")
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "384"))
+
+WORD_RE = re.compile(r"\w+")
+
+@lru_cache(maxsize=1 << 18)
+def _bucket(term: str, dim: int):
+    h = zlib.crc32(term.encode("utf-8"))
+    return h % dim, -1.0 if h & 0x80000000 else 1.0
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+class HashingEmbedder:
+    """Hashed TF-IDF over words and word bigrams"""
+
+    uses_idf = True
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = dim
+        self.name = f"hashed-tfidf-{dim}"
+
+    def terms(self, text: str) -> List[str]:
+        words = WORD_RE.findall((text or "").lower())
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def embed(self, texts: Sequence[str], idf: Optional[np.ndarray] = None) -> np.ndarray:
+        rows, cols, signs = [], [], []
+        for i, text in enumerate(texts):
+            for term in self.terms(text):
+                col, sign = _bucket(term, self.dim)
+                rows.append(i)
+                cols.append(col)
+                signs.append(sign)
+        counts = np.zeros((len(texts), self.dim), dtype=np.float32)
+        np.add.at(counts, (np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp)),
+                  np.array(signs, dtype=np.float32))
+        # Sublinear term frequency: the tenth repeat adds far less than the first
+        vectors = np.sign(counts) * np.log1p(np.abs(counts))
+        if idf is not None:
+            vectors *= idf
+        return normalize(vectors)
+
+class SentenceTransformerEmbedder:
+    """A local sentence-transformers model, run on the CPU"""
+
+    uses_idf = False
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = "st-" + re.sub(r"[^\w.-]+", "_", model_name)
+
+    def embed(self, texts: Sequence[str], idf: Optional[np.ndarray] = None) -> np.ndarray:
+        vectors = self.model.encode(list(texts), batch_size=64, normalize_embeddings=True)
+        return np.asarray(vectors, dtype=np.float32)
+
+def load_embedder(model_name: str = EMBEDDING_MODEL):
+    """The configured model, falling back to hashed TF-IDF"""
+    if model_name:
+        try:
+            return SentenceTransformerEmbedder(model_name)
+        except Exception as e:
+            print(f"Could not load embedding model {model_name}, using hashed TF-IDF: {str(e)}")
+    return HashingEmbedder()
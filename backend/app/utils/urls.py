@@ -0,0 +1,111 @@
+"""
+URL helpers shared by the media and link services
+"""
+
+import hashlib
+import re
+from typing import Optional
+from urllib.parse import urlparse, parse_qs, parse_qsl, urlencode, urlunparse
+
+YOUTUBE_HOSTS = {"youtube.com", "www.youtube.com", "m.youtube.com", "music.youtube.com"}
+YOUTU_BE_HOSTS = {"youtu.be", "www.youtu.be"}
+_YOUTUBE_ID = re.compile(r"^[A-Za-z0-9_-]{11}$")
+
+def youtube_video_id(url: str) -> Optional[str]:
+    """Extract the 11-character id from any common YouTube URL form"""
+    try:
+        parsed = urlparse(url.strip())
+    except ValueError:
+        return None
+    host = (parsed.hostname or "").lower()
+    candidate = None
+    if host in YOUTU_BE_HOSTS:
+        candidate = parsed.path.lstrip("/").split("/")[0]
+    elif host in YOUTUBE_HOSTS or host == "youtube-nocookie.com" or host == "www.youtube-nocookie.com":
+        if parsed.path == "/watch":
+            candidate = parse_qs(parsed.query).get("v", [None])[0]
+        else:
+            parts = parsed.path.strip("/").split("/")
+            if len(parts) >= 2 and parts[0] in ("embed", "v", "shorts", "live"):
+                candidate = parts[1]
+    if candidate and _YOUTUBE_ID.match(candidate):
+        return candidate
+    return None
+
+def vimeo_video_id(url: str) -> Optional[str]:
+    try:
+        parsed = urlparse(url.strip())
+    except ValueError:
+        return None
+    host = (parsed.hostname or "").lower()
+    if host not in ("vimeo.com", "www.vimeo.com", "player.vimeo.com"):
+        return None
+    for part in parsed.path.strip("/").split("/"):
+        if part.isdigit():
+            return part
+    return None
+
+def video_id(url: str) -> Optional[str]:
+    """Provider-prefixed video id, e.g. 'youtube:dQw4w9WgXcQ'"""
+    vid = youtube_video_id(url)
+    if vid:
+        return f"youtube:{vid}"
+    vid = vimeo_video_id(url)
+    if vid:
+        return f"vimeo:{vid}"
+    return None
+
+# Query parameters that only identify the referrer or campaign
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "gbraid", "wbraid", "msclkid", "yclid", "twclid",
+    "igshid", "mc_cid", "mc_eid", "_hsenc", "_hsmi", "mkt_tok", "ref_src", "ref_url",
+    "si", "feature", "spm", "oly_anon_id", "oly_enc_id", "vero_id", "wickedid",
+}
+TRACKING_PREFIXES = ("utm_", "pk_", "hsa_")
+URL_CLIP_TYPES = ("link", "image", "video")
+
+def _is_tracking(param: str) -> bool:
+    param = param.lower()
+    return param in TRACKING_PARAMS or param.startswith(TRACKING_PREFIXES)
+
+def canonicalize_url(url: str) -> Optional[str]:
+    """
+    Normalize a URL so different spellings of the same resource compare
+    equal: lowercase scheme and host, no default port, no fragment, no
+    tracking parameters, sorted query, and one form for YouTube videos.
+    Returns None for anything that is not an absolute http(s) URL.
+    """
+    if not url:
+        return None
+    try:
+        parsed = urlparse(url.strip())
+        port = parsed.port
+    except ValueError:
+        return None
+    scheme = parsed.scheme.lower()
+    host = (parsed.hostname or "").lower().rstrip(".")
+    if scheme not in ("http", "https") or not host:
+        return None
+
+    vid = youtube_video_id(url)
+    if vid:
+        return f"https://www.youtube.com/watch?v={vid}"
+
+    if port and not ((scheme == "http" and port == 80) or (scheme == "https" and port == 443)):
+        host = f"{host}:{port}"
+    path = parsed.path or "/"
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if not _is_tracking(key)
+    )
+    return urlunparse((scheme, host, path, parsed.params, urlencode(query), ""))
+
+def canonical_url_hash(url: str) -> Optional[str]:
+    """Compact hash of the canonical form, as stored on clips"""
+    canonical = canonicalize_url(url)
+    if canonical is None:
+        return None
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).hexdigest()
+
+def clip_url_hash(type: str, value: str) -> Optional[str]:
+    return canonical_url_hash(value) if type in URL_CLIP_TYPES else None
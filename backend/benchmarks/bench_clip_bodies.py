@@ -0,0 +1,62 @@
+"""
+GET /clips listing cost with large bodies stored inline versus moved to
+clip_bodies, plus the storage saved by compression and deduplication.
+
+Usage (from backend/):
+    python -m benchmarks.bench_clip_bodies --clips 20000 --large 0.1
+"""
+import argparse
+import random
+import uuid
+from datetime import datetime
+
+from benchmarks.common import reset_database, create_user, timed
+from app.db.session import SessionLocal
+from sqlalchemy import func, select
+from app.core.responses import dumps
+from app.db.listing import clip_rows
+from app.models.db_models import Clip, ClipBody, Idea
+from app.services.clip_body_service import ClipBodyService
+
+def synthetic_bodies(n, large, seed=7):
+    rng = random.Random(seed)
+    words = [f"token{i}" for i in range(2000)]
+    # A few distinct large files, pasted repeatedly
+    files = ["\n".join(" ".join(rng.choices(words, k=12)) for _ in range(600)) for _ in range(50)]
+    return [rng.choice(files) if rng.random() < large else " ".join(rng.choices(words, k=30))
+            for _ in range(n)]
+
+def seed(db, user_id, values, bodies=None):
+    idea = Idea(id=str(uuid.uuid4()), name="Bench", user_id=user_id)
+    db.add(idea)
+    now = datetime.utcnow()
+    rows = [{"id": str(uuid.uuid4()), "type": "code", "value": value, "status": "active",
+             "created_at": now, "updated_at": now, "idea_id": idea.id} for value in values]
+    if bodies is not None:
+        bodies.store(db, rows)
+    db.execute(Clip.__table__.insert(), rows)
+    db.commit()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clips", type=int, default=20000)
+    parser.add_argument("--large", type=float, default=0.1, help="Fraction of clips with large bodies")
+    args = parser.parse_args()
+    values = synthetic_bodies(args.clips, args.large)
+    raw = sum(len(value.encode("utf-8")) for value in values)
+
+    for label, bodies in (("inline", None), ("out of row", ClipBodyService())):
+        reset_database()
+        db = SessionLocal()
+        user_id = create_user(db).id
+        with timed(f"{label}: write {args.clips} clips"):
+            seed(db, user_id, values, bodies)
+        with timed(f"{label}: list + serialize"):
+            size = len(dumps(clip_rows(db, user_id)))
+        stored = db.execute(select(func.sum(func.length(Clip.value)))).scalar() or 0
+        stored += db.execute(select(func.sum(func.length(ClipBody.data)))).scalar() or 0
+        print(f"  response {size / 1e6:.1f} MB, stored {stored / 1e6:.1f} MB of {raw / 1e6:.1f} MB")
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Re-sync an unchanged collector payload and compare with the first sync.
+
+Usage (from backend/):
+    python -m benchmarks.bench_collect_resync --clips 50000
+"""
+import argparse
+import contextlib
+import io
+
+from benchmarks.common import reset_database, create_user, timed, engine
+from app.db.session import SessionLocal
+from sqlalchemy import event
+from fastapi import BackgroundTasks
+from app.models.schemas import ClipkitPayload
+from app.routes.collect import collect
+
+def build_payload(user, clips, clips_per_idea, tags):
+    ideas = []
+    for i in range(0, clips, clips_per_idea):
+        ideas.append({
+            "id": f"idea-{i // clips_per_idea}",
+            "name": f"Idea {i // clips_per_idea}",
+            "category": "bench",
+            "clips": [
+                {
+                    "id": f"clip-{n}",
+                    "type": "text",
+                    "value": f"Clip body {n} " * 8,
+                    "status": "active",
+                    "created_at": "2026-01-01T00:00:00Z",
+                    "tags": [{"id": f"tag-{n % tags}", "name": f"tag {n % tags}"}],
+                }
+                for n in range(i, min(i + clips_per_idea, clips))
+            ],
+        })
+    return ClipkitPayload(
+        user={"id": user.id, "name": user.name, "email": user.email},
+        ideas=ideas,
+    )
+
+def run_collect(payload, user):
+    statements = []
+    record = lambda *args: statements.append(args[2])
+    event.listen(engine, "before_cursor_execute", record)
+    db = SessionLocal()
+    try:
+        # get_current_user normally supplies this from its own session
+        current_user = db.merge(user)
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = collect(payload, BackgroundTasks(), db=db, current_user=current_user)
+    finally:
+        db.close()
+        event.remove(engine, "before_cursor_execute", record)
+    writes = sum(1 for s in statements if not s.lstrip().upper().startswith("SELECT"))
+    return result, len(statements), writes
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clips", type=int, default=50000)
+    parser.add_argument("--clips-per-idea", type=int, default=100)
+    parser.add_argument("--tags", type=int, default=200)
+    args = parser.parse_args()
+
+    reset_database()
+    db = SessionLocal()
+    user = create_user(db)
+    db.close()
+    payload = build_payload(user, args.clips, args.clips_per_idea, args.tags)
+
+    with timed(f"initial sync ({args.clips} clips)"):
+        result, statements, writes = run_collect(payload, user)
+    print(f"  written={result['written']} skipped={result['skipped']} statements={statements} writes={writes}")
+
+    with timed("unchanged re-sync"):
+        result, statements, writes = run_collect(payload, user)
+    print(f"  written={result['written']} skipped={result['skipped']} statements={statements} writes={writes}")
+
+    payload.ideas[0].clips[0].value = "edited"
+    with timed("re-sync with one edited clip"):
+        result, statements, writes = run_collect(payload, user)
+    print(f"  written={result['written']} skipped={result['skipped']} statements={statements} writes={writes}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Near-duplicate detection throughput: MinHash signatures, LSH banding and
+candidate verification over a large synthetic corpus, plus the per-idea
+duplicate query against the database.
+
+A fraction of the clips are planted near-duplicates (one word changed) of
+earlier clips, so recall of the banded index is reported too.
+
+Usage (from backend/):
+    python -m benchmarks.bench_dedupe --clips 1000000 --db-clips 20000
+"""
+import argparse
+import uuid
+
+import numpy as np
+from benchmarks.common import reset_database, create_user, timed
+from app.db.session import SessionLocal
+from app.models.db_models import Clip, Idea
+from app.services.dedupe_service import DedupeService
+from app.utils import minhash
+
+def synthetic_clips(n, dup_rate, words=50, vocab=20000, seed=1):
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array([f"w{i}" for i in range(vocab)])
+    docs = rng.integers(0, vocab, size=(n, words))
+    dup_of = np.full(n, -1)
+    dups = np.flatnonzero(rng.random(n) < dup_rate)
+    dups = dups[dups > 0]
+    dup_of[dups] = rng.integers(0, dups)
+    docs[dups] = docs[dup_of[dups]]
+    docs[dups, rng.integers(0, words, len(dups))] = rng.integers(0, vocab, len(dups))
+    texts = [" ".join(row) for row in vocabulary[docs]]
+    return texts, dup_of
+
+def bench_memory(n, dup_rate, threshold):
+    results = {}
+    texts, dup_of = synthetic_clips(n, dup_rate)
+    with timed(f"signatures ({n} clips)", results):
+        sigs = np.stack(minhash.signatures([("text", text) for text in texts]))
+    with timed("band keys", results):
+        keys = minhash.band_keys(sigs)
+    with timed("candidate pairs", results):
+        members = np.repeat(np.arange(n), minhash.BANDS)
+        pairs = minhash.candidate_pairs(members, keys.ravel())
+    with timed("verify candidates", results):
+        scores = minhash.similarity(sigs[pairs[:, 0]], sigs[pairs[:, 1]])
+        found = pairs[scores >= threshold]
+
+    planted = {(int(min(i, d)), int(max(i, d))) for i, d in enumerate(dup_of) if d >= 0}
+    found_set = {tuple(pair) for pair in found.tolist()}
+    print(f"  candidates {len(pairs)}, confirmed {len(found)}, planted {len(planted)}")
+    print(f"  recall of planted pairs: {len(planted & found_set) / max(len(planted), 1):.3f}")
+    print(f"  signatures/s: {n / results[f'signatures ({n} clips)']:,.0f}")
+
+def bench_database(n, dup_rate):
+    reset_database()
+    db = SessionLocal()
+    try:
+        user = create_user(db)
+        idea = Idea(id=str(uuid.uuid4()), name="Bench", user_id=user.id)
+        db.add(idea)
+        db.commit()
+        texts, _ = synthetic_clips(n, dup_rate, seed=2)
+        rows = [
+            {"id": str(uuid.uuid4()), "type": "text", "value": text, "status": "active",
+             "idea_id": idea.id}
+            for text in texts
+        ]
+        service = DedupeService()
+        with timed(f"sign + index {n} clips in the database"):
+            for row, signature in zip(rows, service.signatures(rows)):
+                row["minhash"] = signature
+            db.execute(Clip.__table__.insert(), rows)
+            service.index(db, rows)
+            db.commit()
+        with timed("GET /ideas/{id}/duplicates query"):
+            groups = service.duplicate_groups(db, idea.id)
+        print(f"  {len(groups)} duplicate groups")
+    finally:
+        db.close()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clips", type=int, default=1_000_000)
+    parser.add_argument("--db-clips", type=int, default=20_000)
+    parser.add_argument("--dup-rate", type=float, default=0.05)
+    parser.add_argument("--threshold", type=float, default=0.8)
+    args = parser.parse_args()
+    bench_memory(args.clips, args.dup_rate, args.threshold)
+    if args.db_clips:
+        bench_database(args.db_clips, args.dup_rate)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Throughput, time to first byte and peak memory of the streaming exports.
+
+Usage (from backend/):
+    python -m benchmarks.bench_export --clips 200000
+"""
+import argparse
+import time
+import tracemalloc
+import uuid
+
+from benchmarks.common import reset_database, create_user
+from app.db.session import SessionLocal
+from app.models.db_models import Clip, Idea, Tag, clip_tags
+from app.services.export_service import ExportService
+
+def populate(db, user_id, n_clips, n_ideas, batch=10000):
+    ideas = [{"id": str(uuid.uuid4()), "name": f"Idea {i}", "user_id": user_id} for i in range(n_ideas)]
+    db.execute(Idea.__table__.insert(), ideas)
+    tags = [{"id": str(uuid.uuid4()), "name": f"tag{i}"} for i in range(50)]
+    db.execute(Tag.__table__.insert(), tags)
+    for start in range(0, n_clips, batch):
+        clips = [{
+            "id": str(uuid.uuid4()), "type": "text", "status": "active",
+            "value": f"clip {i} " + "lorem ipsum dolor sit amet " * 8,
+            "idea_id": ideas[i % n_ideas]["id"],
+        } for i in range(start, min(start + batch, n_clips))]
+        db.execute(Clip.__table__.insert(), clips)
+        db.execute(clip_tags.insert(), [
+            {"clip_id": clip["id"], "tag_id": tags[i % len(tags)]["id"]} for i, clip in enumerate(clips)
+        ])
+    db.commit()
+
+def measure(label, chunks):
+    tracemalloc.start()
+    start = time.perf_counter()
+    first = None
+    total = 0
+    for chunk in chunks:
+        if first is None:
+            first = time.perf_counter() - start
+        total += len(chunk)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<10} {total / 1e6:8.1f} MB in {elapsed:6.2f} s  "
+          f"first byte {first * 1000:7.1f} ms  peak {peak / 1e6:6.1f} MB")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clips", type=int, default=200000)
+    parser.add_argument("--ideas", type=int, default=500)
+    args = parser.parse_args()
+
+    reset_database()
+    db = SessionLocal()
+    user_id = create_user(db).id
+    populate(db, user_id, args.clips, args.ideas)
+    db.close()
+
+    service = ExportService()
+    for format in ("jsonl", "markdown", "zip"):
+        measure(format, getattr(service, format)(user_id))
+
+if __name__ == "__main__":
+    main()
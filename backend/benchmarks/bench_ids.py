@@ -0,0 +1,72 @@
+"""
+Insert throughput and index size with random UUIDv4 strings as keys versus
+time-ordered UUIDv7 ids stored as 16 bytes (app.db.types.CompactId).
+
+Uses standalone tables shaped like clips (id primary key plus an
+(idea_id, created_at) index), so nothing else in the schema skews the
+numbers. Page counts come from SQLite's dbstat table when available.
+
+Usage (from backend/):
+    python -m benchmarks.bench_ids --rows 200000
+"""
+import argparse
+import uuid
+from datetime import datetime
+
+from benchmarks.common import engine, timed
+from sqlalchemy import Column, DateTime, Index, MetaData, String, Table, Text, insert, text
+from app.db.types import CompactId
+from app.utils.ids import new_id
+
+BATCH = 5000
+
+def make_table(metadata, name, id_type):
+    table = Table(
+        name, metadata,
+        Column("id", id_type, primary_key=True),
+        Column("idea_id", id_type, nullable=False),
+        Column("created_at", DateTime),
+        Column("value", Text),
+    )
+    Index(f"ix_{name}_idea_id_created_at", table.c.idea_id, table.c.created_at)
+    return table
+
+def index_pages(conn, name):
+    try:
+        return conn.execute(text(
+            "SELECT name, count(*) FROM dbstat WHERE name IN (:table, :pk, :ix) GROUP BY name"
+        ), {"table": name, "pk": f"sqlite_autoindex_{name}_1", "ix": f"ix_{name}_idea_id_created_at"}).all()
+    except Exception:
+        return []
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--ideas", type=int, default=200)
+    args = parser.parse_args()
+
+    variants = (
+        ("uuid4 text", String, lambda: str(uuid.uuid4())),
+        ("uuid7 binary", CompactId, new_id),
+    )
+    for name, id_type, make_id in variants:
+        metadata = MetaData()
+        table = make_table(metadata, f"bench_{name.replace(' ', '_')}", id_type)
+        metadata.drop_all(engine)
+        metadata.create_all(engine)
+        ideas = [make_id() for _ in range(args.ideas)]
+        with timed(f"{name}: insert {args.rows} rows"):
+            with engine.begin() as conn:
+                for start in range(0, args.rows, BATCH):
+                    now = datetime.utcnow()
+                    conn.execute(insert(table), [
+                        {"id": make_id(), "idea_id": ideas[i % args.ideas], "created_at": now, "value": "x"}
+                        for i in range(start, min(start + BATCH, args.rows))
+                    ])
+        with engine.connect() as conn:
+            for index, pages in index_pages(conn, table.name):
+                print(f"  {index:<45} {pages:8d} pages")
+        metadata.drop_all(engine)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Compare serialization of a large GET /clips response: ORM instances through
+jsonable_encoder + json (the old path) against SQL rows + FastJSONResponse.
+
+Usage (from backend/):
+    python -m benchmarks.bench_serialization --clips 10000
+"""
+import argparse
+import json
+import time
+import uuid
+from datetime import datetime
+
+from benchmarks.common import reset_database, create_user
+from app.db.session import SessionLocal
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy.orm import selectinload
+from typing import List
+from app.core.responses import dumps
+from app.db.listing import clip_rows
+from app.models.db_models import Clip, Idea, Tag, clip_tags
+from app.models.schemas import ClipOut
+
+def seed(db, user, clips, tags_per_clip=2, tag_count=100):
+    idea = Idea(id=str(uuid.uuid4()), name="Bench", user_id=user.id)
+    db.add(idea)
+    tags = [{"id": str(uuid.uuid4()), "name": f"tag-{i}"} for i in range(tag_count)]
+    db.execute(Tag.__table__.insert(), tags)
+    now = datetime.utcnow()
+    rows = [
+        {
+            "id": str(uuid.uuid4()), "type": "text", "value": f"Clip body {i} " * 10,
+            "status": "active", "created_at": now, "updated_at": now, "idea_id": idea.id,
+        }
+        for i in range(clips)
+    ]
+    db.execute(Clip.__table__.insert(), rows)
+    links = [
+        {"clip_id": row["id"], "tag_id": tags[(i + k) % tag_count]["id"]}
+        for i, row in enumerate(rows) for k in range(tags_per_clip)
+    ]
+    db.execute(clip_tags.insert(), links)
+    db.commit()
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clips", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    reset_database()
+    db = SessionLocal()
+    user = create_user(db)
+    seed(db, user, args.clips)
+
+    orm_clips = (
+        db.query(Clip).join(Idea).filter(Idea.user_id == user.id)
+        .options(selectinload(Clip.tags)).all()
+    )
+    rows = clip_rows(db, user.id)
+    adapter = TypeAdapter(List[ClipOut])
+
+    def orm_path():
+        # What FastAPI did for a route returning ORM objects with no response_model
+        json.dumps(jsonable_encoder(orm_clips)).encode("utf-8")
+
+    def adapter_path():
+        adapter.dump_json(adapter.validate_python(orm_clips, from_attributes=True))
+
+    def rows_path():
+        dumps(rows)
+
+    results = {
+        "jsonable_encoder + json (ORM)": best_of(orm_path, args.repeat),
+        "TypeAdapter from_attributes (ORM)": best_of(adapter_path, args.repeat),
+        "FastJSONResponse (SQL rows)": best_of(rows_path, args.repeat),
+    }
+    baseline = results["jsonable_encoder + json (ORM)"]
+    print(f"Serializing {args.clips} clips (best of {args.repeat}):")
+    for label, elapsed in results.items():
+        print(f"  {label:<36} {elapsed * 1000:8.1f} ms  {baseline / elapsed:5.1f}x")
+
+    query_and_serialize = best_of(lambda: dumps(clip_rows(db, user.id)), args.repeat)
+    print(f"  {'clip_rows query + serialize':<36} {query_and_serialize * 1000:8.1f} ms")
+    db.close()
+
+if __name__ == "__main__":
+    main()
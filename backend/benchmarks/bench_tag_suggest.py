@@ -0,0 +1,64 @@
+"""
+Latency of tag suggestions for a user with many tags, and the cost of the
+incremental model updates applied on each clip write.
+
+Usage (from backend/):
+    python -m benchmarks.bench_tag_suggest --tags 10000 --clips 50000
+"""
+import argparse
+import time
+
+import numpy as np
+from benchmarks.common import timed
+from app.services.tag_suggestion_service import TagModel
+
+def synthetic_clips(n, tags, vocab, words=40, seed=3):
+    rng = np.random.default_rng(seed)
+    # Zipf-distributed words, so common terms carry thousands of tags
+    word_ids = np.minimum(rng.zipf(1.3, size=(n, words)), vocab) - 1
+    tag_ids = rng.integers(0, tags, size=(n, 3))
+    # Give each tag a few characteristic words
+    word_ids[:, :3] = (tag_ids * 7 + 11) % vocab
+    texts = [" ".join(f"word{w}" for w in row) for row in word_ids]
+    clip_tags = [[f"tag{t}" for t in set(row)] for row in tag_ids.tolist()]
+    return texts, clip_tags
+
+def percentile(samples, p):
+    return float(np.percentile(np.array(samples) * 1000, p))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tags", type=int, default=10000)
+    parser.add_argument("--clips", type=int, default=50000)
+    parser.add_argument("--vocab", type=int, default=30000)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    texts, clip_tags = synthetic_clips(args.clips, args.tags, args.vocab)
+    model = TagModel()
+    with timed(f"build model ({args.clips} tagged clips)"):
+        for text, tags in zip(texts, clip_tags):
+            model.load(text, tags)
+        model.finish()
+    print(f"  {len(model.tag_clips)} tags, {len(model.term_clips)} terms")
+
+    queries, _ = synthetic_clips(args.queries, args.tags, args.vocab, seed=4)
+    latencies = []
+    for i, text in enumerate(queries):
+        chosen = clip_tags[i][:1] if i % 2 else []
+        start = time.perf_counter()
+        model.suggest(text, chosen, 5)
+        latencies.append(time.perf_counter() - start)
+    print(f"suggest p50 {percentile(latencies, 50):.3f} ms  "
+          f"p99 {percentile(latencies, 99):.3f} ms  max {percentile(latencies, 100):.3f} ms")
+
+    updates = []
+    for i in range(min(1000, args.clips)):
+        start = time.perf_counter()
+        model.apply(texts[i], clip_tags[i], -1)
+        model.apply(texts[i], clip_tags[(i + 1) % args.clips], 1)
+        updates.append(time.perf_counter() - start)
+    print(f"retag update p50 {percentile(updates, 50):.3f} ms  p99 {percentile(updates, 99):.3f} ms")
+
+if __name__ == "__main__":
+    main()
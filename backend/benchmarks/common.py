@@ -0,0 +1,42 @@
+"""
+Shared setup for the standalone benchmark scripts.
+
+Import this module before anything from `app`: the app reads DATABASE_URL
+at import time, so it must point at a scratch database first.
+"""
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+if "BENCH_DATABASE_URL" in os.environ:
+    os.environ["DATABASE_URL"] = os.environ["BENCH_DATABASE_URL"]
+else:
+    _db_dir = tempfile.mkdtemp(prefix="clipkit-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'bench.db')}"
+
+from app.db.session import engine
+from app.models.db_models import Base, User
+
+def reset_database():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+def create_user(db, email="bench@example.com"):
+    user = User(name="Bench User", email=email, hashed_password="x")
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+@contextmanager
+def timed(label, results=None):
+    start = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {elapsed * 1000:10.1f} ms")
+    if results is not None:
+        results[label] = elapsed
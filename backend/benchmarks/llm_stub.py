@@ -0,0 +1,179 @@
+"""
+Local stand-in for an OpenAI-compatible chat completions API.
+
+Serves /openai/v1/chat/completions, the path layout Groq uses, plain or
+streamed as server-sent events. Output is made-up text derived from a hash
+of the request, so the same request always gets the same completion.
+Latency is shaped by a time to first token and a token rate, and a share of
+requests can fail with a 500 or be rate limited with a 429 and Retry-After.
+
+Usage (from backend/):
+    python -m benchmarks.llm_stub --port 8001 --ttft 0.3 --tokens-per-sec 80 --rate-limit-rate 0.05
+
+Then point the API server at it:
+    GROQ_API_KEY=stub GROQ_API_BASE=http://127.0.0.1:8001/openai/v1 uvicorn app.main:app
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORDS = (
+    "idea research note draft outline source quote summary insight theme "
+    "pattern example argument evidence context reader audience story point "
+    "detail structure section claim question answer trend signal data "
+    "practice lesson approach method result impact value change growth"
+).split()
+SENTENCE_WORDS = 12
+PARAGRAPH_WORDS = 60
+
+@dataclass
+class StubConfig:
+    ttft: float = 0.2
+    tokens_per_sec: float = 50.0
+    # Upper bound on completion length; a smaller max_tokens wins
+    completion_tokens: int = 400
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after: float = 1.0
+    seed: int = 1
+
+def _error(status: int, message: str, type_: str, headers: Dict[str, str] = None) -> JSONResponse:
+    return JSONResponse({"error": {"message": message, "type": type_}}, status_code=status, headers=headers)
+
+def completion_tokens(body: Dict[str, Any], seed: int, limit: int) -> List[str]:
+    """The tokens of the completion for a request, the same on every call"""
+    key = json.dumps([body.get("model"), body.get("messages")], sort_keys=True)
+    rng = random.Random(f"{seed}:{key}")
+    count = min(int(body.get("max_tokens") or limit), limit)
+    tokens = ["#", " Stub", " completion", "\n\n"]
+    words = 0
+    while len(tokens) < count:
+        word = rng.choice(WORDS)
+        words += 1
+        if words % SENTENCE_WORDS == 1:
+            word = word.capitalize()
+        tokens.append(word if tokens[-1].endswith("\n\n") else f" {word}")
+        if words % PARAGRAPH_WORDS == 0:
+            tokens.append(".\n\n")
+        elif words % SENTENCE_WORDS == 0:
+            tokens.append(".")
+    return tokens[:count]
+
+def create_app(config: StubConfig) -> FastAPI:
+    app = FastAPI(title="LLM stub")
+    # One draw per request decides its fate, so a run replays exactly
+    faults = random.Random(config.seed)
+    stats = app.state.stats = {"requests": 0, "errors": 0, "rate_limited": 0, "streams": 0}
+
+    @app.get("/openai/v1/models")
+    async def models():
+        return {"object": "list", "data": [{"id": "stub", "object": "model", "owned_by": "stub"}]}
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+        draw = faults.random()
+        if draw < config.error_rate:
+            stats["errors"] += 1
+            return _error(500, "Stub server error", "server_error")
+        if draw < config.error_rate + config.rate_limit_rate:
+            stats["rate_limited"] += 1
+            return _error(429, "Rate limit reached", "rate_limit_exceeded",
+                          headers={"Retry-After": f"{config.retry_after:g}"})
+
+        tokens = completion_tokens(body, config.seed, config.completion_tokens)
+        digest = hashlib.sha256("".join(tokens).encode("utf-8")).hexdigest()[:24]
+        model = body.get("model", "stub")
+        created = int(time.time())
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in body.get("messages", []))
+        finish = "length" if body.get("max_tokens") and len(tokens) >= int(body["max_tokens"]) else "stop"
+        started = time.monotonic()
+
+        if body.get("stream"):
+            stats["streams"] += 1
+
+            def chunk(delta, finish_reason=None):
+                data = {
+                    "id": f"chatcmpl-{digest}", "object": "chat.completion.chunk", "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                }
+                return f"data: {json.dumps(data)}\n\n"
+
+            async def events():
+                await asyncio.sleep(config.ttft)
+                yield chunk({"role": "assistant", "content": ""})
+                for i, token in enumerate(tokens):
+                    if config.tokens_per_sec > 0:
+                        # Pace against the start time so sleeps don't drift
+                        delay = started + config.ttft + i / config.tokens_per_sec - time.monotonic()
+                        if delay > 0:
+                            await asyncio.sleep(delay)
+                    yield chunk({"content": token})
+                yield chunk({}, finish)
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        generation = len(tokens) / config.tokens_per_sec if config.tokens_per_sec > 0 else 0.0
+        await asyncio.sleep(config.ttft + generation)
+        return {
+            "id": f"chatcmpl-{digest}",
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "".join(tokens)},
+                "finish_reason": finish,
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(tokens),
+                "total_tokens": prompt_tokens + len(tokens),
+            },
+        }
+
+    return app
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible LLM stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--ttft", type=float, default=StubConfig.ttft,
+                        help="seconds before the first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=StubConfig.tokens_per_sec,
+                        help="token rate after the first; 0 for no pacing")
+    parser.add_argument("--completion-tokens", type=int, default=StubConfig.completion_tokens,
+                        help="longest completion, in tokens")
+    parser.add_argument("--error-rate", type=float, default=StubConfig.error_rate,
+                        help="share of requests answered with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=StubConfig.rate_limit_rate,
+                        help="share of requests answered with a 429")
+    parser.add_argument("--retry-after", type=float, default=StubConfig.retry_after,
+                        help="Retry-After seconds sent with a 429")
+    parser.add_argument("--seed", type=int, default=StubConfig.seed)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    import uvicorn
+
+    args = parse_args(argv)
+    config = StubConfig(
+        ttft=args.ttft, tokens_per_sec=args.tokens_per_sec, completion_tokens=args.completion_tokens,
+        error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate, retry_after=args.retry_after,
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,396 @@
+"""
+HTTP load test for a running API server.
+
+Virtual users log in and then run one scenario in a closed loop. Each
+iteration is one user action made of one or more requests:
+
+  dashboard   browse ideas, summaries, an idea's clips, tags and single clips
+  clipping    create, edit, look up and delete clips, and ask for tag suggestions
+  collector   re-send a collector tree with a few edits, then page through /sync
+  generate    content generation for a handful of clips. Point the server's AI
+              service at benchmarks/llm_stub.py with GROQ_API_BASE, or leave
+              GROQ_API_KEY unset for mock output.
+
+Concurrency ramps through --stages. Each stage runs for --stage-seconds and
+reports throughput plus p50/p95/p99 latency per route as JSON. Routes are
+keyed by method and path template, so reports from different commits line
+up. With --baseline, the run fails when a route's p95 or a stage's
+throughput is more than --max-regression worse than the baseline's.
+
+Usage (from backend/, with the server running and seeded, e.g. by
+scripts/seed_database.py):
+    python -m benchmarks.load_test --scenario dashboard --stages 1,8,32 --output dashboard.json
+    python -m benchmarks.load_test --scenario dashboard --stages 1,8,32 --baseline dashboard.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import platform
+import random
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+REPORT_VERSION = 1
+# Routes with fewer samples in a stage are not compared against the baseline
+MIN_SAMPLES = 20
+# p95 differences below this are noise, whatever the ratio
+NOISE_FLOOR_MS = 2.0
+MAX_TRACKED_CLIPS = 200
+
+@dataclass
+class Account:
+    email: str
+    password: Optional[str] = None
+    name: Optional[str] = None
+    token: Optional[str] = None
+
+class Recorder:
+    """Latencies and failures per route for one stage"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.statuses: Dict[str, Dict[str, int]] = {}
+
+    def record(self, route: str, seconds: float, status: Optional[int]) -> None:
+        self.latencies.setdefault(route, []).append(seconds)
+        key = str(status) if status is not None else "failed"
+        counts = self.statuses.setdefault(route, {})
+        counts[key] = counts.get(key, 0) + 1
+        if status is None or (status >= 400 and status != 404):
+            self.errors[route] = self.errors.get(route, 0) + 1
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, min(len(sorted_values), math.ceil(q * len(sorted_values) / 100)))
+    return sorted_values[rank - 1]
+
+def summarize(recorder: Recorder, concurrency: int, seconds: float) -> Dict[str, Any]:
+    routes = {}
+    for route in sorted(recorder.latencies):
+        values = sorted(recorder.latencies[route])
+        routes[route] = {
+            "count": len(values),
+            "errors": recorder.errors.get(route, 0),
+            "statuses": recorder.statuses[route],
+            "rps": round(len(values) / seconds, 2),
+            "p50_ms": round(percentile(values, 50) * 1000, 2),
+            "p95_ms": round(percentile(values, 95) * 1000, 2),
+            "p99_ms": round(percentile(values, 99) * 1000, 2),
+            "max_ms": round(values[-1] * 1000, 2),
+        }
+    total = sum(route["count"] for route in routes.values())
+    return {
+        "concurrency": concurrency,
+        "seconds": round(seconds, 2),
+        "requests": total,
+        "errors": sum(route["errors"] for route in routes.values()),
+        "throughput_rps": round(total / seconds, 2),
+        "routes": routes,
+    }
+
+class VirtualUser:
+    """One logged-in client and what it knows about its data"""
+
+    def __init__(self, client: httpx.AsyncClient, account: Account, number: int, seed: int):
+        self.client = client
+        self.account = account
+        self.number = number
+        self.rng = random.Random(f"{seed}:{number}")
+        self.recorder = Recorder()
+        self.user_id: Optional[str] = None
+        self.idea_ids: List[str] = []
+        self.clip_ids: Dict[str, List[str]] = {}
+        self.created: List[str] = []
+        self.etag: Optional[str] = None
+        self.cursor: Optional[str] = None
+        self.collector_tree: Optional[List[Dict[str, Any]]] = None
+
+    async def request(self, method: str, route: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        """Send a request and record its latency under the route template"""
+        headers = kwargs.pop("headers", {})
+        headers["Authorization"] = f"Bearer {self.account.token}"
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, headers=headers, **kwargs)
+        except httpx.HTTPError:
+            self.recorder.record(route, time.perf_counter() - started, None)
+            return None
+        self.recorder.record(route, time.perf_counter() - started, response.status_code)
+        return response
+
+    async def setup(self) -> None:
+        if self.account.token is None:
+            await login(self.client, self.account)
+        response = await self.request("GET", "GET /ideas", "/ideas")
+        ideas = response.json() if response is not None and response.status_code == 200 else []
+        if not ideas:
+            response = await self.request("POST", "POST /ideas", "/ideas", json={"name": "Load test"})
+            ideas = [response.json()]
+        self.user_id = ideas[0]["user_id"]
+        self.idea_ids = [idea["id"] for idea in ideas]
+        self.recorder = Recorder()
+
+    async def clips_of(self, idea_id: str) -> List[str]:
+        if idea_id not in self.clip_ids:
+            response = await self.request("GET", "GET /clips?idea", "/clips", params={"idea": idea_id})
+            clips = response.json() if response is not None and response.status_code == 200 else []
+            self.clip_ids[idea_id] = [clip["id"] for clip in clips[:MAX_TRACKED_CLIPS]]
+        return self.clip_ids[idea_id]
+
+async def login(client: httpx.AsyncClient, account: Account, register: bool = False) -> None:
+    response = await client.post("/auth/login", data={"username": account.email, "password": account.password})
+    if response.status_code == 401 and register:
+        response = await client.post("/auth/register", json={
+            "email": account.email, "password": account.password, "name": account.name or account.email,
+        })
+    response.raise_for_status()
+    account.token = response.json()["access_token"]
+
+# Scenarios: one user action per call
+
+async def dashboard(vu: VirtualUser) -> None:
+    # Returning visitors revalidate the idea list with the ETag they hold
+    headers = {"If-None-Match": vu.etag} if vu.etag and vu.rng.random() < 0.5 else {}
+    response = await vu.request("GET", "GET /ideas", "/ideas", headers=headers)
+    if response is not None:
+        vu.etag = response.headers.get("etag", vu.etag)
+    await vu.request("GET", "GET /ideas/summary", "/ideas/summary")
+    idea_id = vu.rng.choice(vu.idea_ids)
+    vu.clip_ids.pop(idea_id, None)
+    clips = await vu.clips_of(idea_id)
+    if vu.rng.random() < 0.3:
+        await vu.request("GET", "GET /tags", "/tags")
+    for clip_id in vu.rng.sample(clips, min(2, len(clips))):
+        await vu.request("GET", "GET /clips/{id}", f"/clips/{clip_id}")
+
+async def clipping(vu: VirtualUser) -> None:
+    idea_id = vu.rng.choice(vu.idea_ids)
+    kind = vu.rng.choice(["text", "text", "link", "code"])
+    n = vu.rng.randrange(10 ** 6)
+    content = (f"https://example.com/article/{n}" if kind == "link"
+               else f"Load test note {n}: " + " ".join(f"word{vu.rng.randrange(500)}" for _ in range(40)))
+    if kind == "link":
+        await vu.request("GET", "GET /clips/lookup", "/clips/lookup", params={"url": content})
+    else:
+        await vu.request("POST", "POST /tags/suggest", "/tags/suggest", json={"content": content})
+    response = await vu.request("POST", "POST /clips", "/clips", json={
+        "type": kind, "content": content, "idea_id": idea_id, "tags": [f"load-{n % 20}"],
+    })
+    if response is not None and response.status_code == 201:
+        vu.created.append(response.json()["id"])
+    if vu.created and vu.rng.random() < 0.3:
+        await vu.request("PUT", "PUT /clips/{id}", f"/clips/{vu.rng.choice(vu.created)}",
+                         json={"status": "archived"})
+    # Delete as many as are created, so the data set stays the same size
+    if len(vu.created) > 20:
+        await vu.request("DELETE", "DELETE /clips/{id}", f"/clips/{vu.created.pop(0)}")
+
+async def collector(vu: VirtualUser) -> None:
+    if vu.collector_tree is None:
+        vu.collector_tree = [
+            {"id": f"load-{vu.number}-{i}", "name": f"Collected {i}", "clips": [
+                {"id": f"load-{vu.number}-{i}-{j}", "type": "text", "value": f"Collected clip {i}.{j}",
+                 "status": "active", "created_at": "2026-01-01T00:00:00Z", "tags": []}
+                for j in range(25)
+            ]}
+            for i in range(4)
+        ]
+    # A few edits since the last sync; everything else is re-sent unchanged
+    for _ in range(3):
+        clip = vu.rng.choice(vu.rng.choice(vu.collector_tree)["clips"])
+        clip["value"] = f"Collected clip edited {vu.rng.randrange(10 ** 6)}"
+    await vu.request("POST", "POST /collect", "/collect", json={
+        "user": {"id": vu.user_id, "name": vu.account.name or vu.account.email, "email": vu.account.email},
+        "ideas": vu.collector_tree, "deleted_ideas": [], "deleted_clips": [],
+    })
+    for _ in range(10):
+        params = {"limit": 500, **({"since": vu.cursor} if vu.cursor else {})}
+        response = await vu.request("GET", "GET /sync", "/sync", params=params)
+        if response is None or response.status_code != 200:
+            break
+        page = response.json()
+        vu.cursor = page["cursor"]
+        if not page["has_more"]:
+            break
+
+async def generate(vu: VirtualUser) -> None:
+    idea_id = vu.rng.choice(vu.idea_ids)
+    clips = await vu.clips_of(idea_id)
+    if not clips:
+        return
+    await vu.request("POST", "POST /content/generate", "/content/generate", json={
+        "idea_id": idea_id,
+        "clip_ids": vu.rng.sample(clips, min(5, len(clips))),
+        "content_type": vu.rng.choice(["blog", "tweet", "newsletter"]),
+        "tone": "informative",
+        "length": "short",
+    })
+
+SCENARIOS: Dict[str, Callable[[VirtualUser], Any]] = {
+    "dashboard": dashboard,
+    "clipping": clipping,
+    "collector": collector,
+    "generate": generate,
+}
+
+async def _drive(vu: VirtualUser, scenario, deadline: float, think: float) -> None:
+    while time.perf_counter() < deadline:
+        await scenario(vu)
+        if think:
+            await asyncio.sleep(vu.rng.expovariate(1 / think))
+
+async def run_load_test(
+    base_url: str,
+    scenario: str,
+    accounts: List[Account],
+    stages: List[int],
+    stage_seconds: float,
+    think: float = 0.0,
+    seed: int = 1,
+    register: bool = False,
+    transport: Optional[httpx.AsyncBaseTransport] = None,
+    timeout: float = 30.0,
+) -> List[Dict[str, Any]]:
+    """Run the stages one after another and return a summary per stage"""
+    limits = httpx.Limits(max_connections=max(stages), max_keepalive_connections=max(stages))
+    async with httpx.AsyncClient(base_url=base_url, transport=transport, limits=limits, timeout=timeout) as client:
+        for account in accounts:
+            if account.token is None:
+                await login(client, account, register)
+        users: List[VirtualUser] = []
+        results = []
+        for concurrency in stages:
+            # Users carry over between stages, so each stage only logs in the new ones
+            while len(users) < concurrency:
+                vu = VirtualUser(client, accounts[len(users) % len(accounts)], len(users), seed)
+                await vu.setup()
+                users.append(vu)
+            active = users[:concurrency]
+            for vu in active:
+                vu.recorder = Recorder()
+            started = time.perf_counter()
+            await asyncio.gather(*(
+                _drive(vu, SCENARIOS[scenario], started + stage_seconds, think) for vu in active
+            ))
+            elapsed = time.perf_counter() - started
+            merged = Recorder()
+            for vu in active:
+                for route, values in vu.recorder.latencies.items():
+                    merged.latencies.setdefault(route, []).extend(values)
+                for route, count in vu.recorder.errors.items():
+                    merged.errors[route] = merged.errors.get(route, 0) + count
+                for route, counts in vu.recorder.statuses.items():
+                    target = merged.statuses.setdefault(route, {})
+                    for status, count in counts.items():
+                        target[status] = target.get(status, 0) + count
+            results.append(summarize(merged, concurrency, elapsed))
+        return results
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """Human-readable regressions of report against baseline; empty if none"""
+    regressions = []
+    base_stages = {stage["concurrency"]: stage for stage in baseline["stages"]}
+    for stage in report["stages"]:
+        base = base_stages.get(stage["concurrency"])
+        if base is None:
+            continue
+        label = f"c={stage['concurrency']}"
+        if stage["throughput_rps"] < base["throughput_rps"] * (1 - max_regression):
+            regressions.append(f"{label}: throughput {base['throughput_rps']} -> {stage['throughput_rps']} rps")
+        if stage["errors"] > base["errors"]:
+            regressions.append(f"{label}: errors {base['errors']} -> {stage['errors']}")
+        for route, stats in stage["routes"].items():
+            old = base["routes"].get(route)
+            if old is None or min(old["count"], stats["count"]) < MIN_SAMPLES:
+                continue
+            if (stats["p95_ms"] > old["p95_ms"] * (1 + max_regression)
+                    and stats["p95_ms"] - old["p95_ms"] > NOISE_FLOOR_MS):
+                regressions.append(f"{label} {route}: p95 {old['p95_ms']} -> {stats['p95_ms']} ms")
+    return regressions
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def build_report(args: argparse.Namespace, stages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "version": REPORT_VERSION,
+        "scenario": args.scenario,
+        "commit": _commit(),
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "config": {
+            "base_url": args.base_url,
+            "accounts": args.accounts,
+            "stages": args.stages,
+            "stage_seconds": args.stage_seconds,
+            "think": args.think,
+            "seed": args.seed,
+        },
+        "stages": stages,
+    }
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="HTTP load test with scenario profiles")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="dashboard")
+    parser.add_argument("--stages", type=lambda s: [int(c) for c in s.split(",")], default=[1, 4, 16],
+                        help="Comma-separated concurrency levels, run in order")
+    parser.add_argument("--stage-seconds", type=float, default=20.0)
+    parser.add_argument("--think", type=float, default=0.0, help="Mean pause between a user's actions (s)")
+    parser.add_argument("--accounts", type=int, default=10, help="Distinct accounts the users are spread over")
+    parser.add_argument("--email", default="seed-user-{n}@example.com", help="Account email pattern")
+    parser.add_argument("--name", default="Seed User {n}", help="Account name pattern")
+    parser.add_argument("--password", default="password")
+    parser.add_argument("--register", action="store_true", help="Register accounts that cannot log in")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the JSON report here (default: stdout)")
+    parser.add_argument("--baseline", help="Report to compare against; exit 1 on regressions")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="Allowed slowdown of p95 and throughput, as a fraction")
+    return parser.parse_args(argv)
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    accounts = [
+        Account(args.email.format(n=n), args.password, args.name.format(n=n)) for n in range(args.accounts)
+    ]
+    stages = asyncio.run(run_load_test(
+        args.base_url, args.scenario, accounts, args.stages, args.stage_seconds,
+        think=args.think, seed=args.seed, register=args.register,
+    ))
+    report = build_report(args, stages)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    for stage in stages:
+        print(f"c={stage['concurrency']:<4} {stage['throughput_rps']:10.1f} rps  {stage['errors']} errors",
+              file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.max_regression)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
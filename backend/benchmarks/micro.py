@@ -0,0 +1,142 @@
+"""
+In-process micro-benchmarks with stored baselines and budgets.
+
+Each measurement runs a function repeatedly for its wall time, then once
+under tracemalloc for its peak allocation and once with a statement counter
+on the engine. The results are checked against benchmarks/micro_baselines.json:
+
+  statements  must not exceed the baseline; the count is exact, so any
+              extra query per call is a regression
+  peak_kib    must stay within ALLOC_TOLERANCE of the baseline
+  wall        the median must stay within PERF_WALL_TOLERANCE times the
+              baseline (default 3, 0 to skip). Baselines come from one
+              machine, so only large slowdowns are caught here.
+
+tests/test_perf_budgets.py runs them with the ordinary test suite. After an
+intended change, re-record the baselines with:
+    PERF_UPDATE_BASELINES=1 python -m pytest tests/test_perf_budgets.py
+"""
+import json
+import os
+import statistics
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import event
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "micro_baselines.json")
+UPDATE_BASELINES = os.getenv("PERF_UPDATE_BASELINES", "") not in ("", "0")
+WALL_TOLERANCE = float(os.getenv("PERF_WALL_TOLERANCE", "3"))
+ALLOC_TOLERANCE = 1.5
+# Allocation differences below this are noise from caches and interning
+ALLOC_SLACK_KIB = 64
+MIN_TIME = 0.2
+MAX_ROUNDS = 200
+
+@dataclass
+class Measurement:
+    name: str
+    rounds: int
+    min_ms: float
+    median_ms: float
+    peak_kib: float
+    statements: Optional[int]
+
+    def describe(self) -> str:
+        statements = "-" if self.statements is None else self.statements
+        return (f"{self.name}: median {self.median_ms:.3f} ms, min {self.min_ms:.3f} ms "
+                f"over {self.rounds} rounds, peak {self.peak_kib:.1f} KiB, {statements} statements")
+
+def _count_statements(bind, fn: Callable[[], Any]) -> int:
+    count = 0
+    def record(*args):
+        nonlocal count
+        count += 1
+    event.listen(bind, "before_cursor_execute", record)
+    try:
+        fn()
+    finally:
+        event.remove(bind, "before_cursor_execute", record)
+    return count
+
+def _peak_allocation(fn: Callable[[], Any]) -> float:
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return (peak - before) / 1024
+
+def measure(name: str, fn: Callable[[], Any], bind=None, min_time: float = MIN_TIME,
+            max_rounds: int = MAX_ROUNDS) -> Measurement:
+    """Time fn until min_time has passed, then take its allocations and statements
+
+    The first call is a warm-up and is not counted. Statements are only
+    counted when an engine is given.
+    """
+    fn()
+    timings: List[float] = []
+    deadline = time.perf_counter() + min_time
+    while len(timings) < max_rounds and (len(timings) < 3 or time.perf_counter() < deadline):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return Measurement(
+        name=name,
+        rounds=len(timings),
+        min_ms=round(min(timings), 4),
+        median_ms=round(statistics.median(timings), 4),
+        peak_kib=round(_peak_allocation(fn), 1),
+        statements=_count_statements(bind, fn) if bind is not None else None,
+    )
+
+def regressions(current: Measurement, baseline: Dict[str, Any],
+                wall_tolerance: float = WALL_TOLERANCE) -> List[str]:
+    """Ways the measurement is over its budget, empty when within it"""
+    found = []
+    if baseline.get("statements") is not None and current.statements is not None \
+            and current.statements > baseline["statements"]:
+        found.append(f"statements {baseline['statements']} -> {current.statements}")
+    allowed = baseline["peak_kib"] * ALLOC_TOLERANCE + ALLOC_SLACK_KIB
+    if current.peak_kib > allowed:
+        found.append(f"peak allocation {baseline['peak_kib']:.1f} -> {current.peak_kib:.1f} KiB")
+    if wall_tolerance and current.median_ms > baseline["median_ms"] * wall_tolerance:
+        found.append(f"median {baseline['median_ms']:.3f} -> {current.median_ms:.3f} ms")
+    return found
+
+class Baselines:
+    """The stored measurements, and the ones taken in this run"""
+
+    def __init__(self, path: str = BASELINE_PATH, update: bool = UPDATE_BASELINES):
+        self.path = path
+        self.update = update
+        self.results: List[Measurement] = []
+        try:
+            with open(path) as f:
+                self.stored: Dict[str, Dict[str, Any]] = json.load(f)
+        except FileNotFoundError:
+            self.stored = {}
+
+    def check(self, current: Measurement) -> List[str]:
+        """Record a measurement and return its regressions against the baseline"""
+        self.results.append(current)
+        if self.update:
+            return []
+        baseline = self.stored.get(current.name)
+        if baseline is None:
+            return [f"no baseline for {current.name}; record one with PERF_UPDATE_BASELINES=1"]
+        return regressions(current, baseline)
+
+    def save(self) -> None:
+        stored = dict(self.stored)
+        for result in self.results:
+            entry = asdict(result)
+            del entry["name"]
+            stored[result.name] = entry
+        with open(self.path, "w") as f:
+            json.dump(dict(sorted(stored.items())), f, indent=2)
+            f.write("\n")
@@ -0,0 +1,159 @@
+"""
+Local stand-in for a Redis server, speaking enough of the protocol for
+app.core.cache's resp backend: PING, AUTH, SELECT, GET, MGET, SET (with EX,
+PX, NX and XX), DEL, INCR, FLUSHDB and DBSIZE. Data lives in one dict per
+database and is lost on exit.
+
+Usage (from backend/):
+    python -m benchmarks.resp_stub --port 6390
+
+Then point the API server at it:
+    CACHE_BACKEND=resp CACHE_URL=redis://127.0.0.1:6390/0 uvicorn app.main:app
+"""
+import argparse
+import socketserver
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+class RespStub(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), RespHandler)
+        # db -> key -> (value, expires_at or None)
+        self.data: Dict[int, Dict[bytes, Tuple[bytes, Optional[float]]]] = {}
+        self.lock = threading.Lock()
+        self.commands = 0
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"redis://{host}:{port}/0"
+
+    def start(self) -> "RespStub":
+        """Serve from a daemon thread"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def db(self, index: int) -> Dict[bytes, Tuple[bytes, Optional[float]]]:
+        return self.data.setdefault(index, {})
+
+def _live(db, key: bytes) -> Optional[bytes]:
+    entry = db.get(key)
+    if entry is None:
+        return None
+    if entry[1] is not None and entry[1] <= time.monotonic():
+        del db[key]
+        return None
+    return entry[0]
+
+class RespHandler(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        self.db_index = 0
+
+    def _read_command(self) -> Optional[List[bytes]]:
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            # Inline command, as typed into telnet
+            return line.split()
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def _reply(self, value) -> bytes:
+        if value is None:
+            return b"$-1\r\n"
+        if isinstance(value, Exception):
+            return b"-ERR %s\r\n" % str(value).encode()
+        if isinstance(value, int):
+            return b":%d\r\n" % value
+        if isinstance(value, str):
+            return b"+%s\r\n" % value.encode()
+        if isinstance(value, list):
+            return b"*%d\r\n" % len(value) + b"".join(self._reply(item) for item in value)
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def handle(self):
+        while True:
+            args = self._read_command()
+            if args is None:
+                return
+            if not args:
+                continue
+            with self.server.lock:
+                self.server.commands += 1
+                try:
+                    reply = self.execute(args[0].upper().decode(), args[1:])
+                except Exception as e:
+                    reply = e
+            self.wfile.write(self._reply(reply))
+
+    def execute(self, name: str, args: List[bytes]):
+        db = self.server.db(self.db_index)
+        if name == "PING":
+            return "PONG"
+        if name == "AUTH":
+            return "OK"
+        if name == "SELECT":
+            self.db_index = int(args[0])
+            return "OK"
+        if name == "GET":
+            return _live(db, args[0])
+        if name == "MGET":
+            return [_live(db, key) for key in args]
+        if name == "SET":
+            key, value, options = args[0], args[1], [arg.upper() for arg in args[2:]]
+            expires_at = None
+            if b"PX" in options:
+                expires_at = time.monotonic() + int(options[options.index(b"PX") + 1]) / 1000
+            elif b"EX" in options:
+                expires_at = time.monotonic() + int(options[options.index(b"EX") + 1])
+            exists = _live(db, key) is not None
+            if (b"NX" in options and exists) or (b"XX" in options and not exists):
+                return None
+            db[key] = (value, expires_at)
+            return "OK"
+        if name == "DEL":
+            return sum(db.pop(key, None) is not None for key in args)
+        if name == "INCR":
+            value = int(_live(db, args[0]) or 0) + 1
+            expires_at = db[args[0]][1] if args[0] in db else None
+            db[args[0]] = (str(value).encode(), expires_at)
+            return value
+        if name == "FLUSHDB":
+            db.clear()
+            return "OK"
+        if name == "DBSIZE":
+            return len(db)
+        raise ValueError(f"unknown command '{name}'")
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    return parser.parse_args(argv)
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    server = RespStub(args.host, args.port)
+    print(f"RESP stub listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,410 @@
+"""
+Deterministic synthetic dataset generator for benchmarking.
+
+Generates users, ideas, tags and clips with realistic shapes:
+- Clips per user follow a Zipf-like skew (--user-skew). With --users 1
+  this produces a single large tenant.
+- Clip types follow CLIP_TYPES.
+- Text and code bodies have log-normal sizes with a long tail. Bodies over
+  CLIP_BODY_THRESHOLD are moved to clip_bodies, as the API would.
+- Tag use follows a Zipf distribution (--tag-skew).
+
+The same --seed always produces the same rows, whatever the number of
+workers (only the users' salted password hash differs between runs). Each block of BLOCK_SIZE clips in an idea has its own random
+stream, and work is only ever split along block boundaries.
+
+Worker processes generate blocks in parallel:
+- On Postgres each worker writes its own rows with COPY.
+- On SQLite, which has a single writer, the workers send rows back and
+  the parent writes them with executemany in large batches.
+
+Derived data (MinHash buckets, embedding indexes, cached link previews)
+is not generated. The services build it as clips are used.
+
+Usage (from backend/):
+    python -m scripts.seed_database --users 100 --clips 1000000 --reset
+    python -m scripts.seed_database --database-url postgresql://... --users 1 --clips 10000000 --workers 8
+"""
+import argparse
+import calendar
+import csv
+import io
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+import uuid
+from bisect import bisect
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bcrypt
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+from app.models.db_models import Base
+from app.services.clip_body_service import CLIP_BODY_THRESHOLD, CLIP_PREVIEW_CHARS, body_hash, compress
+from app.utils.content_hash import clip_hash, idea_hash
+from app.utils.ids import id_to_bytes
+from app.utils.urls import URL_CLIP_TYPES, clip_url_hash
+
+# Share of clips per type
+CLIP_TYPES = {"text": 0.40, "link": 0.25, "code": 0.15, "image": 0.12, "video": 0.08}
+# Log-normal body length in characters: (median, sigma)
+BODY_SIZES = {"text": (300, 1.2), "code": (1200, 1.4)}
+MAX_BODY_SIZE = 512 * 1024
+# Distinct link, image and video URLs
+URL_POOL_SIZE = 100_000
+STATUSES = {"active": 0.9, "archived": 0.1}
+# Probability of a clip having 0, 1, 2, ... tags
+TAGS_PER_CLIP = [0.25, 0.35, 0.22, 0.12, 0.06]
+CATEGORIES = [None, "Writing", "Research", "Engineering", "Design", "Marketing", "Personal"]
+DOMAINS = ["example.com", "news.example.org", "blog.example.net", "docs.example.io", "shop.example.co"]
+# Clips per random stream, and the unit work is split on
+BLOCK_SIZE = 10_000
+# Blocks per worker task
+TASK_BLOCKS = 5
+# Rows per executemany on SQLite
+SQLITE_BATCH_SIZE = 50_000
+
+# Tables written by the workers
+BULK_TABLES = ("clip_bodies", "clips", "clip_tags")
+
+TABLE_COLUMNS = {
+    "users": ("id", "name", "email", "hashed_password", "data_version"),
+    "tags": ("id", "name", "updated_at"),
+    "ideas": ("id", "name", "category", "user_id", "updated_at", "version", "content_hash"),
+    "clips": ("id", "type", "value", "status", "created_at", "updated_at", "version",
+              "content_hash", "url_hash", "body_hash", "body_size", "idea_id"),
+    "clip_tags": ("clip_id", "tag_id"),
+    "clip_bodies": ("hash", "codec", "size", "data", "last_used_at"),
+}
+
+def seeded_id(rng: random.Random, when: datetime) -> str:
+    """UUIDv7 for a point in time, with its random bits drawn from rng"""
+    ms = calendar.timegm(when.timetuple()) * 1000 + when.microsecond // 1000
+    return str(uuid.UUID(int=(ms << 80) | (0x7 << 76) | (rng.getrandbits(12) << 64)
+                         | (0b10 << 62) | rng.getrandbits(62)))
+
+def apportion(total: int, weights: Sequence[float]) -> List[int]:
+    """Split total into integer parts proportional to weights (largest remainder)"""
+    scale = total / sum(weights)
+    exact = [w * scale for w in weights]
+    parts = [int(x) for x in exact]
+    by_remainder = sorted(range(len(weights)), key=lambda i: (parts[i] - exact[i], i))
+    for i in by_remainder[:total - sum(parts)]:
+        parts[i] += 1
+    return parts
+
+def zipf_weights(n: int, skew: float) -> List[float]:
+    return [1 / (rank + 1) ** skew for rank in range(n)]
+
+def timestamp(value: datetime) -> str:
+    # The format SQLAlchemy stores DateTime in on SQLite; Postgres reads it too
+    return value.isoformat(" ", "microseconds")
+
+class Vocabulary:
+    """Pseudo-words and text/code corpora that bodies are sliced from"""
+
+    SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "ti", "vo", "be", "da", "fe", "gi", "ho", "ju", "pe", "zo"]
+
+    def __init__(self, seed: int, words: int = 4000, corpus_size: int = 2 * 1024 * 1024):
+        rng = random.Random(f"{seed}:vocabulary")
+        self.words = list(dict.fromkeys(
+            "".join(rng.choices(self.SYLLABLES, k=rng.randint(2, 4))) for _ in range(words * 2)
+        ))[:words]
+        self.text = self._corpus(rng, corpus_size, self._sentence)
+        self.code = self._corpus(rng, corpus_size, self._function)
+
+    def _corpus(self, rng, size, make) -> str:
+        parts, length = [], 0
+        while length < size:
+            part = make(rng)
+            parts.append(part)
+            length += len(part)
+        return "".join(parts)
+
+    def _sentence(self, rng) -> str:
+        words = rng.choices(self.words, k=rng.randint(6, 18))
+        return " ".join(words).capitalize() + (". " if rng.random() < 0.85 else ".\n\n")
+
+    def _function(self, rng) -> str:
+        name, arg, other = rng.sample(self.words, 3)
+        return (f"def {name}_{other}({arg}):\n"
+                f"    {other} = {arg} * {rng.randint(2, 99)}\n"
+                f"    return {other} + len({arg!r})\n\n")
+
+    def body(self, rng: random.Random, kind: str, size: int) -> str:
+        corpus = self.text if kind == "text" else self.code
+        size = min(size, len(corpus))
+        start = rng.randrange(len(corpus) - size + 1)
+        return corpus[start:start + size]
+
+class Generator:
+    """Rows for a seeded dataset; any block can be generated on its own"""
+
+    def __init__(self, args: argparse.Namespace):
+        self.seed = args.seed
+        self.start = datetime(2024, 1, 1)
+        self.span = timedelta(days=args.days)
+        self.vocabulary = Vocabulary(args.seed)
+        self.tag_ids = [seeded_id(random.Random(f"{args.seed}:tag:{i}"), self.start) for i in range(args.tags)]
+        self.tag_cum_weights = list(accumulate(zipf_weights(args.tags, args.tag_skew)))
+        self.type_names = list(CLIP_TYPES)
+        self.type_cum_weights = list(accumulate(CLIP_TYPES.values()))
+        self.tag_count_cum_weights = list(accumulate(TAGS_PER_CLIP))
+        self.threshold = args.body_threshold
+        self._url_hashes: Dict[str, Optional[str]] = {}
+
+    def tags(self) -> Iterator[Tuple]:
+        words = self.vocabulary.words
+        for i, tag_id in enumerate(self.tag_ids):
+            name = words[i % len(words)] + (str(i // len(words)) if i >= len(words) else "")
+            yield (tag_id, name, timestamp(self.start))
+
+    def user(self, index: int, password_hash: str) -> Tuple:
+        user_id = seeded_id(random.Random(f"{self.seed}:user:{index}"), self.start)
+        return (user_id, f"Seed User {index}", f"seed-user-{index}@example.com", password_hash, 1)
+
+    def ideas(self, user_index: int, clip_count: int, ideas_per_user: int) -> List[Dict[str, Any]]:
+        """A user's ideas, each with its id, start time and number of clips"""
+        rng = random.Random(f"{self.seed}:ideas:{user_index}")
+        user_id = self.user(user_index, "")[0]
+        count = max(1, min(clip_count or 1, round(rng.lognormvariate(math.log(ideas_per_user), 0.5))))
+        ideas = []
+        for i, clips in enumerate(apportion(clip_count, zipf_weights(count, 1.0))):
+            started = self.start + self.span * rng.random()
+            name = " ".join(rng.choices(self.vocabulary.words, k=rng.randint(1, 4))).title()
+            category = rng.choice(CATEGORIES)
+            idea_id = seeded_id(rng, started)
+            ideas.append({
+                "id": idea_id, "index": i, "clips": clips, "started": started,
+                "row": (id_to_bytes(idea_id), name, category, user_id, timestamp(started), 1,
+                        idea_hash(name, category)),
+            })
+        return ideas
+
+    def block(self, user_index: int, idea: Dict[str, Any], block: int) -> Dict[str, List[Tuple]]:
+        """Clips, clip_tags and clip_bodies rows for one block of an idea's clips"""
+        rng = random.Random(f"{self.seed}:clips:{user_index}:{idea['index']}:{block}")
+        rows = {"clips": [], "clip_tags": [], "clip_bodies": []}
+        first = block * BLOCK_SIZE
+        last = min(first + BLOCK_SIZE, idea["clips"])
+        # The idea's clips are spread evenly from its start to the end of the span
+        remaining = self.start + self.span - idea["started"]
+        step = remaining / max(idea["clips"], 1)
+        idea_key = id_to_bytes(idea["id"])
+        for n in range(first, last):
+            created = idea["started"] + step * (n + rng.random() * 0.5)
+            clip_id = seeded_id(rng, created)
+            kind = self.type_names[bisect(self.type_cum_weights, rng.random() * self.type_cum_weights[-1])]
+            value = self._value(rng, kind, clip_id)
+            status = "active" if rng.random() < STATUSES["active"] else "archived"
+            tag_count = bisect(self.tag_count_cum_weights, rng.random() * self.tag_count_cum_weights[-1])
+            tags = list(dict.fromkeys(
+                rng.choices(self.tag_ids, cum_weights=self.tag_cum_weights, k=tag_count)
+            ))
+            digest = clip_hash(kind, value, status, created, idea["id"], tags)
+            stored, stored_hash, stored_size = value, None, None
+            data = value.encode("utf-8")
+            created_at = timestamp(created)
+            if len(data) > self.threshold:
+                stored_hash, stored_size = body_hash(data), len(data)
+                stored = value[:CLIP_PREVIEW_CHARS]
+                codec, compressed = compress(data)
+                rows["clip_bodies"].append((stored_hash, codec, stored_size, compressed, created_at))
+            clip_key = id_to_bytes(clip_id)
+            rows["clips"].append((
+                clip_key, kind, stored, status, created_at, created_at, 1,
+                digest, self._url_hash(kind, value), stored_hash, stored_size, idea_key,
+            ))
+            rows["clip_tags"].extend((clip_key, tag_id) for tag_id in tags)
+        return rows
+
+    def _value(self, rng: random.Random, kind: str, clip_id: str) -> str:
+        if kind in BODY_SIZES:
+            median, sigma = BODY_SIZES[kind]
+            size = max(1, min(MAX_BODY_SIZE, int(rng.lognormvariate(math.log(median), sigma))))
+            body = self.vocabulary.body(rng, kind, size)
+            # Large bodies are stored by hash; keep them distinct like real pastes
+            return f"# {clip_id}\n{body}" if size > self.threshold else body
+        # URLs come from a fixed pool, so popular pages get clipped more than once
+        page = rng.randrange(URL_POOL_SIZE)
+        words = self.vocabulary.words
+        word = words[page % len(words)]
+        if kind == "link":
+            query = "?utm_source=newsletter" if rng.random() < 0.2 else ""
+            return f"https://{DOMAINS[page % len(DOMAINS)]}/{word}/{page}{query}"
+        if kind == "image":
+            return f"https://images.example.com/{word}/{page:08x}.jpg"
+        return f"https://www.youtube.com/watch?v={page:011d}"
+
+    def _url_hash(self, kind: str, value: str) -> Optional[str]:
+        if kind not in URL_CLIP_TYPES:
+            return None
+        digest = self._url_hashes.get(value)
+        if digest is None:
+            digest = self._url_hashes[value] = clip_url_hash(kind, value)
+        return digest
+
+class Writer:
+    """Bulk inserts: COPY on Postgres, large executemany batches elsewhere"""
+
+    def __init__(self, database_url: str):
+        self.engine = create_engine(database_url, poolclass=NullPool)
+        self.postgres = self.engine.dialect.name == "postgresql"
+        self.connection = self.engine.raw_connection()
+        if not self.postgres:
+            cursor = self.connection.cursor()
+            cursor.execute("PRAGMA synchronous=OFF")
+            cursor.close()
+
+    def write(self, table: str, rows: List[Tuple]) -> None:
+        if not rows:
+            return
+        columns = TABLE_COLUMNS[table]
+        cursor = self.connection.cursor()
+        if self.postgres:
+            self._copy(cursor, table, columns, rows)
+        else:
+            statement = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+            for i in range(0, len(rows), SQLITE_BATCH_SIZE):
+                cursor.executemany(statement, rows[i:i + SQLITE_BATCH_SIZE])
+        cursor.close()
+
+    def _copy(self, cursor, table: str, columns: Sequence[str], rows: List[Tuple]) -> None:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(["\\N" if v is None else "\\x" + v.hex() if isinstance(v, bytes) else v for v in row])
+        buffer.seek(0)
+        sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+        if hasattr(cursor, "copy_expert"):  # psycopg2
+            cursor.copy_expert(sql, buffer)
+        else:  # psycopg 3
+            with cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+
+    def commit(self) -> None:
+        self.connection.commit()
+
+    def close(self) -> None:
+        self.connection.close()
+        self.engine.dispose()
+
+# Per-process state for the worker pool
+_generator: Optional[Generator] = None
+_writer: Optional[Writer] = None
+
+def _init_worker(args: argparse.Namespace, write: bool) -> None:
+    global _generator, _writer
+    _generator = Generator(args)
+    _writer = Writer(args.database_url) if write else None
+
+def _run_task(task: Tuple[int, Dict[str, Any], int, int]) -> Tuple[int, Dict[str, List[Tuple]]]:
+    """Generate (and on Postgres, write) blocks [first, last) of an idea's clips"""
+    user_index, idea, first, last = task
+    rows = {"clips": [], "clip_tags": [], "clip_bodies": []}
+    for block in range(first, last):
+        for table, block_rows in _generator.block(user_index, idea, block).items():
+            rows[table].extend(block_rows)
+    clips = len(rows["clips"])
+    if _writer is None:
+        return clips, rows
+    # Bodies are unique per clip, so parallel COPYs never collide on their keys
+    for table in BULK_TABLES:
+        _writer.write(table, rows[table])
+    _writer.commit()
+    return clips, {}
+
+def plan(generator: Generator, args: argparse.Namespace) -> Tuple[List[Dict[str, Any]], List[Tuple]]:
+    """Every idea, and the (user, idea, first block, last block) tasks for their clips"""
+    ideas, tasks = [], []
+    for user_index, clip_count in enumerate(apportion(args.clips, zipf_weights(args.users, args.user_skew))):
+        for idea in generator.ideas(user_index, clip_count, args.ideas_per_user):
+            ideas.append(idea)
+            blocks = math.ceil(idea["clips"] / BLOCK_SIZE)
+            for first in range(0, blocks, TASK_BLOCKS):
+                tasks.append((user_index, idea, first, min(first + TASK_BLOCKS, blocks)))
+    # Biggest tasks first, so one large idea does not finish last on its own
+    tasks.sort(key=lambda task: -min(task[1]["clips"] - task[2] * BLOCK_SIZE, (task[3] - task[2]) * BLOCK_SIZE))
+    return ideas, tasks
+
+def seed(args: argparse.Namespace) -> Dict[str, int]:
+    generator = Generator(args)
+    writer = Writer(args.database_url)
+    deferred = []
+    if args.reset:
+        Base.metadata.drop_all(bind=writer.engine)
+        Base.metadata.create_all(bind=writer.engine)
+        # Building the secondary indexes once at the end is much faster
+        # than maintaining them through millions of inserts
+        deferred = [index for table in BULK_TABLES for index in Base.metadata.tables[table].indexes]
+        for index in deferred:
+            index.drop(bind=writer.engine)
+
+    # Same $2b$ format the app's passlib context verifies
+    password_hash = bcrypt.hashpw(args.password.encode("utf-8"), bcrypt.gensalt()).decode("ascii")
+    ideas, tasks = plan(generator, args)
+    writer.write("users", [generator.user(i, password_hash) for i in range(args.users)])
+    writer.write("tags", list(generator.tags()))
+    writer.write("ideas", [idea["row"] for idea in ideas])
+    writer.commit()
+
+    counts = {"users": args.users, "tags": args.tags, "ideas": len(ideas), "clips": 0}
+    write_in_workers = writer.postgres
+    context = multiprocessing.get_context()
+    with context.Pool(args.workers, _init_worker, (args, write_in_workers)) as pool:
+        for clips, rows in pool.imap_unordered(_run_task, tasks):
+            counts["clips"] += clips
+            for table in BULK_TABLES:
+                writer.write(table, rows.get(table, []))
+            if rows:
+                writer.commit()
+            if args.progress:
+                print(f"\r{counts['clips']:,} / {args.clips:,} clips", end="", file=sys.stderr, flush=True)
+    if args.progress:
+        print(file=sys.stderr)
+    if deferred:
+        if args.progress:
+            print("Building indexes", file=sys.stderr)
+        for index in deferred:
+            index.create(bind=writer.engine)
+    writer.close()
+    return counts
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--clips", type=int, default=100_000, help="Total clips across all users")
+    parser.add_argument("--ideas-per-user", type=int, default=20, help="Typical ideas per user")
+    parser.add_argument("--tags", type=int, default=2000, help="Distinct tags")
+    parser.add_argument("--user-skew", type=float, default=1.0, help="Zipf exponent of clips per user (0 = even)")
+    parser.add_argument("--tag-skew", type=float, default=1.1, help="Zipf exponent of tag use")
+    parser.add_argument("--days", type=int, default=730, help="Span the created_at times cover")
+    parser.add_argument("--body-threshold", type=int, default=CLIP_BODY_THRESHOLD)
+    parser.add_argument("--password", default="password", help="Password of every generated user")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--reset", action="store_true", help="Drop and recreate all tables first")
+    parser.add_argument("--quiet", dest="progress", action="store_false")
+    args = parser.parse_args(argv)
+    if not args.database_url:
+        parser.error("set DATABASE_URL or pass --database-url")
+    return args
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    started = time.perf_counter()
+    counts = seed(args)
+    elapsed = time.perf_counter() - started
+    print(", ".join(f"{n:,} {table}" for table, n in counts.items())
+          + f" in {elapsed:.1f} s ({counts['clips'] / elapsed:,.0f} clips/s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Shared fixtures for the in-process API tests.
+
+The app reads DATABASE_URL at import time, so point it at a throwaway SQLite
+file (and embedding indexes at a scratch directory) before anything from
+`app` is imported.
+"""
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_db_dir = tempfile.mkdtemp(prefix="clipkit-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+os.environ["EMBEDDING_INDEX_DIR"] = os.path.join(_db_dir, "embeddings")
+
+import pytest
+from sqlalchemy import event
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.core import cache
+from app.db.session import engine, SessionLocal
+from app.models.db_models import Base, User
+from app.core.auth import create_access_token
+from benchmarks.micro import Baselines, measure
+
+PERF_RESULTS = pytest.StashKey()
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    """Cached users and listings would otherwise outlive each test's database"""
+    monkeypatch.setattr(cache, "cache_backend", None)
+
+@pytest.fixture
+def db_engine():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture
+def db(db_engine):
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+@pytest.fixture
+def user(db):
+    # Password hashing is not exercised here, so skip bcrypt entirely
+    test_user = User(name="Test User", email="test@example.com", hashed_password="x")
+    db.add(test_user)
+    db.commit()
+    db.refresh(test_user)
+    return test_user
+
+@pytest.fixture
+def auth_headers(user):
+    token = create_access_token(data={"sub": user.email})
+    return {"Authorization": f"Bearer {token}"}
+
+@pytest.fixture
+def client(db_engine):
+    with TestClient(app) as test_client:
+        yield test_client
+
+class StatementCounter:
+    """Records every SQL statement sent to the engine while active"""
+
+    def __init__(self, bind):
+        self.bind = bind
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.bind, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.bind, "before_cursor_execute", self._record)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+@pytest.fixture
+def count_statements(db_engine):
+    return lambda: StatementCounter(db_engine)
+
+@pytest.fixture(scope="session")
+def perf_baselines(pytestconfig):
+    baselines = Baselines()
+    pytestconfig.stash[PERF_RESULTS] = baselines.results
+    yield baselines
+    if baselines.update:
+        baselines.save()
+
+@pytest.fixture
+def benchmark(perf_baselines):
+    """Measure a function and fail if it is over its stored budget"""
+    def run(name, fn, bind=None):
+        result = measure(name, fn, bind=bind)
+        found = perf_baselines.check(result)
+        assert not found, f"{result.describe()}; over budget: {'; '.join(found)}"
+        return result
+    return run
+
+def pytest_terminal_summary(terminalreporter, config):
+    results = config.stash.get(PERF_RESULTS, [])
+    if results:
+        terminalreporter.section("micro-benchmarks")
+        for result in results:
+            terminalreporter.write_line(result.describe())
@@ -0,0 +1,171 @@
+"""
+app.core.cache over the in-process LRU and over the Redis-protocol backend,
+with benchmarks.resp_stub standing in for Redis
+"""
+import threading
+import time
+
+import pytest
+
+from app.core import cache
+from app.core.cache import MISSING, Cache, CacheBackend, CacheStats, LocalBackend, RespBackend, user_tag
+from app.core import invalidation
+from app.core.invalidation import InProcessTransport, Invalidation, InvalidationBus, Transport
+from benchmarks.resp_stub import RespStub
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture(scope="module")
+def resp_server():
+    server = RespStub().start()
+    yield server
+    server.stop()
+
+@pytest.fixture(params=["local", "resp"])
+def backend(request, resp_server):
+    if request.param == "local":
+        return LocalBackend()
+    backend = RespBackend(resp_server.url)
+    backend.clear()
+    return backend
+
+def test_backend_contract(backend):
+    backend.set("a", b"1")
+    backend.set("b", b"2", ttl=0.05)
+    assert backend.get_many(["a", "b", "c"]) == [b"1", b"2", None]
+    assert not backend.add("a", b"x", ttl=1)
+    assert backend.add("c", b"3", ttl=1)
+    assert backend.incr("n") == 1 and backend.incr("n") == 2
+    backend.delete("a")
+    time.sleep(0.06)
+    assert backend.get_many(["a", "b", "c"]) == [None, None, b"3"]
+    backend.clear()
+    assert backend.get_many(["c", "n"]) == [None, None]
+
+def test_tags_invalidate_across_namespaces(backend):
+    stats = CacheStats()
+    ideas, tags = Cache("ideas", backend, stats), Cache("tags", backend, stats)
+    ideas.set("u1", ["Rye"], tags=[user_tag("u1")])
+    tags.set("u1", ["baking"], tags=[user_tag("u1")])
+    tags.set("u2", ["travel"], tags=[user_tag("u2")])
+
+    ideas.invalidate_tag(user_tag("u1"))
+    assert ideas.get("u1", tags=[user_tag("u1")]) is MISSING
+    assert tags.get("u1", tags=[user_tag("u1")]) is MISSING
+    assert tags.get("u2", tags=[user_tag("u2")]) == ["travel"]
+
+    # A write that lands mid-load leaves the loaded value already stale
+    def load():
+        ideas.invalidate_tag(user_tag("u1"))
+        return ["Rye (old)"]
+    assert ideas.get_or_set("u1", load, tags=[user_tag("u1")]) == ["Rye (old)"]
+    assert ideas.get_or_set("u1", lambda: ["Rye, Spelt"], tags=[user_tag("u1")]) == ["Rye, Spelt"]
+    assert stats.report()["ideas"]["hits"] == 0
+
+def test_incomplete_backends_are_refused():
+    class ReadOnly(CacheBackend):
+        def get_many(self, keys):
+            return [None] * len(keys)
+    with pytest.raises(TypeError):
+        ReadOnly()
+
+def test_local_backend_evicts_by_size():
+    clock = Clock()
+    backend = LocalBackend(max_bytes=100, clock=clock)
+    for key in "abc":
+        backend.set(key, b"x" * 29)
+    # Reading "a" makes "b" the least recently used
+    backend.get_many(["a"])
+    backend.set("d", b"x" * 29)
+    assert backend.get_many(list("abcd")) == [b"x" * 29, None, b"x" * 29, b"x" * 29]
+    assert backend.size == 90 and backend.evictions == 1
+
+    backend.set("f", b"y", ttl=5)
+    clock.now += 5
+    assert backend.get_many(["f"]) == [None]
+
+def test_concurrent_misses_load_once(backend):
+    stats = CacheStats()
+    calls = []
+    def slow_load():
+        calls.append(1)
+        time.sleep(0.1)
+        return "value"
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(
+        Cache("slow", backend, stats).get_or_set("key", slow_load))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["value"] * 5
+    assert len(calls) == 1
+    assert stats.report()["slow"]["lock_waits"] == 4
+
+def test_slow_values_refresh_early(monkeypatch):
+    # Each caller refreshes when within load time * ln 2 (about 3.5 s here) of expiry
+    monkeypatch.setattr(cache.random, "random", lambda: 0.5)
+    clock, stats = Clock(), CacheStats()
+    numbers = Cache("numbers", LocalBackend(), stats, clock=clock)
+    loads = iter(range(100))
+    def load():
+        clock.now += 5  # as if loading took five seconds
+        return next(loads)
+    numbers.get_or_set("n", load, ttl=60)
+
+    assert [numbers.get_or_set("n", load, ttl=60) for _ in range(3)] == [0, 0, 0]
+    # Two seconds before expiry the next caller reloads, and the rest get its value
+    clock.now += 58
+    assert [numbers.get_or_set("n", load, ttl=60) for _ in range(3)] == [1, 1, 1]
+    assert stats.report()["numbers"]["early_refreshes"] == 1
+
+def test_unreachable_backend_falls_back_to_loading():
+    stats = CacheStats()
+    down = Cache("users", RespBackend("redis://127.0.0.1:1/0", timeout=0.1), stats)
+    assert down.get_or_set("u1", lambda: "loaded") == "loaded"
+    assert stats.report()["users"]["errors"] >= 1
+
+def test_shared_backend_skips_remote_invalidations(resp_server):
+    backend = RespBackend(resp_server.url)
+    backend.clear()
+    cache.evict(backend, Invalidation("u1", "clip", 3, local=False))
+    assert backend.get_many([f"tag:{user_tag('u1')}"]) == [None]
+    cache.evict(backend, Invalidation("u1", "clip", 3))
+    assert backend.get_many([f"tag:{user_tag('u1')}"]) == [b"1"]
+
+def test_per_worker_backend_needs_invalidations_from_other_workers(resp_server, monkeypatch):
+    monkeypatch.setattr(invalidation, "invalidation_bus", InvalidationBus(InProcessTransport()))
+    cache.check_workers(LocalBackend(), workers=1)
+    cache.check_workers(RespBackend(resp_server.url), workers=4)
+    with pytest.raises(RuntimeError, match="WEB_CONCURRENCY=4"):
+        cache.check_workers(LocalBackend(), workers=4)
+    # A transport between workers, like postgres
+    class Remote(Transport):
+        def start(self, deliver, resync):
+            pass
+
+        def send(self, payload):
+            pass
+    monkeypatch.setattr(invalidation, "invalidation_bus", InvalidationBus(Remote()))
+    cache.check_workers(LocalBackend(), workers=4)
+
+def test_routes_hit_the_cache_until_a_write(client, auth_headers):
+    cache.cache_stats.reset()
+    for _ in range(3):
+        client.get("/ideas", headers=auth_headers)
+        client.get("/tags", headers=auth_headers)
+    created = client.post("/ideas", json={"name": "Rye"}, headers=auth_headers)
+    assert [idea["name"] for idea in client.get("/ideas", headers=auth_headers).json()] == ["Rye"]
+
+    report = client.get("/debug/cache-stats").json()
+    assert report["ideas"]["misses"] == 2 and report["ideas"]["hits"] == 2
+    assert report["tags"] == {"hits": 2, "misses": 1, "early_refreshes": 0, "lock_waits": 0,
+                              "errors": 0, "hit_rate": 0.6667}
+    # A user lookup per request, reloaded once after the write
+    assert report["users"]["misses"] == 3
+    assert created.status_code == 201
@@ -0,0 +1,81 @@
+"""
+Large clip bodies: compressed out-of-row storage with a preview kept on the clip
+"""
+from datetime import timedelta
+
+import pytest
+
+import app.services.clip_body_service as body_module
+from app.models.db_models import Clip, ClipBody
+from app.services.clip_body_service import ClipBodyService, compress, decompress
+
+BIG = "def handler(event):\n    return event\n" * 1000
+
+@pytest.fixture
+def bodies(monkeypatch):
+    service = ClipBodyService(threshold=4096, preview_chars=100, grace=timedelta(0))
+    monkeypatch.setattr(body_module, "clip_body_service", service)
+    return service
+
+def _clip(client, headers, idea_id, content, type="code"):
+    return client.post(
+        "/clips", json={"type": type, "content": content, "idea_id": idea_id}, headers=headers
+    ).json()
+
+def test_codec_round_trip(monkeypatch):
+    data = BIG.encode("utf-8")
+    codec, compressed = compress(data)
+    assert len(compressed) < len(data) // 10
+    assert decompress(codec, compressed) == data
+    monkeypatch.setattr(body_module, "zstandard", None)
+    assert compress(data)[0] == "zlib"
+    assert decompress(*compress(data)) == data
+
+def test_large_bodies_are_stored_once_and_loaded_on_demand(client, auth_headers, db, bodies):
+    idea = client.post("/ideas", json={"name": "Code"}, headers=auth_headers).json()["id"]
+    first = _clip(client, auth_headers, idea, BIG)
+    second = _clip(client, auth_headers, idea, BIG)
+    small = _clip(client, auth_headers, idea, "print('hi')")
+    assert first["value"] == BIG and not first["truncated"]
+
+    stored = db.get(Clip, first["id"])
+    assert stored.value == BIG[:100] and stored.body_size == len(BIG)
+    assert db.query(ClipBody).count() == 1
+
+    listed = {c["id"]: c for c in client.get("/clips", headers=auth_headers).json()}
+    assert listed[first["id"]]["value"] == BIG[:100]
+    assert listed[first["id"]]["truncated"] and listed[first["id"]]["size"] == len(BIG)
+    assert listed[small["id"]]["value"] == "print('hi')" and not listed[small["id"]]["truncated"]
+    assert client.get(f"/clips/{first['id']}", headers=auth_headers).json()["value"] == BIG
+
+    # Status-only edits keep the body; shrinking one clip leaves the shared body in place
+    updated = client.put(f"/clips/{first['id']}", json={"status": "archived"}, headers=auth_headers).json()
+    assert updated["value"] == BIG
+    client.put(f"/clips/{first['id']}", json={"content": "short now"}, headers=auth_headers)
+    db.expire_all()
+    assert db.get(Clip, first["id"]).body_hash is None
+    assert db.query(ClipBody).count() == 1
+
+    # The last reference going away drops the body
+    client.delete(f"/clips/{second['id']}", headers=auth_headers)
+    assert db.query(ClipBody).count() == 0
+
+def test_collect_sync_and_export_carry_full_bodies(client, auth_headers, user, db, bodies):
+    clip = {"id": "big", "type": "text", "value": BIG, "status": "active",
+            "created_at": "2026-01-01T00:00:00Z", "tags": []}
+    payload = {"user": {"id": user.id, "name": user.name, "email": user.email},
+               "ideas": [{"id": "idea", "name": "Idea", "clips": [clip]}],
+               "deleted_ideas": [], "deleted_clips": []}
+    client.post("/collect", json=payload, headers=auth_headers)
+    assert db.get(Clip, "big").value == BIG[:100]
+
+    page = client.get("/sync", headers=auth_headers).json()
+    assert page["clips"][0]["value"] == BIG
+    exported = client.get("/export", headers=auth_headers).text
+    assert BIG.replace("\n", "\\n") in exported
+
+    # Re-sending the same payload is skipped by content hash; a deletion releases the body
+    assert client.post("/collect", json=payload, headers=auth_headers).json()["skipped"] == 2
+    payload.update(ideas=[], deleted_clips=["big"])
+    client.post("/collect", json=payload, headers=auth_headers)
+    assert db.query(ClipBody).count() == 0
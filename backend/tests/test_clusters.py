@@ -0,0 +1,85 @@
+"""
+GET /ideas/{id}/clusters: theme groups over clip embeddings, cached per idea
+"""
+import pytest
+
+import app.services.cluster_service as cluster_module
+import app.services.embedding_service as embedding_module
+from app.services.ai_service import AIService
+from app.services.cluster_service import ClusterService
+from app.services.embedding_service import EmbeddingService
+from app.utils.text_embedding import HashingEmbedder
+
+THEMES = {
+    "sourdough": [
+        "sourdough starter feeding schedule", "sourdough loaf crumb and crust",
+        "sourdough hydration levels", "shaping a sourdough boule",
+        "sourdough starter smells sour", "baking sourdough in a dutch oven",
+    ],
+    "kubernetes": [
+        "kubernetes pod autoscaling", "kubernetes ingress controller setup",
+        "debugging kubernetes pod restarts", "kubernetes helm chart values",
+        "kubernetes node pool upgrades", "kubernetes pod resource limits",
+    ],
+    "taxes": [
+        "freelancer quarterly taxes estimate", "taxes deductions for home office",
+        "filing taxes as a sole trader", "taxes on foreign income",
+        "keeping receipts for taxes", "late taxes payment penalties",
+    ],
+}
+
+@pytest.fixture
+def services(tmp_path, monkeypatch, db_engine):
+    embedding = EmbeddingService(index_dir=str(tmp_path), workers=1, embedder=HashingEmbedder())
+    clusters = ClusterService()
+    monkeypatch.setattr(embedding_module, "embedding_service", embedding)
+    monkeypatch.setattr(cluster_module, "cluster_service", clusters)
+    yield clusters
+    embedding.shutdown()
+
+def _clip(client, headers, idea_id, content):
+    return client.post(
+        "/clips", json={"type": "text", "content": content, "idea_id": idea_id}, headers=headers
+    ).json()["id"]
+
+def test_clusters_group_themes_and_follow_clip_changes(client, auth_headers, services, count_statements):
+    idea = client.post("/ideas", json={"name": "Everything"}, headers=auth_headers).json()["id"]
+    ids = {theme: [_clip(client, auth_headers, idea, text) for text in texts]
+           for theme, texts in THEMES.items()}
+    featureless = _clip(client, auth_headers, idea, "!!")
+
+    clusters = client.get(f"/ideas/{idea}/clusters", headers=auth_headers).json()
+    assert [c["id"] for c in clusters] == list(range(len(clusters)))
+    assert clusters[-1]["label"] == "Other" and clusters[-1]["clip_ids"] == [featureless]
+    themed = {frozenset(c["clip_ids"]): c for c in clusters[:-1]}
+    for theme, clip_ids in ids.items():
+        cluster = themed[frozenset(clip_ids)]
+        assert theme in cluster["terms"]
+        assert cluster["size"] == len(clip_ids)
+
+    # Cached: only the ownership check and the per-idea change check
+    with count_statements() as counter:
+        client.get(f"/ideas/{idea}/clusters", headers=auth_headers)
+    assert counter.count == 2
+
+    extra = _clip(client, auth_headers, idea, "kubernetes pod disruption budgets")
+    clusters = client.get(f"/ideas/{idea}/clusters", headers=auth_headers).json()
+    assert any(extra in c["clip_ids"] and "kubernetes" in c["terms"] for c in clusters)
+    client.delete(f"/clips/{extra}", headers=auth_headers)
+    clusters = client.get(f"/ideas/{idea}/clusters", headers=auth_headers).json()
+    assert all(extra not in c["clip_ids"] for c in clusters)
+
+def test_small_ideas_form_one_group(client, auth_headers, services):
+    idea = client.post("/ideas", json={"name": "Small"}, headers=auth_headers).json()["id"]
+    ids = [_clip(client, auth_headers, idea, text) for text in THEMES["taxes"][:2]]
+    clusters = client.get(f"/ideas/{idea}/clusters", headers=auth_headers).json()
+    assert len(clusters) == 1 and sorted(clusters[0]["clip_ids"]) == sorted(ids)
+    assert client.get("/ideas/missing/clusters", headers=auth_headers).status_code == 404
+
+def test_prompt_lists_themes():
+    prompt = AIService(api_key="test")._build_prompt(
+        idea=type("Idea", (), {"name": "Idea"}), text_clips=["a"], image_clips=[], link_clips=[],
+        video_clips=[], code_clips=[], content_type="outline", tone="neutral", length="short",
+        themes=["sourdough, starter (2 clips)", "taxes (1 clips)"],
+    )
+    assert "--- THEMES ---\n1. sourdough, starter (2 clips)\n2. taxes (1 clips)" in prompt
@@ -0,0 +1,83 @@
+"""
+POST /collect: no-op detection for unchanged ideas and clips
+"""
+from app.core.auth import create_access_token
+from app.models.db_models import Clip, Idea, User, clip_tags
+
+def _payload(user, clips_per_idea=3, value="body"):
+    return {
+        "user": {"id": user.id, "name": user.name, "email": user.email},
+        "ideas": [
+            {
+                "id": f"idea-{i}",
+                "name": f"Idea {i}",
+                "clips": [
+                    {
+                        "id": f"clip-{i}-{j}",
+                        "type": "text",
+                        "value": value,
+                        "status": "active",
+                        "created_at": "2026-01-01T00:00:00Z",
+                        "tags": [{"id": "tag-a", "name": "a"}, {"id": f"tag-{j}", "name": str(j)}],
+                    }
+                    for j in range(clips_per_idea)
+                ],
+            }
+            for i in range(2)
+        ],
+    }
+
+def test_unchanged_resync_writes_nothing(client, auth_headers, user, count_statements):
+    first = client.post("/collect", json=_payload(user), headers=auth_headers).json()
+    assert first["written"] == 8
+    assert first["skipped"] == 0
+
+    with count_statements() as counter:
+        again = client.post("/collect", json=_payload(user), headers=auth_headers).json()
+    assert again["written"] == 0
+    assert again["skipped"] == 8
+    assert again["version"] == first["version"]
+    writes = [s for s in counter.statements if not s.lstrip().upper().startswith("SELECT")]
+    assert writes == []
+
+def test_only_changed_clip_is_rewritten(client, auth_headers, user, db):
+    client.post("/collect", json=_payload(user), headers=auth_headers)
+    payload = _payload(user)
+    payload["ideas"][0]["clips"][1]["value"] = "edited"
+    payload["ideas"][0]["clips"][1]["tags"] = [{"id": "tag-b", "name": "b"}]
+
+    result = client.post("/collect", json=payload, headers=auth_headers).json()
+    assert result["written"] == 1
+    assert result["skipped"] == 7
+
+    clip = db.query(Clip).filter_by(id="clip-0-1").one()
+    assert clip.value == "edited"
+    assert [t.name for t in clip.tags] == ["b"]
+    # Untouched clips keep their tag links
+    untouched = db.execute(clip_tags.select().where(clip_tags.c.clip_id == "clip-1-1")).all()
+    assert len(untouched) == 2
+
+def test_route_edit_forces_next_sync_to_write(client, auth_headers, user):
+    client.post("/collect", json=_payload(user), headers=auth_headers)
+    client.put("/clips/clip-0-0", json={"content": "edited in dashboard"}, headers=auth_headers)
+    result = client.post("/collect", json=_payload(user), headers=auth_headers).json()
+    assert result["written"] == 1
+
+def test_ids_of_another_users_rows_are_refused(client, auth_headers, user, db):
+    client.post("/collect", json=_payload(user), headers=auth_headers)
+    other = User(name="Other", email="other@example.com", hashed_password="x")
+    db.add(other)
+    db.commit()
+    db.refresh(other)
+    other_headers = {"Authorization": "Bearer " + create_access_token(data={"sub": other.email})}
+
+    # The other user's idea ids, and a new idea holding one of the first user's clips
+    takeover = _payload(other, value="overwritten")
+    moved = _payload(other, value="overwritten")
+    moved["ideas"] = [{"id": "idea-other", "name": "Mine", "clips": moved["ideas"][0]["clips"]}]
+    for payload in (takeover, moved):
+        assert client.post("/collect", json=payload, headers=other_headers).status_code == 403
+
+    db.expire_all()
+    assert {idea.name for idea in db.query(Idea)} == {"Idea 0", "Idea 1"}
+    assert {(clip.value, clip.idea_id) for clip in db.query(Clip).filter_by(id="clip-0-0")} == {("body", "idea-0")}
@@ -0,0 +1,91 @@
+"""
+Near-duplicate text/code clips: MinHash signatures, LSH buckets and
+GET /ideas/{id}/duplicates
+"""
+import numpy as np
+from app.models.db_models import ClipLshBucket
+from app.utils import minhash
+
+QUOTE = (
+    "The best way to predict the future is to invent it, and the people who "
+    "are really serious about software should make their own hardware"
+)
+CODE = "def total(items):\n    return sum(item.price * item.qty for item in items)\n"
+
+def test_signatures_track_similarity():
+    variants = [
+        ("text", QUOTE),
+        ("text", QUOTE.upper() + "!"),
+        ("text", QUOTE.replace("really serious", "seriously")),
+        ("text", "Completely unrelated words about gardening tomatoes in the early spring sun"),
+        ("code", "def total(items):\n  return sum(item.price*item.qty for item in items)"),
+        ("code", CODE),
+        ("link", "https://example.com/"),
+        ("text", "  "),
+    ]
+    sigs = minhash.signatures(variants)
+    assert sigs[6] is None and sigs[7] is None
+    # Case and punctuation do not matter for text; whitespace does not matter for code
+    assert minhash.similarity(sigs[0], sigs[1]) == 1.0
+    assert minhash.similarity(sigs[4], sigs[5]) == 1.0
+    assert 0.5 < minhash.similarity(sigs[0], sigs[2]) < 1.0
+    assert minhash.similarity(sigs[0], sigs[3]) < 0.2
+    # Batching does not change the result
+    assert np.array_equal(minhash.signatures([variants[2]])[0], sigs[2])
+
+def test_candidate_pairs_share_a_bucket():
+    keys = np.array([7, 7, 7, 9, 9, 3], dtype=np.int64)
+    members = np.array([2, 0, 1, 4, 3, 5])
+    assert minhash.candidate_pairs(members, keys).tolist() == [[0, 1], [0, 2], [3, 4]]
+
+def _clip(client, headers, idea_id, content, type="text"):
+    return client.post(
+        "/clips", json={"type": type, "content": content, "idea_id": idea_id}, headers=headers
+    ).json()["id"]
+
+def test_duplicate_groups_and_index_maintenance(client, auth_headers, db):
+    idea = client.post("/ideas", json={"name": "Quotes"}, headers=auth_headers).json()["id"]
+    original = _clip(client, auth_headers, idea, QUOTE)
+    copy = _clip(client, auth_headers, idea, QUOTE + ".")
+    other = _clip(client, auth_headers, idea, "Nothing like the others at all, just a note")
+    code = _clip(client, auth_headers, idea, CODE, type="code")
+    code_copy = _clip(client, auth_headers, idea, CODE.replace("    ", "\t"), type="code")
+
+    groups = client.get(f"/ideas/{idea}/duplicates", headers=auth_headers).json()
+    assert sorted((g["keep"], g["duplicates"]) for g in groups) == sorted([
+        (original, [copy]), (code, [code_copy])
+    ])
+    assert all(g["similarity"] == 1.0 for g in groups)
+
+    # Editing a copy into something else removes it from its group
+    client.put(f"/clips/{copy}", json={"content": "A fresh thought entirely"}, headers=auth_headers)
+    client.delete(f"/clips/{code_copy}", headers=auth_headers)
+    assert client.get(f"/ideas/{idea}/duplicates", headers=auth_headers).json() == []
+    assert db.query(ClipLshBucket).filter_by(clip_id=code_copy).count() == 0
+    assert db.query(ClipLshBucket).filter_by(clip_id=other).count() == minhash.BANDS
+
+def test_collect_indexes_changed_clips(client, auth_headers, user):
+    clips = [
+        {"id": f"c{i}", "type": "text", "value": QUOTE + " " * i, "status": "active",
+         "created_at": f"2026-01-0{i + 1}T00:00:00", "tags": []}
+        for i in range(3)
+    ]
+    client.post("/collect", json={
+        "user": {"id": user.id, "name": user.name, "email": user.email},
+        "ideas": [{"id": "i1", "name": "Synced", "clips": clips}],
+    }, headers=auth_headers)
+    groups = client.get("/ideas/i1/duplicates", headers=auth_headers).json()
+    assert groups == [{"keep": "c0", "duplicates": ["c1", "c2"], "similarity": 1.0}]
+
+def test_drop_duplicates_keeps_one_selected_copy(client, auth_headers, db):
+    from app.services.dedupe_service import get_dedupe_service
+    from app.models.db_models import Clip
+    idea = client.post("/ideas", json={"name": "Quotes"}, headers=auth_headers).json()["id"]
+    original = _clip(client, auth_headers, idea, QUOTE)
+    copies = [_clip(client, auth_headers, idea, QUOTE + "!" * n) for n in (1, 2)]
+    unique = _clip(client, auth_headers, idea, "Something else")
+
+    selected = db.query(Clip).filter(Clip.id.in_([*copies, unique])).order_by(Clip.created_at).all()
+    kept = get_dedupe_service().drop_duplicates(db, idea, selected)
+    assert [c.id for c in kept] == [copies[0], unique]
+    assert original not in [c.id for c in kept]
@@ -0,0 +1,78 @@
+"""
+Per-user data versioning and conditional GETs on the list endpoints
+"""
+
+def _create_idea(client, headers, name="Idea"):
+    response = client.post("/ideas", json={"name": name}, headers=headers)
+    assert response.status_code == 201
+    return response.json()
+
+def test_list_endpoints_return_weak_etag(client, auth_headers):
+    for path in ("/ideas", "/clips", "/tags"):
+        response = client.get(path, headers=auth_headers)
+        assert response.status_code == 200
+        assert response.headers["etag"].startswith('W/"')
+
+def test_unchanged_refetch_is_304_with_single_lookup(client, auth_headers, count_statements):
+    _create_idea(client, auth_headers)
+    first = client.get("/ideas", headers=auth_headers)
+    etag = first.headers["etag"]
+
+    for path in ("/ideas", "/clips", "/tags"):
+        with count_statements() as counter:
+            response = client.get(path, headers={**auth_headers, "If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+        # The user lookup from get_current_user is cached since the first GET
+        assert counter.statements == []
+
+def test_every_write_path_bumps_version(client, auth_headers, user):
+    etags = [client.get("/ideas", headers=auth_headers).headers["etag"]]
+
+    idea = _create_idea(client, auth_headers)
+    etags.append(client.get("/ideas", headers=auth_headers).headers["etag"])
+
+    client.put(f"/ideas/{idea['id']}", json={"name": "Renamed"}, headers=auth_headers)
+    etags.append(client.get("/ideas", headers=auth_headers).headers["etag"])
+
+    clip = client.post(
+        "/clips",
+        json={"type": "text", "content": "hello", "idea_id": idea["id"], "tags": ["a"]},
+        headers=auth_headers,
+    ).json()
+    etags.append(client.get("/clips", headers=auth_headers).headers["etag"])
+
+    client.put(f"/clips/{clip['id']}", json={"content": "changed"}, headers=auth_headers)
+    etags.append(client.get("/clips", headers=auth_headers).headers["etag"])
+
+    client.post(
+        "/collect",
+        json={
+            "user": {"id": user.id, "name": user.name, "email": user.email},
+            "ideas": [{"id": idea["id"], "name": "Collected", "clips": []}],
+        },
+        headers=auth_headers,
+    )
+    etags.append(client.get("/ideas", headers=auth_headers).headers["etag"])
+
+    client.delete(f"/clips/{clip['id']}", headers=auth_headers)
+    etags.append(client.get("/clips", headers=auth_headers).headers["etag"])
+
+    assert len(set(etags)) == len(etags)
+
+def test_stale_etag_gets_full_response(client, auth_headers):
+    etag = client.get("/ideas", headers=auth_headers).headers["etag"]
+    _create_idea(client, auth_headers)
+    response = client.get("/ideas", headers={**auth_headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert len(response.json()) == 1
+    assert response.headers["etag"] != etag
+
+def test_dataset_etag_does_not_answer_for_missing_resources(client, auth_headers):
+    idea = _create_idea(client, auth_headers)
+    etag = client.get("/ideas", headers=auth_headers).headers["etag"]
+    headers = {**auth_headers, "If-None-Match": etag}
+
+    assert client.get(f"/ideas/{idea['id']}", headers=headers).status_code == 304
+    for path in ("/ideas/missing", "/clips/missing", "/ideas/missing/duplicates", "/ideas/missing/clusters"):
+        assert client.get(path, headers=headers).status_code == 404
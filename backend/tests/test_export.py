@@ -0,0 +1,93 @@
+"""
+GET /export: streamed JSONL, Markdown and ZIP exports of a user's data
+"""
+import io
+import json
+import zipfile
+
+from app.services.export_service import ExportService, clip_markdown
+
+def _setup(client, headers):
+    recipes = client.post("/ideas", json={"name": "Recipes", "category": "food"}, headers=headers).json()
+    empty = client.post("/ideas", json={"name": "Empty"}, headers=headers).json()
+    clips = [
+        client.post("/clips", json={"type": t, "content": c, "idea_id": recipes["id"], "tags": tags},
+                    headers=headers).json()
+        for t, c, tags in [
+            ("text", "Feed the starter daily", ["bread", "baking"]),
+            ("code", "print('```')", []),
+            ("link", "https://example.com/loaf", ["bread"]),
+        ]
+    ]
+    return recipes, empty, clips
+
+def test_jsonl_export(client, auth_headers):
+    recipes, empty, clips = _setup(client, auth_headers)
+    response = client.get("/export", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert "attachment" in response.headers["content-disposition"]
+
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(r["name"] for r in records if r["kind"] == "tag") == ["baking", "bread"]
+    ideas = [r for r in records if r["kind"] == "idea"]
+    assert [i["id"] for i in ideas] == [empty["id"], recipes["id"]]
+    assert ideas[1]["category"] == "food"
+    exported = {r["id"]: r for r in records if r["kind"] == "clip"}
+    assert set(exported) == {c["id"] for c in clips}
+    assert exported[clips[0]["id"]]["tags"] == ["baking", "bread"]
+    assert exported[clips[1]["id"]]["value"] == "print('```')"
+
+    assert client.get("/export", params={"format": "pdf"}, headers=auth_headers).status_code == 400
+
+def test_zip_and_markdown_exports(client, auth_headers):
+    recipes, empty, clips = _setup(client, auth_headers)
+    response = client.get("/export", params={"format": "zip"}, headers=auth_headers)
+    assert response.headers["content-type"] == "application/zip"
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        assert archive.testzip() is None
+        files = {name: archive.read(name).decode("utf-8") for name in archive.namelist()}
+    assert sorted(files) == [f"empty-{empty['id']}.md", f"recipes-{recipes['id']}.md"]
+    recipe_doc = files[f"recipes-{recipes['id']}.md"]
+    assert recipe_doc.startswith("# Recipes\n\n_Category: food_")
+    assert "Tags: `baking`, `bread`" in recipe_doc
+    assert "````\nprint('```')\n````" in recipe_doc
+    assert "<https://example.com/loaf>" in recipe_doc
+
+    markdown = client.get("/export", params={"format": "markdown"}, headers=auth_headers).text
+    assert markdown.index("# Recipes") < markdown.index("Feed the starter") < markdown.index("# Empty")
+
+def test_zip_names_are_unique(client, auth_headers, user):
+    # Back-to-back UUIDv7 ids share their first characters
+    for _ in range(2):
+        client.post("/ideas", json={"name": "Notes"}, headers=auth_headers)
+    # Collector ids that only differ in characters unsafe in file names
+    client.post("/collect", json={
+        "user": {"id": user.id, "name": user.name, "email": user.email},
+        "ideas": [{"id": "trip/1", "name": "Trip", "clips": []}, {"id": "trip_1", "name": "Trip", "clips": []}],
+    }, headers=auth_headers)
+    response = client.get("/export", params={"format": "zip"}, headers=auth_headers)
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        names = archive.namelist()
+    assert len(set(names)) == len(names) == 4
+    assert {"trip-trip_1.md", "trip-trip_1-2.md"} <= set(names)
+
+def test_export_streams_in_batches(db, user):
+    from app.models.db_models import Clip, Idea
+    idea = Idea(name="Bulk", user_id=user.id)
+    db.add(idea)
+    db.flush()
+    db.add_all(Clip(type="text", value="x" * 200, status="active", idea_id=idea.id) for _ in range(2000))
+    db.commit()
+
+    chunks = list(ExportService(batch_size=100).jsonl(user.id))
+    assert len(chunks) > 1
+    assert sum(chunk.count(b'"kind":"clip"') for chunk in chunks) == 2000
+
+    archive = b"".join(ExportService(batch_size=100).zip(user.id))
+    with zipfile.ZipFile(io.BytesIO(archive)) as z:
+        assert z.read(z.namelist()[0]).count(b"## Text") == 2000
+
+def test_clip_markdown_without_date():
+    text = clip_markdown({"type": "image", "value": "https://x/y.png", "created_at": None, "tags": []})
+    assert text == "## Image\n\n![](https://x/y.png)\n\n"
@@ -0,0 +1,56 @@
+"""
+GET /ideas/summary: per-idea aggregates in one grouped query
+"""
+
+def _clip(client, headers, idea_id, type, tags):
+    client.post(
+        "/clips",
+        json={"type": type, "content": "x", "idea_id": idea_id, "tags": tags},
+        headers=headers,
+    )
+
+def test_summary_counts_types_and_tags(client, auth_headers, count_statements):
+    full = client.post("/ideas", json={"name": "Full", "category": "c"}, headers=auth_headers).json()
+    empty = client.post("/ideas", json={"name": "Empty"}, headers=auth_headers).json()
+    _clip(client, auth_headers, full["id"], "text", ["a", "b"])
+    _clip(client, auth_headers, full["id"], "text", ["a"])
+    _clip(client, auth_headers, full["id"], "link", ["a", "c"])
+
+    with count_statements() as counter:
+        response = client.get("/ideas/summary", headers=auth_headers)
+    # User lookup plus the single grouped query
+    assert counter.count == 2
+    summaries = {s["idea_id"]: s for s in response.json()}
+
+    assert summaries[full["id"]]["clip_count"] == 3
+    assert summaries[full["id"]]["clips_by_type"] == {"text": 2, "link": 1}
+    assert summaries[full["id"]]["last_clip_at"] is not None
+    assert summaries[full["id"]]["top_tags"][0] == {"name": "a", "count": 3}
+    assert summaries[empty["id"]] == {
+        "idea_id": empty["id"],
+        "name": "Empty",
+        "category": None,
+        "clip_count": 0,
+        "clips_by_type": {},
+        "last_clip_at": None,
+        "top_tags": [],
+    }
+
+def test_summary_is_cached_until_a_write(client, auth_headers, count_statements):
+    idea = client.post("/ideas", json={"name": "Idea"}, headers=auth_headers).json()
+    first = client.get("/ideas/summary", headers=auth_headers)
+    etag = first.headers["etag"]
+
+    with count_statements() as counter:
+        again = client.get("/ideas/summary", headers=auth_headers)
+    assert again.json() == first.json()
+    assert counter.count == 0  # user and summaries both served from cache
+
+    assert client.get(
+        "/ideas/summary", headers={**auth_headers, "If-None-Match": etag}
+    ).status_code == 304
+
+    _clip(client, auth_headers, idea["id"], "code", [])
+    updated = client.get("/ideas/summary", headers={**auth_headers, "If-None-Match": etag})
+    assert updated.status_code == 200
+    assert updated.json()[0]["clips_by_type"] == {"code": 1}
@@ -0,0 +1,114 @@
+"""
+Idempotency-Key on POST /clips and POST /collect
+"""
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.idempotency import IdempotencyStore, request_hash
+from app.db.session import SessionLocal
+from app.models.db_models import Clip, IdempotencyKey
+from app.models.schemas import ClipCreate
+
+def _idea(client, auth_headers):
+    return client.post("/ideas", json={"name": "Reading"}, headers=auth_headers).json()["id"]
+
+def test_retried_clip_is_created_once(client, auth_headers, db, count_statements):
+    idea = _idea(client, auth_headers)
+    clip = {"type": "text", "content": "Chapter one notes", "idea_id": idea, "tags": ["books"]}
+    headers = {**auth_headers, "Idempotency-Key": "clip-1"}
+
+    first = client.post("/clips", json=clip, headers=headers)
+    with count_statements() as counter:
+        retry = client.post("/clips", json=clip, headers=headers)
+    assert first.status_code == retry.status_code == 201
+    assert retry.content == first.content
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert db.query(Clip).count() == 1
+    # The user reload (the first request moved their data version on) and
+    # the key lookup; nothing touches ideas, clips or tags
+    assert [s.split()[0] for s in counter.statements] == ["SELECT", "INSERT", "SELECT"]
+    assert "FROM users" in counter.statements[0]
+    assert all("idempotency_keys" in s for s in counter.statements[1:])
+
+    # Same key, different clip
+    changed = client.post("/clips", json={**clip, "content": "Chapter two"}, headers=headers)
+    assert changed.status_code == 422
+    # Other keys, or none, create clips as before
+    assert client.post("/clips", json=clip, headers={**auth_headers, "Idempotency-Key": "clip-2"}).json()["id"] \
+        != first.json()["id"]
+    assert client.post("/clips", json=clip, headers=auth_headers).status_code == 201
+    assert db.query(Clip).count() == 3
+
+def test_failed_request_gives_its_key_up(client, auth_headers, db):
+    clip = {"type": "text", "content": "Too early", "idea_id": "missing"}
+    headers = {**auth_headers, "Idempotency-Key": "clip-1"}
+    assert client.post("/clips", json=clip, headers=headers).status_code == 404
+    assert db.query(IdempotencyKey).count() == 0
+    assert client.post("/clips", json=clip, headers=headers).status_code == 404
+
+def test_retried_collect_returns_the_first_result(client, auth_headers, user, db):
+    payload = {
+        "user": {"id": user.id, "name": user.name, "email": user.email},
+        "ideas": [{"id": "idea-1", "name": "Trip", "clips": [
+            {"id": "clip-1", "type": "text", "value": "Pack light", "status": "active",
+             "created_at": "2026-01-01T00:00:00Z", "tags": []},
+        ]}],
+    }
+    headers = {**auth_headers, "Idempotency-Key": "sync-1"}
+    first = client.post("/collect", json=payload, headers=headers)
+    retry = client.post("/collect", json=payload, headers=headers)
+    assert first.json()["written"] == 2
+    # Without the key the unchanged resync reports nothing written
+    assert retry.json() == first.json()
+    assert client.post("/collect", json=payload, headers=auth_headers).json()["written"] == 0
+
+@pytest.fixture
+def claim(db_engine, user):
+    """A claimed key whose request is still running, and a way to finish it"""
+    store = IdempotencyStore(retry_after=3)
+    fingerprint = request_hash("POST /clips", ClipCreate(type="text", content="x", idea_id="i"))
+    with SessionLocal() as db:
+        assert store.claim(db, user.id, "clip-1", fingerprint) is None
+
+    def finish(body):
+        with SessionLocal() as db:
+            store.complete(db, user.id, "clip-1", 201, body)
+    return store, fingerprint, finish
+
+def test_duplicate_is_told_to_retry_until_the_first_request_finishes(claim, user):
+    store, fingerprint, finish = claim
+    started = time.monotonic()
+    with SessionLocal() as db, pytest.raises(HTTPException) as error:
+        store.claim(db, user.id, "clip-1", fingerprint)
+    assert error.value.status_code == 409
+    assert error.value.headers == {"Retry-After": "3"}
+    # Answered without waiting on the first request
+    assert time.monotonic() - started < 1
+
+    finish(b'{"id":"c1"}')
+    with SessionLocal() as db:
+        replay = store.claim(db, user.id, "clip-1", fingerprint)
+    assert replay.body == b'{"id":"c1"}' and replay.status_code == 201
+
+def test_abandoned_claims_are_taken_over(claim, user):
+    store, fingerprint, _ = claim
+
+    store.stale_after = timedelta(0)
+    with SessionLocal() as db:
+        assert store.claim(db, user.id, "clip-1", fingerprint) is None
+
+def test_expired_keys_are_swept(db, user):
+    store = IdempotencyStore(ttl=timedelta(hours=1))
+    now = datetime.utcnow()
+    db.add_all([
+        IdempotencyKey(user_id=user.id, key="old", request_hash="h", response_status=201,
+                       response_body=b"{}", created_at=now - timedelta(hours=2), expires_at=now - timedelta(hours=1)),
+        IdempotencyKey(user_id=user.id, key="new", request_hash="h", response_status=201,
+                       response_body=b"{}", created_at=now, expires_at=now + timedelta(hours=1)),
+    ])
+    db.commit()
+    assert store.collect_garbage(db) == 1
+    assert [row.key for row in db.query(IdempotencyKey)] == ["new"]
@@ -0,0 +1,53 @@
+"""
+Time-ordered UUIDv7 ids and their compact binary storage
+"""
+import uuid
+
+import pytest
+from sqlalchemy import text
+
+from app.utils.ids import id_from_bytes, id_to_bytes, new_id, uuid7
+
+def test_uuid7_is_versioned_and_increasing():
+    ids = [uuid7() for _ in range(5000)]
+    assert all(u.version == 7 and u.variant == uuid.RFC_4122 for u in ids)
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+
+@pytest.mark.parametrize("value", [
+    new_id(),
+    str(uuid.uuid4()),
+    "0190A6B2-1234-7ABC-8DEF-0123456789AB",  # Not canonical: kept as text
+    "fifteen-chars!!",  # Would otherwise be 16 bytes long
+    "c1",
+    "",
+    "idée-🙂",
+])
+def test_ids_round_trip(value):
+    data = id_to_bytes(value)
+    assert id_from_bytes(data) == value
+    assert (len(data) == 16) == (value == value.lower() and len(value) == 36)
+
+def test_ids_are_stored_compactly(client, auth_headers, db):
+    idea = client.post("/ideas", json={"name": "Idea"}, headers=auth_headers).json()
+    clip = client.post(
+        "/clips", json={"type": "text", "content": "hi", "idea_id": idea["id"]}, headers=auth_headers
+    ).json()
+    assert uuid.UUID(clip["id"]).version == 7 and clip["idea_id"] == idea["id"]
+
+    row = db.execute(text("SELECT id, idea_id FROM clips")).one()
+    assert bytes(row.id) == uuid.UUID(clip["id"]).bytes
+    assert bytes(row.idea_id) == uuid.UUID(idea["id"]).bytes
+    assert client.get(f"/clips/{clip['id']}", headers=auth_headers).json()["id"] == clip["id"]
+
+def test_client_chosen_ids_still_work(client, auth_headers, user, db):
+    clip = {"id": "c1", "type": "text", "value": "hi", "status": "active",
+            "created_at": "2026-01-01T00:00:00Z", "tags": []}
+    payload = {"user": {"id": user.id, "name": user.name, "email": user.email},
+               "ideas": [{"id": "my-idea", "name": "Idea", "clips": [clip]}],
+               "deleted_ideas": [], "deleted_clips": []}
+    client.post("/collect", json=payload, headers=auth_headers)
+
+    assert bytes(db.execute(text("SELECT id FROM clips")).scalar()) == b"\xffc1"
+    listed = client.get("/clips", headers=auth_headers).json()
+    assert [(c["id"], c["idea_id"]) for c in listed] == [("c1", "my-idea")]
@@ -0,0 +1,91 @@
+"""
+Invalidation bus, with buses sharing an in-process transport standing in
+for separate workers
+"""
+import pytest
+
+from app.core import invalidation
+from app.core.invalidation import (
+    ALL, InProcessTransport, Invalidation, InvalidationBus, Transport, invalidate_after_commit
+)
+from app.services.tag_suggestion_service import TagSuggestionService
+
+@pytest.fixture
+def transport():
+    return InProcessTransport()
+
+@pytest.fixture
+def here(transport, monkeypatch):
+    """The bus of the worker handling the requests"""
+    bus = InvalidationBus(transport)
+    monkeypatch.setattr(invalidation, "invalidation_bus", bus)
+    return bus
+
+@pytest.fixture
+def elsewhere(transport):
+    """Another worker's bus"""
+    return InvalidationBus(transport)
+
+def _record(bus):
+    events = []
+    bus.subscribe(events.append)
+    return events
+
+def test_events_reach_every_worker_once(here, elsewhere):
+    local, remote = _record(here), _record(elsewhere)
+    here.publish("u1", "clip", 7)
+
+    assert local == [Invalidation("u1", "clip", 7, local=True)]
+    assert remote == [Invalidation("u1", "clip", 7, local=False)]
+
+    # User ids may contain the separator, and garbage is dropped
+    elsewhere.publish("tenant:u2", "idea", 8)
+    here._receive("not an event")
+    assert local[-1] == Invalidation("tenant:u2", "idea", 8, local=False)
+    assert len(local) == 2
+
+def test_incomplete_transports_are_refused():
+    class SendOnly(Transport):
+        def send(self, payload):
+            pass
+    with pytest.raises(TypeError):
+        SendOnly()
+
+def test_published_only_after_commit(db, user, here, elsewhere):
+    remote = _record(elsewhere)
+    invalidate_after_commit(db, user.id, "idea", 1)
+    db.rollback()
+    assert remote == []
+
+    invalidate_after_commit(db, user.id, "idea", 2)
+    invalidate_after_commit(db, user.id, "idea", 2)
+    assert remote == []
+    db.commit()
+    assert remote == [Invalidation(user.id, "idea", 2, local=False)]
+
+def test_writes_evict_other_workers_tag_models(client, auth_headers, user, db, here, elsewhere):
+    idea = client.post("/ideas", json={"name": "Notes"}, headers=auth_headers).json()
+    ours, theirs = TagSuggestionService(), TagSuggestionService()
+    here.subscribe(ours.on_invalidation)
+    elsewhere.subscribe(theirs.on_invalidation)
+    ours.model(db, user.id)
+    theirs.model(db, user.id)
+
+    client.post("/clips", json={"type": "text", "content": "sourdough starter", "idea_id": idea["id"],
+                                "tags": ["baking"]}, headers=auth_headers)
+    # The writing worker keeps its model, updated in place
+    assert ours._cached(user.id) is not None
+    assert theirs._cached(user.id) is None
+
+    theirs.model(db, user.id)
+    assert theirs.suggest(db, user.id, "sourdough loaf", [], 3)[0]["name"] == "baking"
+    # A lost connection may have dropped events, so everything goes
+    elsewhere.resync()
+    assert theirs._models == {}
+
+def test_collect_invalidates_everything_for_the_user(client, auth_headers, user, elsewhere, here):
+    remote = _record(elsewhere)
+    client.post("/collect", json={"user": {"id": user.id, "name": user.name, "email": user.email},
+                                  "ideas": [{"id": "i1", "name": "Trip", "clips": []}]},
+                headers=auth_headers)
+    assert [(e.user_id, e.entity) for e in remote] == [(user.id, ALL)]
@@ -0,0 +1,39 @@
+"""
+List endpoints build their JSON straight from SQL rows
+"""
+
+def _seed(client, headers):
+    idea = client.post("/ideas", json={"name": "Idea", "category": "c"}, headers=headers).json()
+    for i in range(3):
+        client.post(
+            "/clips",
+            json={"type": "text", "content": f"clip {i}", "idea_id": idea["id"], "tags": ["x", f"t{i}"]},
+            headers=headers,
+        )
+    return idea
+
+def test_clip_list_shape_matches_single_clip(client, auth_headers):
+    idea = _seed(client, auth_headers)
+    clips = client.get("/clips", params={"idea": idea["id"]}, headers=auth_headers).json()
+    assert len(clips) == 3
+    single = client.get(f"/clips/{clips[0]['id']}", headers=auth_headers).json()
+    assert clips[0] == single
+    assert set(single) == {"id", "type", "value", "status", "created_at", "updated_at", "idea_id", "tags", "preview",
+                           "truncated", "size"}
+    assert sorted(t["name"] for t in single["tags"]) in (["t0", "x"], ["t1", "x"], ["t2", "x"])
+
+def test_list_responses_keep_etag(client, auth_headers):
+    _seed(client, auth_headers)
+    for path in ("/ideas", "/clips", "/tags"):
+        response = client.get(path, headers=auth_headers)
+        assert response.headers["content-type"] == "application/json"
+        assert response.headers["etag"].startswith('W/"')
+
+def test_idea_and_tag_lists(client, auth_headers):
+    idea = _seed(client, auth_headers)
+    ideas = client.get("/ideas", headers=auth_headers).json()
+    assert ideas == [client.get(f"/ideas/{idea['id']}", headers=auth_headers).json()]
+    tags = client.get("/tags", headers=auth_headers).json()
+    assert sorted(t["name"] for t in tags) == ["t0", "t1", "t2", "x"]
+    by_tag = client.get("/clips-by-tag", params={"tag": "x"}, headers=auth_headers).json()
+    assert len(by_tag) == 3
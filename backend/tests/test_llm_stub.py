@@ -0,0 +1,99 @@
+"""
+The stub LLM server, and the AI service's real HTTP path run against it
+"""
+import asyncio
+import json
+import time
+
+import httpx
+
+from app.services import ai_service
+from app.services.ai_service import AIService
+from benchmarks.llm_stub import StubConfig, create_app
+
+class Idea:
+    name = "Sourdough"
+    description = "Notes on baking"
+
+class Clip:
+    def __init__(self, value):
+        self.id = value
+        self.type = "text"
+        self.value = value
+
+def _service(app, **kwargs):
+    return AIService(api_key="stub", base_url="http://stub/openai/v1",
+                     transport=httpx.ASGITransport(app=app), **kwargs)
+
+def _generate(service, clips=("starter feeding", "crumb and crust")):
+    return asyncio.run(service.generate_content(
+        idea=Idea(), clips=[Clip(value) for value in clips], content_type="article",
+        tone="casual", length="short",
+    ))
+
+def test_generation_goes_through_the_stub_deterministically():
+    app = create_app(StubConfig(ttft=0, tokens_per_sec=0, completion_tokens=300))
+    first = _generate(_service(app))
+    assert first.startswith("# Stub completion\n\n")
+    assert first == _generate(_service(app))
+    assert first != _generate(_service(app), clips=("hydration",))
+    assert app.state.stats["requests"] == 3
+
+def test_rate_limits_and_errors_are_retried(monkeypatch):
+    # Seed 1 draws 0.13 then 0.85: one 429, then a completion
+    app = create_app(StubConfig(ttft=0, tokens_per_sec=0, rate_limit_rate=0.5, retry_after=0))
+    assert _generate(_service(app)).startswith("# Stub completion")
+    assert app.state.stats["rate_limited"] == 1 and app.state.stats["requests"] == 2
+
+    failing = create_app(StubConfig(ttft=0, error_rate=1.0))
+    monkeypatch.setattr(ai_service, "RETRY_BASE_DELAY", 0)
+    assert _generate(_service(failing, max_retries=2)) == "Error generating content: 500"
+    assert failing.state.stats["errors"] == 3
+
+class Flaky(httpx.AsyncBaseTransport):
+    """Fails the first requests with a timeout, then a dropped connection"""
+
+    def __init__(self, app, failures):
+        self.inner = httpx.ASGITransport(app=app)
+        self.failures = list(failures)
+
+    async def handle_async_request(self, request):
+        if self.failures:
+            raise self.failures.pop(0)("stub failure", request=request)
+        return await self.inner.handle_async_request(request)
+
+def test_timeouts_and_dropped_connections_are_retried(monkeypatch):
+    monkeypatch.setattr(ai_service, "RETRY_BASE_DELAY", 0)
+    app = create_app(StubConfig(ttft=0, tokens_per_sec=0))
+    flaky = Flaky(app, [httpx.ReadTimeout, httpx.ConnectError])
+    service = AIService(api_key="stub", base_url="http://stub/openai/v1", transport=flaky, max_retries=2)
+    assert _generate(service).startswith("# Stub completion")
+    assert app.state.stats["requests"] == 1
+
+    flaky = Flaky(app, [httpx.ReadTimeout] * 3)
+    service = AIService(api_key="stub", base_url="http://stub/openai/v1", transport=flaky, max_retries=2)
+    assert _generate(service) == "Error generating content: stub failure"
+
+def test_streaming_matches_the_plain_completion_and_is_paced():
+    config = StubConfig(ttft=0.05, tokens_per_sec=200, completion_tokens=20)
+    app = create_app(config)
+    body = {"model": "stub", "messages": [{"role": "user", "content": "hello"}], "max_tokens": 50}
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://stub") as client:
+            plain = (await client.post("/openai/v1/chat/completions", json=body)).json()
+            started = time.monotonic()
+            response = await client.post("/openai/v1/chat/completions", json={**body, "stream": True})
+            return plain, response, time.monotonic() - started
+
+    plain, response, elapsed = asyncio.run(run())
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [line[len("data: "):] for line in response.text.split("\n\n") if line]
+    assert events[-1] == "[DONE]"
+    chunks = [json.loads(event) for event in events[:-1]]
+    streamed = "".join(chunk["choices"][0]["delta"].get("content", "") for chunk in chunks)
+    assert streamed == plain["choices"][0]["message"]["content"]
+    assert plain["usage"]["completion_tokens"] == 20
+    assert chunks[-1]["choices"][0]["finish_reason"] == "stop"
+    # ttft plus the 19 gaps between 20 tokens
+    assert elapsed >= config.ttft + 19 / config.tokens_per_sec
@@ -0,0 +1,59 @@
+"""
+The load test harness, driven in-process through httpx's ASGI transport
+"""
+import asyncio
+import copy
+
+import httpx
+import pytest
+
+from app.main import app
+from app.core.auth import create_access_token
+from benchmarks.load_test import Account, compare, percentile, run_load_test
+
+def _run(user, scenario, stages=(1, 2)):
+    account = Account(user.email, name=user.name, token=create_access_token(data={"sub": user.email}))
+    return asyncio.run(run_load_test(
+        "http://test", scenario, [account], list(stages), stage_seconds=0.3,
+        transport=httpx.ASGITransport(app=app),
+    ))
+
+def test_percentile_is_nearest_rank():
+    values = [i / 100 for i in range(1, 101)]
+    assert percentile(values, 50) == 0.5
+    assert percentile(values, 99) == 0.99
+    assert percentile([0.2], 95) == 0.2
+    assert percentile([], 50) == 0.0
+
+@pytest.mark.parametrize("scenario", ["dashboard", "clipping", "collector", "generate"])
+def test_scenarios_report_per_route_latencies(client, auth_headers, user, scenario):
+    idea = client.post("/ideas", json={"name": "Load"}, headers=auth_headers).json()["id"]
+    for n in range(3):
+        client.post("/clips", json={"type": "text", "content": f"note {n}", "idea_id": idea},
+                    headers=auth_headers)
+
+    stages = _run(user, scenario)
+    assert [stage["concurrency"] for stage in stages] == [1, 2]
+    for stage in stages:
+        assert stage["requests"] > 0 and stage["errors"] == 0
+        assert stage["throughput_rps"] > 0
+        for stats in stage["routes"].values():
+            assert stats["p50_ms"] <= stats["p95_ms"] <= stats["p99_ms"] <= stats["max_ms"]
+
+def test_compare_flags_slower_routes_and_throughput():
+    stage = {"concurrency": 4, "throughput_rps": 100.0, "errors": 0, "routes": {
+        "GET /ideas": {"count": 500, "p95_ms": 10.0},
+        "GET /tags": {"count": 5, "p95_ms": 10.0},
+    }}
+    baseline = {"stages": [stage]}
+    assert compare(baseline, baseline, 0.2) == []
+
+    slower = copy.deepcopy(baseline)
+    slower["stages"][0]["throughput_rps"] = 70.0
+    slower["stages"][0]["routes"]["GET /ideas"]["p95_ms"] = 20.0
+    # Too few samples to judge
+    slower["stages"][0]["routes"]["GET /tags"]["p95_ms"] = 50.0
+    assert compare(slower, baseline, 0.2) == [
+        "c=4: throughput 100.0 -> 70.0 rps",
+        "c=4 GET /ideas: p95 10.0 -> 20.0 ms",
+    ]
@@ -0,0 +1,168 @@
+"""
+Per-call cost of hot functions, against SQLite seeded at several sizes.
+
+Each benchmark reports wall time, peak allocation and SQL statements, and
+fails when it goes over the budget stored in benchmarks/micro_baselines.json
+(see benchmarks/micro.py).
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.core import cache
+from app.db.listing import clip_rows
+from app.db.repository import MemoryRepository, SqlRepository, get_repository
+from app.db.session import engine, SessionLocal
+from app.core.auth import create_access_token, get_current_user
+from app.core.responses import dumps
+from app.models.db_models import Base, User
+from app.services.ai_service import AIService
+from benchmarks.micro import Measurement, regressions
+
+# Clips per user
+SIZES = [100, 1000, 5000]
+IDEAS_PER_USER = 10
+USERS = 2
+
+class Idea:
+    name = "Sourdough"
+    description = "Notes on baking"
+
+def _tree(user, clips):
+    per_idea = clips // IDEAS_PER_USER
+    return {
+        "user": {"id": user.id, "name": user.name, "email": user.email},
+        "ideas": [
+            {
+                "id": f"{user.id}-idea-{i}",
+                "name": f"Idea {i}",
+                "clips": [
+                    {
+                        "id": f"{user.id}-clip-{i}-{j}",
+                        # No links: unfurling them would go to the network
+                        "type": "code" if j % 4 == 0 else "text",
+                        "value": f"note {i} {j} " + "about sourdough starters " * 8,
+                        "status": "active",
+                        "created_at": "2026-01-01T00:00:00Z",
+                        "tags": [{"id": f"tag-{j % 30}", "name": f"tag {j % 30}"},
+                                 {"id": f"tag-{i}", "name": f"tag {i}"}],
+                    }
+                    for j in range(per_idea)
+                ],
+            }
+            for i in range(IDEAS_PER_USER)
+        ],
+    }
+
+def _run(coroutine):
+    """Result of a coroutine that never awaits, without an event loop's overhead"""
+    try:
+        coroutine.send(None)
+    except StopIteration as done:
+        return done.value
+    raise RuntimeError("coroutine suspended")
+
+@pytest.fixture(scope="module", params=SIZES)
+def seeded(request):
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    # Users from the previous size's database share these emails
+    cache.cache_backend = None
+    with SessionLocal() as db:
+        users = [User(name=f"User {u}", email=f"perf{u}@example.com", hashed_password="x")
+                 for u in range(USERS)]
+        db.add_all(users)
+        db.commit()
+        for user in users:
+            db.refresh(user)
+        db.expunge_all()
+    with TestClient(app) as client:
+        for user in users:
+            headers = {"Authorization": "Bearer " + create_access_token(data={"sub": user.email})}
+            response = client.post("/collect", json=_tree(user, request.param), headers=headers)
+            assert response.status_code == 200
+        client.headers.update(headers)
+        yield {"size": request.param, "user": users[-1], "client": client,
+               "token": headers["Authorization"].split()[1]}
+    Base.metadata.drop_all(bind=engine)
+
+def test_build_prompt(seeded, benchmark):
+    clips = [clip["value"] for idea in _tree(seeded["user"], seeded["size"])["ideas"]
+             for clip in idea["clips"]]
+    service = AIService(api_key="test")
+    benchmark(f"build_prompt[{seeded['size']}]", lambda: service._build_prompt(
+        idea=Idea(), text_clips=clips, image_clips=[], link_clips=[], video_clips=[],
+        code_clips=clips[::4], content_type="blog", tone="casual", length="long",
+        themes=["sourdough", "starters"],
+    ))
+
+def test_get_current_user(seeded, benchmark):
+    def authenticate():
+        with SessionLocal() as db:
+            return _run(get_current_user(token=seeded["token"], repo=SqlRepository(db)))
+    benchmark(f"get_current_user[{seeded['size']}]", authenticate, bind=engine)
+
+def test_get_current_user_uncached(seeded, benchmark):
+    # The first request after a write, or on a fresh worker: the database lookup
+    def authenticate():
+        cache.get_cache_backend().clear()
+        with SessionLocal() as db:
+            return _run(get_current_user(token=seeded["token"], repo=SqlRepository(db)))
+    benchmark(f"get_current_user_uncached[{seeded['size']}]", authenticate, bind=engine)
+
+def test_collect_resync(seeded, benchmark):
+    client, tree = seeded["client"], _tree(seeded["user"], seeded["size"])
+    def resync():
+        assert client.post("/collect", json=tree).json()["written"] == 0
+    benchmark(f"collect_resync[{seeded['size']}]", resync, bind=engine)
+
+def test_list_clips(seeded, benchmark):
+    client = seeded["client"]
+    def list_clips():
+        assert len(client.get("/clips").json()) == seeded["size"]
+    benchmark(f"list_clips[{seeded['size']}]", list_clips, bind=engine)
+
+@pytest.fixture(scope="module")
+def memory_repo(seeded):
+    """The same clips in the in-memory repository"""
+    repo = MemoryRepository()
+    user = seeded["user"]
+    repo.add_user(user.name, user.email, user_id=user.id)
+    for idea in _tree(user, seeded["size"])["ideas"]:
+        idea_id = repo.create_idea(user.id, idea["name"])["id"]
+        for clip in idea["clips"]:
+            repo.add_clip(user.id, idea_id, clip["type"], clip["value"],
+                          tags=[tag["name"] for tag in clip["tags"]])
+    return repo
+
+@pytest.fixture
+def memory_client(seeded, memory_repo):
+    """The seeded client, served from memory_repo without a database"""
+    app.dependency_overrides[get_repository] = lambda: memory_repo
+    yield seeded["client"]
+    app.dependency_overrides.pop(get_repository)
+
+def test_list_clips_from_memory(seeded, memory_client, benchmark):
+    def list_clips():
+        assert len(memory_client.get("/clips").json()) == seeded["size"]
+    benchmark(f"list_clips_memory[{seeded['size']}]", list_clips, bind=engine)
+
+def test_serialize_clip_rows(seeded, benchmark):
+    def serialize():
+        with SessionLocal() as db:
+            return dumps(clip_rows(db, seeded["user"].id))
+    benchmark(f"serialize_clip_rows[{seeded['size']}]", serialize, bind=engine)
+
+def test_regressions_flag_statements_allocations_and_large_slowdowns():
+    baseline = {"median_ms": 10.0, "peak_kib": 1000.0, "statements": 3}
+    within = Measurement("x", rounds=5, min_ms=9.0, median_ms=20.0, peak_kib=1200.0, statements=3)
+    assert regressions(within, baseline, wall_tolerance=3) == []
+
+    worse = Measurement("x", rounds=5, min_ms=30.0, median_ms=40.0, peak_kib=2000.0, statements=4)
+    assert regressions(worse, baseline, wall_tolerance=3) == [
+        "statements 3 -> 4",
+        "peak allocation 1000.0 -> 2000.0 KiB",
+        "median 10.000 -> 40.000 ms",
+    ]
+    # Wall time budgets can be switched off on slow or shared machines
+    assert len(regressions(worse, baseline, wall_tolerance=0)) == 2
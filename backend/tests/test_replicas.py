@@ -0,0 +1,121 @@
+"""
+Read-replica routing, with two extra SQLite files standing in for replicas
+"""
+import pytest
+from sqlalchemy import create_engine, insert, update
+
+from app.core import cache
+from app.db import replicas
+from app.db.replicas import ReplicaPool
+from app.models.db_models import Base, Idea, User
+from app.utils.ids import new_id
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def _replica(path, user, idea_name):
+    """A replica holding the user and one idea that only it has"""
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User.__table__), [{"id": user.id, "name": user.name, "email": user.email,
+                                               "hashed_password": "x", "data_version": 0}])
+        conn.execute(insert(Idea.__table__), [{"id": new_id(), "name": idea_name, "user_id": user.id,
+                                               "version": 0}])
+    return engine
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+@pytest.fixture
+def lags():
+    """Replication lag each replica reports, by URL"""
+    return {}
+
+@pytest.fixture
+def pool(tmp_path, user, clock, lags, monkeypatch):
+    engines = [_replica(tmp_path / f"{name}.db", user, name) for name in ("replica-a", "replica-b")]
+    pool = ReplicaPool(engines, max_lag=5, check_interval=10,
+                       lag_probe=lambda conn: lags.get(str(conn.engine.url), 0.0), clock=clock)
+    monkeypatch.setattr(replicas, "replica_pool", pool)
+    yield pool
+    for engine in engines:
+        engine.dispose()
+
+def _idea_names(client, auth_headers):
+    # Listings are cached by data version; drop them so each read hits a database
+    cache.get_cache_backend().clear()
+    return [idea["name"] for idea in client.get("/ideas", headers=auth_headers).json()]
+
+def test_reads_go_round_robin_to_replicas(client, auth_headers, pool):
+    assert [_idea_names(client, auth_headers) for _ in range(4)] == [
+        ["replica-a"], ["replica-b"], ["replica-a"], ["replica-b"],
+    ]
+    # Every session handed its replica back
+    assert [replica.in_use for replica in pool.replicas] == [0, 0]
+
+def _replay_version(replica, user, version):
+    with replica.engine.begin() as conn:
+        conn.execute(update(User.__table__).where(User.id == user.id).values(data_version=version))
+
+def test_writes_read_from_the_primary_until_replayed(client, auth_headers, pool, user):
+    client.post("/ideas", json={"name": "on primary"}, headers=auth_headers)
+    assert [_idea_names(client, auth_headers) for _ in range(2)] == [["on primary"], ["on primary"]]
+
+    # Only the replica that has replayed the write serves reads
+    _replay_version(pool.replicas[1], user, 1)
+    assert [_idea_names(client, auth_headers) for _ in range(2)] == [["replica-b"], ["replica-b"]]
+    _replay_version(pool.replicas[0], user, 1)
+    assert sorted(_idea_names(client, auth_headers) + _idea_names(client, auth_headers)) == [
+        "replica-a", "replica-b",
+    ]
+    assert [replica.in_use for replica in pool.replicas] == [0, 0]
+
+def test_writes_through_other_workers_are_seen(client, auth_headers, pool, db, user):
+    # Bumped on the primary without passing through this process
+    db.execute(update(User.__table__).where(User.id == user.id).values(data_version=3))
+    db.commit()
+    response = client.get("/ideas", headers=auth_headers)
+    assert response.headers["etag"] == f'W/"{user.id}-3"'
+    assert [idea["name"] for idea in response.json()] == []
+
+def test_lagging_and_failing_replicas_are_skipped(client, auth_headers, pool, clock, lags, db):
+    first, second = pool.replicas
+    lags[str(first.engine.url)] = 30.0
+    assert [_idea_names(client, auth_headers) for _ in range(2)] == [["replica-b"], ["replica-b"]]
+
+    # Caught up, but only noticed at the next health check
+    lags[str(first.engine.url)] = 0.0
+    assert _idea_names(client, auth_headers) == ["replica-b"]
+    clock.now += 10
+    assert sorted(_idea_names(client, auth_headers) + _idea_names(client, auth_headers)) == [
+        "replica-a", "replica-b",
+    ]
+
+    def failing(conn):
+        raise OSError("connection refused")
+    pool.lag_probe = failing
+    clock.now += 10
+    db.add(Idea(id=new_id(), name="primary only", user_id=db.query(User).one().id))
+    db.commit()
+    assert _idea_names(client, auth_headers) == ["primary only"]
+    assert not first.healthy and not second.healthy
+
+def test_least_connections_picks_the_idlest_replica(tmp_path, user):
+    engines = [_replica(tmp_path / f"{name}.db", user, name) for name in ("a", "b")]
+    pool = ReplicaPool(engines, balance="least_connections")
+    held = [pool.acquire(user.id, 0) for _ in range(3)]
+    assert [replica.in_use for replica in pool.replicas] == [2, 1]
+    pool.release(held[0])
+    pool.release(held[2])
+    assert pool.acquire(user.id, 0) is pool.replicas[0]
+    # Passed over when behind the version, whatever its load
+    assert pool.acquire(user.id, 1) is None
+    assert ReplicaPool([]).acquire(user.id, 0) is None
+    for engine in engines:
+        engine.dispose()
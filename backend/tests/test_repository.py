@@ -0,0 +1,128 @@
+"""
+The repository backends behave alike, and the routes run on the in-memory
+one without touching the database
+"""
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.main import app
+from app.core.auth import create_access_token
+from app.db.repository import MemoryRepository, SqlRepository, get_repository
+from app.models.db_models import Clip, Tag, User
+from app.utils.ids import new_id
+
+def _sql_clip(db):
+    def add_clip(user_id, idea_id, type, value, tags=()):
+        clip = Clip(id=new_id(), type=type, value=value, status="active", idea_id=idea_id)
+        for name in tags:
+            tag = db.query(Tag).filter_by(name=name).first() or Tag(id=new_id(), name=name)
+            clip.tags.append(tag)
+        db.add(clip)
+        db.commit()
+    return add_clip
+
+@pytest.fixture(params=["sql", "memory"])
+def backend(request, db):
+    if request.param == "sql":
+        users = [User(name=f"User {n}", email=f"user{n}@example.com", hashed_password="x") for n in range(2)]
+        db.add_all(users)
+        db.commit()
+        return SqlRepository(db), [user.id for user in users], _sql_clip(db)
+    repo = MemoryRepository()
+    users = [repo.add_user(f"User {n}", f"user{n}@example.com") for n in range(2)]
+    return repo, [user.id for user in users], repo.add_clip
+
+def test_idea_crud_is_scoped_to_the_user(backend):
+    repo, (alice, bob), _ = backend
+    first = repo.create_idea(alice, "Sourdough", "baking")
+    second = repo.create_idea(alice, "Taxes")
+    assert {idea["name"] for idea in repo.list_ideas(alice)} == {"Sourdough", "Taxes"}
+    assert repo.list_ideas(bob) == []
+    assert repo.get_idea(alice, first["id"])["category"] == "baking"
+    assert repo.get_idea(bob, first["id"]) is None
+
+    version = repo.user_by_email("user0@example.com").data_version
+    assert repo.update_idea(bob, first["id"], name="Stolen") is None
+    updated = repo.update_idea(alice, first["id"], name="Rye")
+    assert updated["name"] == "Rye" and updated["category"] == "baking"
+    assert repo.user_by_email("user0@example.com").data_version > version
+
+    assert not repo.delete_idea(bob, second["id"])
+    assert repo.delete_idea(alice, second["id"])
+    assert [idea["id"] for idea in repo.list_ideas(alice)] == [first["id"]]
+
+def test_clips_and_tags_come_through_the_indexes(backend):
+    repo, (alice, bob), add_clip = backend
+    bread = repo.create_idea(alice, "Bread")["id"]
+    taxes = repo.create_idea(alice, "Taxes")["id"]
+    other = repo.create_idea(bob, "Other")["id"]
+    add_clip(alice, bread, "text", "starter", tags=["baking", "sourdough"])
+    add_clip(alice, bread, "text", "crumb", tags=["baking"])
+    add_clip(alice, taxes, "text", "receipts", tags=["money"])
+    add_clip(bob, other, "text", "bob's bread", tags=["baking"])
+
+    clips = repo.list_clips(alice)
+    assert sorted(clip["value"] for clip in clips) == ["crumb", "receipts", "starter"]
+    starter = next(clip for clip in clips if clip["value"] == "starter")
+    assert sorted(tag["name"] for tag in starter["tags"]) == ["baking", "sourdough"]
+    assert starter["idea_id"] == bread and starter["preview"] is None and not starter["truncated"]
+
+    assert sorted(clip["value"] for clip in repo.list_clips(alice, bread)) == ["crumb", "starter"]
+    assert repo.list_clips(bob, bread) == []
+    assert sorted(clip["value"] for clip in repo.clips_by_tag(alice, "baking")) == ["crumb", "starter"]
+    tag_id = starter["tags"][0]["id"]
+    assert repo.clips_by_tag(alice, tag_id) == repo.clips_by_tag(alice, starter["tags"][0]["name"])
+    assert sorted(tag["name"] for tag in repo.list_tags(alice)) == ["baking", "money", "sourdough"]
+    assert [tag["name"] for tag in repo.list_tags(bob)] == ["baking"]
+
+def test_deleting_an_idea_deletes_its_clips(backend):
+    repo, (alice, bob), add_clip = backend
+    bread = repo.create_idea(alice, "Bread")["id"]
+    taxes = repo.create_idea(alice, "Taxes")["id"]
+    add_clip(alice, bread, "text", "starter", tags=["baking", "sourdough"])
+    add_clip(alice, bread, "text", "crumb", tags=["baking"])
+    add_clip(alice, taxes, "text", "receipts", tags=["money"])
+
+    assert not repo.delete_idea(bob, bread)
+    assert repo.delete_idea(alice, bread)
+    assert [idea["id"] for idea in repo.list_ideas(alice)] == [taxes]
+    assert [clip["value"] for clip in repo.list_clips(alice)] == ["receipts"]
+    assert repo.list_clips(alice, bread) == []
+    assert repo.clips_by_tag(alice, "baking") == []
+    assert [tag["name"] for tag in repo.list_tags(alice)] == ["money"]
+
+def test_routes_run_on_the_memory_repository(db_engine):
+    repo = MemoryRepository()
+    user = repo.add_user("Memory User", "memory@example.com")
+    headers = {"Authorization": "Bearer " + create_access_token(data={"sub": user.email})}
+    statements = []
+    def record(*args):
+        statements.append(args[2])
+
+    app.dependency_overrides[get_repository] = lambda: repo
+    event.listen(db_engine, "before_cursor_execute", record)
+    try:
+        with TestClient(app) as client:
+            idea = client.post("/ideas", json={"name": "Bread"}, headers=headers).json()
+            listing = client.get("/ideas", headers=headers)
+            assert [row["name"] for row in listing.json()] == ["Bread"]
+            repo.add_clip(user.id, idea["id"], "text", "starter", tags=["baking"])
+
+            clips = client.get("/clips", params={"idea": idea["id"]}, headers=headers).json()
+            assert clips[0]["value"] == "starter" and clips[0]["tags"][0]["name"] == "baking"
+            assert client.get("/clips-by-tag", params={"tag": "baking"}, headers=headers).json() == clips
+            assert client.get("/tags", headers=headers).json() == clips[0]["tags"]
+            # The memory user's version moved on with the clip, so the first ETag is stale
+            etag = listing.headers["etag"]
+            assert client.get("/ideas", headers={**headers, "If-None-Match": etag}).status_code == 200
+            etag = client.get("/ideas", headers=headers).headers["etag"]
+            assert client.get("/ideas", headers={**headers, "If-None-Match": etag}).status_code == 304
+
+            assert client.put(f"/ideas/{idea['id']}", json={"name": "Rye"}, headers=headers).json()["name"] == "Rye"
+            assert client.delete(f"/ideas/{idea['id']}", headers=headers).status_code == 204
+            assert client.get(f"/ideas/{idea['id']}", headers=headers).status_code == 404
+    finally:
+        event.remove(db_engine, "before_cursor_execute", record)
+        app.dependency_overrides.pop(get_repository)
+    assert statements == []
@@ -0,0 +1,193 @@
+"""
+Clip embeddings, the per-user vector index, GET /clips/{id}/related and
+GET /search/semantic
+"""
+import multiprocessing
+import os
+
+import numpy as np
+import pytest
+
+import app.db.vector_index as vector_index_module
+import app.services.embedding_service as embedding_module
+from app.db.vector_index import VectorIndex
+from app.services.embedding_service import EmbeddingService
+from app.utils.text_embedding import HashingEmbedder
+
+@pytest.fixture
+def embeddings(tmp_path, monkeypatch, db_engine):
+    service = EmbeddingService(index_dir=str(tmp_path), workers=1, embedder=HashingEmbedder(dim=256))
+    monkeypatch.setattr(embedding_module, "embedding_service", service)
+    yield service
+    service.shutdown()
+
+def _unit(rng, n, dim):
+    x = rng.normal(size=(n, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+def test_index_updates_without_rebuild(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_index_module, "IVF_MIN_ROWS", 200)
+    rng = np.random.default_rng(0)
+    vectors = _unit(rng, 400, 32)
+    ids = [f"c{i}" for i in range(400)]
+
+    index = VectorIndex(str(tmp_path), 32, nprobe=4)
+    index.add(ids[:300], vectors[:300])
+    centroids = index.centroids
+    assert centroids is not None and index.trained_rows == 300
+    # Adds below the retrain threshold go to existing lists
+    index.add(ids[300:], vectors[300:])
+    assert index.centroids is centroids
+    index.remove(ids[:50])
+    assert len(index) == 350 and len(index.free) == 50
+
+    hits = 0
+    for i in range(50, 400, 7):
+        top = index.search(vectors[i], k=1)
+        hits += top[0][0] == ids[i]
+    assert hits >= 45
+    assert all(clip_id not in ids[:50] for clip_id, _ in index.search(vectors[0], k=20))
+
+    # Freed rows are reused, and everything survives reopening
+    index.add(["new"], vectors[:1])
+    assert index.rows["new"] in range(50)
+    reopened = VectorIndex(str(tmp_path), 32, nprobe=4)
+    assert len(reopened) == 351
+    assert reopened.search(vectors[0], k=1)[0][0] == "new"
+    assert np.allclose(reopened.get("c99"), vectors[99], atol=1e-3)
+
+def test_probes_read_only_their_lists(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_index_module, "IVF_MIN_ROWS", 200)
+    rng = np.random.default_rng(0)
+    vectors = _unit(rng, 600, 32)
+    ids = [f"c{i}" for i in range(600)]
+    index, other = VectorIndex(str(tmp_path), 32, nprobe=4), VectorIndex(str(tmp_path), 32, nprobe=4)
+    index.add(ids[:300], vectors[:300])
+
+    def in_lists(probes):
+        return np.flatnonzero(np.isin(index.lists[:len(index.ids)], probes))
+
+    probes = np.array([0, 3, 5])
+    index.search(vectors[0], k=1)
+    assert np.array_equal(index._probe(probes), in_lists(probes))
+    # Another worker's adds and removes are picked up without a re-sort
+    sorted_rows = index._list_rows
+    other.add(ids[300:320], vectors[300:320])
+    other.remove(ids[:10])
+    index.search(vectors[0], k=1)
+    assert index._list_rows is sorted_rows
+    assert np.array_equal(index._probe(probes), in_lists(probes))
+    # Enough churn re-sorts
+    other.add(ids[320:], vectors[320:])
+    index.search(vectors[0], k=1)
+    assert index._list_rows is not sorted_rows and not index._list_moved
+    assert np.array_equal(index._probe(probes), in_lists(probes))
+
+def test_search_within_ranks_only_those_clips(tmp_path):
+    rng = np.random.default_rng(0)
+    vectors = _unit(rng, 50, 32)
+    index = VectorIndex(str(tmp_path), 32)
+    index.add([f"c{i}" for i in range(50)], vectors)
+    results = index.search(vectors[0], k=3, within=["c7", "c8", "missing"])
+    assert sorted(clip_id for clip_id, _ in results) == ["c7", "c8"]
+    assert index.search(vectors[0], k=3, within=[]) == []
+
+def test_evicted_indexes_are_closed(embeddings, monkeypatch):
+    monkeypatch.setattr(embedding_module, "MAX_OPEN_INDEXES", 1)
+    with embeddings._user_lock("a"):
+        first = embeddings._index("a")
+    # The index in use by this thread is not closed under it
+    with embeddings._user_lock("b"):
+        second = embeddings._index("b")
+        assert list(embeddings._indexes) == ["b"]
+        assert first._lock_file.closed and first.vectors is None
+        assert not second._lock_file.closed
+
+def _add_in_batches(path, worker, count):
+    index = VectorIndex(path, 32)
+    vectors = _unit(np.random.default_rng(worker), count, 32)
+    for start in range(0, count, 10):
+        index.add([f"w{worker}-{i}" for i in range(start, start + 10)], vectors[start:start + 10])
+
+def test_workers_share_an_index(tmp_path):
+    path = str(tmp_path)
+    rng = np.random.default_rng(0)
+    first, second = VectorIndex(path, 32), VectorIndex(path, 32)
+    first.add(["a", "b"], _unit(rng, 2, 32))
+    second.add(["c"], _unit(rng, 1, 32))
+    first.remove(["a"])
+    # Each sees the other's writes, and the freed row goes to the next add
+    second.add(["d"], _unit(rng, 1, 32))
+    assert "c" in first and "a" not in second
+    assert first.rows == second.rows == {"b": 1, "c": 2, "d": 0}
+    # Adds append to the journal rather than rewriting it
+    with open(os.path.join(path, "ids.log")) as f:
+        assert f.read().splitlines()[1:] == ["0\ta", "1\tb", "2\tc", "0\t", "0\td"]
+
+    workers = [multiprocessing.Process(target=_add_in_batches, args=(path, worker, 200)) for worker in range(2)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    reopened = VectorIndex(path, 32)
+    assert len(reopened) == 403 and len(set(reopened.rows.values())) == 403
+    expected = _unit(np.random.default_rng(1), 200, 32)
+    assert np.allclose(reopened.get("w1-123"), expected[123], atol=1e-3)
+
+def _clip(client, headers, idea_id, content, type="text"):
+    return client.post(
+        "/clips", json={"type": type, "content": content, "idea_id": idea_id}, headers=headers
+    ).json()["id"]
+
+def test_related_and_semantic_search(client, auth_headers, embeddings):
+    baking = client.post("/ideas", json={"name": "Baking"}, headers=auth_headers).json()["id"]
+    misc = client.post("/ideas", json={"name": "Misc"}, headers=auth_headers).json()["id"]
+    bread = _clip(client, auth_headers, baking, "Sourdough bread needs a lively wild yeast starter")
+    starter = _clip(client, auth_headers, misc, "Feed the sourdough starter twice a day before baking bread")
+    k8s = _clip(client, auth_headers, misc, "Kubernetes horizontal pod autoscaling reacts to CPU load")
+    _clip(client, auth_headers, misc, "Quarterly tax deadlines for freelancers")
+
+    related = client.get(f"/clips/{bread}/related", headers=auth_headers).json()
+    # Found across ideas, and never the clip itself
+    assert related[0]["id"] == starter and related[0]["idea_id"] == misc
+    assert bread not in [clip["id"] for clip in related]
+    assert related[0]["score"] > related[-1]["score"]
+
+    results = client.get("/search/semantic", params={"q": "pod autoscaling"}, headers=auth_headers).json()
+    assert results[0]["id"] == k8s
+    results = client.get(
+        "/search/semantic", params={"q": "sourdough starter", "idea": baking}, headers=auth_headers
+    ).json()
+    assert [clip["id"] for clip in results] == [bread]
+
+    # Edits re-embed, deletes drop out of the index
+    client.put(f"/clips/{k8s}", json={"content": "Rye bread with a sourdough starter"}, headers=auth_headers)
+    client.delete(f"/clips/{starter}", headers=auth_headers)
+    results = client.get("/search/semantic", params={"q": "sourdough starter"}, headers=auth_headers).json()
+    assert [clip["id"] for clip in results][:2] == [k8s, bread]
+    assert starter not in [clip["id"] for clip in results]
+
+    # The idea filter fills the limit even when other ideas match better
+    more = [_clip(client, auth_headers, baking, f"Rye loaf number {i}") for i in range(3)]
+    for i in range(20):
+        _clip(client, auth_headers, misc, f"Sourdough starter feeding schedule {i}")
+    results = client.get(
+        "/search/semantic", params={"q": "sourdough starter", "idea": baking, "limit": 3}, headers=auth_headers
+    ).json()
+    assert len(results) == 3 and results[0]["id"] == bread
+    assert {clip["id"] for clip in results} <= {bread, *more}
+
+def test_collect_embeds_and_related_is_user_scoped(client, auth_headers, user, embeddings):
+    client.post("/collect", json={
+        "user": {"id": user.id, "name": user.name, "email": user.email},
+        "ideas": [{"id": "i1", "name": "Synced", "clips": [
+            {"id": "a", "type": "text", "value": "espresso grind size and extraction time",
+             "status": "active", "created_at": "2026-01-01T00:00:00", "tags": []},
+            {"id": "b", "type": "text", "value": "dialing in espresso extraction",
+             "status": "active", "created_at": "2026-01-01T00:00:00", "tags": []},
+        ]}],
+    }, headers=auth_headers)
+    assert len(embeddings._index(user.id)) == 2
+    related = client.get("/clips/a/related", headers=auth_headers).json()
+    assert [clip["id"] for clip in related] == ["b"]
+    assert client.get("/clips/missing/related", headers=auth_headers).status_code == 404
@@ -0,0 +1,114 @@
+"""
+Delta sync: GET /sync change feed and delta payloads on POST /collect
+"""
+from datetime import timedelta
+
+from sqlalchemy import text
+
+import app.services.clip_body_service as body_module
+from app.services.clip_body_service import ClipBodyService
+
+def _payload(user, ideas, deleted_ideas=None, deleted_clips=None):
+    return {
+        "user": {"id": user.id, "name": user.name, "email": user.email},
+        "ideas": ideas,
+        "deleted_ideas": deleted_ideas or [],
+        "deleted_clips": deleted_clips or [],
+    }
+
+def _clip(clip_id, value, tags=()):
+    return {
+        "id": clip_id,
+        "type": "text",
+        "value": value,
+        "status": "active",
+        "created_at": "2026-01-01T00:00:00Z",
+        "tags": [{"id": f"tag-{t}", "name": t} for t in tags],
+    }
+
+def _drain(client, headers, since=None, limit=500):
+    pages = []
+    while True:
+        params = {"limit": limit}
+        if since:
+            params["since"] = since
+        page = client.get("/sync", params=params, headers=headers).json()
+        pages.append(page)
+        since = page["cursor"]
+        if not page["has_more"]:
+            return pages, since
+
+def test_full_then_incremental_sync(client, auth_headers, user):
+    ideas = [
+        {"id": f"idea-{i}", "name": f"Idea {i}", "clips": [_clip(f"clip-{i}-{j}", "x", ["t"]) for j in range(5)]}
+        for i in range(3)
+    ]
+    client.post("/collect", json=_payload(user, ideas), headers=auth_headers)
+
+    pages, cursor = _drain(client, auth_headers, limit=4)
+    assert len(pages) > 1
+    assert sum(len(p["ideas"]) for p in pages) == 3
+    assert sum(len(p["clips"]) for p in pages) == 15
+    assert {"id": "tag-t", "name": "t"} in pages[0]["tags"] + pages[1]["tags"]
+
+    # Nothing changed: an empty page at the same cursor
+    empty = client.get("/sync", params={"since": cursor}, headers=auth_headers).json()
+    assert empty["ideas"] == [] and empty["clips"] == [] and empty["deleted"] == []
+    assert empty["cursor"] == cursor
+
+    # Delta collect: one edited clip and one deletion
+    delta = _payload(
+        user,
+        [{"id": "idea-0", "name": "Idea 0", "clips": [_clip("clip-0-0", "edited")]}],
+        deleted_clips=["clip-1-1"],
+    )
+    response = client.post("/collect", json=delta, headers=auth_headers).json()
+    assert response["deleted"] == 1
+
+    pages, _ = _drain(client, auth_headers, since=cursor)
+    changes = pages[0]
+    assert [c["id"] for c in changes["clips"]] == ["clip-0-0"]
+    assert changes["clips"][0]["value"] == "edited"
+    # The idea itself was resent unchanged, so it is not part of the delta
+    assert changes["ideas"] == []
+    assert changes["deleted"] == [
+        {"entity": "clip", "id": "clip-1-1", "deleted_at": changes["deleted"][0]["deleted_at"]}
+    ]
+
+def test_deleting_an_idea_tombstones_its_clips(client, auth_headers, db, monkeypatch):
+    monkeypatch.setattr(body_module, "clip_body_service", ClipBodyService(grace=timedelta(0)))
+    idea = client.post("/ideas", json={"name": "Doomed"}, headers=auth_headers).json()
+    clips = [
+        client.post(
+            "/clips", json={"type": "code", "content": content, "idea_id": idea["id"], "tags": ["t"]},
+            headers=auth_headers,
+        ).json()
+        for content in ("print('hello world') " * 10, "def handler(event):\n    return event\n" * 1000)
+    ]
+    _, cursor = _drain(client, auth_headers)
+
+    assert client.delete(f"/ideas/{idea['id']}", headers=auth_headers).status_code == 204
+    changes = client.get("/sync", params={"since": cursor}, headers=auth_headers).json()
+    assert sorted((d["entity"], d["id"]) for d in changes["deleted"]) == sorted(
+        [("idea", idea["id"])] + [("clip", clip["id"]) for clip in clips]
+    )
+    # Tags, LSH buckets and stored bodies went with the clips
+    for table in ("clips", "clip_tags", "clip_lsh_buckets", "clip_bodies"):
+        assert db.execute(text(f"SELECT count(*) FROM {table}")).scalar() == 0, table
+
+def test_route_writes_appear_in_sync(client, auth_headers):
+    _, cursor = _drain(client, auth_headers)
+    idea = client.post("/ideas", json={"name": "New"}, headers=auth_headers).json()
+    clip = client.post(
+        "/clips", json={"type": "text", "content": "c", "idea_id": idea["id"]}, headers=auth_headers
+    ).json()
+    client.delete(f"/clips/{clip['id']}", headers=auth_headers)
+
+    changes = client.get("/sync", params={"since": cursor}, headers=auth_headers).json()
+    assert [i["id"] for i in changes["ideas"]] == [idea["id"]]
+    assert changes["clips"] == []
+    assert [d["id"] for d in changes["deleted"]] == [clip["id"]]
+
+def test_invalid_cursor_is_rejected(client, auth_headers):
+    response = client.get("/sync", params={"since": "not-a-cursor"}, headers=auth_headers)
+    assert response.status_code == 400
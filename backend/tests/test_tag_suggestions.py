@@ -0,0 +1,78 @@
+"""
+POST /tags/suggest and the incrementally maintained per-user tag model
+"""
+import pytest
+
+import app.services.tag_suggestion_service as tag_module
+from app.services.tag_suggestion_service import SparseCounts, TagSuggestionService
+
+@pytest.fixture
+def suggestions(monkeypatch):
+    service = TagSuggestionService()
+    monkeypatch.setattr(tag_module, "tag_suggestion_service", service)
+    return service
+
+def test_sparse_counts_top_stays_exact():
+    counts = SparseCounts(k=2)
+    for column, n in [("a", 3), ("b", 1), ("c", 2)]:
+        for _ in range(n):
+            counts.add("row", column, 1)
+    assert counts.top("row") == [("a", 3), ("c", 2)]
+    # Decrementing a top column rescans the row
+    counts.add("row", "a", -1)
+    counts.add("row", "a", -1)
+    assert counts.top("row") == [("c", 2), ("a", 1)]
+    counts.add("row", "c", -2)
+    assert counts.top("row") == [("a", 1), ("b", 1)]
+    assert "c" not in counts.rows["row"]
+
+def _clip(client, headers, idea_id, content, tags):
+    return client.post(
+        "/clips", json={"type": "text", "content": content, "idea_id": idea_id, "tags": tags},
+        headers=headers,
+    ).json()["id"]
+
+def _suggest(client, headers, content, tags=()):
+    response = client.post("/tags/suggest", json={"content": content, "tags": list(tags)}, headers=headers)
+    assert response.status_code == 200
+    return [s["name"] for s in response.json()]
+
+def test_suggestions_learn_from_tag_writes(client, auth_headers, suggestions, count_statements):
+    idea = client.post("/ideas", json={"name": "Notes"}, headers=auth_headers).json()["id"]
+    _clip(client, auth_headers, idea, "Async generators in Python are neat", ["python", "async"])
+    _clip(client, auth_headers, idea, "Python dataclasses replace boilerplate", ["python"])
+    _clip(client, auth_headers, idea, "Sourdough hydration at seventy percent", ["baking"])
+
+    assert _suggest(client, auth_headers, "Type hints in Python dataclasses")[0] == "python"
+    assert _suggest(client, auth_headers, "Higher hydration sourdough loaf")[0] == "baking"
+    # Co-occurrence: python was chosen, async came with it before
+    assert _suggest(client, auth_headers, "Something unrelated", tags=["python"]) == ["async"]
+
+    # Model is built once; later suggestions and writes do not rescan
+    with count_statements() as counter:
+        _suggest(client, auth_headers, "python again")
+    assert counter.count == 0  # the user lookup is cached too
+
+    clip = _clip(client, auth_headers, idea, "Croissant lamination with cold butter", ["pastry"])
+    assert _suggest(client, auth_headers, "laminated croissant dough")[0] == "pastry"
+    client.put(f"/clips/{clip}", json={"tags": ["viennoiserie"]}, headers=auth_headers)
+    assert _suggest(client, auth_headers, "laminated croissant dough")[0] == "viennoiserie"
+    client.delete(f"/clips/{clip}", headers=auth_headers)
+    assert "viennoiserie" not in _suggest(client, auth_headers, "laminated croissant dough")
+
+def test_model_matches_rebuild_after_changes(client, auth_headers, suggestions, db, user):
+    idea = client.post("/ideas", json={"name": "Notes"}, headers=auth_headers).json()["id"]
+    ids = [_clip(client, auth_headers, idea, f"note about topic{i % 3} and shared words", [f"t{i % 4}"])
+           for i in range(12)]
+    _suggest(client, auth_headers, "warm up")
+    for clip_id in ids[:4]:
+        client.put(f"/clips/{clip_id}", json={"content": "rewritten text", "tags": ["t9"]},
+                   headers=auth_headers)
+    client.delete(f"/clips/{ids[5]}", headers=auth_headers)
+
+    incremental = suggestions.model(db, user.id)
+    rebuilt = suggestions.build(db, user.id)
+    assert incremental.term_clips == rebuilt.term_clips
+    assert incremental.tag_clips == rebuilt.tag_clips
+    assert incremental.term_tags.rows == rebuilt.term_tags.rows
+    assert incremental.clips == rebuilt.clips
@@ -0,0 +1,230 @@
+"""
+GET /media/thumb against a local HTTP stand-in for image origins
+"""
+import asyncio
+import io
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from PIL import Image
+
+import app.routes.media as media_module
+import app.services.thumbnail_service as thumbnail_module
+import app.utils.net as net
+from app.services.thumbnail_service import ThumbnailCache, ThumbnailError, ThumbnailService
+
+def _png(width=1200, height=800, color=(200, 30, 30)):
+    out = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(out, "PNG")
+    return out.getvalue()
+
+@pytest.fixture
+def origin():
+    """
+    Serves /red.png, /blue.png and /not-an-image, counting hits per path;
+    /to/<url> redirects to <url>
+    """
+    files = {
+        "/red.png": (_png(), "image/png"),
+        "/blue.png": (_png(color=(20, 20, 220)), "image/png"),
+        "/not-an-image": (b"hello", "text/plain"),
+    }
+    hits = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits[self.path] = hits.get(self.path, 0) + 1
+            if self.path.startswith("/to/"):
+                self.send_response(302)
+                self.send_header("Location", self.path[len("/to/"):])
+                self.end_headers()
+                return
+            if self.path not in files:
+                self.send_response(404)
+                self.end_headers()
+                return
+            body, content_type = files[self.path]
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    yield base, hits
+    server.shutdown()
+
+@pytest.fixture(autouse=True)
+def signed_in(client, auth_headers):
+    client.headers.update(auth_headers)
+
+@pytest.fixture
+def thumbnails(tmp_path, monkeypatch):
+    service = ThumbnailService(cache_dir=str(tmp_path), workers=1, allow_private_hosts=True)
+    monkeypatch.setattr(thumbnail_module, "thumbnail_service", service)
+    yield service
+    service.shutdown()
+
+def test_origin_is_fetched_once_for_all_sizes(client, origin, thumbnails):
+    base, hits = origin
+    url = f"{base}/red.png"
+    sizes = {}
+    for size in ("sm", "md", "lg"):
+        for fmt in ("webp", "jpeg"):
+            response = client.get("/media/thumb", params={"url": url, "size": size, "format": fmt})
+            assert response.status_code == 200
+            assert response.headers["content-type"] == f"image/{fmt}"
+            with Image.open(io.BytesIO(response.content)) as image:
+                sizes[size] = max(image.size)
+    assert sizes == {"sm": 160, "md": 320, "lg": 640}
+    assert hits["/red.png"] == 1
+
+def test_strong_etag_and_304(client, origin, thumbnails):
+    base, _ = origin
+    params = {"url": f"{base}/red.png"}
+    first = client.get("/media/thumb", params=params)
+    etag = first.headers["etag"]
+    assert etag.startswith('"') and not etag.startswith("W/")
+    again = client.get("/media/thumb", params=params, headers={"If-None-Match": etag})
+    assert again.status_code == 304
+
+def test_lru_eviction_keeps_cache_bounded(client, origin, tmp_path, monkeypatch):
+    base, hits = origin
+    service = ThumbnailService(cache_dir=str(tmp_path / "small"), workers=1, allow_private_hosts=True)
+    monkeypatch.setattr(thumbnail_module, "thumbnail_service", service)
+    try:
+        client.get("/media/thumb", params={"url": f"{base}/red.png"})
+        one_image = service.cache.total_bytes
+        service.cache.max_bytes = int(one_image * 1.5)
+
+        client.get("/media/thumb", params={"url": f"{base}/blue.png"})
+        assert service.cache.total_bytes <= service.cache.max_bytes
+        # red's never-requested variants were least recently used, so they went first
+        params = {"url": f"{base}/red.png", "size": "sm", "format": "jpeg"}
+        assert client.get("/media/thumb", params=params).status_code == 200
+        assert hits["/red.png"] == 2
+    finally:
+        service.shutdown()
+
+def test_workers_share_one_cache(tmp_path):
+    first = ThumbnailCache(str(tmp_path), max_bytes=100)
+    second = ThumbnailCache(str(tmp_path), max_bytes=100)
+    first.store("red", "http://origin/red.png", {"md.webp": b"r" * 40})
+    # Seen by a worker that did not store it, and counted once
+    path, _ = second.lookup("red", "md.webp")
+    second.store("red", "http://origin/red.png", {"md.webp": b"r" * 40})
+    assert first.total_bytes == second.total_bytes == 40
+
+    second.store("blue", "http://origin/blue.png", {"md.webp": b"b" * 80})
+    assert first.total_bytes == 80
+    assert first.lookup("red", "md.webp") is None and not os.path.exists(path)
+    assert first.lookup("blue", "md.webp") is not None
+
+def test_blob_evicted_before_it_is_served(client, origin, thumbnails, monkeypatch):
+    base, hits = origin
+    get_thumbnail = thumbnails.get_thumbnail
+    evicted = []
+
+    async def evicting(*args):
+        thumb = await get_thumbnail(*args)
+        if not evicted:
+            # Another worker evicts it between lookup and response
+            os.remove(thumb.path)
+            evicted.append(thumb.path)
+        return thumb
+    monkeypatch.setattr(thumbnails, "get_thumbnail", evicting)
+    assert client.get("/media/thumb", params={"url": f"{base}/red.png"}).status_code == 200
+    assert evicted and hits["/red.png"] == 2
+
+def test_concurrent_requests_share_one_fetch(origin, thumbnails):
+    base, hits = origin
+
+    async def grid(url):
+        return await asyncio.gather(
+            *(thumbnails.get_thumbnail(url, size) for size in ("sm", "md", "lg") * 2),
+            return_exceptions=True
+        )
+    results = asyncio.run(grid(f"{base}/red.png"))
+    assert all(not isinstance(result, Exception) for result in results)
+    assert hits["/red.png"] == 1
+    # Failed fetches leave no lock behind either
+    results = asyncio.run(grid(f"{base}/missing.png"))
+    assert all(isinstance(result, ThumbnailError) for result in results)
+    assert thumbnails._inflight == {}
+
+def test_errors(client, origin, thumbnails):
+    base, _ = origin
+    assert client.get("/media/thumb", params={"url": f"{base}/missing.png"}).status_code == 502
+    assert client.get("/media/thumb", params={"url": f"{base}/not-an-image"}).status_code == 415
+    assert client.get("/media/thumb", params={"url": "file:///etc/passwd"}).status_code == 400
+    assert client.get("/media/thumb", params={"url": f"{base}/red.png", "size": "xl"}).status_code == 400
+
+def test_private_hosts_are_refused_by_default(client, origin, tmp_path, monkeypatch):
+    base, hits = origin
+    service = ThumbnailService(cache_dir=str(tmp_path / "strict"), workers=1)
+    monkeypatch.setattr(thumbnail_module, "thumbnail_service", service)
+    assert client.get("/media/thumb", params={"url": f"{base}/red.png"}).status_code == 400
+    assert "/red.png" not in hits
+
+def test_signed_in_users_only(client, origin, thumbnails):
+    base, hits = origin
+    del client.headers["Authorization"]
+    assert client.get("/media/thumb", params={"url": f"{base}/red.png"}).status_code == 401
+    assert "/red.png" not in hits
+
+def test_signed_urls_work_without_a_token(client, origin, thumbnails, monkeypatch):
+    base, hits = origin
+    url = f"{base}/red.png"
+    signed = client.post("/media/thumb/sign", json={"urls": [url], "size": "sm"}).json()
+    path = signed[url]
+    del client.headers["Authorization"]
+    assert client.post("/media/thumb/sign", json={"urls": [url]}).status_code == 401
+
+    response = client.get(path)
+    assert response.status_code == 200
+    with Image.open(io.BytesIO(response.content)) as image:
+        assert max(image.size) == 160
+    # Stable within a TTL, so browsers reuse their cached copy
+    assert media_module.signed_thumbnail_path(url, "sm") == path
+    # The signature covers every parameter
+    assert client.get(path.replace("size=sm", "size=lg")).status_code == 403
+    assert client.get(path[:-4] + "0000").status_code == 403
+    monkeypatch.setattr(media_module.time, "time", lambda: 10 ** 12)
+    assert client.get(path).status_code == 403
+    assert hits["/red.png"] == 1
+
+def test_every_redirect_hop_is_checked(client, origin, tmp_path, monkeypatch):
+    base, hits = origin
+    port = base.rsplit(":", 1)[1]
+    checked = []
+    real_check = net.ensure_public_host
+
+    async def check(hostname):
+        # Treat public.test as a public name for the local origin
+        checked.append(hostname)
+        return "127.0.0.1" if hostname == "public.test" else await real_check(hostname)
+    monkeypatch.setattr(net, "ensure_public_host", check)
+    service = ThumbnailService(cache_dir=str(tmp_path / "strict"), workers=1)
+    monkeypatch.setattr(thumbnail_module, "thumbnail_service", service)
+    public = f"http://public.test:{port}"
+    try:
+        assert client.get("/media/thumb", params={"url": f"{public}/to//red.png"}).status_code == 200
+        assert hits["/red.png"] == 1
+        # A public page redirecting into the server's own network
+        private = client.get("/media/thumb", params={"url": f"{public}/to/{base}/blue.png"})
+        assert private.status_code == 400
+        assert "/blue.png" not in hits
+        assert checked == ["public.test", "public.test", "public.test", "127.0.0.1"]
+        # Redirect loops give up
+        loop = f"{public}/to/" * 8 + "red.png"
+        assert client.get("/media/thumb", params={"url": loop}).status_code == 502
+    finally:
+        service.shutdown()
@@ -0,0 +1,205 @@
+"""
+Background link unfurling against a local stub site
+"""
+import asyncio
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import app.services.unfurl_service as unfurl_module
+import app.utils.net as net
+from app.core.auth import create_access_token
+from app.models.db_models import LinkMetadata, User
+from app.services.ai_service import AIService
+from app.services.unfurl_service import UnfurlService, parse_metadata
+from app.utils.urls import video_id
+
+ARTICLE = b"""<html><head>
+<title>Fallback title</title>
+<meta property="og:title" content="Stub Article">
+<meta property="og:description" content="What the article is about">
+<meta property="og:image" content="/cover.png">
+<meta property="og:site_name" content="Stub Site">
+<link rel="canonical" href="/articles/1">
+</head><body>hi</body></html>"""
+
+@pytest.fixture
+def site():
+    hits = {}
+    state = {"active": 0, "max_active": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            with lock:
+                hits[self.path] = hits.get(self.path, 0) + 1
+                state["active"] += 1
+                state["max_active"] = max(state["max_active"], state["active"])
+            try:
+                if self.path.startswith("/slow"):
+                    time.sleep(0.05)
+                if self.path.startswith("/to/"):
+                    self.send_response(302)
+                    self.send_header("Location", self.path[len("/to/"):])
+                    self.end_headers()
+                    return
+                if self.path == "/missing":
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(ARTICLE)))
+                self.end_headers()
+                self.wfile.write(ARTICLE)
+            finally:
+                with lock:
+                    state["active"] -= 1
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", hits, state
+    server.shutdown()
+
+@pytest.fixture
+def unfurler(monkeypatch, db_engine):
+    service = UnfurlService(host_delay=0, allow_private_hosts=True)
+    monkeypatch.setattr(unfurl_module, "unfurl_service", service)
+    return service
+
+def test_parse_metadata_prefers_opengraph():
+    metadata = parse_metadata(ARTICLE.decode(), "https://example.com/a?x=1")
+    assert metadata == {
+        "title": "Stub Article",
+        "description": "What the article is about",
+        "canonical_url": "https://example.com/articles/1",
+        "image_url": "https://example.com/cover.png",
+        "site_name": "Stub Site",
+        "video_id": None,
+    }
+
+def test_video_ids():
+    for url in (
+        "https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=10",
+        "https://youtu.be/dQw4w9WgXcQ",
+        "https://youtube.com/shorts/dQw4w9WgXcQ",
+        "https://www.youtube.com/embed/dQw4w9WgXcQ",
+    ):
+        assert video_id(url) == "youtube:dQw4w9WgXcQ"
+    assert video_id("https://vimeo.com/123456") == "vimeo:123456"
+    assert video_id("https://example.com/watch?v=x") is None
+
+def test_created_link_clip_is_unfurled_and_listed(client, auth_headers, site, unfurler):
+    base, hits, _ = site
+    idea = client.post("/ideas", json={"name": "Links"}, headers=auth_headers).json()
+    url = f"{base}/article"
+    created = client.post(
+        "/clips", json={"type": "link", "content": url, "idea_id": idea["id"]}, headers=auth_headers
+    ).json()
+    # The background task ran after the response, not before it
+    assert created["preview"] is None
+
+    clips = client.get("/clips", headers=auth_headers).json()
+    assert clips[0]["preview"]["title"] == "Stub Article"
+    single = client.get(f"/clips/{created['id']}", headers=auth_headers).json()
+    assert single["preview"] == clips[0]["preview"]
+
+    # Same URL again: served from the metadata cache
+    client.post("/clips", json={"type": "link", "content": url, "idea_id": idea["id"]}, headers=auth_headers)
+    assert hits["/article"] == 1
+
+def test_expired_metadata_is_refreshed(client, auth_headers, site, unfurler, db):
+    base, hits, _ = site
+    unfurler.ttl = timedelta(seconds=-1)
+    idea = client.post("/ideas", json={"name": "Links"}, headers=auth_headers).json()
+    for _ in range(2):
+        client.post(
+            "/clips", json={"type": "video", "content": f"{base}/article", "idea_id": idea["id"]},
+            headers=auth_headers,
+        )
+    assert hits["/article"] == 2
+    assert db.query(LinkMetadata).count() == 1
+
+def test_background_refresh_moves_every_linking_users_etag_on(client, auth_headers, site, unfurler, db):
+    base, hits, _ = site
+    unfurler.ttl = timedelta(seconds=-1)
+    other = User(name="Other", email="other@example.com", hashed_password="x")
+    db.add(other)
+    db.commit()
+    other_headers = {"Authorization": "Bearer " + create_access_token(data={"sub": other.email})}
+    clips = []
+    for headers in (auth_headers, other_headers):
+        idea = client.post("/ideas", json={"name": "Links"}, headers=headers).json()
+        clips.append(client.post(
+            "/clips", json={"type": "link", "content": f"{base}/article", "idea_id": idea["id"]},
+            headers=headers,
+        ).json())
+    # Caches both users at the versions the unfurls left
+    etags = [client.get("/clips", headers=headers).headers["etag"] for headers in (auth_headers, other_headers)]
+
+    # Refreshed through the first user's clip; the metadata is shared
+    assert asyncio.run(unfurler.refresh_clips([clips[0]["id"]])) == 1
+    assert hits["/article"] == 3
+    for headers, etag in zip((auth_headers, other_headers), etags):
+        again = client.get("/clips", headers={**headers, "If-None-Match": etag})
+        assert again.status_code == 200
+        assert again.headers["etag"] != etag
+
+def test_failed_fetch_is_cached_as_error(client, auth_headers, site, unfurler, db):
+    base, _, _ = site
+    idea = client.post("/ideas", json={"name": "Links"}, headers=auth_headers).json()
+    client.post(
+        "/clips", json={"type": "link", "content": f"{base}/missing", "idea_id": idea["id"]},
+        headers=auth_headers,
+    )
+    assert db.query(LinkMetadata).one().status == "error"
+    assert client.get("/clips", headers=auth_headers).json()[0]["preview"] is None
+
+def test_per_host_concurrency_is_bounded(site):
+    base, hits, state = site
+    service = UnfurlService(concurrency=8, per_host=2, host_delay=0, allow_private_hosts=True)
+    urls = [f"{base}/slow/{i}" for i in range(10)]
+    results = asyncio.run(service.unfurl(urls))
+    assert all(r["status"] == "ok" for r in results.values())
+    assert state["max_active"] <= 2
+
+def test_redirects_into_private_hosts_are_refused(site, monkeypatch):
+    base, hits, _ = site
+    port = base.rsplit(":", 1)[1]
+    real_check = net.ensure_public_host
+
+    async def check(hostname):
+        # Treat public.test as a public name for the local site
+        return "127.0.0.1" if hostname == "public.test" else await real_check(hostname)
+    monkeypatch.setattr(net, "ensure_public_host", check)
+    public = f"http://public.test:{port}"
+    results = asyncio.run(UnfurlService(host_delay=0).unfurl([
+        f"{public}/to//articles/1", f"{public}/to/{base}/private",
+    ]))
+    followed = results[f"{public}/to//articles/1"]
+    assert followed["status"] == "ok"
+    # Relative links resolve against the hostname, not the pinned address
+    assert followed["canonical_url"] == f"{public}/articles/1"
+    assert results[f"{public}/to/{base}/private"]["status"] == "error"
+    assert "/private" not in hits
+
+def test_prompt_includes_link_metadata():
+    class Link:
+        type = "link"
+        value = "https://example.com/a"
+
+    class Idea:
+        name = "Idea"
+
+    service = AIService(api_key=None)
+    content = asyncio.run(service.generate_content(
+        idea=Idea(), clips=[Link()], content_type="article", tone="casual", length="short",
+        link_metadata={"https://example.com/a": {"title": "A Title", "description": "About A"}},
+    ))
+    assert "Link: https://example.com/a (Title: A Title; Description: About A)" in content
@@ -0,0 +1,74 @@
+"""
+Canonical URL hashes and the "already clipped" lookup endpoints
+"""
+from app.utils.urls import canonicalize_url
+
+def test_canonicalize_url():
+    assert canonicalize_url("HTTPS://Example.COM:443/Path?b=2&utm_source=x&a=1#frag") == \
+        "https://example.com/Path?a=1&b=2"
+    assert canonicalize_url("http://example.com") == "http://example.com/"
+    assert canonicalize_url("http://example.com:8080/x?fbclid=abc") == "http://example.com:8080/x"
+    assert canonicalize_url("https://youtu.be/dQw4w9WgXcQ?si=share") == \
+        canonicalize_url("https://m.youtube.com/watch?v=dQw4w9WgXcQ&feature=share") == \
+        "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+    assert canonicalize_url("ftp://example.com/file") is None
+    assert canonicalize_url("not a url") is None
+
+def _clip(client, headers, idea_id, type, content):
+    return client.post(
+        "/clips", json={"type": type, "content": content, "idea_id": idea_id}, headers=headers
+    ).json()
+
+def test_lookup_single_and_batch(client, auth_headers, count_statements):
+    idea = client.post("/ideas", json={"name": "Links"}, headers=auth_headers).json()
+    link = _clip(client, auth_headers, idea["id"], "link", "https://Example.com/post?utm_medium=email#top")
+    video = _clip(client, auth_headers, idea["id"], "video", "https://youtu.be/dQw4w9WgXcQ")
+    _clip(client, auth_headers, idea["id"], "text", "https://example.com/post")
+
+    found = client.get(
+        "/clips/lookup", params={"url": "https://example.com/post"}, headers=auth_headers
+    ).json()
+    # Text clips that happen to contain a URL are not indexed
+    assert [c["id"] for c in found["clips"]] == [link["id"]]
+    assert found["canonical_url"] == "https://example.com/post"
+
+    urls = ["https://www.youtube.com/watch?v=dQw4w9WgXcQ", "https://example.com/other", "junk"]
+    urls += [f"https://example.com/n/{i}" for i in range(300)]
+    with count_statements() as counter:
+        results = client.post("/clips/lookup", json={"urls": urls}, headers=auth_headers).json()
+    # One indexed query for the whole batch; the user lookup is cached
+    assert counter.count == 1
+    assert [c["id"] for c in results[0]["clips"]] == [video["id"]]
+    assert results[1]["clips"] == [] and results[2]["canonical_url"] is None
+
+def test_lookup_is_scoped_to_user(client, auth_headers, db):
+    from app.models.db_models import User, Idea, Clip
+    from app.utils.urls import canonical_url_hash
+    other = User(name="Other", email="other@example.com", hashed_password="x")
+    db.add(other)
+    db.flush()
+    idea = Idea(name="Theirs", user_id=other.id)
+    db.add(idea)
+    db.flush()
+    db.add(Clip(type="link", value="https://example.com/", status="active", idea_id=idea.id,
+                url_hash=canonical_url_hash("https://example.com/")))
+    db.commit()
+    found = client.get("/clips/lookup", params={"url": "https://example.com"}, headers=auth_headers).json()
+    assert found["clips"] == []
+
+def test_updated_and_collected_clips_are_indexed(client, auth_headers, user):
+    idea = client.post("/ideas", json={"name": "Links"}, headers=auth_headers).json()
+    clip = _clip(client, auth_headers, idea["id"], "link", "https://a.example/")
+    client.put(f"/clips/{clip['id']}", json={"content": "https://b.example/"}, headers=auth_headers)
+    client.post("/collect", json={
+        "user": {"id": user.id, "name": user.name, "email": user.email},
+        "ideas": [{"id": idea["id"], "name": "Links", "clips": [{
+            "id": "collected", "type": "image", "value": "https://c.example/pic.png",
+            "status": "active", "created_at": "2026-01-01T00:00:00", "tags": [],
+        }]}],
+    }, headers=auth_headers)
+
+    results = client.post("/clips/lookup", json={"urls": [
+        "https://a.example/", "https://b.example/", "https://c.example/pic.png?utm_campaign=x",
+    ]}, headers=auth_headers).json()
+    assert [len(r["clips"]) for r in results] == [0, 1, 1]
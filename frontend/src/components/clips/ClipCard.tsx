@@ -1,5 +1,4 @@
 import React from "react";
-import Image from "next/image";
 import { Clip } from "@/types/idea";
 import { Icons } from "@/components/icons";
 import { buttonStyles } from "@/styles/tokens";
@@ -15,6 +14,7 @@ interface ClipCardProps {
   onDelete: (clipId: string) => void;
   onContentChange?: (clipId: string, content: string) => void;
   isEditing: boolean;
+  thumbnailUrl?: string; // Signed /media/thumb URL for image clips
 }
 
 /**
@@ -26,6 +26,7 @@ export const ClipCard: React.FC<ClipCardProps> = ({
   onDelete,
   onContentChange,
   isEditing,
+  thumbnailUrl,
 }) => {
   const handleClipContentChange = (
     e: React.ChangeEvent<HTMLTextAreaElement>
@@ -104,15 +105,18 @@ export const ClipCard: React.FC<ClipCardProps> = ({
     if (clip.type === "image") {
       return (
         <div className="w-full h-auto max-h-[300px] overflow-hidden rounded-lg">
-          <Image
-            src={clip.content}
-            alt="clip"
-            width={400}
-            height={300}
-            className="object-cover w-full h-full rounded-lg shadow-sm hover:shadow-md transition-shadow"
-            sizes="(max-width: 768px) 100vw, 400px"
-            priority={false}
-          />
+          {thumbnailUrl ? (
+            <img
+              src={thumbnailUrl}
+              alt="clip"
+              width={400}
+              height={300}
+              loading="lazy"
+              className="object-cover w-full h-full rounded-lg shadow-sm hover:shadow-md transition-shadow"
+            />
+          ) : (
+            <div className="w-full h-[300px] rounded-lg bg-neutral-100 animate-pulse" />
+          )}
         </div>
       );
     }
@@ -1,5 +1,6 @@
-import React from "react";
+import React, { useEffect, useState } from "react";
 import { Clip, ClipType } from "@/types/idea";
+import { media } from "@/lib/api";
 import { clipTypeStyles } from "@/styles/tokens";
 import { ClipCard } from "./ClipCard";
 import { Icons } from "@/components/icons";
@@ -25,6 +26,30 @@ export const ClipSection: React.FC<ClipSectionProps> = ({
   onClipContentChange,
 }) => {
   const typeClips = clips.filter((clip) => clip.type === type);
+  // Image clips are shown as backend thumbnails, through signed URLs
+  // since <img> cannot send the auth header
+  const [thumbnails, setThumbnails] = useState<Record<string, string>>({});
+  const imageUrls = type === "image" ? typeClips.map((clip) => clip.content) : [];
+  const imageKey = imageUrls.join("\n");
+
+  useEffect(() => {
+    const missing = imageUrls.filter((url) => url && !(url in thumbnails));
+    if (missing.length === 0) return;
+    let cancelled = false;
+    media
+      .signThumbnails(missing)
+      .catch(() =>
+        // Fall back to loading the originals directly
+        Object.fromEntries(missing.map((url) => [url, url]))
+      )
+      .then((signed) => {
+        if (!cancelled) setThumbnails((current) => ({ ...current, ...signed }));
+      });
+    return () => {
+      cancelled = true;
+    };
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [imageKey]);
 
   if (typeClips.length === 0) return null;
 
@@ -54,6 +79,7 @@ export const ClipSection: React.FC<ClipSectionProps> = ({
             onDelete={onClipDelete}
             onContentChange={onClipContentChange}
             isEditing={clip.id === selectedClipId}
+            thumbnailUrl={thumbnails[clip.content]}
           />
         ))}
       </div>
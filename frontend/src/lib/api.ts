@@ -380,6 +380,42 @@ export const ideas = {
     }
   },
 
+  getSummary: async () => {
+    try {
+      console.log("Fetching idea summaries");
+      const response = await api.get("/ideas/summary");
+      console.log("Idea summaries response:", response.data);
+      return response.data;
+    } catch (error) {
+      console.error("Error fetching idea summaries:", error);
+      throw error;
+    }
+  },
+
+  getDuplicates: async (ideaId: string) => {
+    try {
+      console.log(`Fetching duplicate clips for idea ${ideaId}`);
+      const response = await api.get(`/ideas/${ideaId}/duplicates`);
+      console.log("Duplicate clips response:", response.data);
+      return response.data;
+    } catch (error) {
+      console.error(`Error fetching duplicates for idea ${ideaId}:`, error);
+      throw error;
+    }
+  },
+
+  getClusters: async (ideaId: string) => {
+    try {
+      console.log(`Fetching clip clusters for idea ${ideaId}`);
+      const response = await api.get(`/ideas/${ideaId}/clusters`);
+      console.log("Clip clusters response:", response.data);
+      return response.data;
+    } catch (error) {
+      console.error(`Error fetching clusters for idea ${ideaId}:`, error);
+      throw error;
+    }
+  },
+
   getById: async (id: string) => {
     try {
       console.log(`Fetching idea with ID: ${id}`);
@@ -467,6 +503,42 @@ export const clips = {
     }
   },
 
+  getRelated: async (id: string, limit = 10) => {
+    try {
+      console.log(`Fetching clips related to ${id}`);
+      const response = await api.get(`/clips/${id}/related`, { params: { limit } });
+      console.log("Related clips response:", response.data);
+      return response.data;
+    } catch (error) {
+      console.error(`Error fetching clips related to ${id}:`, error);
+      throw error;
+    }
+  },
+
+  suggestTags: async (content: string, tags: string[] = []) => {
+    try {
+      const response = await api.post("/tags/suggest", { content, tags });
+      return response.data;
+    } catch (error) {
+      console.error("Error fetching tag suggestions:", error);
+      throw error;
+    }
+  },
+
+  search: async (query: string, ideaId?: string) => {
+    try {
+      console.log(`Searching clips for "${query}"`);
+      const response = await api.get("/search/semantic", {
+        params: { q: query, idea: ideaId },
+      });
+      console.log("Search response:", response.data);
+      return response.data;
+    } catch (error) {
+      console.error(`Error searching clips for "${query}":`, error);
+      throw error;
+    }
+  },
+
   create: async (ideaId: string, data: ClipCreateData) => {
     try {
       console.log(`Creating clip for idea ${ideaId}:`, data);
@@ -512,5 +584,42 @@ export const clips = {
   },
 };
 
+// API methods for resized images served by the backend
+export const media = {
+  // Signed /media/thumb URLs for image clips, usable as plain <img src>
+  signThumbnails: async (
+    urls: string[],
+    size: "sm" | "md" | "lg" = "md"
+  ): Promise<Record<string, string>> => {
+    try {
+      const response = await api.post("/media/thumb/sign", { urls, size });
+      const signed: Record<string, string> = response.data;
+      return Object.fromEntries(
+        Object.entries(signed).map(([url, path]) => [url, `${API_URL}${path}`])
+      );
+    } catch (error) {
+      console.error("Error signing thumbnail URLs:", error);
+      throw error;
+    }
+  },
+};
+
+// API methods for exporting all of the user's data
+export const exports = {
+  download: async (format: "jsonl" | "markdown" | "zip" = "jsonl") => {
+    try {
+      console.log(`Exporting data as ${format}`);
+      const response = await api.get("/export", {
+        params: { format },
+        responseType: "blob",
+      });
+      return response.data as Blob;
+    } catch (error) {
+      console.error("Error exporting data:", error);
+      throw error;
+    }
+  },
+};
+
 // Export the axios instance for direct use
 export default api;
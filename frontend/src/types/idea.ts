@@ -7,6 +7,8 @@ export interface Clip {
   created: string;
   tags: string[];
   lang?: string; // Optional language for code clips
+  truncated?: boolean; // content is a preview; clips.getById returns the full text
+  size?: number; // Full body size in bytes, when truncated
 }
 
 export interface Idea {
@@ -0,0 +1,7 @@
+#!/usr/bin/env bash
+# Fill a database with synthetic users, ideas, tags and clips.
+# Options are passed through; see backend/scripts/seed_database.py, e.g.
+#   ./seed_database.sh --users 1 --clips 1000000 --reset
+set -euo pipefail
+cd "$(dirname "$0")/backend"
+exec python -m scripts.seed_database "$@"